@@ -5,20 +5,37 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
+import json
+import os
+from operator import attrgetter
+from pathlib import Path
+
 import click
+from sqlalchemy.orm import selectinload
+from terminaltables import AsciiTable
 
 from indico.cli.core import cli_group
+from indico.core.cache import IndicoTwoTierRedisCache, cache
+from indico.core.config import config
 from indico.core.db import db
 from indico.core.db.sqlalchemy.principals import PrincipalType
 from indico.core.db.sqlalchemy.util.models import get_simple_column_attrs
 from indico.modules.attachments import Attachment, AttachmentFolder
 from indico.modules.attachments.models.principals import AttachmentFolderPrincipal, AttachmentPrincipal
+from indico.modules.categories import Category
+from indico.modules.categories.models.paths import CategoryPath
+from indico.modules.categories.stats import rebuild_category_stats as _rebuild_category_stats
+from indico.modules.events import Event
 from indico.modules.events.contributions import Contribution
 from indico.modules.events.contributions.models.principals import ContributionPrincipal
 from indico.modules.events.models.principals import EventPrincipal
 from indico.modules.events.models.roles import EventRole
 from indico.modules.events.sessions import Session
 from indico.modules.events.sessions.models.principals import SessionPrincipal
+from indico.modules.search.acl_index import index_categories, index_event
+from indico.modules.search.models.acl_index import SearchACLIndexEntry
+from indico.util.console import cformat, verbose_iterator
+from indico.web.flask.stats import get_request_stats_files, merge_request_stats
 
 
 @cli_group()
@@ -101,3 +118,187 @@ def fix_event_role_acls():
                   default=True, abort=True)
     db.session.commit()
     click.secho('Success!', fg='green')
+
+
+@cli.command()
+def rebuild_search_acl_index():
+    """Rebuild the search ACL index from scratch.
+
+    This is needed after enabling the `SEARCH_ACL_INDEX` setting. Afterwards
+    the index is kept up to date automatically.
+    """
+    db.session.execute(SearchACLIndexEntry.__table__.delete())
+    cache = {}
+    index_categories(Category.query.filter(~Category.is_deleted), cache)
+    # keep only the category tokens in the cache; they are needed by all events
+    category_cache = dict(cache)
+    events = Event.query.filter(~Event.is_deleted).options(selectinload(Event.acl_entries)).all()
+    for i, event in enumerate(verbose_iterator(events, len(events), attrgetter('id'), attrgetter('title')), 1):
+        index_event(event, cache)
+        if i % 1000 == 0:
+            db.session.commit()
+            cache = dict(category_cache)
+    db.session.commit()
+    click.secho('Search ACL index rebuilt', fg='green')
+
+
+@cli.command()
+def rebuild_category_stats():
+    """Rebuild the precomputed category statistics from scratch.
+
+    This is needed after upgrading to populate the statistics for the first
+    time. Afterwards they are kept up to date automatically.
+    """
+    num_rows = _rebuild_category_stats()
+    db.session.commit()
+    click.secho(f'Category statistics rebuilt ({num_rows} rows)', fg='green')
+
+
+@cli.command()
+def rebuild_category_paths():
+    """Check and rebuild the category paths.
+
+    The paths are used to query category subtrees and parent chains and
+    are kept up to date by database triggers, so this is only needed if
+    they were modified manually.
+    """
+    num_changed = CategoryPath.rebuild()
+    db.session.commit()
+    if num_changed:
+        click.secho(f'Category paths rebuilt ({num_changed} paths were inconsistent)', fg='yellow')
+    else:
+        click.secho('Category paths rebuilt (no inconsistencies found)', fg='green')
+
+
+@cli.command()
+@click.option('--reset', is_flag=True, help='Reset the counters after showing them')
+def cache_stats(reset):
+    """Show hit/miss statistics of the process-local cache.
+
+    The statistics are only available if the `LOCAL_CACHE_SIZE` setting
+    is enabled.  Each process sends its counters to Redis about once per
+    minute, so very recent cache accesses may not be included yet.
+    """
+    if not isinstance(cache.cache, IndicoTwoTierRedisCache):
+        click.secho('The local cache is not enabled', fg='yellow')
+        return
+    stats = cache.cache.get_local_stats()
+    table_data = [['Scope', 'Hits', 'Misses', 'Hit rate']]
+    for scope, counters in sorted(stats.items()):
+        total = counters['hits'] + counters['misses']
+        hit_rate = f'{counters["hits"] / total:.1%}' if total else '-'
+        table_data.append([scope or '(unscoped)', counters['hits'], counters['misses'], hit_rate])
+    click.echo(AsciiTable(table_data, cformat('%{white!}Local cache%{reset}')).table)
+    if reset:
+        cache.cache.reset_local_stats()
+        click.secho('Counters have been reset', fg='green')
+
+
+def _format_prometheus_stats(stats):
+    def _escape(value):
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+    metrics = {
+        'indico_requests_total': ('counter', 'Number of requests'),
+        'indico_request_duration_seconds_total': ('counter', 'Total time spent in requests'),
+        'indico_request_duration_seconds_max': ('gauge', 'Duration of the slowest request'),
+        'indico_request_queries_total': ('counter', 'Number of SQL queries'),
+        'indico_request_query_duration_seconds_total': ('counter', 'Total time spent in SQL queries'),
+        'indico_request_phase_duration_seconds_total': ('counter', 'Total time spent in each request phase'),
+        'indico_request_repeated_statements': ('gauge', 'Number of statements likely caused by N+1 queries'),
+    }
+    lines = {name: [f'# HELP {name} {help_}', f'# TYPE {name} {type_}']
+             for name, (type_, help_) in metrics.items()}
+    for endpoint, data in sorted(stats.items()):
+        label = f'endpoint="{_escape(endpoint)}"'
+        lines['indico_requests_total'].append(f'indico_requests_total{{{label}}} {data["requests"]}')
+        lines['indico_request_duration_seconds_total'].append(
+            f'indico_request_duration_seconds_total{{{label}}} {data["duration"]:.6f}')
+        lines['indico_request_duration_seconds_max'].append(
+            f'indico_request_duration_seconds_max{{{label}}} {data["max_duration"]:.6f}')
+        lines['indico_request_queries_total'].append(f'indico_request_queries_total{{{label}}} {data["query_count"]}')
+        lines['indico_request_query_duration_seconds_total'].append(
+            f'indico_request_query_duration_seconds_total{{{label}}} {data["query_duration"]:.6f}')
+        for phase, duration in sorted(data['phases'].items()):
+            lines['indico_request_phase_duration_seconds_total'].append(
+                f'indico_request_phase_duration_seconds_total{{{label},phase="{phase}"}} {duration:.6f}')
+        lines['indico_request_repeated_statements'].append(
+            f'indico_request_repeated_statements{{{label}}} {len(data["repeated"])}')
+    return '\n'.join(line for group in lines.values() for line in group) + '\n'
+
+
+def _print_request_stats_table(stats, limit):
+    table_data = [['Endpoint', 'Requests', 'Avg time', 'Max time', 'Avg queries', 'Avg query time',
+                   'Args', 'Access', 'Process', 'Template']]
+    endpoints = sorted(stats.items(), key=lambda x: x[1]['duration'], reverse=True)[:limit]
+    for endpoint, data in endpoints:
+        count = data['requests']
+        phases = data['phases']
+        table_data.append([endpoint, count, f'{data["duration"] / count:.3f}s', f'{data["max_duration"]:.3f}s',
+                           f'{data["query_count"] / count:.1f}', f'{data["query_duration"] / count:.3f}s',
+                           *(f'{phases.get(phase, 0) / count:.3f}s'
+                             for phase in ('_process_args', '_check_access', '_process', 'render_template'))])
+    click.echo(AsciiTable(table_data, cformat('%{white!}Endpoints by total time%{reset}')).table)
+
+    table_data = [['Endpoint', 'Count', 'Total time', 'Max time', 'Statement']]
+    for endpoint, data in endpoints:
+        for statement, info in sorted(data['statements'].items(), key=lambda x: x[1]['duration'],
+                                      reverse=True)[:3]:
+            table_data.append([endpoint, info['count'], f'{info["duration"]:.3f}s', f'{info["max_duration"]:.3f}s',
+                               statement[:100]])
+    click.echo(AsciiTable(table_data, cformat('%{white!}Slowest statements%{reset}')).table)
+
+    table_data = [['Endpoint', 'Requests', 'Max count', 'Statement']]
+    for endpoint, data in endpoints:
+        for statement, info in sorted(data['repeated'].items(), key=lambda x: x[1]['max_count'], reverse=True):
+            table_data.append([endpoint, info['requests'], info['max_count'], statement[:100]])
+    if len(table_data) > 1:
+        click.echo(AsciiTable(table_data, cformat('%{white!}Likely N+1 queries%{reset}')).table)
+
+
+@cli.command()
+@click.option('--format', 'format_', type=click.Choice(['table', 'json', 'prometheus']), default='table',
+              help='The output format')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True),
+              help='Write the stats to a file instead of showing them')
+@click.option('--limit', type=int, default=20, show_default=True,
+              help='The number of endpoints shown in the table')
+@click.option('--reset', is_flag=True, help='Delete the collected stats after showing them')
+def request_stats(format_, output, limit, reset):
+    """Show statistics collected by the request instrumentation.
+
+    The statistics are only available if the `REQUEST_STATS_DIR` setting
+    is enabled.  Each process writes its stats about once per minute, so
+    very recent requests may not be included yet.
+
+    The `prometheus` format can be written to the directory used by the
+    textfile collector of the Prometheus node exporter, e.g. using a cronjob.
+    """
+    if not config.REQUEST_STATS_DIR:
+        click.secho('Request instrumentation is not enabled', fg='yellow')
+        return
+    stats = {}
+    paths = get_request_stats_files(config.REQUEST_STATS_DIR)
+    for path in paths:
+        try:
+            with open(path) as f:
+                merge_request_stats(stats, json.load(f))
+        except (OSError, ValueError) as exc:
+            click.secho(f'Could not read {path}: {exc}', fg='yellow', err=True)
+    if format_ == 'table':
+        if not stats:
+            click.secho('No request stats have been collected yet', fg='yellow')
+        else:
+            _print_request_stats_table(stats, limit)
+    else:
+        data = json.dumps(stats, indent=2) if format_ == 'json' else _format_prometheus_stats(stats)
+        if output:
+            tmp_path = f'{output}.tmp'
+            Path(tmp_path).write_text(data)
+            os.replace(tmp_path, output)
+        else:
+            click.echo(data, nl=False)
+    if reset:
+        for path in paths:
+            os.remove(path)
+        click.secho('Request stats have been reset', fg='green', err=True)
@@ -5,9 +5,16 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from datetime import timedelta
 
 from cachelib.serializers import RedisSerializer
+from flask import g, has_request_context
 from flask_caching import Cache
 from flask_caching.backends.rediscache import RedisCache
 from redis import RedisError
@@ -18,6 +25,7 @@ from indico.core.logger import Logger
 
 
 _logger = Logger.get('cache')
+_fork_lock = threading.Lock()
 
 
 class CachedNone:
@@ -42,31 +50,417 @@ class NoneWrappingRedisSerializer(RedisSerializer):
         return super().dumps(CachedNone.wrap(value), *args, **kwargs)
 
 
+class _WriteBatch:
+    __slots__ = ('commands', 'values')
+
+    def __init__(self):
+        self.commands = []
+        self.values = {}
+
+    def get(self, key, serializer, default=None):
+        # values are kept serialized so changes made to an object after
+        # storing it in the cache do not show up when reading it again
+        value = self.values[key]
+        return default if value is _deleted else CachedNone.unwrap(serializer.loads(value), default)
+
+
+_deleted = object()
+
+
 class IndicoRedisCache(RedisCache):
     """
     This is similar to the original RedisCache from Flask-Caching, but it
     allows specifying a default value when retrieving cache data and
     distinguishing between a cached ``None`` value and a cache miss.
+
+    It also supports write batches: While a batch is active in the current
+    request, all writes are queued and sent to Redis in a single pipeline
+    when the batch is flushed.  Reads in the same request see the queued
+    values, and operations whose result depends on the data in Redis (such
+    as :meth:`add` and :meth:`inc`) flush the batch first.
     """
 
     serializer = NoneWrappingRedisSerializer()
 
+    def _get_write_batch(self):
+        if not has_request_context():
+            return None
+        return g.get('cache_write_batch')
+
+    def _write(self, func):
+        if (batch := self._get_write_batch()) is not None:
+            batch.commands.append(func)
+        else:
+            func(self._write_client)
+
+    def start_write_batch(self):
+        """Queue all writes in the current request until the batch is flushed."""
+        if not has_request_context():
+            return
+        self.flush_write_batch()
+        g.cache_write_batch = _WriteBatch()
+
+    def flush_write_batch(self):
+        """Send all queued writes to Redis using a single pipeline."""
+        batch = self._get_write_batch()
+        if batch is None or not batch.commands:
+            return
+        pipe = self._write_client.pipeline(transaction=False)
+        for command in batch.commands:
+            command(pipe)
+        batch.commands = []
+        batch.values = {}
+        pipe.execute()
+
+    def end_write_batch(self):
+        """Flush all queued writes and stop queuing new ones."""
+        if self._get_write_batch() is None:
+            return
+        try:
+            self.flush_write_batch()
+        finally:
+            del g.cache_write_batch
+
+    def _get(self, key):
+        return RedisCache.get(self, key)
+
+    def _get_many(self, keys):
+        return RedisCache.get_many(self, *keys)
+
     def get(self, key, default=None):
-        return CachedNone.unwrap(super().get(key), default)
+        batch = self._get_write_batch()
+        if batch is not None and key in batch.values:
+            return batch.get(key, self.serializer, default)
+        return CachedNone.unwrap(self._get(key), default)
 
     def get_many(self, *keys, default=None):
-        return [CachedNone.unwrap(val, default) for val in super().get_many(*keys)]
+        batch = self._get_write_batch()
+        queued = batch.values if batch is not None else {}
+        missing = [key for key in keys if key not in queued]
+        fetched = dict(zip(missing, self._get_many(missing), strict=True)) if missing else {}
+        return [batch.get(key, self.serializer, default) if key in queued else CachedNone.unwrap(fetched[key], default)
+                for key in keys]
 
     def get_dict(self, *keys, default=None):
         return dict(zip(keys, self.get_many(*keys, default=default), strict=True))
 
+    def _queue_set(self, batch, key, value, timeout):
+        timeout = self._normalize_timeout(timeout)
+        name = self._get_prefix() + key
+        dump = self.serializer.dumps(value)
+        if timeout == -1:
+            batch.commands.append(lambda pipe: pipe.set(name, dump))
+        else:
+            batch.commands.append(lambda pipe: pipe.setex(name, timeout, dump))
+        batch.values[key] = dump
+
+    def set(self, key, value, timeout=None):
+        if (batch := self._get_write_batch()) is None:
+            return super().set(key, value, timeout=timeout)
+        self._queue_set(batch, key, value, timeout)
+        return True
+
+    def set_many(self, mapping, timeout=None):
+        if (batch := self._get_write_batch()) is None:
+            return super().set_many(mapping, timeout=timeout)
+        for key, value in mapping.items():
+            self._queue_set(batch, key, value, timeout)
+        return list(mapping)
+
+    def _queue_delete(self, batch, keys):
+        names = [self._get_prefix() + key for key in keys]
+        batch.commands.append(lambda pipe: pipe.delete(*names))
+        batch.values.update(dict.fromkeys(keys, _deleted))
+
+    def delete(self, key):
+        if (batch := self._get_write_batch()) is None:
+            return super().delete(key)
+        self._queue_delete(batch, [key])
+        return True
+
+    def delete_many(self, *keys):
+        if (batch := self._get_write_batch()) is None:
+            return super().delete_many(*keys)
+        if keys:
+            self._queue_delete(batch, keys)
+        return list(keys)
+
+    def add(self, key, value, timeout=None):
+        self.flush_write_batch()
+        return super().add(key, value, timeout=timeout)
+
+    def inc(self, key, delta=1):
+        self.flush_write_batch()
+        return super().inc(key, delta)
+
+    def clear(self):
+        self.flush_write_batch()
+        return super().clear()
+
+    def get_hash(self, key):
+        """Get the raw (not deserialized) fields of a Redis hash."""
+        return {field.decode(): value for field, value in self._read_client.hgetall(self._get_prefix() + key).items()}
+
+    def write_hash(self, key, mapping, delete_fields=(), timeout=None):
+        """Update the raw fields of a Redis hash and set its expiry.
+
+        :param mapping: A dict containing the fields to set
+        :param delete_fields: The names of fields to delete
+        :param timeout: The expiry of the whole hash
+        """
+        name = self._get_prefix() + key
+        timeout = self._normalize_timeout(timeout)
+
+        def _write_hash(pipe):
+            if delete_fields:
+                pipe.hdel(name, *delete_fields)
+            if mapping:
+                pipe.hset(name, mapping=mapping)
+            if timeout == -1:
+                pipe.persist(name)
+            else:
+                pipe.expire(name, timeout)
+
+        self._write(_write_hash)
+
     @classmethod
     def factory(cls, app, config, args, kwargs):
         key_prefix = config.get('CACHE_KEY_PREFIX')
         if key_prefix:
             kwargs['key_prefix'] = key_prefix
         kwargs['host'] = redis_from_url(config['CACHE_REDIS_URL'], socket_timeout=1)
-        return IndicoRedisCache(*args, **kwargs)
+        return cls(*args, **kwargs)
+
+
+class IndicoTwoTierRedisCache(IndicoRedisCache):
+    """
+    A Redis cache with an additional process-local LRU cache in front of it.
+
+    Values read from or written to Redis are kept in memory for a short time
+    (capped per scope) so hot keys do not need a Redis round trip on every
+    access.  Any write or deletion is broadcast to all other processes using
+    Redis pub/sub so they can drop their local copies immediately.  While the
+    pub/sub connection is down, the local tier is bypassed, so a process never
+    serves data that is older than the TTL cap of its scope.
+
+    Local hit/miss counters are collected per scope and periodically added to
+    a Redis hash so they can be inspected using ``indico maint cache-stats``.
+    """
+
+    #: How often (in seconds) the local hit/miss counters are sent to Redis
+    stats_flush_interval = 60
+
+    def __init__(self, *args, local_size=1000, local_ttl=10, local_scope_ttls=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.local_size = local_size
+        self.local_ttl = local_ttl
+        self.local_scope_ttls = local_scope_ttls or {}
+        self._pid = None
+
+    @property
+    def _channel(self):
+        return f'{self._get_prefix()}local-cache-invalidate'
+
+    @property
+    def _stats_key(self):
+        return f'{self._get_prefix()}local-cache-stats'
+
+    def _ensure_listener(self):
+        # processes are usually forked after the app (and thus the cache) has been
+        # created, so we need to set up the local state and listener lazily
+        if self._pid == os.getpid():
+            return
+        with _fork_lock:
+            if self._pid == os.getpid():
+                return
+            self._lock = threading.Lock()
+            self._local = OrderedDict()
+            self._stats = {}
+            self._generation = 0
+            self._subscribed = False
+            self._origin = uuid.uuid4().hex
+            thread = threading.Thread(target=self._listen, name='indico-local-cache', daemon=True)
+            self._pid = os.getpid()
+            thread.start()
+
+    def _listen(self):
+        pid = os.getpid()
+        last_flush = time.monotonic()
+        while self._pid == pid:
+            try:
+                pubsub = self._write_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                with self._lock:
+                    self._subscribed = True
+                while self._pid == pid:
+                    message = pubsub.get_message(timeout=1)
+                    if message is not None:
+                        self._handle_message(message['data'])
+                    if time.monotonic() - last_flush >= self.stats_flush_interval:
+                        self._flush_stats()
+                        last_flush = time.monotonic()
+            except RedisError:
+                _logger.exception('Local cache invalidation listener failed')
+                with self._lock:
+                    self._subscribed = False
+                    self._local.clear()
+                    self._generation += 1
+                time.sleep(1)
+
+    def _handle_message(self, data):
+        data = json.loads(data)
+        if data['origin'] == self._origin:
+            return
+        if data['keys'] is None:
+            self._drop_local(clear=True)
+        else:
+            self._drop_local(data['keys'])
+
+    def _flush_stats(self):
+        with self._lock:
+            stats = self._stats
+            self._stats = {}
+        if not stats:
+            return
+        pipe = self._write_client.pipeline(transaction=False)
+        for scope, (hits, misses) in stats.items():
+            pipe.hincrby(self._stats_key, f'{scope}:hits', hits)
+            pipe.hincrby(self._stats_key, f'{scope}:misses', misses)
+        pipe.execute()
+
+    def get_local_stats(self):
+        """Get the hit/miss counters of the local cache tier per scope.
+
+        The counters are aggregated over all processes using this cache,
+        but the counters of each process are only sent to Redis every
+        :attr:`stats_flush_interval` seconds.
+        """
+        stats = {}
+        for field, value in self._read_client.hgetall(self._stats_key).items():
+            scope, __, kind = field.decode().rpartition(':')
+            stats.setdefault(scope, {'hits': 0, 'misses': 0})[kind] = int(value)
+        return stats
+
+    def reset_local_stats(self):
+        self._write_client.delete(self._stats_key)
+
+    def _get_scope(self, key):
+        return key.partition('/')[0] if '/' in key else ''
+
+    def _get_local_ttl(self, key, timeout=None):
+        ttl = self.local_scope_ttls.get(self._get_scope(key), self.local_ttl)
+        timeout = self._normalize_timeout(timeout)
+        if timeout > 0:
+            ttl = min(ttl, timeout)
+        return ttl
+
+    def _count(self, key, hit):
+        counters = self._stats.setdefault(self._get_scope(key), [0, 0])
+        counters[0 if hit else 1] += 1
+
+    def _get_local(self, keys):
+        """Get the serialized values of keys from the local cache.
+
+        :return: A dict containing the keys found in the local cache and the
+                 current generation which is needed when storing new values.
+        """
+        self._ensure_listener()
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._local.get(key) if self._subscribed else None
+                if entry is not None and entry[0] <= now:
+                    del self._local[key]
+                    entry = None
+                if entry is not None:
+                    self._local.move_to_end(key)
+                    found[key] = entry[1]
+                self._count(key, entry is not None)
+            return found, self._generation
+
+    def _set_local(self, mapping, generation, timeout=None):
+        now = time.monotonic()
+        with self._lock:
+            # if keys have been invalidated since we read them from redis, we
+            # may have stale data and must not store anything
+            if not self._subscribed or generation != self._generation:
+                return
+            for key, raw_value in mapping.items():
+                ttl = self._get_local_ttl(key, timeout)
+                if ttl <= 0:
+                    continue
+                self._local[key] = (now + ttl, raw_value)
+                self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def _drop_local(self, keys=None, clear=False):
+        self._ensure_listener()
+        with self._lock:
+            self._generation += 1
+            if clear:
+                self._local.clear()
+            else:
+                for key in keys:
+                    self._local.pop(key, None)
+
+    def _invalidate(self, keys=None, clear=False):
+        self._drop_local(keys, clear=clear)
+        channel = self._channel
+        message = json.dumps({'origin': self._origin, 'keys': None if clear else list(keys)})
+        # when using a write batch, this is sent in the same pipeline right after the writes
+        self._write(lambda client: client.publish(channel, message))
+
+    def _get(self, key):
+        return self._get_many([key])[0]
+
+    def _get_many(self, keys):
+        found, generation = self._get_local(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            prefix = self._get_prefix()
+            raw_values = self._read_client.mget([prefix + key for key in missing])
+            fetched = {key: raw for key, raw in zip(missing, raw_values, strict=True) if raw is not None}
+            self._set_local(fetched, generation)
+            found.update(fetched)
+        return [self.serializer.loads(found.get(key)) for key in keys]
+
+    def set(self, key, value, timeout=None):
+        rv = super().set(key, value, timeout=timeout)
+        self._invalidate([key])
+        return rv
+
+    def add(self, key, value, timeout=None):
+        rv = super().add(key, value, timeout=timeout)
+        if rv:
+            self._invalidate([key])
+        return rv
+
+    def set_many(self, mapping, timeout=None):
+        rv = super().set_many(mapping, timeout=timeout)
+        self._invalidate(mapping)
+        return rv
+
+    def delete(self, key):
+        rv = super().delete(key)
+        self._invalidate([key])
+        return rv
+
+    def delete_many(self, *keys):
+        rv = super().delete_many(*keys)
+        self._invalidate(keys)
+        return rv
+
+    def inc(self, key, delta=1):
+        rv = super().inc(key, delta)
+        self._invalidate([key])
+        return rv
+
+    def clear(self):
+        rv = super().clear()
+        self._invalidate(clear=True)
+        return rv
 
 
 class ScopedCache:
@@ -88,7 +482,7 @@ class ScopedCache:
     def add(self, key, value, timeout=None):
         if isinstance(timeout, timedelta):
             timeout = int(timeout.total_seconds())
-        self.cache.add(self._scoped(key), value, timeout=timeout)
+        return self.cache.add(self._scoped(key), value, timeout=timeout)
 
     def delete(self, key):
         self.cache.delete(self._scoped(key))
@@ -97,6 +491,17 @@ class ScopedCache:
         keys = [self._scoped(key) for key in keys]
         self.cache.delete_many(*keys)
 
+    def inc(self, key, delta=1):
+        return self.cache.inc(self._scoped(key), delta)
+
+    def get_hash(self, key):
+        return self.cache.get_hash(self._scoped(key))
+
+    def write_hash(self, key, mapping, delete_fields=(), timeout=None):
+        if isinstance(timeout, timedelta):
+            timeout = int(timeout.total_seconds())
+        self.cache.write_hash(self._scoped(key), mapping, delete_fields, timeout=timeout)
+
     def clear(self):
         raise NotImplementedError('Clearing scoped caches is not supported')
 
@@ -152,7 +557,7 @@ class IndicoCache(Cache):
         if isinstance(timeout, timedelta):
             timeout = int(timeout.total_seconds())
         try:
-            super().add(key, value, timeout=timeout)
+            return super().add(key, value, timeout=timeout)
         except RedisError:
             if config.DEBUG:
                 raise
@@ -174,6 +579,72 @@ class IndicoCache(Cache):
                 raise
             _logger.exception('delete_many(%s) failed', ', '.join(map(repr, keys)))
 
+    def inc(self, key, delta=1):
+        try:
+            return self.cache.inc(key, delta)
+        except RedisError:
+            if config.DEBUG:
+                raise
+            _logger.exception('inc(%r) failed', key)
+
+    def get_hash(self, key):
+        if not isinstance(self.cache, IndicoRedisCache):
+            return {}
+        try:
+            return self.cache.get_hash(key)
+        except RedisError:
+            if config.DEBUG:
+                raise
+            _logger.exception('get_hash(%r) failed', key)
+            return {}
+
+    def write_hash(self, key, mapping, delete_fields=(), timeout=None):
+        if not isinstance(self.cache, IndicoRedisCache):
+            return
+        if isinstance(timeout, timedelta):
+            timeout = int(timeout.total_seconds())
+        try:
+            self.cache.write_hash(key, mapping, delete_fields, timeout=timeout)
+        except RedisError:
+            if config.DEBUG:
+                raise
+            _logger.exception('write_hash(%r) failed', key)
+
+    def start_write_batch(self):
+        """Queue all cache writes in the current request.
+
+        The queued writes are sent to Redis in a single pipeline by
+        :meth:`flush_write_batch` or :meth:`end_write_batch`.
+        """
+        if not has_request_context() or not isinstance(self.cache, IndicoRedisCache):
+            return
+        try:
+            self.cache.start_write_batch()
+        except RedisError:
+            if config.DEBUG:
+                raise
+            _logger.exception('start_write_batch() failed')
+
+    def flush_write_batch(self):
+        if not has_request_context() or not isinstance(self.cache, IndicoRedisCache):
+            return
+        try:
+            self.cache.flush_write_batch()
+        except RedisError:
+            if config.DEBUG:
+                raise
+            _logger.exception('flush_write_batch() failed')
+
+    def end_write_batch(self):
+        if not has_request_context() or not isinstance(self.cache, IndicoRedisCache):
+            return
+        try:
+            self.cache.end_write_batch()
+        except RedisError:
+            if config.DEBUG:
+                raise
+            _logger.exception('end_write_batch() failed')
+
     def clear(self):
         try:
             super().clear()
@@ -5,11 +5,12 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
+import time
 from datetime import timedelta
 
 import pytest
 
-from indico.core.cache import cache, make_scoped_cache
+from indico.core.cache import IndicoTwoTierRedisCache, cache, make_scoped_cache
 
 
 def test_cache_none_default():
@@ -69,3 +70,90 @@ def test_expiry(scoped, timeout):
     cache_obj.add('b', 2, timeout=timeout)
     cache_obj.set_many({'c': 3}, timeout=timeout)
     assert cache_obj.get_many('a', 'b', 'c') == [1, 2, 3]
+
+
+def _wait_for(func, timeout=5):
+    end = time.monotonic() + timeout
+    while not func():
+        assert time.monotonic() < end, 'timeout'
+        time.sleep(0.05)
+
+
+@pytest.mark.usefixtures('request_context')
+def test_write_batch():
+    # the request context already started a write batch
+    backend = cache.cache
+    cache.set('foo', 1)
+    cache.set('bar', 2)
+    cache.set_many({'a': None})
+    cache.delete('bar')
+    assert cache.get_many('foo', 'bar', 'a', 'b', default='x') == [1, 'x', None, 'x']
+    assert backend._read_client.get(backend.key_prefix + 'foo') is None
+    cache.flush_write_batch()
+    assert backend._read_client.get(backend.key_prefix + 'foo') is not None
+    # add() needs to know what's in redis, so it sends the queued writes first
+    cache.set('foo', 3)
+    cache.add('foo', 4)
+    cache.end_write_batch()
+    assert cache.get_many('foo', 'bar', 'a') == [3, None, None]
+
+
+@pytest.mark.usefixtures('request_context')
+def test_write_batch_mutable():
+    value = {'foo': [1]}
+    cache.set('foo', value)
+    # changes made after queuing the write are neither stored nor returned
+    value['foo'].append(2)
+    assert cache.get('foo') == {'foo': [1]}
+    cache.end_write_batch()
+    assert cache.get('foo') == {'foo': [1]}
+
+
+@pytest.fixture
+def two_tier_caches():
+    backend = cache.cache
+    caches = [IndicoTwoTierRedisCache(host=backend._write_client, key_prefix=backend.key_prefix, default_timeout=0,
+                                      local_scope_ttls={'nolocal': 0})
+              for __ in range(2)]
+    for c in caches:
+        c._ensure_listener()
+        _wait_for(lambda c=c: c._subscribed)
+    yield caches
+    for c in caches:
+        c._pid = None
+
+
+def test_two_tier_cache(two_tier_caches):
+    a, b = two_tier_caches
+    a.set('test/foo', 1)
+    a.set('test/none', None)
+    assert b.get('test/foo') == 1
+    assert b.get_many('test/foo', 'test/none', 'test/missing', default='x') == [1, None, 'x']
+    assert b._local.keys() == {'test/foo', 'test/none'}
+    assert b._stats == {'test': [1, 3]}
+    # changes are broadcast to the other cache
+    a.set('test/foo', 2)
+    _wait_for(lambda: 'test/foo' not in b._local)
+    assert b.get('test/foo') == 2
+    a.delete_many('test/foo', 'test/none')
+    _wait_for(lambda: not b._local)
+    assert b.get('test/foo', 'x') == 'x'
+
+
+def test_two_tier_cache_scope_ttl(two_tier_caches):
+    a, b = two_tier_caches
+    a.set('nolocal/foo', 1)
+    a.set('test/foo', 1)
+    assert b.get_many('nolocal/foo', 'test/foo') == [1, 1]
+    assert list(b._local) == ['test/foo']
+
+
+def test_two_tier_cache_lru(two_tier_caches):
+    a, b = two_tier_caches
+    b.local_size = 2
+    a.set_many({'test/a': 1, 'test/b': 2, 'test/c': 3})
+    b.get('test/a')
+    b.get('test/b')
+    b.get('test/a')
+    b.get('test/c')
+    assert list(b._local) == ['test/a', 'test/c']
@@ -17,6 +17,7 @@ from flask_pluginengine import current_plugin, plugin_context
 from sqlalchemy import inspect
 from terminaltables import AsciiTable
 
+from indico.core.cache import cache
 from indico.core.celery.util import locked_task
 from indico.core.config import config
 from indico.core.db import db
@@ -115,6 +116,8 @@ class IndicoCelery(Celery):
                 if current_plugin:
                     options['headers'] = options.get('headers') or {}  # None in a retry
                     options['headers']['indico_plugin'] = current_plugin.name
+                # the task may need cache data written in the current request
+                cache.flush_write_batch()
                 return super().apply_async(args=args, kwargs=kwargs, task_id=task_id, producer=producer,
                                            link=link, link_error=link_error, shadow=shadow, **options)
 
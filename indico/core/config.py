@@ -69,6 +69,7 @@ DEFAULTS = {
     'FAILED_LOGIN_RATE_LIMIT': '5 per 15 minutes; 10 per day',
     'FAVICON_URL': None,
     'IDENTITY_PROVIDERS': {},
+    'LATEX_PDF_STORAGE': None,
     'LATEX_RATE_LIMIT': '2 per 3 seconds',
     'LOCAL_IDENTITIES': True,
     'LOCAL_USERNAMES': True,
@@ -76,6 +77,9 @@ DEFAULTS = {
     'LOCAL_PASSWORD_MIN_LENGTH': 8,
     'LOCAL_REGISTRATION': True,
     'LOCAL_GROUPS': True,
+    'LOCAL_CACHE_SCOPE_TTL': {},
+    'LOCAL_CACHE_SIZE': 0,
+    'LOCAL_CACHE_TTL': 10,
     'LOGGING_CONFIG_FILE': 'logging.yaml',
     'LOGIN_LOGO_URL': None,
     'LOGO_URL': None,
@@ -90,8 +94,10 @@ DEFAULTS = {
     'PROVIDER_MAP': {},
     'PUBLIC_SUPPORT_EMAIL': None,
     'REDIS_CACHE_URL': None,
+    'REQUEST_STATS_DIR': None,
     'ROUTE_OLD_URLS': False,
     'SCHEDULED_TASK_OVERRIDE': {},
+    'SEARCH_ACL_INDEX': False,
     'SECRET_KEY': None,
     'SENTRY_DSN': None,
     'SENTRY_LOGGING_LEVEL': 'WARNING',
@@ -103,6 +109,7 @@ DEFAULTS = {
     'SMTP_CERTFILE': None,
     'SMTP_KEYFILE': None,
     'SMTP_LOGIN': None,
+    'SMTP_MAX_CONNECTIONS': 4,
     'SMTP_PASSWORD': None,
     'SMTP_SENDER_FALLBACK': None,
     'SMTP_SERVER': ('localhost', 25),
@@ -322,6 +329,8 @@ class IndicoConfig:
             raise ValueError('Cannot restrict SMTP senders without a fallback')
         if self.SMTP_USE_TLS and self.SMTP_USE_SSL:
             raise ValueError('SMTP_USE_TLS and SMTP_USE_SSL are mutually exclusive')
+        if self.SMTP_MAX_CONNECTIONS < 1:
+            raise ValueError('SMTP_MAX_CONNECTIONS must be at least 1')
         if not self.DEBUG and self.LOCAL_PASSWORD_MIN_LENGTH < 8:
             raise ValueError('Minimum password length cannot be less than 8 characters long')
         if self.CSP_ENABLED not in {True, False, 'report-only'}:
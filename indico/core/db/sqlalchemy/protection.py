@@ -6,12 +6,15 @@
 # LICENSE file for more details.
 
 import itertools
+from collections import defaultdict
 
 from flask import has_request_context, session
 from sqlalchemy import inspect
 from sqlalchemy.event import listens_for
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.orm.base import NEVER_SET, NO_VALUE
 
 from indico.core import signals
@@ -59,6 +62,10 @@ class ProtectionMixin:
     allow_no_access_contact = False
     #: Whether the object can have no protection parent
     allow_none_protection_parent = False
+    #: The names of the (many-to-one) relationships which may contain
+    #: the `protection_parent` of the object.  They are used to load
+    #: the parents of many objects at once in :meth:`can_access_many`.
+    protection_parent_relationships = ()
 
     @classmethod
     def register_protection_events(cls):
@@ -253,6 +260,27 @@ class ProtectionMixin:
         override = self._check_can_access_override(user, allow_admin=allow_admin, authorized=rv)
         return override if override is not None else rv
 
+    @classmethod
+    def can_access_many(cls, objs, user, allow_admin=True):
+        """Check if the user can access each of the given objects.
+
+        The results are the same as calling :meth:`can_access` on each
+        object, but the ACLs and protection parents of all objects (up
+        to the root category) are loaded using a fixed number of queries
+        instead of several queries per object.
+
+        :param objs: The objects to check.  They do not need to be of
+                     the same type.
+        :param user: The :class:`.User` to check. May be None if the
+                     user is not logged in.
+        :param allow_admin: If admin users should always have access
+        :return: A list containing a bool for each object, in the same
+                 order as `objs`.
+        """
+        objs = list(objs)
+        _preloaded = preload_protection_data(objs, user)
+        return [obj.can_access(user, allow_admin=allow_admin) for obj in objs]
+
     def check_access_key(self, access_key=None):
         """Check whether an access key is valid for the object.
 
@@ -281,6 +309,7 @@ class ProtectionMixin:
 
     def _check_principal_access(self, user):
         """Check whether the user is allowed per ACL entries."""
+        prefetch_group_memberships(user, self.acl_entries)
         return any(user in entry.principal for entry in iter_acl(self.acl_entries))
 
     def set_session_access_key(self, access_key):
@@ -426,6 +455,7 @@ class ProtectionManagersMixin(ProtectionMixin):
         if not explicit_permission and allow_admin and type(self).is_user_admin(user):
             return True
 
+        prefetch_group_memberships(user, self.acl_entries)
         if any(user in entry.principal
                for entry in iter_acl(self.acl_entries)
                if entry.has_management_permission(permission,
@@ -559,6 +589,125 @@ class ProtectionManagersMixin(ProtectionMixin):
             return set()
 
 
+def _preload_acl_entries(cls, objs):
+    objs = [obj for obj in objs if 'acl_entries' in inspect(obj).unloaded]
+    if not objs:
+        return
+    rel = inspect(cls).relationships['acl_entries']
+    principal_cls = rel.mapper.class_
+    [(local_col, remote_col)] = rel.local_remote_pairs
+    local_attr = inspect(cls).get_property_by_column(local_col).key
+    remote_attr = rel.mapper.get_property_by_column(remote_col).key
+    options = [joinedload('user'), joinedload('local_group')]
+    if principal_cls.allow_networks:
+        options.append(joinedload('ip_network_group'))
+    if principal_cls.allow_event_roles:
+        options.append(joinedload('event_role'))
+    if principal_cls.allow_category_roles:
+        options.append(joinedload('category_role'))
+    entries = defaultdict(list)
+    query = (principal_cls.query
+             .filter(remote_col.in_({getattr(obj, local_attr) for obj in objs}))
+             .options(*options))
+    for entry in query:
+        entries[getattr(entry, remote_attr)].append(entry)
+    for obj in objs:
+        set_committed_value(obj, 'acl_entries', entries[getattr(obj, local_attr)])
+
+
+def _preload_protection_parents(cls, objs, category_ids):
+    from indico.modules.categories import Category
+    parents = []
+    mapper = inspect(cls)
+    for name in getattr(cls, 'protection_parent_relationships', ()):
+        rel = mapper.relationships[name]
+        [(local_col, remote_col)] = rel.local_remote_pairs
+        local_attr = mapper.get_property_by_column(local_col).key
+        if rel.mapper.class_ is Category:
+            # categories are loaded together with their whole chain later; this is
+            # also needed for categories which are already loaded since their ACL
+            # entries and parents may not be
+            category_ids |= {getattr(obj, local_attr) for obj in objs} - {None}
+            continue
+        ids = {getattr(obj, local_attr) for obj in objs if name in inspect(obj).unloaded} - {None}
+        if ids:
+            parents += rel.mapper.class_.query.filter(remote_col.in_(ids)).all()
+        # unloaded relationships now come from the identity map
+        parents += [parent for obj in objs if (parent := getattr(obj, name)) is not None]
+    return parents
+
+
+def preload_protection_data(objs, user=None):
+    """Load the data needed to check access to many objects.
+
+    This loads the ACL entries of the objects and of all their protection
+    parents, and makes sure the parents are in SQLAlchemy's identity map
+    so the access checks do not need to query them one by one.
+
+    Since the identity map only keeps weak references, the caller needs
+    to keep a reference to the returned list of loaded objects while
+    performing the access checks.
+
+    :param objs: The objects which will be checked
+    :param user: The user whose access will be checked
+    :return: A list of all objects that have been loaded
+    """
+    from indico.modules.categories import Category
+    loaded = []
+    seen = set()
+    category_ids = set()
+    pending = objs
+    while pending:
+        objs_by_type = defaultdict(list)
+        for obj in pending:
+            if obj not in seen and inspect(obj).persistent:
+                seen.add(obj)
+                objs_by_type[type(obj)].append(obj)
+        pending = []
+        for cls, type_objs in objs_by_type.items():
+            if issubclass(cls, Category):
+                category_ids.update(categ.id for categ in type_objs)
+                continue
+            if issubclass(cls, ProtectionMixin):
+                _preload_acl_entries(cls, type_objs)
+            parents = _preload_protection_parents(cls, type_objs, category_ids)
+            loaded += parents
+            pending += parents
+    if category_ids:
+        # this gets all categories up to the root; the `get_protection_cte` would
+        # be less useful here since it always goes through the whole category tree,
+        # and we need the ACL entries of all the parent categories anyway
+        categories = Category._get_chain_query(Category.id.in_(category_ids)).all()
+        _preload_acl_entries(Category, categories)
+        loaded += categories
+    if user is not None:
+        acl_entries = itertools.chain.from_iterable(
+            obj.acl_entries for obj in itertools.chain(objs, loaded)
+            if isinstance(obj, ProtectionMixin) and 'acl_entries' not in inspect(obj).unloaded
+        )
+        prefetch_group_memberships(user, acl_entries)
+        # group/role memberships are checked using these relationships
+        loaded += [user.local_groups, user.event_roles, user.category_roles]
+    return loaded
+
+
+def prefetch_group_memberships(user, acl_entries):
+    """Get the cached memberships of a user in the groups of ACL entries.
+
+    This retrieves the memberships in all multipass groups at once
+    instead of one by one when checking the ACL entries.
+
+    :param user: The user whose access will be checked
+    :param acl_entries: The ACL entries which will be checked
+    """
+    from indico.modules.groups.core import get_group_memberships
+    if not user:
+        return
+    groups = {entry.principal for entry in acl_entries if entry.type == PrincipalType.multipass_group}
+    if len(groups) > 1:
+        get_group_memberships(user, groups, lookup_missing=False)
+
+
 def _get_acl_data(obj, principal):
     """Helper function to get the necessary data for ACL modifications.
 
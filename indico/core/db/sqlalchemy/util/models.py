@@ -14,7 +14,7 @@ from flask import g
 from flask_sqlalchemy.model import Model
 from flask_sqlalchemy.pagination import Pagination, QueryPagination
 from flask_sqlalchemy.query import Query as BaseQuery
-from sqlalchemy import Column, inspect, orm
+from sqlalchemy import Column, inspect, orm, tuple_
 from sqlalchemy.event import listen, listens_for
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import joinedload
@@ -29,6 +29,7 @@ from indico.util.signals import values_from_signal
 class IndicoQueryPagination(QueryPagination):
     def __init__(self, *args, **kwargs):
         self.show_all = kwargs.pop('show_all', False)
+        self.estimate_total = kwargs.pop('estimate_total', False)
         super().__init__(*args, **kwargs)
 
     def _query_items(self):
@@ -40,11 +41,60 @@ class IndicoQueryPagination(QueryPagination):
     def _query_count(self):
         if self.show_all:
             return len(self.items)
+        elif self.estimate_total:
+            from indico.core.db.sqlalchemy.util.queries import get_estimated_row_count
+            return get_estimated_row_count(self._query_args['query'])
         return super()._query_count()
 
 
+class IndicoKeysetPagination(IndicoQueryPagination):
+    """Pagination which can fetch pages relative to a known row.
+
+    The results are sorted descending by the key columns, which should
+    be unique together and covered by an index.  If the key of the last
+    (or first) row of an adjacent page is specified, the page is loaded
+    using a ``WHERE (a, b) < (x, y)`` criterion instead of an ``OFFSET``,
+    which would require the database to go through all the previous rows.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.key_columns = kwargs.pop('key_columns')
+        self.after = kwargs.pop('after', None)
+        self.before = kwargs.pop('before', None)
+        super().__init__(*args, **kwargs)
+
+    def _query_items(self):
+        query = self._query_args['query']
+        key = tuple_(*self.key_columns)
+        if self.after is not None:
+            return (query.filter(key < tuple_(*self.after))
+                    .order_by(*(col.desc() for col in self.key_columns))
+                    .limit(self.per_page)
+                    .all())
+        elif self.before is not None:
+            items = (query.filter(key > tuple_(*self.before))
+                     .order_by(*self.key_columns)
+                     .limit(self.per_page)
+                     .all())
+            return items[::-1]
+        query = query.order_by(*(col.desc() for col in self.key_columns))
+        return query.limit(self.per_page).offset(self._query_offset).all()
+
+    def get_key(self, item):
+        """Get the key of a row, e.g. to pass it as `before` or `after`."""
+        return tuple(getattr(item, col.key) for col in self.key_columns)
+
+    @property
+    def first_key(self):
+        return self.get_key(self.items[0]) if self.items else None
+
+    @property
+    def last_key(self):
+        return self.get_key(self.items[-1]) if self.items else None
+
+
 class IndicoBaseQuery(BaseQuery):
-    def paginate(self, *, page=1, per_page=25, show_all=False) -> Pagination:
+    def paginate(self, *, page=1, per_page=25, show_all=False, estimate_total=False) -> Pagination:
         """Paginate a query object.
 
         This behaves almost like the default `paginate` method from
@@ -53,11 +103,36 @@ class IndicoBaseQuery(BaseQuery):
         :param page: Number of the page to return.
         :param per_page: Number of items per page.
         :param show_all: Whether to show all the elements on one page.
+        :param estimate_total: Whether to estimate the total number of rows
+                               instead of counting them.
         :return: a :class:`Pagination` object
         """
         if show_all:
             page = 1
-        return IndicoQueryPagination(query=self, page=page, per_page=per_page, max_per_page=None, show_all=show_all)
+        return IndicoQueryPagination(query=self, page=page, per_page=per_page, max_per_page=None, show_all=show_all,
+                                     estimate_total=estimate_total)
+
+    def paginate_keyset(self, key_columns, *, page=1, per_page=25, after=None, before=None, estimate_total=False):
+        """Paginate a query object using keyset pagination.
+
+        The query is sorted descending by `key_columns`, so it must not be
+        sorted already.  When going to an adjacent page, pass the key of the
+        last or first row of the current page as `after` or `before` to avoid
+        using a slow ``OFFSET`` on large tables.
+
+        :param key_columns: The columns identifying a row, usually a date
+                            column and the primary key.
+        :param page: Number of the page to return.
+        :param per_page: Number of items per page.
+        :param after: The key of the row preceding the requested page.
+        :param before: The key of the row following the requested page.
+        :param estimate_total: Whether to estimate the total number of rows
+                               instead of counting them.
+        :return: a :class:`IndicoKeysetPagination` object
+        """
+        return IndicoKeysetPagination(query=self, page=page, per_page=per_page, max_per_page=None,
+                                      key_columns=key_columns, after=after, before=before,
+                                      estimate_total=estimate_total, error_out=False)
 
     def has_rows(self):
         """Check whether a query yields any rows.
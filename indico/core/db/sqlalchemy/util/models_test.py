@@ -61,3 +61,28 @@ def test_signal_query(dummy_user, create_event):
     # signal no longer bound -> no modification applied
     assert dummy_user.created_events.signal_query('test').count() == 2
     assert Event.query.signal_query('test').count() == 2
+
+
+@pytest.mark.usefixtures('db')
+def test_paginate_keyset(create_event):
+    from indico.modules.events.models.events import Event
+
+    events = [create_event(title=f'evt{i}') for i in range(7)]
+    expected = sorted(events, key=lambda e: (e.start_dt, e.id), reverse=True)
+    key_columns = (Event.start_dt, Event.id)
+
+    # regular pagination for arbitrary pages
+    pagination = Event.query.paginate_keyset(key_columns, page=2, per_page=3)
+    assert pagination.items == expected[3:6]
+    assert pagination.total == 7
+    assert pagination.pages == 3
+
+    # adjacent pages relative to the current one
+    next_page = Event.query.paginate_keyset(key_columns, page=3, per_page=3, after=pagination.last_key)
+    assert next_page.items == expected[6:]
+    prev_page = Event.query.paginate_keyset(key_columns, page=1, per_page=3, before=pagination.first_key)
+    assert prev_page.items == expected[:3]
+    assert prev_page.first_key == (expected[0].start_dt, expected[0].id)
+
+    # estimating small totals falls back to counting
+    assert Event.query.paginate_keyset(key_columns, estimate_total=True).total == 7
@@ -5,10 +5,13 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
+import math
 import re
 
-from sqlalchemy import func, inspect, over
-from sqlalchemy.sql import update
+from sqlalchemy import and_, func, inspect, or_, over, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import operators, update
+from sqlalchemy.sql.expression import ClauseElement, Executable, UnaryExpression
 
 
 TS_REGEX = re.compile(r'([@<>!()&|:\'\\])')
@@ -180,6 +183,118 @@ def get_n_matching(query, n, predicate, *, prefetch_factor=5, preload_bulk=None,
     return results[:n]
 
 
+def _split_ordering(column):
+    """Get the expression of an ORDER BY item and whether it is descending."""
+    if isinstance(column, UnaryExpression) and column.modifier in (operators.asc_op, operators.desc_op):
+        return column.element, column.modifier is operators.desc_op
+    return column, False
+
+
+def keyset_filter(order_by, after):
+    """Create a filter matching the rows sorted after a given sort key.
+
+    :param order_by: The columns or expressions the query is ordered by,
+                     optionally using ``.desc()``
+    :param after: The values of these expressions for the last row that
+                  should not be matched
+    """
+    columns, descending = zip(*map(_split_ordering, order_by), strict=True)
+    if len(set(descending)) == 1:
+        # if all columns are sorted in the same direction, a row comparison can use an index
+        return tuple_(*columns) < tuple_(*after) if descending[0] else tuple_(*columns) > tuple_(*after)
+    criteria = []
+    for i, (column, desc, value) in enumerate(zip(columns, descending, after, strict=True)):
+        previous_equal = [col == val for col, val in zip(columns[:i], after[:i], strict=True)]
+        criteria.append(and_(*previous_equal, (column < value) if desc else (column > value)))
+    return or_(*criteria)
+
+
+def get_keyset_key(query, order_by, *criteria):
+    """Get the sort key of a row for keyset pagination.
+
+    This is useful if clients only send the ID of the last object they
+    received and the values it was sorted by need to be retrieved to get
+    the next page.
+
+    :param query: The query used to get the objects
+    :param order_by: The columns or expressions the query is ordered by
+    :param criteria: Filter criteria identifying the row
+    :return: A tuple containing the sort key or ``None`` if there is no
+             such row
+    """
+    columns = [_split_ordering(col)[0] for col in order_by]
+    row = query.filter(*criteria).with_entities(*columns).first()
+    return tuple(row) if row is not None else None
+
+
+def get_n_matching_keyset(query, n, order_by, predicate=None, *, predicate_many=None, after=None, prefetch_factor=5,
+                          max_prefetch=1000, preload_bulk=None):
+    """Get N objects from a query that satisfy a condition.
+
+    Unlike `get_n_matching`, this does not use an OFFSET to load more
+    objects but continues after the sort key of the last object loaded
+    before, so loading many batches of objects does not get slower and
+    slower.  The size of each additional batch depends on the fraction
+    of objects from the previous batches that satisfied the condition.
+
+    :param query: A sqlalchemy query object, which must not be ordered yet
+    :param n: The max number of objects to return
+    :param order_by: The columns or expressions (optionally using
+                     ``.desc()``) to sort the objects by.  Together they
+                     must identify each row and none of them may be NULL.
+    :param predicate: A callable used to filter the found objects
+    :param predicate_many: A callable used instead of `predicate` which
+                           receives a whole batch of objects and returns
+                           a sequence with a boolean for each of them
+    :param after: The sort key of the object after which to start, e.g.
+                  from the result of a previous call
+    :param prefetch_factor: Prefetch ``n * factor`` objects in the first
+                            query
+    :param max_prefetch: The max number of objects loaded in one query
+    :param preload_bulk: Function that's called with each batch of objects
+                         to allow for bulk-preloading of data needed in the
+                         predicate function
+    :return: A ``(results, last_key)`` tuple. `last_key` is the sort key
+             of the last result and can be passed as `after` to get the
+             objects following them.
+    """
+    if (predicate is None) == (predicate_many is None):
+        raise ValueError('Exactly one of predicate and predicate_many is required')
+    key_columns = [_split_ordering(col)[0].label(f'keyset_{i}') for i, col in enumerate(order_by)]
+    query = query.add_columns(*key_columns).order_by(*order_by)
+    limit = n * prefetch_factor
+    checked = accepted = 0
+    results = []
+    last_key = last_checked_key = after
+    while len(results) < n:
+        batch_query = (query.filter(keyset_filter(order_by, last_checked_key))
+                       if last_checked_key is not None
+                       else query)
+        rows = batch_query.limit(limit).all()
+        if not rows:
+            break
+        objects = [row[0] for row in rows]
+        if preload_bulk:
+            preload_bulk(objects)
+        matches = predicate_many(objects) if predicate_many else map(predicate, objects)
+        for row, obj, match in zip(rows, objects, matches, strict=True):
+            checked += 1
+            last_checked_key = tuple(row[1:])
+            if not match:
+                continue
+            accepted += 1
+            results.append(obj)
+            last_key = last_checked_key
+            if len(results) == n:
+                break
+        if len(rows) < limit:
+            break
+        # try to get all the missing objects in the next query, assuming a similar acceptance rate
+        missing = n - len(results)
+        limit = min(max_prefetch, max(missing, math.ceil(missing * checked / max(accepted, 1) * 1.25)))
+    return results, last_key
+
+
 def with_total_rows(query, single_entity=True):
     """Get the result of a query and its total row count.
 
@@ -196,3 +311,36 @@ def with_total_rows(query, single_entity=True):
     total = res[0][-1]
     rows = [row[0] for row in res] if single_entity else [row[:-1] for row in res]
     return rows, total
+
+
+class _Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_Explain, 'postgresql')
+def _compile_explain(element, compiler, **kw):
+    return 'EXPLAIN (FORMAT JSON) ' + compiler.process(element.statement, **kw)
+
+
+def get_estimated_row_count(query, *, exact_below=1000):
+    """Get the approximate number of rows returned by a query.
+
+    Instead of counting all the rows, which is slow for large tables, this
+    uses the row estimate of the query planner, which is based on the table
+    statistics.  Since such estimates are not very accurate for small
+    numbers (and counting is cheap in that case), the rows are counted
+    if the estimate is low.
+
+    :param query: a sqlalchemy query
+    :param exact_below: the estimate below which the rows are counted
+    """
+    from indico.core.db import db
+    query = query.order_by(None)
+    plan = db.session.execute(_Explain(query.statement)).scalar()
+    estimate = plan[0]['Plan']['Plan Rows']
+    if estimate < exact_below:
+        return query.count()
+    return estimate
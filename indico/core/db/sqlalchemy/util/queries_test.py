@@ -0,0 +1,71 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from datetime import datetime, timedelta
+
+import pytest
+from pytz import utc
+
+from indico.core.db.sqlalchemy.util.queries import get_keyset_key, get_n_matching, get_n_matching_keyset
+from indico.modules.events.models.events import Event
+
+
+@pytest.fixture
+def events(create_event):
+    start_dt = datetime(2024, 1, 1, 10, tzinfo=utc)
+    # pairs of events with the same start date
+    return [create_event(start_dt=start_dt + timedelta(days=i // 2), end_dt=start_dt + timedelta(days=i // 2, hours=1))
+            for i in range(20)]
+
+
+@pytest.mark.usefixtures('db')
+@pytest.mark.parametrize('order_by', (
+    (Event.id,),
+    (Event.start_dt, Event.id),
+    (Event.start_dt.desc(), Event.id),
+    (Event.start_dt.desc(), Event.id.desc()),
+))
+@pytest.mark.parametrize('batch', (False, True))
+def test_get_n_matching_keyset(events, order_by, batch):
+    query = Event.query.filter(Event.id.in_(e.id for e in events))
+    expected = [e for e in query.order_by(*order_by) if e.id % 3 == 0]
+    kwargs = {'predicate_many': lambda objs: [e.id % 3 == 0 for e in objs]} if batch else {}
+    predicate = None if batch else (lambda e: e.id % 3 == 0)
+    results = []
+    after = None
+    while True:
+        page, after = get_n_matching_keyset(query, 2, order_by, predicate, after=after, prefetch_factor=1, **kwargs)
+        results += page
+        if len(page) < 2:
+            break
+    assert results == expected
+    # the old offset-based function returns the same objects
+    assert get_n_matching(query.order_by(*order_by), 100, lambda e: e.id % 3 == 0) == expected
+
+
+@pytest.mark.usefixtures('db')
+def test_get_n_matching_keyset_adaptive_prefetch(events, count_queries):
+    query = Event.query.filter(Event.id.in_(e.id for e in events))
+    with count_queries() as cnt:
+        results, last_key = get_n_matching_keyset(query, 2, [Event.id], lambda e: e == events[-1], prefetch_factor=1)
+    assert results == [events[-1]]
+    assert last_key == (events[-1].id,)
+    # nothing matched so far, so the batches grow quickly: 2 events, 5 events, then all the remaining ones
+    assert cnt() == 3
+
+
+@pytest.mark.usefixtures('db')
+def test_get_keyset_key(events):
+    query = Event.query
+    order_by = (Event.start_dt.desc(), Event.id)
+    assert get_keyset_key(query, order_by, Event.id == events[3].id) == (events[3].start_dt, events[3].id)
+    assert get_keyset_key(query, order_by, Event.id == -1) is None
+
+
+def test_get_n_matching_keyset_predicate_required():
+    with pytest.raises(ValueError):
+        get_n_matching_keyset(Event.query, 1, [Event.id])
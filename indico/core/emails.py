@@ -7,14 +7,21 @@
 
 import os
 import pickle
+import smtplib
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import date
 from email.utils import formataddr, make_msgid, parseaddr
 from fnmatch import fnmatch
+from itertools import batched
 from urllib.parse import urlsplit
 
 import click
 from celery.exceptions import MaxRetriesExceededError, Retry
+from flask import current_app
 from sqlalchemy.orm.attributes import flag_modified
 
 from indico.core.celery import celery
@@ -32,6 +39,21 @@ from indico.vendor.django_mail.message import EmailMultiAlternatives
 logger = Logger.get('emails')
 MAX_TRIES = 10
 DELAYS = [30, 60, 120, 300, 600, 1800, 3600, 3600, 7200]
+#: How many emails are handed to a single Celery task
+EMAIL_BATCH_SIZE = 100
+#: How many emails are sent over one SMTP connection before reconnecting
+SMTP_MAX_MESSAGES_PER_CONNECTION = 100
+#: How long (in seconds) an unused SMTP connection is kept for reuse
+SMTP_MAX_IDLE_TIME = 30
+#: The minimum number of emails sent over each connection when delivering in parallel
+SMTP_MIN_EMAILS_PER_CONNECTION = 10
+
+#: Errors indicating that the mail server cannot be used at the moment
+_SMTP_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, smtplib.SMTPAuthenticationError,
+                           ConnectionError, TimeoutError)
+
+_smtp_pools = {}
+_smtp_pools_lock = threading.Lock()
 
 
 @celery.task(name='send_email', bind=True, max_retries=None)
@@ -113,23 +135,240 @@ def do_send_email(email, log_entry=None, _from_task=False):
     :param _from_task: Indicates that this function is called from
                        the celery task responsible for sending emails.
     """
-    with get_connection() as conn:
-        msg = EmailMultiAlternatives(subject=email['subject'], body=email['body'], from_email=email['from'],
-                                     to=email['to'], cc=email['cc'], bcc=email['bcc'], reply_to=email['reply_to'],
-                                     attachments=email['attachments'], alternatives=email.get('alternatives'),
-                                     connection=conn)
-        if not msg.to:
-            msg.extra_headers['To'] = 'Undisclosed-recipients:;'
-        if email['html']:
-            msg.content_subtype = 'html'
-        msg.extra_headers['message-id'] = make_msgid(domain=urlsplit(config.BASE_URL).hostname)
-        msg.send()
+    with get_smtp_pool().connection() as conn:
+        conn.send(email)
     if not _from_task:
         logger.info('Sent email "%s"', truncate(email['subject'], 100))
     if log_entry:
         update_email_log_state(log_entry)
 
 
+@celery.task(name='send_email_batch')
+def send_email_batch_task(emails, log_entry_ids):
+    """Send many emails using the same SMTP connections.
+
+    Emails that cannot be sent (including all remaining ones in case the
+    mail server is unavailable) are passed on to `send_email_task`
+    individually so they get the usual retry logic.
+    """
+    from indico.modules.logs import EventLogEntry
+    ids = {id_ for id_ in log_entry_ids if id_ is not None}
+    log_entries = {e.id: e for e in EventLogEntry.query.filter(EventLogEntry.id.in_(ids))} if ids else {}
+    try:
+        results = deliver_emails(emails)
+    except Exception as exc:
+        # we have no idea which emails have been sent, but it's better to
+        # send some of them twice than to not send the others at all
+        logger.exception('Could not send email batch')
+        results = [exc] * len(emails)
+    for email, log_entry_id, exc in zip(emails, log_entry_ids, results, strict=True):
+        log_entry = log_entries.get(log_entry_id)
+        if exc is not None:
+            logger.warning('Could not send email "%s" in batch; retry in %ds [%s]',
+                           truncate(email['subject'], 100), DELAYS[0], exc)
+            send_email_task.apply_async((email, log_entry), countdown=DELAYS[0])
+            continue
+        if log_entry:
+            logger.info('Sent email "%s" for event %d', truncate(email['subject'], 100), log_entry.event_id)
+            update_email_log_state(log_entry)
+        else:
+            logger.info('Sent email "%s"', truncate(email['subject'], 100))
+    db.session.commit()
+
+
+def send_emails(entries):
+    """Send many emails at once.
+
+    When using Celery, the emails are passed to the workers in batches
+    so each worker can send many of them over the same SMTP connection.
+    Otherwise they are sent right away using pooled SMTP connections.
+
+    :param entries: A list of ``(email, log_entry)`` tuples
+    :return: A list of ``(email, log_entry, exception)`` tuples for the
+             emails that could not be sent (or handed to Celery)
+    """
+    failed = []
+    if config.SMTP_USE_CELERY:
+        for batch in batched(entries, EMAIL_BATCH_SIZE):
+            try:
+                if len(batch) == 1:
+                    send_email_task.delay(*batch[0])
+                else:
+                    send_email_batch_task.delay([email for email, __ in batch],
+                                                [log_entry.id if log_entry else None for __, log_entry in batch])
+            except Exception as exc:
+                failed.extend((email, log_entry, exc) for email, log_entry in batch)
+        return failed
+    results = deliver_emails([email for email, __ in entries])
+    for (email, log_entry), exc in zip(entries, results, strict=True):
+        if exc is not None:
+            failed.append((email, log_entry, exc))
+            continue
+        logger.info('Sent email "%s"', truncate(email['subject'], 100))
+        if log_entry:
+            update_email_log_state(log_entry)
+    return failed
+
+
+def deliver_emails(emails):
+    """Send emails using pooled SMTP connections.
+
+    Large numbers of emails are spread across up to `SMTP_MAX_CONNECTIONS`
+    connections which are used in parallel.  A failure to send one email
+    does not prevent the remaining ones from being sent, but if the mail
+    server cannot be used at all, the remaining emails are not attempted
+    and reported as failed.
+
+    :param emails: A list of emails as created by `make_email`
+    :return: A list containing ``None`` for each email that has been sent
+             and the exception for each email that could not be sent
+    """
+    pool = get_smtp_pool()
+    results = [None] * len(emails)
+
+    def _send(conn, pending):
+        for i in pending:
+            try:
+                conn.send(emails[i])
+            except _SMTP_CONNECTION_ERRORS as exc:
+                results[i] = exc
+                raise
+            except Exception as exc:
+                results[i] = exc
+                # start over with a fresh connection for the next email
+                conn.close()
+
+    def _deliver(indices):
+        pending = iter(indices)
+        try:
+            with pool.connection() as conn:
+                _send(conn, pending)
+        except Exception as exc:
+            # the mail server is unavailable, so there is no point in trying
+            # to send the remaining emails right now
+            for i in pending:
+                results[i] = exc
+
+    num_connections = max(1, min(pool.size, len(emails) // SMTP_MIN_EMAILS_PER_CONNECTION))
+    if num_connections == 1:
+        _deliver(range(len(emails)))
+        return results
+
+    app = current_app._get_current_object()
+
+    def _deliver_in_thread(indices):
+        with app.app_context():
+            _deliver(indices)
+
+    with ThreadPoolExecutor(num_connections, thread_name_prefix='smtp') as executor:
+        list(executor.map(_deliver_in_thread, [range(i, len(emails), num_connections)
+                                                for i in range(num_connections)]))
+    return results
+
+
+def _make_message(email, connection):
+    msg = EmailMultiAlternatives(subject=email['subject'], body=email['body'], from_email=email['from'],
+                                 to=email['to'], cc=email['cc'], bcc=email['bcc'], reply_to=email['reply_to'],
+                                 attachments=email['attachments'], alternatives=email.get('alternatives'),
+                                 connection=connection)
+    if not msg.to:
+        msg.extra_headers['To'] = 'Undisclosed-recipients:;'
+    if email['html']:
+        msg.content_subtype = 'html'
+    msg.extra_headers['message-id'] = make_msgid(domain=urlsplit(config.BASE_URL).hostname)
+    return msg
+
+
+class _PooledConnection:
+    __slots__ = ('backend', 'last_used', 'sent')
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.last_used = time.monotonic()
+        self.sent = 0
+
+    def send(self, email):
+        if self.sent >= SMTP_MAX_MESSAGES_PER_CONNECTION:
+            self.close()
+        if self.backend.open():
+            self.sent = 0
+        msg = _make_message(email, self.backend)
+        try:
+            msg.send()
+        except smtplib.SMTPServerDisconnected:
+            # the server may have dropped the connection while it was unused
+            self.close()
+            self.backend.open()
+            msg.send()
+        self.sent += 1
+
+    def close(self):
+        try:
+            self.backend.close()
+        except Exception:
+            logger.warning('Could not close SMTP connection cleanly')
+        self.sent = 0
+
+
+class SMTPConnectionPool:
+    """A pool of persistent connections to the mail server.
+
+    Connections are kept open after sending an email so the next ones
+    do not need to go through the TCP and TLS handshakes again.  The
+    pool never hands out more than `size` connections at the same time.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._semaphore = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def _get(self):
+        stale = []
+        conn = None
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if now - candidate.last_used < SMTP_MAX_IDLE_TIME:
+                    conn = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            candidate.close()
+        return conn or _PooledConnection(get_connection())
+
+    @contextmanager
+    def connection(self):
+        """Get a connection from the pool.
+
+        The connection is only returned to the pool if no exception
+        was raised while using it.
+        """
+        with self._semaphore:
+            conn = self._get()
+            try:
+                yield conn
+            except BaseException:
+                conn.close()
+                raise
+            conn.last_used = time.monotonic()
+            with self._lock:
+                self._idle.append(conn)
+
+
+def get_smtp_pool():
+    """Get the SMTP connection pool of the current process."""
+    app_config = current_app.config
+    key = (os.getpid(), app_config['EMAIL_BACKEND'], app_config['EMAIL_HOST'], app_config['EMAIL_PORT'],
+           app_config['EMAIL_HOST_USER'])
+    with _smtp_pools_lock:
+        if (pool := _smtp_pools.get(key)) is None:
+            pool = _smtp_pools[key] = SMTPConnectionPool(config.SMTP_MAX_CONNECTIONS)
+        return pool
+
+
 def update_email_log_state(log_entry, failed=False):
     if failed:
         log_entry.data['state'] = 'failed'
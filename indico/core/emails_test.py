@@ -5,9 +5,12 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
+from smtplib import SMTP
+
 import pytest
 
-from indico.core.emails import get_actual_sender_address
+from indico.core.emails import deliver_emails, get_actual_sender_address, send_email_batch_task
+from indico.core.notifications import make_email
 from indico.modules.core.settings import core_settings
 
 
@@ -60,3 +63,52 @@ def test_smtp_sender_config_notset(mocker, sender_email, result):
     core_settings.set('site_title', 'Indico')
     assert get_actual_sender_address(sender_email, set()) == result
     assert get_actual_sender_address(sender_email, {'reply@whatever.com'}) == (result[0], {'reply@whatever.com'})
+
+
+@pytest.mark.usefixtures('request_context')
+def test_deliver_emails(smtp, mocker):
+    connect = mocker.spy(SMTP, 'connect')
+    emails = [make_email(f'user{i}@example.com', sender_address='sender@example.com', subject=f'Test {i}',
+                         body='Hello') for i in range(25)]
+    assert deliver_emails(emails) == [None] * 25
+    assert {msg['Subject'] for msg in smtp.outbox} == {f'Test {i}' for i in range(25)}
+    # emails are spread across two connections instead of opening one for each email
+    assert connect.call_count == 2
+    # the connections are reused
+    assert deliver_emails(emails[:5]) == [None] * 5
+    assert len(smtp.outbox) == 30
+    assert connect.call_count == 2
+
+
+@pytest.mark.usefixtures('request_context')
+def test_deliver_emails_failure(smtp):
+    emails = [make_email(f'user{i}@example.com', sender_address='sender@example.com', subject=f'Test {i}',
+                         body='Hello') for i in range(3)]
+    emails[1]['from'] = 'invalid\n@example.com'
+    results = deliver_emails(emails)
+    assert results[0] is None
+    assert results[1] is not None
+    assert results[2] is None
+    assert {msg['Subject'] for msg in smtp.outbox} == {'Test 0', 'Test 2'}
+
+
+@pytest.mark.usefixtures('request_context', 'smtp')
+def test_deliver_emails_server_unavailable(mocker):
+    connect = mocker.patch.object(SMTP, 'connect', side_effect=ConnectionRefusedError)
+    emails = [make_email(f'user{i}@example.com', sender_address='sender@example.com', subject=f'Test {i}',
+                         body='Hello') for i in range(3)]
+    results = deliver_emails(emails)
+    assert all(isinstance(exc, ConnectionRefusedError) for exc in results)
+    # no need to try again for every single email
+    assert connect.call_count == 1
+
+
+@pytest.mark.usefixtures('db', 'request_context')
+def test_send_email_batch_task_error(mocker):
+    mocker.patch('indico.core.emails.deliver_emails', side_effect=RuntimeError)
+    send_email_task = mocker.patch('indico.core.emails.send_email_task')
+    emails = [make_email(f'user{i}@example.com', sender_address='sender@example.com', subject=f'Test {i}',
+                         body='Hello') for i in range(3)]
+    send_email_batch_task(emails, [None] * 3)
+    # the emails are retried individually
+    assert [call.args[0] for call in send_email_task.apply_async.call_args_list] == [(email, None) for email in emails]
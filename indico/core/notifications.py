@@ -7,7 +7,6 @@
 
 import mimetypes
 import re
-import time
 from email.mime.base import MIMEBase
 from functools import wraps
 from types import GeneratorType
@@ -57,14 +56,15 @@ def send_email(email, event=None, module=None, user=None, log_metadata=None, log
     :param log_metadata: A metadata dictionary to be saved in the event's log
     """
     from indico.core.emails import do_send_email, send_email_task
-    fn = send_email_task.delay if config.SMTP_USE_CELERY else do_send_email
     # we log the email immediately (as pending).  if we don't commit,
     # the log message will simply be thrown away later
     log_entry = _log_email(email, event, module, user, log_metadata, log_summary)
     if 'email_queue' in g:
-        g.email_queue.append((fn, email, log_entry))
+        g.email_queue.append((email, log_entry))
+    elif config.SMTP_USE_CELERY:
+        send_email_task.delay(email, log_entry)
     else:
-        fn(email, log_entry)
+        do_send_email(email, log_entry)
 
 
 def _log_email(email, event, module, user, meta=None, summary=None):
@@ -150,27 +150,21 @@ def flush_email_queue():
     doing a commit/rollback of any other changes that might have
     been pending.
     """
-    from indico.core.emails import store_failed_email, update_email_log_state
+    from indico.core.emails import send_emails, store_failed_email, update_email_log_state
     queue = g.get('email_queue', [])
     if not queue:
         return
     logger.debug('Sending %d queued emails', len(queue))
-    for fn, email, log_entry in queue:
-        try:
-            fn(email, log_entry)
-        except Exception:
-            # Flushing the email queue happens after a commit.
-            # If anything goes wrong here we keep going and just log
-            # it to avoid losing (more) emails in case celery is not
-            # used for email sending or there is a temporary issue
-            # with celery.
-            if log_entry:
-                update_email_log_state(log_entry, failed=True)
-            path = store_failed_email(email, log_entry)
-            logger.exception('Flushing queued email "%s" failed; stored data in %s',
-                             truncate(email['subject'], 100), path)
-            # Wait for a short moment in case it's a very temporary issue
-            time.sleep(0.25)
+    # Flushing the email queue happens after a commit.  Failures do not
+    # affect the other emails; we just log them to avoid losing (more)
+    # emails in case celery is not used for email sending or there is
+    # a temporary issue with celery.
+    for email, log_entry, exc in send_emails(queue):
+        if log_entry:
+            update_email_log_state(log_entry, failed=True)
+        path = store_failed_email(email, log_entry)
+        logger.error('Flushing queued email "%s" failed; stored data in %s', truncate(email['subject'], 100), path,
+                     exc_info=exc)
     del queue[:]
     db.session.commit()
 
@@ -5,9 +5,16 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
+from indico.core import signals
 from indico.core.settings.proxy import (ACLProxyBase, AttributeProxyProperty, PrefixSettingsProxy, SettingProperty,
                                         SettingsProxy, SettingsProxyBase)
 
 
 __all__ = ('ACLProxyBase', 'AttributeProxyProperty', 'PrefixSettingsProxy', 'SettingProperty', 'SettingsProxy',
            'SettingsProxyBase')
+
+
+@signals.core.after_commit.connect
+def _after_commit(sender, **kwargs):
+    from indico.core.settings.util import flush_pending_settings_versions
+    flush_pending_settings_versions()
@@ -12,10 +12,16 @@ from flask import g, has_request_context
 from sqlalchemy.dialects.postgresql import JSONB
 
 from indico.core.db import db
-from indico.core.db.sqlalchemy.principals import PrincipalMixin, PrincipalType
+from indico.core.db.sqlalchemy.principals import EmailPrincipal, PrincipalMixin, PrincipalType
+from indico.core.settings.util import (bump_shared_settings_version, get_shared_settings, get_shared_settings_key,
+                                       set_shared_settings)
 from indico.util.decorators import strict_classproperty
 
 
+_cacheable_principal_types = {PrincipalType.user, PrincipalType.local_group, PrincipalType.multipass_group,
+                               PrincipalType.email}
+
+
 def _coerce_value(value):
     if isinstance(value, Enum):
         return value.value
@@ -55,13 +61,13 @@ class SettingsBase:
          .filter_by(**kwargs)
          .delete(synchronize_session='fetch'))
         db.session.flush()
-        cls._clear_cache()
+        cls._clear_cache(kwargs)
 
     @classmethod
     def delete_all(cls, module, **kwargs):
         cls.query.filter_by(module=module, **kwargs).delete()
         db.session.flush()
-        cls._clear_cache()
+        cls._clear_cache(kwargs)
 
     @classmethod
     def _get_cache(cls, kwargs):
@@ -80,10 +86,11 @@ class SettingsBase:
             # no cache for this settings class / kwargs
             return g.global_settings_cache.setdefault(key, defaultdict(dict)), False
 
-    @staticmethod
-    def _clear_cache():
+    @classmethod
+    def _clear_cache(cls, kwargs):
         if has_request_context():
             g.pop('global_settings_cache', None)
+        bump_shared_settings_version(get_shared_settings_key(cls, kwargs))
 
 
 class JSONSettingsBase(SettingsBase):
@@ -109,10 +116,15 @@ class JSONSettingsBase(SettingsBase):
         cache, hit = cls._get_cache(kwargs)
         if hit:
             return cache[module]
+        shared_key = get_shared_settings_key(cls, kwargs)
+        shared = get_shared_settings('settings', shared_key)
+        if shared is not None:
+            cache.update(shared)
         else:
             for s in cls.query.filter_by(**kwargs):
                 cache[s.module][s.name] = s.value
-            return cache[module]
+            set_shared_settings('settings', shared_key, dict(cache))
+        return cache[module]
 
     @classmethod
     def get(cls, module, name, default=None, **kwargs):
@@ -129,7 +141,7 @@ class JSONSettingsBase(SettingsBase):
             db.session.add(setting)
         setting.value = _coerce_value(value)
         db.session.flush()
-        cls._clear_cache()
+        cls._clear_cache(kwargs)
 
     @classmethod
     def set_multi(cls, module, items, **kwargs):
@@ -140,7 +152,7 @@ class JSONSettingsBase(SettingsBase):
         for name in items.keys() & existing.keys():
             existing[name].value = _coerce_value(items[name])
         db.session.flush()
-        cls._clear_cache()
+        cls._clear_cache(kwargs)
 
 
 class PrincipalSettingsBase(PrincipalMixin, SettingsBase):
@@ -158,14 +170,54 @@ class PrincipalSettingsBase(PrincipalMixin, SettingsBase):
     @classmethod
     def get_all_acls(cls, module, **kwargs):
         rv = defaultdict(set)
+        if (acls := cls._get_cached_acls(kwargs)) is not None:
+            rv.update({name: set(acl) for name, acl in acls.get(module, {}).items()})
+            return rv
         for setting in cls.query.filter_by(module=module, **kwargs):
             rv[setting.name].add(setting.principal)
         return rv
 
     @classmethod
     def get_acl(cls, module, name, raw=False, **kwargs):
+        if not raw and (acls := cls._get_cached_acls(kwargs)) is not None:
+            return set(acls.get(module, {}).get(name, ()))
         return {x if raw else x.principal for x in cls.query.filter_by(module=module, name=name, **kwargs)}
 
+    @classmethod
+    def _get_cached_acls(cls, kwargs):
+        """Get all ACLs of the object identified by `kwargs` from the cache.
+
+        ACLs containing only users, groups and emails are kept in the shared
+        settings cache, storing just the data needed to get the principals
+        again; the users are then loaded in a single query.  Objects with any
+        other principal type are not cached and use the regular queries.
+
+        :return: A ``{module: {name: principals}}`` dict or ``None`` if
+                 the ACLs cannot be cached.
+        """
+        request_cache = g.setdefault('global_settings_cache', {}) if has_request_context() else {}
+        cache_key = (cls, frozenset(kwargs.items()), 'acls')
+        if cache_key in request_cache:
+            return request_cache[cache_key]
+        shared_key = get_shared_settings_key(cls, kwargs)
+        if shared_key is None:
+            return None
+        data = get_shared_settings('acls', shared_key)
+        acls = _load_cached_acls(data) if data is not None and data is not False else None
+        if data is None or (data is not False and acls is None):
+            # nothing cached yet or the cached data references users which no longer exist
+            entries = cls.query.filter_by(**kwargs).all()
+            if any(x.type not in _cacheable_principal_types for x in entries):
+                data = False
+            else:
+                data = [(x.module, x.name, x.type, x.user_id, x.local_group_id, x.multipass_group_provider,
+                         x.multipass_group_name, x.email)
+                        for x in entries]
+            set_shared_settings('acls', shared_key, data)
+            acls = _load_cached_acls(data) if data is not False else None
+        request_cache[cache_key] = acls
+        return acls
+
     @classmethod
     def set_acl(cls, module, name, acl, **kwargs):
         existing = cls.get_acl(module, name, raw=True, **kwargs)
@@ -176,6 +228,7 @@ class PrincipalSettingsBase(PrincipalMixin, SettingsBase):
             if setting.principal not in acl:
                 db.session.delete(setting)
         db.session.flush()
+        cls._clear_cache(kwargs)
 
     @classmethod
     def set_acl_multi(cls, module, items, **kwargs):
@@ -184,9 +237,10 @@ class PrincipalSettingsBase(PrincipalMixin, SettingsBase):
 
     @classmethod
     def add_principal(cls, module, name, principal, **kwargs):
-        if principal not in cls.get_acl(module, name):
+        if principal not in cls.get_acl(module, name, **kwargs):
             db.session.add(cls(module=module, name=name, principal=principal, **kwargs))
             db.session.flush()
+            cls._clear_cache(kwargs)
 
     @classmethod
     def remove_principal(cls, module, name, principal, **kwargs):
@@ -194,6 +248,7 @@ class PrincipalSettingsBase(PrincipalMixin, SettingsBase):
             if setting.principal == principal:
                 db.session.delete(setting)
                 db.session.flush()
+                cls._clear_cache(kwargs)
 
     @classmethod
     def merge_users(cls, module, target, source):
@@ -203,3 +258,30 @@ class PrincipalSettingsBase(PrincipalMixin, SettingsBase):
             cls.remove_principal(mod, name, source, **extra)
             cls.add_principal(mod, name, target, **extra)
         db.session.flush()
+
+
+def _load_cached_acls(data):
+    """Get the principals from cached ACL data.
+
+    :return: A ``{module: {name: principals}}`` dict or ``None`` if any
+             of the users in the data does not exist anymore.
+    """
+    from indico.modules.groups import GroupProxy
+    from indico.modules.users import User
+
+    user_ids = {user_id for __, __, type_, user_id, *__ in data if type_ == PrincipalType.user}
+    users = {u.id: u for u in User.query.filter(User.id.in_(user_ids))} if user_ids else {}
+    if user_ids - users.keys():
+        return None
+    acls = defaultdict(lambda: defaultdict(set))
+    for module, name, type_, user_id, local_group_id, mp_group_provider, mp_group_name, email in data:
+        if type_ == PrincipalType.user:
+            principal = users[user_id]
+        elif type_ == PrincipalType.local_group:
+            principal = GroupProxy(local_group_id)
+        elif type_ == PrincipalType.multipass_group:
+            principal = GroupProxy(mp_group_name, mp_group_provider)
+        else:
+            principal = EmailPrincipal(email)
+        acls[module][name].add(principal)
+    return acls
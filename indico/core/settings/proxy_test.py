@@ -9,9 +9,13 @@ from datetime import datetime, timedelta
 
 import pytest
 import pytz
+from flask import g
 
+from indico.core.db.sqlalchemy.principals import PrincipalType
 from indico.core.settings import PrefixSettingsProxy, SettingsProxy
 from indico.core.settings.converters import DatetimeConverter, EnumConverter, TimedeltaConverter
+from indico.core.settings.models.settings import SettingPrincipal
+from indico.core.settings.util import flush_pending_settings_versions, get_shared_settings_key, set_shared_settings
 from indico.modules.events.settings import EventSettingsProxy
 from indico.modules.users import User
 from indico.util.enum import IndicoIntEnum
@@ -103,6 +107,48 @@ def test_proxy_preload(count_queries):
     assert cnt() == 0
 
 
+@pytest.mark.usefixtures('db', 'request_context')
+def test_proxy_shared_cache(count_queries, dummy_user):
+    proxy = SettingsProxy('test', {'foo': None}, acls={'acl'})
+    proxy.set('foo', 'bar')
+    proxy.acls.set('acl', {dummy_user})
+    # nothing modified in the current transaction uses the shared cache
+    with count_queries() as cnt:
+        assert proxy.get('foo') == 'bar'
+    assert cnt() == 1
+    flush_pending_settings_versions()
+    g.pop('global_settings_cache')
+    assert proxy.get_all() == {'foo': 'bar', 'acl': {dummy_user}}
+    # new request - everything comes from the shared cache (except the user)
+    g.pop('global_settings_cache')
+    g.pop('settings_cache')
+    with count_queries() as cnt:
+        assert proxy.get('foo') == 'bar'
+        assert proxy.acls.get('acl') == {dummy_user}
+    assert cnt() == 1
+    # after a change the old data is no longer used
+    proxy.set('foo', 'foobar')
+    flush_pending_settings_versions()
+    g.pop('global_settings_cache')
+    g.pop('settings_cache')
+    assert proxy.get('foo') == 'foobar'
+
+
+@pytest.mark.usefixtures('db', 'request_context')
+def test_proxy_shared_cache_missing_user(dummy_user):
+    proxy = SettingsProxy('test', {}, acls={'acl'})
+    proxy.acls.set('acl', {dummy_user})
+    flush_pending_settings_versions()
+    g.pop('global_settings_cache')
+    shared_key = get_shared_settings_key(SettingPrincipal, {})
+    set_shared_settings('acls', shared_key, [('test', 'acl', PrincipalType.user, 1337, None, None, None, None)])
+    # a cached ACL containing a user who no longer exists is loaded from the database again
+    assert proxy.acls.get('acl') == {dummy_user}
+    g.pop('global_settings_cache')
+    g.pop('settings_cache')
+    assert proxy.acls.get('acl') == {dummy_user}
+
+
 @pytest.mark.usefixtures('db', 'request_context')  # use req ctx so the cache is active
 def test_proxy_cache_mutable():
     proxy = SettingsProxy('test', {'foo': []})
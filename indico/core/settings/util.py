@@ -5,11 +5,109 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
+import time
 from copy import copy
 from operator import attrgetter
 
+from flask import g, has_app_context
+
+from indico.core.cache import make_scoped_cache
+
 
 _not_in_db = object()
+_shared_cache = make_scoped_cache('settings')
+# cache entries of old versions are never used again, so we do not need to
+# keep them for long
+SHARED_CACHE_TTL = 86400
+
+
+def get_shared_settings_key(cls, kwargs):
+    """Get the key identifying an object's settings in the shared cache.
+
+    The key is the same for the settings and ACL settings of an object (e.g.
+    an event), so changing either of them invalidates both.
+
+    :param cls: The settings model
+    :param kwargs: The kwargs identifying the object the settings belong to,
+                   e.g. ``{'event_id': 123}``
+    :return: The key or ``None`` if the object has no ID yet.
+    """
+    parts = [cls.__table__.schema]
+    for name, value in sorted(kwargs.items()):
+        if name == 'user':
+            name, value = 'user_id', value.id
+        if value is None:
+            return None
+        parts.append(f'{name}={value}')
+    return ':'.join(parts)
+
+
+def _get_shared_settings_version(key):
+    version = _shared_cache.get(f'version/{key}')
+    if version is None:
+        # a timestamp makes sure we do not reuse old entries in case redis
+        # evicted the version counter at some point
+        _shared_cache.add(f'version/{key}', time.time_ns() // 1000)
+        version = _shared_cache.get(f'version/{key}')
+    return version
+
+
+def _has_pending_version_bump(key):
+    return has_app_context() and key in g.get('settings_cache_pending_versions', ())
+
+
+def get_shared_settings(kind, key):
+    """Get data from the cross-request settings cache.
+
+    Any object which has been modified in the current transaction is never
+    read from the shared cache, since its cached data will only be
+    invalidated once the transaction has been committed.
+
+    :param kind: The kind of cached data (``settings`` or ``acls``)
+    :param key: The key from :func:`get_shared_settings_key`
+    :return: The cached data or ``None`` if nothing is cached.
+    """
+    if key is None or _has_pending_version_bump(key):
+        return None
+    version = _get_shared_settings_version(key)
+    if version is None:
+        return None
+    return _shared_cache.get(f'{kind}/{key}/{version}')
+
+
+def set_shared_settings(kind, key, data):
+    """Store data in the cross-request settings cache.
+
+    The data is stored for the current version of the object's settings,
+    so if it has been modified in the meantime, it will never be used.
+    """
+    if key is None or _has_pending_version_bump(key):
+        return
+    version = _get_shared_settings_version(key)
+    if version is None:
+        return
+    _shared_cache.set(f'{kind}/{key}/{version}', data, timeout=SHARED_CACHE_TTL)
+
+
+def bump_shared_settings_version(key):
+    """Invalidate the cached settings of an object.
+
+    The version counter is only incremented after the current transaction
+    has been committed, otherwise another process could cache the old data
+    again before the changes are visible to it.
+    """
+    if key is None:
+        return
+    if has_app_context():
+        g.setdefault('settings_cache_pending_versions', set()).add(key)
+    else:
+        _shared_cache.inc(f'version/{key}')
+
+
+def flush_pending_settings_versions():
+    """Invalidate the cached settings of objects modified in the transaction."""
+    for key in g.pop('settings_cache_pending_versions', ()):
+        _shared_cache.inc(f'version/{key}')
 
 
 def _get_cache_key(proxy, name, kwargs):
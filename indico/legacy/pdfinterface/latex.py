@@ -7,47 +7,69 @@
 
 import codecs
 import functools
+import hashlib
 import os
 import subprocess
 import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from importlib.metadata import version
 from importlib.resources import as_file
 from importlib.resources import files as res_files
 from io import BytesIO
 from operator import attrgetter
 from pathlib import Path
+from uuid import uuid4
 from zipfile import ZipFile
 
 import markdown
-from flask import session
+from flask import has_request_context, session
 from flask.helpers import get_root_path
 from jinja2 import Environment, FileSystemLoader, StrictUndefined
 from jinja2.ext import Extension
 from jinja2.lexer import Token
 from pytz import timezone
 from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
 from werkzeug.exceptions import TooManyRequests
 from werkzeug.local import LocalProxy
 
 from indico.core.cache import make_scoped_cache
 from indico.core.config import config
+from indico.core.db import db
 from indico.core.limiter import make_rate_limiter
 from indico.core.logger import Logger
+from indico.core.storage import StorageError
 from indico.legacy.pdfinterface.base import escape
 from indico.modules.events.abstracts.models.abstracts import AbstractReviewingState, AbstractState
 from indico.modules.events.abstracts.models.reviews import AbstractAction
 from indico.modules.events.abstracts.settings import BOACorrespondingAuthorType, boa_settings
+from indico.modules.events.contributions.models.contributions import Contribution
 from indico.modules.events.contributions.util import sort_contribs
 from indico.modules.events.util import create_event_logo_tmp_file
+from indico.modules.files.models.latex_artifacts import LatexArtifact
 from indico.util import mdx_latex
-from indico.util.date_time import format_date, format_human_timedelta, format_time
+from indico.util.date_time import format_date, format_human_timedelta, format_time, now_utc
 from indico.util.fs import chmod_umask
-from indico.util.i18n import _, ngettext
+from indico.util.i18n import _, get_current_locale, ngettext
 from indico.util.string import render_markdown
 
 
 #: A rate limiter for PDF generation endpoints that are available publicly without logging in
 latex_rate_limiter = LocalProxy(functools.cache(lambda: make_rate_limiter('latex', config.LATEX_RATE_LIMIT)))
 cache = make_scoped_cache('latex-pdfs')
+#: How long to wait for another process compiling the same LaTeX source
+COMPILE_WAIT_TIMEOUT = 600
+#: How long to wait for another process compiling the same LaTeX source
+#: while handling a request, before compiling it again anyway
+COMPILE_REQUEST_WAIT_TIMEOUT = 5
+#: How often the last use of a stored PDF is updated
+ARTIFACT_LAST_USE_INTERVAL = timedelta(days=1)
+#: The rendered LaTeX code of the contributions in books of abstracts
+boa_fragment_cache = make_scoped_cache('boa-fragments')
+#: How long the rendered contributions of a book of abstracts are kept
+BOA_FRAGMENT_CACHE_TTL = timedelta(days=7)
 
 
 def generate_cached_pdf(fn, key, obj=None) -> BytesIO:
@@ -84,6 +106,117 @@ def generate_cached_pdf(fn, key, obj=None) -> BytesIO:
     return BytesIO(data)
 
 
+class LatexArtifactStore:
+    """Store compiled PDFs keyed by a hash of their LaTeX sources.
+
+    The PDFs are kept in a storage backend, so they are shared between all
+    users and processes, and they stay valid until the sources change (which
+    results in a different hash). Artifacts which have not been used for some
+    time are deleted by :func:`~indico.util.tasks.latex_pdf_cleanup`.
+
+    The artifacts are tracked in the database using a separate session, so
+    they are kept even if the transaction of the current request is rolled
+    back.
+    """
+
+    def retrieve(self, source_hash, target_filename):
+        """Copy the PDF for the given source hash to a local file.
+
+        :return: Whether the PDF was available.
+        """
+        with db.tmp_session() as sess:
+            artifact = sess.query(LatexArtifact).filter_by(source_hash=source_hash).first()
+            if artifact is None:
+                return False
+            checksum = hashlib.md5(usedforsecurity=False)
+            try:
+                with artifact.open() as src, open(target_filename, 'wb') as dst:
+                    while chunk := src.read(1024 * 1024):
+                        checksum.update(chunk)
+                        dst.write(chunk)
+            except StorageError:
+                Logger.get('pdflatex').warning('Could not retrieve LaTeX PDF artifact %s', source_hash,
+                                               exc_info=True)
+                return False
+            if checksum.hexdigest() != artifact.md5:
+                Logger.get('pdflatex').warning('LaTeX PDF artifact %s is corrupted', source_hash)
+                return False
+            if artifact.last_used_dt < now_utc() - ARTIFACT_LAST_USE_INTERVAL:
+                artifact.last_used_dt = now_utc()
+                sess.commit()
+        return True
+
+    def store(self, source_hash, filename):
+        """Store the PDF for the given source hash."""
+        artifact = LatexArtifact(source_hash=source_hash, filename=f'{source_hash}.pdf',
+                                 content_type='application/pdf')
+        try:
+            with open(filename, 'rb') as f:
+                artifact.save(f)
+        except StorageError:
+            Logger.get('pdflatex').warning('Could not store LaTeX PDF artifact %s', source_hash, exc_info=True)
+            return
+        with db.tmp_session() as sess:
+            sess.add(artifact)
+            try:
+                sess.commit()
+            except IntegrityError:
+                # someone else stored it in the meantime
+                sess.rollback()
+                artifact.storage.delete(artifact.storage_file_id)
+
+    def cleanup(self, max_age):
+        """Delete artifacts which have not been used recently.
+
+        :param max_age: A `timedelta` specifying after how long
+                        unused artifacts are deleted.
+        :return: The hashes of the deleted artifacts
+        """
+        expired = LatexArtifact.query.filter(LatexArtifact.last_used_dt < now_utc() - max_age).all()
+        deleted = set()
+        for artifact in expired:
+            try:
+                artifact.delete(delete_from_db=True)
+            except StorageError:
+                Logger.get('pdflatex').warning('Could not delete LaTeX PDF artifact %s', artifact.source_hash,
+                                               exc_info=True)
+            else:
+                deleted.add(artifact.source_hash)
+        db.session.commit()
+        return deleted
+
+
+def get_latex_artifact_store():
+    """Get the LaTeX PDF artifact store if it is enabled."""
+    if not config.LATEX_PDF_STORAGE:
+        return None
+    return LatexArtifactStore()
+
+
+@contextmanager
+def _single_compile(source_hash):
+    """Wait until nobody else is compiling the same LaTeX source.
+
+    This avoids compiling the same PDF many times in parallel, e.g. when a
+    book is requested by many people right after it has been modified.
+    The lock is only advisory: If Redis is unavailable or the other compile
+    takes too long, we simply go ahead and compile it ourselves.
+    """
+    lock_key = f'compiling/{source_hash}'
+    # do not keep web workers busy for long, since their clients would give up anyway
+    timeout = COMPILE_REQUEST_WAIT_TIMEOUT if has_request_context() else COMPILE_WAIT_TIMEOUT
+    deadline = time.monotonic() + timeout
+    while (acquired := cache.add(lock_key, True, COMPILE_WAIT_TIMEOUT)) is False:
+        if time.monotonic() > deadline:
+            break
+        time.sleep(0.5)
+    try:
+        yield
+    finally:
+        if acquired:
+            cache.delete(lock_key)
+
+
 class PDFLaTeXBase:
     _table_of_contents = False
     LATEX_TEMPLATE = None
@@ -210,7 +343,11 @@ class LatexRunner:
                     log_file.flush()
                 raise
 
-    def _render_template(self, template_name, kwargs):
+    def create_environment(self, markdown):
+        """Create the Jinja environment used to render the LaTeX templates.
+
+        :param markdown: The function used to convert Markdown to LaTeX
+        """
         template_dir = os.path.join(get_root_path('indico'), 'legacy/pdfinterface/latex_templates')
         env = Environment(loader=FileSystemLoader(template_dir),
                           autoescape=False,  # noqa: S701
@@ -227,10 +364,14 @@ class LatexRunner:
         env.filters['format_duration'] = lambda delta: format_human_timedelta(delta, 'minutes')
         env.filters['latex'] = _latex_escape
         env.filters['rawlatex'] = RawLatex
-        env.filters['markdown'] = kwargs.pop('markdown')
+        env.filters['markdown'] = markdown
         env.globals['_'] = _
         env.globals['ngettext'] = ngettext
         env.globals['session'] = session
+        return env
+
+    def _render_template(self, template_name, kwargs):
+        env = self.create_environment(kwargs.pop('markdown'))
         template = env.get_or_select_template(template_name)
         return template.render(font_dir='fonts/', **kwargs)
 
@@ -247,10 +388,42 @@ class LatexRunner:
             os.symlink(font_dir, os.path.join(self.source_dir, 'fonts'))
         return source_filename, target_filename
 
+    def get_source_hash(self, template_name):
+        """Get a hash of the LaTeX sources and all the assets they use.
+
+        This must be called after :meth:`prepare`.
+        """
+        sha = hashlib.sha256()
+        sha.update(f'{template_name}\0{self.has_toc}\0{config.XELATEX_PATH}\0'.encode())
+        sha.update(version('indico-fonts').encode())
+        for dirpath, dirnames, filenames in os.walk(self.source_dir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                if os.path.islink(path):
+                    continue
+                sha.update(b'\0' + os.path.relpath(path, self.source_dir).encode() + b'\0')
+                with open(path, 'rb') as f:
+                    while chunk := f.read(1024 * 1024):
+                        sha.update(chunk)
+        return sha.hexdigest()
+
     def run(self, template_name, **kwargs):
         if not config.LATEX_ENABLED:
             raise RuntimeError('LaTeX is not enabled')
         source_filename, target_filename = self.prepare(template_name, **kwargs)
+        if not (store := get_latex_artifact_store()):
+            return self.compile(source_filename, target_filename)
+        source_hash = self.get_source_hash(template_name)
+        with _single_compile(source_hash):
+            if store.retrieve(source_hash, target_filename):
+                Logger.get('pdflatex').debug('Using stored PDF %s', source_hash)
+                return target_filename
+            self.compile(source_filename, target_filename)
+            store.store(source_hash, target_filename)
+        return target_filename
+
+    def compile(self, source_filename, target_filename):
         log_filename = os.path.join(self.source_dir, 'output.log')
         log_file = open(log_filename, 'a+')  # noqa: SIM115
         try:
@@ -510,12 +683,90 @@ class ContributionBook(PDFLaTeXBase):
         self._args['logo_img'] = create_event_logo_tmp_file(event, self.source_dir) if event.logo else None
 
 
+def get_boa_fragment_version_key(event_id, contrib_id=None):
+    """Get the cache key containing the version of book of abstracts fragments.
+
+    Without a contribution ID, this is the key of the version shared by
+    all contributions of the event.
+    """
+    return f'version-{event_id}-{contrib_id}' if contrib_id is not None else f'version-{event_id}'
+
+
+def _get_boa_fragment_versions(event):
+    contrib_ids = [id_ for id_, in db.session.query(Contribution.id).filter_by(event_id=event.id, is_deleted=False)]
+    event_key = get_boa_fragment_version_key(event.id)
+    contrib_keys = {id_: get_boa_fragment_version_key(event.id, id_) for id_ in contrib_ids}
+    versions = boa_fragment_cache.get_dict(event_key, *contrib_keys.values())
+    if missing := {key: uuid4().hex for key, version in versions.items() if version is None}:
+        boa_fragment_cache.set_many(missing, BOA_FRAGMENT_CACHE_TTL)
+        versions.update(missing)
+    return versions[event_key], {id_: versions[key] for id_, key in contrib_keys.items()}
+
+
 class AbstractBook(ContributionBook):
     LATEX_TEMPLATE = 'book_of_abstracts'
     _table_of_contents = True
 
     def __init__(self, event, tz=None):
+        # the versions need to be retrieved before loading the contributions, so
+        # data loaded right before an invalidation is never cached as current
+        event_version, contrib_versions = _get_boa_fragment_versions(event)
         sort_by = boa_settings.get(event, 'sort_by')
         super().__init__(event, None, sort_by=sort_by)
         self._args['show_ids'] = boa_settings.get(event, 'show_abstract_ids')
         self._args['url'] = None
+        self._args['fragments'] = self._render_fragments(event_version, contrib_versions)
+
+    def _render_fragments(self, event_version, contrib_versions):
+        """Render the LaTeX code of each contribution in the book.
+
+        The rendered code is cached, so only the contributions which changed
+        since the book has been built the last time need to be rendered again.
+        """
+        env = LatexRunner(self.source_dir).create_environment(self._args['markdown'])
+        template = env.get_template('book_of_abstracts_entry.tex')
+        locale = str(get_current_locale())
+        contribs = [contrib for contrib in self._args['contribs'] if contrib.can_access(session.user)]
+        # contributions created after retrieving the versions are not cached at all
+        keys = {contrib.id: (f'{contrib.id}-{event_version}-{contrib_versions[contrib.id]}-{locale}-'
+                             f'{self._get_fragment_digest(contrib)}')
+                for contrib in contribs if contrib.id in contrib_versions}
+        cached = boa_fragment_cache.get_dict(*keys.values()) if keys else {}
+        fragments = []
+        new_fragments = {}
+        for contrib in contribs:
+            key = keys.get(contrib.id)
+            if (fragment := cached.get(key)) is None:
+                num_files = len(os.listdir(self.source_dir))
+                fragment = template.render(contrib=contrib, show_ids=self._args['show_ids'],
+                                           affiliation_contribs=self._args['affiliation_contribs'],
+                                           corresp_authors=self._args['corresp_authors'])
+                # images in markdown are downloaded to the source directory, so
+                # a fragment containing them cannot be used in another build
+                if key is not None and len(os.listdir(self.source_dir)) == num_files:
+                    new_fragments[key] = fragment
+            fragments.append(fragment)
+        if new_fragments:
+            boa_fragment_cache.set_many(new_fragments, BOA_FRAGMENT_CACHE_TTL)
+        return fragments
+
+    def _get_fragment_digest(self, contrib):
+        """Get a hash of the data in a fragment which is not covered by its version.
+
+        Tracks, types, custom fields and affiliations can be changed without
+        triggering any contribution signal, so they are part of the cache key.
+        """
+        affiliation_data = self._args['affiliation_contribs'][contrib.id]
+        data = (
+            contrib.type.name if contrib.type else None,
+            contrib.track.title_with_group if contrib.track else None,
+            contrib.session.title if contrib.session else None,
+            contrib.board_number,
+            affiliation_data['affiliations'],
+            [(link.full_name, affil_id) for link, affil_id in affiliation_data['authors_affil']],
+            [(link.full_name, affil_id) for link, affil_id in affiliation_data['coauthors_affil']],
+            self._args['corresp_authors'].get(contrib.id),
+            [(fv.contribution_field.title, fv.contribution_field.is_active, fv.contribution_field.is_public,
+              fv.friendly_data) for fv in contrib.field_values],
+        )
+        return hashlib.md5(repr(data).encode(), usedforsecurity=False).hexdigest()
@@ -0,0 +1,50 @@
+"""Add search ACL index
+
+Revision ID: 82a208d5dc48
+Revises: af9d03d7073c
+Create Date: 2026-10-18 10:00:00.000000
+"""
+
+from enum import Enum
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.sql.ddl import CreateSchema, DropSchema
+
+from indico.core.db.sqlalchemy import PyIntEnum
+
+
+# revision identifiers, used by Alembic.
+revision = '82a208d5dc48'
+down_revision = 'af9d03d7073c'
+branch_labels = None
+depends_on = None
+
+
+class _SearchTarget(int, Enum):
+    category = 1
+    event = 2
+    contribution = 3
+    subcontribution = 4
+    event_note = 5
+    attachment = 6
+
+
+def upgrade():
+    op.execute(CreateSchema('search'))
+    op.create_table(
+        'acl_index',
+        sa.Column('object_type', PyIntEnum(_SearchTarget), nullable=False),
+        sa.Column('object_id', sa.Integer(), nullable=False),
+        sa.Column('principal', sa.String(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=True, index=True),
+        sa.Column('category_id', sa.Integer(), nullable=True, index=True),
+        sa.PrimaryKeyConstraint('object_type', 'object_id', 'principal'),
+        schema='search'
+    )
+    op.create_index(None, 'acl_index', ['principal', 'object_type', 'object_id'], schema='search')
+
+
+def downgrade():
+    op.drop_table('acl_index', schema='search')
+    op.execute(DropSchema('search'))
@@ -0,0 +1,50 @@
+"""Add log search and keyset pagination indexes
+
+Revision ID: 5b8e1f0c3a72
+Revises: 82a208d5dc48
+Create Date: 2026-10-18 11:00:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e1f0c3a72'
+down_revision = '82a208d5dc48'
+branch_labels = None
+depends_on = None
+
+
+_log_tables = [
+    ('events', 'event_id'),
+    ('categories', 'category_id'),
+    ('users', 'target_user_id'),
+    ('indico', None),
+]
+
+_search_document = '''
+    to_tsvector('simple', indico.indico_unaccent(
+        module || ' ' || type || ' ' || summary ||
+        ' ' || coalesce(data ->> 'body', '') ||
+        ' ' || coalesce(data ->> 'subject', '') ||
+        ' ' || coalesce(data ->> 'from', '') ||
+        ' ' || coalesce(data ->> 'to', '') ||
+        ' ' || coalesce(data ->> 'cc', '')
+    ))
+'''
+
+
+def upgrade():
+    for schema, link_column in _log_tables:
+        columns = [link_column, 'logged_dt', 'id'] if link_column else ['logged_dt', 'id']
+        op.create_index(op.f(f'ix_logs_{"_".join(columns)}'), 'logs', columns, schema=schema)
+        op.create_index('ix_logs_search_fts', 'logs', [sa.text(_search_document)], schema=schema,
+                        postgresql_using='gin')
+
+
+def downgrade():
+    for schema, link_column in _log_tables:
+        columns = [link_column, 'logged_dt', 'id'] if link_column else ['logged_dt', 'id']
+        op.drop_index('ix_logs_search_fts', table_name='logs', schema=schema)
+        op.drop_index(op.f(f'ix_logs_{"_".join(columns)}'), table_name='logs', schema=schema)
@@ -0,0 +1,38 @@
+"""Add category stats
+
+Revision ID: c3f1d2a7b9e4
+Revises: 5b8e1f0c3a72
+Create Date: 2026-10-18 12:00:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+from indico.core.db.sqlalchemy import UTCDateTime
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f1d2a7b9e4'
+down_revision = '5b8e1f0c3a72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'stats',
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('events', sa.Integer(), nullable=False),
+        sa.Column('created_events', sa.Integer(), nullable=False),
+        sa.Column('contributions', sa.Integer(), nullable=False),
+        sa.Column('attachments', sa.Integer(), nullable=False),
+        sa.Column('updated_dt', UTCDateTime, nullable=False),
+        sa.ForeignKeyConstraint(['category_id'], ['categories.categories.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('category_id', 'year'),
+        schema='categories'
+    )
+
+
+def downgrade():
+    op.drop_table('stats', schema='categories')
@@ -0,0 +1,96 @@
+"""Add category paths
+
+Revision ID: d7a4e9b2c8f1
+Revises: c3f1d2a7b9e4
+Create Date: 2026-10-18 13:00:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a4e9b2c8f1'
+down_revision = 'c3f1d2a7b9e4'
+branch_labels = None
+depends_on = None
+
+
+SQL_FUNCTION_UPDATE_CATEGORY_PATHS = '''
+    CREATE FUNCTION categories.update_category_paths(root_id int) RETURNS void AS
+    $BODY$
+    DECLARE
+        level_ids int[] := ARRAY[root_id];
+        seen_ids int[] := ARRAY[root_id];
+    BEGIN
+        -- all paths within the subtree go through the root category, so they are rebuilt as well
+        DELETE FROM categories.paths
+        WHERE descendant_id IN (SELECT descendant_id FROM categories.paths WHERE ancestor_id = root_id);
+        -- build the paths one level at a time, extending the paths to the parent categories
+        WHILE level_ids != '{}' LOOP
+            INSERT INTO categories.paths (ancestor_id, descendant_id, depth, visibility_horizon)
+            SELECT p.ancestor_id, cat.id, p.depth + 1, LEAST(p.visibility_horizon + 1, cat.visibility)
+            FROM categories.categories cat
+            JOIN categories.paths p ON (p.descendant_id = cat.parent_id)
+            WHERE cat.id = ANY(level_ids)
+            UNION ALL
+            SELECT cat.id, cat.id, 0, cat.visibility
+            FROM categories.categories cat
+            WHERE cat.id = ANY(level_ids);
+
+            SELECT COALESCE(array_agg(id), '{}') INTO level_ids
+            FROM categories.categories
+            WHERE parent_id = ANY(level_ids) AND id != ALL(seen_ids);
+            seen_ids := seen_ids || level_ids;
+        END LOOP;
+    END;
+    $BODY$
+    LANGUAGE plpgsql
+'''
+
+SQL_FUNCTION_UPDATE_CATEGORY_PATHS_TRIGGER = '''
+    CREATE FUNCTION categories.update_category_paths_trigger() RETURNS trigger AS
+    $BODY$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM categories.update_category_paths(NEW.id);
+        ELSIF OLD.parent_id IS DISTINCT FROM NEW.parent_id OR OLD.visibility IS DISTINCT FROM NEW.visibility THEN
+            PERFORM categories.update_category_paths(NEW.id);
+        END IF;
+        RETURN NULL;
+    END;
+    $BODY$
+    LANGUAGE plpgsql
+'''
+
+
+def upgrade():
+    op.create_table(
+        'paths',
+        sa.Column('ancestor_id', sa.Integer(), nullable=False),
+        sa.Column('descendant_id', sa.Integer(), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.Column('visibility_horizon', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['ancestor_id'], ['categories.categories.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['descendant_id'], ['categories.categories.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id'),
+        schema='categories'
+    )
+    op.create_index(None, 'paths', ['descendant_id', 'depth'], schema='categories')
+    op.execute(SQL_FUNCTION_UPDATE_CATEGORY_PATHS)
+    op.execute(SQL_FUNCTION_UPDATE_CATEGORY_PATHS_TRIGGER)
+    op.execute('''
+        CREATE TRIGGER update_category_paths
+        AFTER INSERT OR UPDATE OF parent_id, visibility
+        ON categories.categories
+        FOR EACH ROW
+        EXECUTE PROCEDURE categories.update_category_paths_trigger();
+    ''')
+    op.execute('SELECT categories.update_category_paths(id) FROM categories.categories WHERE parent_id IS NULL')
+
+
+def downgrade():
+    op.execute('DROP TRIGGER update_category_paths ON categories.categories')
+    op.execute('DROP FUNCTION categories.update_category_paths_trigger()')
+    op.execute('DROP FUNCTION categories.update_category_paths(root_id int)')
+    op.drop_table('paths', schema='categories')
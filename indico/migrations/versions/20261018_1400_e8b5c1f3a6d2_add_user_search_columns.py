@@ -0,0 +1,43 @@
+"""Add user and affiliation search columns
+
+Revision ID: e8b5c1f3a6d2
+Revises: d7a4e9b2c8f1
+Create Date: 2026-10-18 14:00:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b5c1f3a6d2'
+down_revision = 'd7a4e9b2c8f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('search_name', sa.String(), sa.Computed(
+        "indico.indico_unaccent(lower(first_name || ' ' || last_name || ' ' || first_name))"
+    ), nullable=False), schema='users')
+    op.create_index('ix_users_search_name_trgm', 'users', ['search_name'], schema='users',
+                    postgresql_using='gin', postgresql_ops={'search_name': 'gin_trgm_ops'})
+    op.create_index('ix_users_search_name_prefix', 'users', ['search_name'], schema='users',
+                    postgresql_ops={'search_name': 'text_pattern_ops'})
+    op.add_column('affiliations', sa.Column('search_key', sa.String(), sa.Computed(
+        "indico.indico_unaccent(lower(indico.text_array_to_string("
+        "ARRAY['']::text[] || indico.text_array_append(alt_names::text[], name::text) || ARRAY['']::text[], '|||')))"
+    ), nullable=False), schema='indico')
+    op.create_index('ix_affiliations_search_key_trgm', 'affiliations', ['search_key'], schema='indico',
+                    postgresql_using='gin', postgresql_ops={'search_key': 'gin_trgm_ops'})
+    op.drop_index('ix_affiliations_searchable_names_unaccent', table_name='affiliations', schema='indico')
+
+
+def downgrade():
+    op.execute('''
+        CREATE INDEX ix_affiliations_searchable_names_unaccent
+        ON indico.affiliations
+        USING gin (indico.indico_unaccent(lower(indico.text_array_to_string(((ARRAY[''::text] || indico.text_array_append((alt_names)::text[], (name)::text)) || ARRAY[''::text]), '|||'::text))) gin_trgm_ops);
+    ''')
+    op.drop_column('affiliations', 'search_key', schema='indico')
+    op.drop_column('users', 'search_name', schema='users')
@@ -0,0 +1,39 @@
+"""Add latex artifacts table
+
+Revision ID: f2c6a8d4b1e7
+Revises: e8b5c1f3a6d2
+Create Date: 2026-10-18 15:00:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+from indico.core.db.sqlalchemy import UTCDateTime
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c6a8d4b1e7'
+down_revision = 'e8b5c1f3a6d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'latex_artifacts',
+        sa.Column('source_hash', sa.String(), nullable=False),
+        sa.Column('last_used_dt', UTCDateTime, nullable=False, index=True),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('storage_backend', sa.String(), nullable=False),
+        sa.Column('content_type', sa.String(), nullable=False),
+        sa.Column('md5', sa.String(), nullable=False),
+        sa.Column('storage_file_id', sa.String(), nullable=False),
+        sa.Column('filename', sa.String(), nullable=False),
+        sa.Column('created_dt', UTCDateTime, nullable=False),
+        sa.PrimaryKeyConstraint('source_hash'),
+        schema='indico'
+    )
+
+
+def downgrade():
+    op.drop_table('latex_artifacts', schema='indico')
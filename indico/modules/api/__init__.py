@@ -53,6 +53,85 @@ def _merge_users(target, source, **kwargs):
             ak_merged.user = target
 
 
+@signals.core.app_created.connect
+def _setup_cache_tag_tracking(app, **kwargs):
+    from indico.web.http_api.cache import setup_cache_tag_tracking
+    setup_cache_tag_tracking()
+
+
+@signals.core.after_commit.connect
+def _flush_cache_invalidations(sender, **kwargs):
+    from indico.web.http_api.cache import flush_cache_invalidations
+    flush_cache_invalidations()
+
+
+@signals.event.created.connect
+@signals.event.updated.connect
+@signals.event.deleted.connect
+@signals.event.restored.connect
+@signals.event.type_changed.connect
+@signals.event.location_changed.connect
+@signals.event.session_updated.connect
+@signals.event.session_deleted.connect
+@signals.event.session_block_updated.connect
+@signals.event.session_block_deleted.connect
+@signals.event.contribution_created.connect
+@signals.event.contribution_updated.connect
+@signals.event.contribution_deleted.connect
+@signals.event.subcontribution_created.connect
+@signals.event.subcontribution_updated.connect
+@signals.event.subcontribution_deleted.connect
+@signals.event.timetable_entry_created.connect
+@signals.event.timetable_entry_updated.connect
+@signals.event.timetable_entry_deleted.connect
+@signals.event.note_added.connect
+@signals.event.note_modified.connect
+@signals.event.note_deleted.connect
+@signals.event.note_restored.connect
+@signals.event.person_updated.connect
+@signals.attachments.folder_created.connect
+@signals.attachments.folder_updated.connect
+@signals.attachments.folder_deleted.connect
+@signals.attachments.attachment_created.connect
+@signals.attachments.attachment_updated.connect
+@signals.attachments.attachment_deleted.connect
+@signals.category.created.connect
+@signals.category.updated.connect
+@signals.category.deleted.connect
+def _invalidate_api_cache(sender, **kwargs):
+    from indico.web.http_api.cache import get_object_cache_tags, invalidate_cache_tags
+    invalidate_cache_tags(*get_object_cache_tags(sender))
+
+
+@signals.event.moved.connect
+@signals.category.moved.connect
+def _invalidate_api_cache_moved(sender, old_parent, **kwargs):
+    from indico.web.http_api.cache import get_object_cache_tags, invalidate_cache_tags
+    invalidate_cache_tags(*get_object_cache_tags(sender), *get_object_cache_tags(old_parent))
+
+
+@signals.event.times_changed.connect
+@signals.acl.entry_changed.connect
+@signals.acl.protection_changed.connect
+def _invalidate_api_cache_obj(sender, obj, **kwargs):
+    from indico.web.http_api.cache import get_object_cache_tags, invalidate_cache_tags
+    invalidate_cache_tags(*get_object_cache_tags(obj))
+
+
+@signals.users.anonymized.connect
+@signals.users.favorite_category_added.connect
+@signals.users.favorite_category_removed.connect
+def _invalidate_api_cache_user(user, **kwargs):
+    from indico.web.http_api.cache import invalidate_cache_tags, user_tag
+    invalidate_cache_tags(user_tag(user.id))
+
+
+@signals.users.merged.connect
+def _invalidate_api_cache_merged_users(target, source, **kwargs):
+    from indico.web.http_api.cache import invalidate_cache_tags, user_tag
+    invalidate_cache_tags(user_tag(target.id), user_tag(source.id))
+
+
 @signals.menu.items.connect_via('admin-sidemenu')
 def _extend_admin_menu(sender, **kwargs):
     if session.user.is_admin:
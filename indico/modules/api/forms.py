@@ -31,7 +31,8 @@ class AdminSettingsForm(IndicoForm):
                                           description=_('Specify if/when people need to use an API key or a '
                                                         'signed request.'))
     cache_ttl = IntegerField(_('Cache TTL'), [NumberRange(min=0)],
-                             description=_('Time to cache API results (in seconds)'))
+                             description=_('Time to cache API results (in seconds). Cached results are discarded '
+                                           'when the events or categories they contain are modified.'))
     signature_ttl = IntegerField(_('Signature TTL'), [NumberRange(min=1)],
                                  description=_('Time after which a request signature expires. This should not be too '
                                                'low to account for small clock differences between the client and the '
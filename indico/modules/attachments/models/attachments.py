@@ -130,6 +130,7 @@ class Attachment(SearchableTitleMixin, ProtectionMixin, VersionedResourceMixin,
     stored_file_class = AttachmentFile
     stored_file_fkey = 'attachment_id'
     title_required = False
+    protection_parent_relationships = ('folder',)
 
     @declared_attr
     def __table_args__(cls):
@@ -31,6 +31,7 @@ class AttachmentFolder(LinkMixin, ProtectionMixin, db.Model):
     events_backref_name = 'all_attachment_folders'
     link_backref_name = 'attachment_folders'
     link_backref_lazy = 'dynamic'
+    protection_parent_relationships = ('category', 'event', 'session', 'contribution', 'subcontribution')
 
     @strict_classproperty
     @staticmethod
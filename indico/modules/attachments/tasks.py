@@ -5,8 +5,6 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
-import os
-
 from indico.core.celery import celery
 from indico.core.config import config
 from indico.core.db import db
@@ -20,11 +18,11 @@ def generate_materials_package(attachment_ids, event):
     attachments = Attachment.query.filter(Attachment.id.in_(attachment_ids)).all()
     attachment_package_mixin = AttachmentPackageGeneratorMixin()
     attachment_package_mixin.event = event
-    generated_zip = attachment_package_mixin._generate_zip_file(attachments, return_file=True)
+    zip_stream = attachment_package_mixin._build_zip_stream(attachments)
     f = File(filename='material-package.zip', content_type='application/zip', meta={'event_id': event.id})
     context = ('event', event.id, 'attachment-package')
-    f.save(context, generated_zip, backend=config.STATIC_SITE_STORAGE)
+    # the zip file is written directly to the storage backend while it is being generated
+    f.save(context, zip_stream.open(), backend=config.STATIC_SITE_STORAGE)
     db.session.add(f)
     db.session.commit()
-    os.unlink(generated_zip.name)
     return f.signed_download_url
@@ -80,6 +80,57 @@ def _check_permissions(app, **kwargs):
     check_permissions(Category)
 
 
+@signals.core.app_created.connect
+def _setup_feed_change_tracking(app, **kwargs):
+    from indico.modules.categories.feeds import setup_feed_change_tracking
+    setup_feed_change_tracking()
+
+
+@signals.core.after_commit.connect
+def _update_feed_versions(sender, **kwargs):
+    from indico.modules.categories.feeds import update_feed_versions
+    update_feed_versions()
+
+
+@signals.event.created.connect
+@signals.event.updated.connect
+@signals.event.deleted.connect
+@signals.event.restored.connect
+@signals.event.session_deleted.connect
+@signals.event.contribution_deleted.connect
+@signals.event.subcontribution_deleted.connect
+@signals.event.timetable_entry_created.connect
+@signals.event.timetable_entry_updated.connect
+@signals.event.timetable_entry_deleted.connect
+@signals.attachments.attachment_created.connect
+@signals.attachments.attachment_deleted.connect
+@signals.attachments.folder_deleted.connect
+def _schedule_stats_update(sender, **kwargs):
+    from indico.modules.categories.stats import schedule_stats_update
+    schedule_stats_update(sender)
+
+
+@signals.event.times_changed.connect
+def _schedule_stats_update_times_changed(sender, obj, **kwargs):
+    from indico.modules.categories.stats import schedule_stats_update
+    schedule_stats_update(obj)
+
+
+@signals.event.moved.connect
+def _schedule_stats_update_moved(sender, old_parent, **kwargs):
+    from indico.modules.categories.stats import schedule_stats_update
+    schedule_stats_update(sender)
+    schedule_stats_update(old_parent)
+
+
+@signals.core.after_commit.connect
+def _update_stats(sender, **kwargs):
+    from indico.modules.categories.stats import STATS_UPDATE_DELAY, pop_pending_stats_updates
+    from indico.modules.categories.tasks import update_category_stats
+    if pending := pop_pending_stats_updates():
+        update_category_stats.apply_async([sorted(pending)], countdown=STATS_UPDATE_DELAY)
+
+
 @signals.acl.get_management_permissions.connect_via(Category)
 def _get_management_permissions(sender, **kwargs):
     yield CreatorPermission
@@ -7,7 +7,7 @@
 
 from datetime import date, datetime, time, timedelta
 from enum import Enum, auto
-from functools import partial
+from functools import cache, partial
 from io import BytesIO
 from itertools import chain, groupby
 from operator import attrgetter, itemgetter
@@ -16,27 +16,30 @@ from time import mktime
 import dateutil
 from dateutil.parser import ParserError
 from dateutil.relativedelta import relativedelta
-from flask import flash, jsonify, redirect, request, session
+from flask import current_app, flash, jsonify, redirect, request, session
 from pytz import utc
 from sqlalchemy.orm import joinedload, load_only, selectinload, subqueryload, undefer, undefer_group
 from webargs import fields, validate
 from werkzeug.exceptions import BadRequest, Forbidden, NotFound
+from werkzeug.http import is_resource_modified
 
 from indico.core import signals
 from indico.core.db import db
-from indico.core.db.sqlalchemy.util.queries import get_n_matching
+from indico.core.db.sqlalchemy.util.queries import get_keyset_key, get_n_matching_keyset
 from indico.modules.categories.controllers.base import RHCategoryBase, RHDisplayCategoryBase
 from indico.modules.categories.controllers.util import (get_category_view_params, get_event_query_filter,
                                                         group_by_month, make_format_event_date_func,
                                                         make_happening_now_func, make_is_recent_func)
 from indico.modules.categories.models.categories import Category
-from indico.modules.categories.serialize import (serialize_categories_ical, serialize_category, serialize_category_atom,
-                                                 serialize_category_chain)
-from indico.modules.categories.util import get_category_stats, get_upcoming_events
+from indico.modules.categories.serialize import (get_categories_ical_validators, get_category_atom_validators,
+                                                 serialize_categories_ical, serialize_category,
+                                                 serialize_category_atom, serialize_category_chain)
+from indico.modules.categories.stats import get_category_stats
+from indico.modules.categories.util import get_upcoming_events
 from indico.modules.categories.views import WPCategory, WPCategoryCalendar
 from indico.modules.events.management.settings import global_event_settings
 from indico.modules.events.models.events import Event
-from indico.modules.events.timetable.util import get_category_timetable
+from indico.modules.events.timetable.util import get_category_timetable_rows, load_timetable_objects
 from indico.modules.news.util import get_recent_news
 from indico.modules.rb.models.locations import Location
 from indico.modules.users import User
@@ -89,12 +92,6 @@ class RHCategoryLogo(RHDisplayCategoryBase):
 class RHCategoryStatisticsJSON(RHDisplayCategoryBase):
     def _process(self):
         stats = get_category_stats(self.category.id)
-        if 'min_year' not in stats:
-            # in case the instance was freshly updated and still has data
-            # cached we need to invalidate it to avoid breaking the page
-            # TODO: remove this in 3.0; by then people had enough time to update to 2.3...
-            get_category_stats.clear_cached(self.category.id)
-            stats = get_category_stats(self.category.id)
         data = {
             'events': stats['events_by_year'],
             'contributions': stats['contribs_by_year'],
@@ -197,26 +194,30 @@ class RHCategoryManagedEventSearch(RHCategoryBase):
         RHCategoryBase._check_access(self)
 
     @use_kwargs({'q': LowercaseString(required=True, validate=not_empty),
-                 'offset': fields.Integer(load_default=0, validate=validate.Range(0))}, location='query')
-    def _process(self, q, offset):
+                 'after': fields.Integer(load_default=None)}, location='query')
+    def _process(self, q, after):
         from indico.modules.events.series.schemas import SeriesManagementSearchResultsSchema
         query = (
             Event.query.with_parent(self.category)
             .filter(Event.title_matches(q), ~Event.is_deleted)
             .options(load_only('id', 'title', 'start_dt', 'end_dt', 'category_id', 'category_chain', 'series_id'))
         )
-        # Prefer favorite events
-        query = query.order_by(Event.favorite_of.any(favorite_event_table.c.user_id == session.user.id).desc())
-        # Prefer exact matches and matches at the beginning, then order by event title
-        query = query.order_by(
+        order_by = (
+            # Prefer favorite events
+            Event.favorite_of.any(favorite_event_table.c.user_id == session.user.id).desc(),
+            # Prefer exact matches and matches at the beginning, then order by event title
             (db.func.lower(Event.title) == q).desc(),
             db.func.lower(Event.title).startswith(q).desc(),
             Event.start_dt,
             db.func.lower(Event.title),
+            Event.id,
         )
+        # Continue after the last event the client already has
+        after_key = get_keyset_key(query, order_by, Event.id == after) if after is not None else None
         events_per_page = 10
         # Try to load one extra event. This tells us if there are more events to load later
-        events = get_n_matching(query, events_per_page + 1, lambda event: event.can_manage(session.user), offset=offset)
+        events, __ = get_n_matching_keyset(query, events_per_page + 1, order_by,
+                                           lambda event: event.can_manage(session.user), after=after_key)
         return SeriesManagementSearchResultsSchema().jsonify({'events': events[:events_per_page],
                                                               'has_more': len(events) > events_per_page})
 
@@ -352,32 +353,48 @@ class RHShowPastEventsInCategory(RHShowEventsInCategoryBase):
     session_field = 'fetch_past_events_in'
 
 
+def _make_feed_not_modified_response(etag, last_modified):
+    """Create a response telling the client that its copy of a feed is up to date."""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
 @allow_signed_url
 class RHExportCategoryICAL(RHDisplayCategoryBase):
     def _process(self):
         filename = f'{secure_filename(self.category.title, str(self.category.id))}-category.ics'
-        buf = serialize_categories_ical([self.category.id], session.user,
-                                        Event.end_dt >= (now_utc() - timedelta(weeks=4)))
-        return send_file(filename, buf, 'text/calendar')
+        event_filter = Event.end_dt >= (now_utc() - timedelta(weeks=4))
+        versions, etag, last_modified = get_categories_ical_validators([self.category.id], session.user,
+                                                                       event_filter)
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            return _make_feed_not_modified_response(etag, last_modified)
+        buf = serialize_categories_ical([self.category.id], session.user, event_filter, versions=versions)
+        return send_file(filename, buf, 'text/calendar', etag=etag, last_modified=last_modified)
 
 
 class RHExportCategoryAtom(RHDisplayCategoryBase):
     def _process(self):
         filename = f'{secure_filename(self.category.title, str(self.category.id))}-category.atom'
-        buf = serialize_category_atom(self.category,
-                                      url_for(request.endpoint, self.category, _external=True),
-                                      session.user,
-                                      Event.end_dt >= now_utc())
-        return send_file(filename, buf, 'application/atom+xml')
+        url = url_for(request.endpoint, self.category, _external=True)
+        event_filter = Event.end_dt >= now_utc()
+        etag, last_modified = get_category_atom_validators(self.category, url, session.user, event_filter)
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            return _make_feed_not_modified_response(etag, last_modified)
+        buf = serialize_category_atom(self.category, url, session.user, event_filter)
+        return send_file(filename, buf, 'application/atom+xml', etag=etag, last_modified=last_modified)
 
 
 class RHCategoryOverview(RHDisplayCategoryBase):
     """Display the events for a particular day, week or month."""
 
     def _get_timetable(self):
-        return get_category_timetable([self.category.id], self.start_dt, self.end_dt,
-                                      detail_level=self.detail, tz=self.category.display_tzinfo,
-                                      from_categ=self.category, grouped=False)
+        return get_category_timetable_rows([self.category.id], self.start_dt, self.end_dt,
+                                           detail_level=self.detail, tz=self.category.display_tzinfo,
+                                           from_categ=self.category)
 
     @use_kwargs({
         'detail': fields.String(load_default='event', validate=validate.OneOf(['event', 'session', 'contribution'])),
@@ -416,16 +433,18 @@ class RHCategoryOverview(RHDisplayCategoryBase):
             self.end_dt = self.start_dt + relativedelta(months=1)
 
     def _process(self):
-        info = self._get_timetable()
-        events = info['events']
+        events, timetable_rows = self._get_timetable()
 
         # Only categories with icons are listed in the sidebar
         subcategory_ids = {event.category.effective_icon_data['source_id']
                            for event in events if event.category.has_effective_icon}
         subcategories = Category.query.filter(Category.id.in_(subcategory_ids)).all()
 
+        # The timetable objects are only loaded if any of them are actually displayed
+        load_objects = cache(partial(load_timetable_objects, list(chain.from_iterable(timetable_rows.values()))))
+
         # Events spanning multiple days must appear on all days
-        events = _flat_map(partial(self._process_multiday_events, info), events)
+        events = _flat_map(partial(self._process_multiday_events, timetable_rows, load_objects), events)
 
         def _event_sort_key(event):
             # Ongoing events are shown after all other events on the same day and are sorted by start_date
@@ -515,40 +534,45 @@ class RHCategoryOverview(RHDisplayCategoryBase):
         return url_for('.overview', self.category, detail=self.detail, period=self.period,
                        date=format_date(date, 'yyyy-MM-dd'))
 
-    def _process_multiday_events(self, info, event):
+    def _process_multiday_events(self, timetable_rows, load_objects, event):
         # Add "fake" proxy events for events spanning multiple days such that there is one event per day
         # Function type: Event -> List[Event]
         tzinfo = self.category.display_tzinfo
 
-        # Breaks, contributions and sessions grouped by start_dt. Each EventProxy will return the relevant ones only
-        timetable_objects = sorted(chain(*list(info[event.id].values())), key=attrgetter('timetable_entry.start_dt'))
-        timetable_objects_by_date = {x[0]: list(x[1]) for x
-                                     in groupby(timetable_objects, key=lambda x: x.start_dt.astimezone(tzinfo).date())}
+        # Breaks, contributions and sessions grouped by their (local) start date, which comes from
+        # the database. Each EventProxy will return the relevant ones only
+        timetable_rows_by_date = {x[0]: list(x[1]) for x
+                                  in groupby(timetable_rows.get(event.id, []), key=attrgetter('local_date'))}
 
         # All the days of the event shown in the overview
         event_days = self._get_days(max(self.start_dt, event.start_dt.astimezone(tzinfo)),
                                     min(self.end_dt, event.end_dt.astimezone(tzinfo)))
 
         # Generate a proxy object with adjusted start_dt and timetable_objects for each day
-        return [_EventProxy(event, day, tzinfo, timetable_objects_by_date.get(day.date(), [])) for day in event_days]
+        return [_EventProxy(event, day, tzinfo, timetable_rows_by_date.get(day.date(), []), load_objects)
+                for day in event_days]
 
 
 class _EventProxy:
-    def __init__(self, event, date, tzinfo, timetable_objects):
+    def __init__(self, event, date, tzinfo, timetable_rows, load_timetable_objects):
         start_dt = datetime.combine(date, event.start_dt.astimezone(tzinfo).timetz())
         assert date >= event.start_dt
         assert date <= event.end_dt
         object.__setattr__(self, '_start_dt', start_dt)
         object.__setattr__(self, '_real_event', event)
         object.__setattr__(self, '_event_tz_start_date', event.start_dt.astimezone(tzinfo).date())
-        object.__setattr__(self, '_timetable_objects', timetable_objects)
+        object.__setattr__(self, '_timetable_rows', timetable_rows)
+        object.__setattr__(self, '_load_timetable_objects', load_timetable_objects)
 
     def __getattribute__(self, name):
         if name == 'start_dt':
             return object.__getattribute__(self, '_start_dt')
         event = object.__getattribute__(self, '_real_event')
         if name == 'timetable_objects':
-            return object.__getattribute__(self, '_timetable_objects')
+            if not (rows := object.__getattribute__(self, '_timetable_rows')):
+                return []
+            objects = object.__getattribute__(self, '_load_timetable_objects')()
+            return [objects[(row.type, row.object_id)] for row in rows]
         if name == 'ongoing':
             # the event is "ongoing" if the dates (in the tz of the category)
             # of the event and the proxy (calendar entry) don't match
@@ -714,9 +738,8 @@ class RHCategoryRelativeEventBase(RHDisplayCategoryBase):
                  .filter(Event.is_visible_in(self.category.id),
                          filter_,
                          ~Event.is_deleted)
-                 .options(subqueryload('acl_entries'))
-                 .order_by(*order))
-        res = get_n_matching(query, 1, lambda event: event.can_access(session.user))
+                 .options(subqueryload('acl_entries')))
+        res, __ = get_n_matching_keyset(query, 1, order, lambda event: event.can_access(session.user))
         if res:
             return res[0]
 
@@ -10,7 +10,9 @@ import json
 import pytest
 from flask import request
 
+from indico.core.db.sqlalchemy.protection import ProtectionMode
 from indico.modules.categories.controllers.display import RHCategorySearch
+from indico.web.util import signed_url_for_user
 
 
 @pytest.mark.usefixtures('request_context')
@@ -31,3 +33,17 @@ def test_deleted_category_search(dummy_category):
     data = json.loads(response.data)
     assert data['success']
     assert data['total_count'] == 0
+
+
+def test_export_ical_signed_url(dummy_category, dummy_user, test_client):
+    dummy_category.protection_mode = ProtectionMode.protected
+    dummy_category.update_principal(dummy_user, read_access=True)
+    dummy_user.signing_secret = 'sixtynine'
+    url = signed_url_for_user(dummy_user, 'categories.export_ical', dummy_category)
+    resp = test_client.get(url)
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/calendar'
+    # without the signature the user needs to log in
+    resp = test_client.get(url.split('?')[0])
+    assert resp.status_code == 302
+    assert '/login/' in resp.location
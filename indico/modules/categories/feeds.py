@@ -0,0 +1,108 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+import hashlib
+import itertools
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+from flask import g, has_app_context
+from sqlalchemy.event import contains, listen
+
+from indico.core.cache import make_scoped_cache
+from indico.core.db import db
+from indico.modules.categories.models.categories import Category
+from indico.modules.events import Event
+from indico.modules.groups.models.groups import LocalGroup
+from indico.util.date_time import now_utc
+
+
+feed_cache = make_scoped_cache('category-feeds')
+
+#: How often (in seconds) feeds are considered changed even if no change
+#: was detected, e.g. to pick up membership changes in external groups
+FEED_MAX_AGE = 3600
+#: How long the version of an event is kept; once it expired, a new
+#: version is assigned, so feeds containing the event get regenerated
+FEED_VERSION_TTL = timedelta(days=7)
+
+
+def _get_version_key(event_id=None):
+    return f'event-{event_id}' if event_id is not None else 'global'
+
+
+def get_feed_versions(event_ids):
+    """Get tokens which change whenever an event changes.
+
+    Besides the versions of the given events, the result also contains
+    the global version (with the key ``None``) which changes whenever
+    anything changes that may affect many events, such as a category.
+
+    Events which do not have a version yet (or whose version has been
+    evicted from the cache) get a new one, so a version is never reused
+    for a different state of an event.  To avoid caching outdated data
+    under a current version, the versions need to be retrieved *before*
+    loading the event data from the database.
+    """
+    ids = [None, *event_ids]
+    versions = dict(zip(ids, feed_cache.get_many(*map(_get_version_key, ids)), strict=True))
+    if missing := {id_: uuid4().hex for id_, version in versions.items() if version is None}:
+        feed_cache.set_many({_get_version_key(id_): version for id_, version in missing.items()}, FEED_VERSION_TTL)
+        versions.update(missing)
+    return versions
+
+
+def get_feed_validators(versions, *extra):
+    """Get the ETag and Last-Modified date for a feed.
+
+    :param versions: The versions of all events that may be included in
+                     the feed, as returned by `get_feed_versions`
+    :param extra: Anything else the content of the feed depends on, e.g.
+                  the user or settings affecting the output
+    :return: An ``(etag, last_modified)`` tuple
+    """
+    global_version = versions[None]
+    event_versions = sorted((id_, version) for id_, version in versions.items() if id_ is not None)
+    data = repr((global_version, event_versions, extra, int(time.time() // FEED_MAX_AGE)))
+    etag = hashlib.sha256(data.encode()).hexdigest()
+    # the feed has not changed since we first saw its current state
+    feed_cache.add(f'etag-{etag}', now_utc().replace(microsecond=0), FEED_MAX_AGE)
+    last_modified = feed_cache.get(f'etag-{etag}') or now_utc().replace(microsecond=0)
+    return etag, last_modified
+
+
+def _collect_feed_changes(session, flush_context):
+    if not has_app_context():
+        return
+    pending = g.setdefault('pending_feed_version_updates', set())
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Event):
+            pending.add(_get_version_key(obj.id))
+        elif isinstance(obj, Category | LocalGroup) or getattr(obj, 'category_id', None) is not None:
+            # category protection and group memberships affect the access to many events
+            pending.add(_get_version_key())
+        elif (event_id := getattr(obj, 'event_id', None)) is not None:
+            pending.add(_get_version_key(event_id))
+
+
+def setup_feed_change_tracking():
+    """Track changes which affect category feeds.
+
+    Any object associated with an event that is flushed to the database
+    changes the version of that event once the transaction is committed.
+    """
+    if not contains(db.session, 'after_flush', _collect_feed_changes):
+        listen(db.session, 'after_flush', _collect_feed_changes)
+
+
+def update_feed_versions():
+    """Assign new versions to everything changed in the committed transaction."""
+    if not has_app_context():
+        return
+    if pending := g.pop('pending_feed_version_updates', None):
+        feed_cache.set_many({key: uuid4().hex for key in pending}, FEED_VERSION_TTL)
@@ -0,0 +1,49 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+import pytest
+
+from indico.modules.categories.feeds import (get_feed_validators, get_feed_versions, setup_feed_change_tracking,
+                                             update_feed_versions)
+
+
+def test_get_feed_versions():
+    versions = get_feed_versions([1, 2])
+    assert versions.keys() == {None, 1, 2}
+    assert len(set(versions.values())) == 3
+    assert get_feed_versions([2, 3]).items() >= {(None, versions[None]), (2, versions[2])}
+
+
+def test_get_feed_validators():
+    versions = get_feed_versions([1, 2])
+    etag, last_modified = get_feed_validators(versions, 'test')
+    assert get_feed_validators(versions, 'test') == (etag, last_modified)
+    assert get_feed_validators(versions, 'other')[0] != etag
+    assert get_feed_validators({**versions, 2: 'changed'}, 'test')[0] != etag
+    assert get_feed_validators({k: v for k, v in versions.items() if k != 2}, 'test')[0] != etag
+
+
+@pytest.mark.usefixtures('request_context')
+def test_feed_change_tracking(db, dummy_event, dummy_category, create_event):
+    setup_feed_change_tracking()
+    other_event = create_event()
+    db.session.flush()
+    update_feed_versions()
+    versions = get_feed_versions([dummy_event.id, other_event.id])
+
+    dummy_event.title = 'Changed'
+    db.session.flush()
+    update_feed_versions()
+    new_versions = get_feed_versions([dummy_event.id, other_event.id])
+    assert new_versions[dummy_event.id] != versions[dummy_event.id]
+    assert new_versions[other_event.id] == versions[other_event.id]
+    assert new_versions[None] == versions[None]
+
+    dummy_category.title = 'Changed'
+    db.session.flush()
+    update_feed_versions()
+    assert get_feed_versions([])[None] != versions[None]
@@ -106,3 +106,57 @@ def _create_check_cycles(sender, connection, **kwargs):
         LANGUAGE plpgsql
     ''')
     DDL(sql).execute(connection)
+
+
+SQL_FUNCTION_UPDATE_CATEGORY_PATHS = textwrap.dedent('''
+    CREATE FUNCTION categories.update_category_paths(root_id int) RETURNS void AS
+    $BODY$
+    DECLARE
+        level_ids int[] := ARRAY[root_id];
+        seen_ids int[] := ARRAY[root_id];
+    BEGIN
+        -- all paths within the subtree go through the root category, so they are rebuilt as well
+        DELETE FROM categories.paths
+        WHERE descendant_id IN (SELECT descendant_id FROM categories.paths WHERE ancestor_id = root_id);
+        -- build the paths one level at a time, extending the paths to the parent categories
+        WHILE level_ids != '{}' LOOP
+            INSERT INTO categories.paths (ancestor_id, descendant_id, depth, visibility_horizon)
+            SELECT p.ancestor_id, cat.id, p.depth + 1, LEAST(p.visibility_horizon + 1, cat.visibility)
+            FROM categories.categories cat
+            JOIN categories.paths p ON (p.descendant_id = cat.parent_id)
+            WHERE cat.id = ANY(level_ids)
+            UNION ALL
+            SELECT cat.id, cat.id, 0, cat.visibility
+            FROM categories.categories cat
+            WHERE cat.id = ANY(level_ids);
+
+            SELECT COALESCE(array_agg(id), '{}') INTO level_ids
+            FROM categories.categories
+            WHERE parent_id = ANY(level_ids) AND id != ALL(seen_ids);
+            seen_ids := seen_ids || level_ids;
+        END LOOP;
+    END;
+    $BODY$
+    LANGUAGE plpgsql
+''')
+
+SQL_FUNCTION_UPDATE_CATEGORY_PATHS_TRIGGER = textwrap.dedent('''
+    CREATE FUNCTION categories.update_category_paths_trigger() RETURNS trigger AS
+    $BODY$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM categories.update_category_paths(NEW.id);
+        ELSIF OLD.parent_id IS DISTINCT FROM NEW.parent_id OR OLD.visibility IS DISTINCT FROM NEW.visibility THEN
+            PERFORM categories.update_category_paths(NEW.id);
+        END IF;
+        RETURN NULL;
+    END;
+    $BODY$
+    LANGUAGE plpgsql
+''')
+
+
+@signals.core.db_schema_created.connect_via('categories')
+def _create_update_category_paths(sender, connection, **kwargs):
+    DDL(SQL_FUNCTION_UPDATE_CATEGORY_PATHS).execute(connection)
+    DDL(SQL_FUNCTION_UPDATE_CATEGORY_PATHS_TRIGGER).execute(connection)
@@ -8,7 +8,7 @@
 import pytz
 from flask import session
 from sqlalchemy import DDL, orm
-from sqlalchemy.dialects.postgresql import ARRAY, JSONB, array
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, aggregate_order_by, array
 from sqlalchemy.event import listens_for
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -24,6 +24,7 @@ from indico.core.db.sqlalchemy.descriptions import DescriptionMixin, RenderMode
 from indico.core.db.sqlalchemy.protection import ProtectionManagersMixin, ProtectionMode
 from indico.core.db.sqlalchemy.searchable import SearchableTitleMixin
 from indico.core.db.sqlalchemy.util.models import auto_table_args
+from indico.modules.categories.models.paths import CategoryPath
 from indico.modules.logs.models.entries import CategoryLogEntry, CategoryLogRealm, LogKind
 from indico.util.date_time import get_display_tz
 from indico.util.decorators import strict_classproperty
@@ -451,23 +452,41 @@ class Category(SearchableTitleMixin, DescriptionMixin, ProtectionManagersMixin,
                      .where(cat_alias.parent_id == cte_query.c.id))
         return cte_query.union_all(rec_query)
 
+    @classmethod
+    def get_chain_subquery(cls, category_id, col='id'):
+        """Create a scalar subquery for the parent chain of a category.
+
+        The subquery returns an array containing the path from the root
+        to the category itself, just like the ``path`` column of
+        `get_tree_cte`, but it only needs to look at the categories in
+        that path.
+
+        :param category_id: The ID of the category, usually a column
+                            of the outer query
+        :param col: The name of the column to use in the path or a
+                    callable receiving the category alias that must
+                    return the expression used for the path.
+        """
+        cat_alias = db.aliased(cls)
+        if callable(col):
+            path_column = col(cat_alias)
+        else:
+            path_column = getattr(cat_alias, col)
+        return (select([db.func.array_agg(aggregate_order_by(path_column, CategoryPath.depth.desc()))])
+                .where((CategoryPath.descendant_id == category_id) & (CategoryPath.ancestor_id == cat_alias.id))
+                .correlate_except(CategoryPath, cat_alias)
+                .scalar_subquery())
+
     @classmethod
     def get_subtree_ids_cte(cls, ids):
         """Create a CTE for a category subtree.
 
         This CTE contains a single ``id`` column that contains all the specified
         IDs and those of all their subcategories.
-
-        This is likely to be much more performant than `get_tree_cte` when the
-        query is used with LIMIT, especially in large databases.
         """
-        cat_alias = db.aliased(cls)
-        cte_query = (select([cat_alias.id])
-                     .where(cat_alias.id.in_(ids))
-                     .cte(recursive=True))
-        rec_query = (select([cat_alias.id])
-                     .where(cat_alias.parent_id == cte_query.c.id))
-        return cte_query.union_all(rec_query)
+        return (select([CategoryPath.descendant_id.label('id')])
+                .where(CategoryPath.ancestor_id.in_(ids))
+                .cte())
 
     @classmethod
     def get_protection_cte(cls):
@@ -540,12 +559,11 @@ class Category(SearchableTitleMixin, DescriptionMixin, ProtectionManagersMixin,
 
         This includes subcategories at any level of nesting.
         """
-        cte = Category.get_tree_cte()
         return (Category.query
-                .join(cte, Category.id == cte.c.id)
-                .filter(cte.c.path.contains([self.id]),
-                        cte.c.id != self.id,
-                        ~cte.c.is_deleted))
+                .join(CategoryPath, CategoryPath.descendant_id == Category.id)
+                .filter(CategoryPath.ancestor_id == self.id,
+                        CategoryPath.depth > 0,
+                        ~Category.is_deleted))
 
     @staticmethod
     def _get_chain_query(start_criterion):
@@ -557,6 +575,13 @@ class Category(SearchableTitleMixin, DescriptionMixin, ProtectionManagersMixin,
         cte_query = cte_query.union_all(parent_query)
         return Category.query.join(cte_query, Category.id == cte_query.c.id).order_by(cte_query.c.level.desc())
 
+    @staticmethod
+    def _get_ancestors_query(category_id):
+        return (Category.query
+                .join(CategoryPath, CategoryPath.ancestor_id == Category.id)
+                .filter(CategoryPath.descendant_id == category_id)
+                .order_by(CategoryPath.depth.desc()))
+
     @property
     def chain_query(self):
         """Get a query object for the category chain.
@@ -564,7 +589,7 @@ class Category(SearchableTitleMixin, DescriptionMixin, ProtectionManagersMixin,
         The query retrieves the root category first and then all the
         intermediate categories up to (and including) this category.
         """
-        return self._get_chain_query(Category.id == self.id)
+        return self._get_ancestors_query(self.id)
 
     @property
     def parent_chain_query(self):
@@ -573,7 +598,7 @@ class Category(SearchableTitleMixin, DescriptionMixin, ProtectionManagersMixin,
         The query retrieves the root category first and then all the
         intermediate categories up to (excluding) this category.
         """
-        return self._get_chain_query(Category.id == self.parent_id)
+        return self._get_ancestors_query(self.parent_id)
 
     def nth_parent(self, n_categs, fail_on_overflow=True):
         """Return the nth parent of the category.
@@ -643,14 +668,9 @@ class Category(SearchableTitleMixin, DescriptionMixin, ProtectionManagersMixin,
         Get a sqlalchemy select for the visible categories within
         the given category, including the category itself.
         """
-        cte_query = (select([Category.id, literal(0).label('level')])
-                     .where((Category.id == category_id) & (Category.visibility.is_(None) | (Category.visibility > 0)))
-                     .cte(recursive=True))
-        parent_query = (select([Category.id, cte_query.c.level + 1])
-                        .where(db.and_(Category.parent_id == cte_query.c.id,
-                                       db.or_(Category.visibility.is_(None),
-                                              Category.visibility > cte_query.c.level + 1))))
-        return cte_query.union_all(parent_query)
+        return (select([CategoryPath.descendant_id.label('id'), CategoryPath.depth.label('level')])
+                .where((CategoryPath.ancestor_id == category_id) & CategoryPath.is_visible)
+                .cte())
 
     @property
     def visible_categories_query(self):
@@ -703,8 +723,15 @@ def _mappers_configured():
     # Category.effective_protection_mode -- the effective protection mode
     # (public/protected) of the category, even if it's inheriting it from its
     # parent category
-    cte = Category.get_protection_cte()
-    query = select([cte.c.protection_mode]).where(cte.c.id == Category.id).correlate_except(cte).scalar_subquery()
+    cat_alias = db.aliased(Category)
+    query = (select([cat_alias.protection_mode])
+             .where((CategoryPath.descendant_id == Category.id) &
+                    (CategoryPath.ancestor_id == cat_alias.id) &
+                    (cat_alias.protection_mode != ProtectionMode.inheriting))
+             .order_by(CategoryPath.depth)
+             .limit(1)
+             .correlate_except(CategoryPath, cat_alias)
+             .scalar_subquery())
     Category.effective_protection_mode = column_property(query, deferred=True, expire_on_flush=False)
 
     # Category.effective_google_wallet_config -- the effective google wallet config
@@ -760,40 +787,41 @@ def _mappers_configured():
 
     # Category.chain_titles -- a list of the titles in the parent chain,
     # starting with the root category down to the current category.
-    cte = Category.get_tree_cte('title')
-    query = select([cte.c.path]).where(cte.c.id == Category.id).correlate_except(cte).scalar_subquery()
+    query = Category.get_chain_subquery(Category.id, 'title')
     Category.chain_titles = column_property(query, deferred=True)
 
     # Category.chain_ids -- a list of the ids in the parent chain,
     # starting with the root category down to the current category.
     # This is equivalent to the `category_chain` in the Event model.
-    cte = Category.get_tree_cte()
-    query = select([cte.c.path]).where(cte.c.id == Category.id).correlate_except(cte).scalar_subquery()
+    query = Category.get_chain_subquery(Category.id)
     Category.chain_ids = column_property(query, deferred=True)
 
     # Category.chain -- a list of the ids and titles in the parent
     # chain, starting with the root category down to the current
     # category.  Each chain entry is a dict containing 'id' and `title`.
-    cte = Category.get_tree_cte(lambda cat: db.func.json_build_object('id', cat.id, 'title', cat.title))
-    query = select([cte.c.path]).where(cte.c.id == Category.id).correlate_except(cte).scalar_subquery()
+    query = Category.get_chain_subquery(Category.id,
+                                        lambda cat: db.func.json_build_object('id', cat.id, 'title', cat.title))
     Category.chain = column_property(query, deferred=True)
 
     # Category.deep_events_count -- the number of events in the category
     # or any child category (excluding deleted events)
-    cte = Category.get_tree_cte()
-    crit = db.and_(cte.c.id == Event.category_id,
-                   cte.c.path.contains(array([Category.id])),
-                   ~cte.c.is_deleted,
+    cat_alias = db.aliased(Category)
+    crit = db.and_(CategoryPath.ancestor_id == Category.id,
+                   CategoryPath.descendant_id == cat_alias.id,
+                   Event.category_id == cat_alias.id,
+                   ~cat_alias.is_deleted,
                    ~Event.is_deleted)
-    query = select([db.func.count()]).where(crit).correlate_except(Event).scalar_subquery()
+    query = select([db.func.count()]).where(crit).correlate_except(Event, CategoryPath, cat_alias).scalar_subquery()
     Category.deep_events_count = column_property(query, deferred=True)
 
     # Category.deep_children_count -- the number of subcategories in the
     # category or any child category (excluding deleted ones)
-    cte = Category.get_tree_cte()
-    crit = db.and_(cte.c.path.contains(array([Category.id])),
-                   cte.c.id != Category.id, ~cte.c.is_deleted)
-    query = select([db.func.count()]).where(crit).correlate_except(cte).scalar_subquery()
+    cat_alias = db.aliased(Category)
+    crit = db.and_(CategoryPath.ancestor_id == Category.id,
+                   CategoryPath.descendant_id == cat_alias.id,
+                   CategoryPath.depth > 0,
+                   ~cat_alias.is_deleted)
+    query = select([db.func.count()]).where(crit).correlate_except(CategoryPath, cat_alias).scalar_subquery()
     Category.deep_children_count = column_property(query, deferred=True)
 
 
@@ -821,3 +849,15 @@ def _add_cycle_check_trigger(target, conn, **kw):
         EXECUTE PROCEDURE categories.check_cycles();
     '''
     DDL(sql).execute(conn)
+
+
+@listens_for(Category.__table__, 'after_create')
+def _add_update_paths_trigger(target, conn, **kw):
+    sql = f'''
+        CREATE TRIGGER update_category_paths
+        AFTER INSERT OR UPDATE OF parent_id, visibility
+        ON {target.fullname}
+        FOR EACH ROW
+        EXECUTE PROCEDURE categories.update_category_paths_trigger();
+    '''
+    DDL(sql).execute(conn)
@@ -11,6 +11,8 @@ from sqlalchemy.orm import undefer
 from indico.core.db.sqlalchemy.protection import ProtectionMode
 from indico.modules.categories import Category
 from indico.modules.categories.models.categories import EventCreationMode
+from indico.modules.categories.models.paths import CategoryPath
+from indico.modules.events import Event
 
 
 @pytest.mark.parametrize(('protection_mode', 'creation_mode', 'acl', 'allowed'), (
@@ -160,3 +162,61 @@ def test_visibility_horizon_limitation(category_family, create_category):
     assert son.real_visibility_horizon == dad
     assert grandson.real_visibility_horizon == dad
     assert sibling.real_visibility_horizon == dad
+
+
+def _get_paths():
+    return {(p.ancestor_id, p.descendant_id): (p.depth, p.visibility_horizon) for p in CategoryPath.query}
+
+
+def test_category_paths(db, category_family, create_category):
+    grandpa, dad, son, sibling = category_family
+    grandson = create_category(4, title='Grandson', parent=son)
+    db.session.flush()
+    assert _get_paths() == {
+        (0, 0): (0, None), (1, 1): (0, None), (2, 2): (0, None), (3, 3): (0, None), (4, 4): (0, None),
+        (0, 1): (1, None), (0, 2): (2, None), (0, 3): (2, None), (0, 4): (3, None),
+        (1, 2): (1, None), (1, 3): (1, None), (1, 4): (2, None),
+        (2, 4): (1, None),
+    }
+    assert grandson.chain_ids == [0, 1, 2, 4]
+    assert son.deep_children_count == 1
+    assert dad.deep_children_count == 3
+    # move 'son' to 'sibling' and limit its visibility
+    son.parent = sibling
+    son.visibility = 2
+    db.session.flush()
+    paths = _get_paths()
+    assert paths[(0, 4)] == (4, 3)
+    assert paths[(3, 2)] == (1, 2)
+    assert paths[(2, 4)] == (1, 3)
+    assert (1, 2) in paths
+    assert son.chain_query.all() == [grandpa, dad, sibling, son]
+    assert set(dad.deep_children_query) == {son, sibling, grandson}
+    assert CategoryPath.rebuild() == 0
+    assert _get_paths() == paths
+
+
+def test_category_paths_rebuild(db, category_family):
+    __, __, son, sibling = category_family
+    db.session.execute(CategoryPath.__table__.delete().where(CategoryPath.descendant_id == son.id))
+    CategoryPath.query.filter_by(ancestor_id=0, descendant_id=sibling.id).update({'depth': 5})
+    assert CategoryPath.rebuild() == 4
+    assert son.chain_ids == [0, 1, 2]
+
+
+def test_visible_categories(db, category_family, create_category, create_event, dummy_category):
+    grandpa, dad, son, sibling = category_family
+    grandson = create_category(4, title='Grandson', parent=son)
+    son.visibility = 2
+    db.session.flush()
+    assert set(dad.visible_categories_query) == {dad, son, sibling, grandson}
+    assert set(grandpa.visible_categories_query) == {grandpa, dad, sibling, dummy_category}
+    event = create_event(category=grandson)
+    hidden_event = create_event(category=sibling)
+    hidden_event.visibility = 1
+    db.session.flush()
+    assert set(Event.query.filter(Event.is_visible_in(son.id))) == {event}
+    assert set(Event.query.filter(Event.is_visible_in(dad.id))) == {event}
+    assert not Event.query.filter(Event.is_visible_in(grandpa.id)).has_rows()
+    assert set(Event.query.filter(Event.category_chain_overlaps(dad.id))) == {event, hidden_event}
+    assert set(Event.query.filter(~Event.category_chain_overlaps(son.id))) == {hidden_event}
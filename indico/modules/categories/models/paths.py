@@ -0,0 +1,92 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from sqlalchemy.ext.hybrid import hybrid_property
+
+from indico.core.db import db
+from indico.util.string import format_repr
+
+
+class CategoryPath(db.Model):
+    """A path from a category to one of its descendants.
+
+    The table contains a row for every category and each of its ancestors
+    (including the category itself), which allows querying subtrees and
+    parent chains without recursive queries.  It is maintained by database
+    triggers whenever a category is created, moved or deleted or its
+    visibility changes.
+    """
+
+    __tablename__ = 'paths'
+    __table_args__ = (db.Index(None, 'descendant_id', 'depth'),
+                      {'schema': 'categories'})
+
+    #: The ID of the upper category of the path
+    ancestor_id = db.Column(
+        db.Integer,
+        db.ForeignKey('categories.categories.id', ondelete='CASCADE'),
+        primary_key=True,
+        autoincrement=False
+    )
+    #: The ID of the lower category of the path
+    descendant_id = db.Column(
+        db.Integer,
+        db.ForeignKey('categories.categories.id', ondelete='CASCADE'),
+        primary_key=True,
+        autoincrement=False
+    )
+    #: The number of levels between the two categories (0 for the path
+    #: from a category to itself)
+    depth = db.Column(
+        db.Integer,
+        nullable=False
+    )
+    #: The number of levels below the ancestor up to which the descendant
+    #: is visible, based on the visibility of all the categories in the
+    #: path; the descendant is visible in the ancestor if this is ``NULL``
+    #: or greater than `depth`
+    visibility_horizon = db.Column(
+        db.Integer,
+        nullable=True
+    )
+
+    @hybrid_property
+    def is_visible(self):
+        """Whether the descendant category is visible in the ancestor category."""
+        return self.visibility_horizon is None or self.visibility_horizon > self.depth
+
+    @is_visible.expression
+    def is_visible(cls):
+        return cls.visibility_horizon.is_(None) | (cls.visibility_horizon > cls.depth)
+
+    def __repr__(self):
+        return format_repr(self, 'ancestor_id', 'descendant_id', 'depth', visibility_horizon=None)
+
+    @classmethod
+    def rebuild(cls):
+        """Rebuild the paths of all categories.
+
+        :return: The number of paths that were missing or incorrect
+                 before rebuilding them.
+        """
+        # creating or moving categories while rebuilding would result in wrong paths, but
+        # this lock mode still allows reading categories
+        db.session.execute(db.text('LOCK TABLE categories.categories IN SHARE MODE'))
+        db.session.execute(db.text('CREATE TEMP TABLE _old_category_paths AS SELECT * FROM categories.paths'))
+        db.session.execute(cls.__table__.delete())
+        # like in the migration which populated the table, start with all top-level categories
+        db.session.execute(db.text('SELECT categories.update_category_paths(id) '
+                                   'FROM categories.categories WHERE parent_id IS NULL'))
+        num_changed = db.session.execute(db.text('''
+            SELECT COUNT(DISTINCT (ancestor_id, descendant_id)) FROM (
+                (SELECT * FROM categories.paths EXCEPT SELECT * FROM _old_category_paths)
+                UNION ALL
+                (SELECT * FROM _old_category_paths EXCEPT SELECT * FROM categories.paths)
+            ) changed
+        ''')).scalar()
+        db.session.execute(db.text('DROP TABLE _old_category_paths'))
+        return num_changed
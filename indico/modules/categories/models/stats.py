@@ -0,0 +1,70 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from indico.core.db import db
+from indico.core.db.sqlalchemy import UTCDateTime
+from indico.util.date_time import now_utc
+from indico.util.string import format_repr
+
+
+class CategoryStats(db.Model):
+    """Precomputed statistics of a category for a single year.
+
+    The counts only include objects directly inside the category; the
+    statistics of a category tree are the sums over all its categories.
+    This way moving a category does not require updating any rows.
+    """
+
+    __tablename__ = 'stats'
+    __table_args__ = {'schema': 'categories'}
+
+    #: The ID of the category
+    category_id = db.Column(
+        db.Integer,
+        db.ForeignKey('categories.categories.id', ondelete='CASCADE'),
+        primary_key=True,
+        autoincrement=False
+    )
+    #: The year the counts are for
+    year = db.Column(
+        db.Integer,
+        primary_key=True,
+        autoincrement=False
+    )
+    #: The number of events starting in that year
+    events = db.Column(
+        db.Integer,
+        nullable=False,
+        default=0
+    )
+    #: The number of events created in that year
+    created_events = db.Column(
+        db.Integer,
+        nullable=False,
+        default=0
+    )
+    #: The number of scheduled contributions starting in that year
+    contributions = db.Column(
+        db.Integer,
+        nullable=False,
+        default=0
+    )
+    #: The number of attachments in events starting in that year
+    attachments = db.Column(
+        db.Integer,
+        nullable=False,
+        default=0
+    )
+    #: The date when the counts were calculated
+    updated_dt = db.Column(
+        UTCDateTime,
+        nullable=False,
+        default=now_utc
+    )
+
+    def __repr__(self):
+        return format_repr(self, 'category_id', 'year', events=0, contributions=0, attachments=0)
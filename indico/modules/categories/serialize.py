@@ -7,18 +7,86 @@
 
 from io import BytesIO
 
+import icalendar
 from feedgen.feed import FeedGenerator
 from flask import session
 from sqlalchemy.orm import joinedload, load_only, subqueryload, undefer
 
-from indico.modules.categories import Category
+from indico.core import signals
+from indico.core.cache import make_scoped_cache
+from indico.core.db import db
+from indico.modules.categories.feeds import FEED_MAX_AGE, get_feed_validators, get_feed_versions
 from indico.modules.events import Event
-from indico.modules.events.ical import events_to_ical
+from indico.modules.events.ical import generate_event_component
 from indico.modules.events.settings import event_contact_settings
 from indico.util.string import sanitize_html
 
 
-def serialize_categories_ical(category_ids, user, event_filter=True, event_filter_fn=None, update_query=None):
+ical_fragment_cache = make_scoped_cache('category-ical-fragments')
+
+
+def _get_ical_user_key(user):
+    alerts = user.settings.get('add_ical_alerts_mins') if user and user.settings.get('add_ical_alerts') else None
+    if signals.event.metadata_postprocess.has_receivers_for('ical-export'):
+        # plugins may add data to the event which depends on the user
+        return user.id if user else None, alerts
+    return alerts
+
+
+def get_categories_ical_query(category_ids, event_filter=True):
+    """Get a query returning the IDs of all events that may be in an iCal feed.
+
+    :param category_ids: Category IDs to export
+    :param event_filter: A SQLalchemy criterion to restrict which
+                         events will be returned.
+    """
+    return (db.session.query(Event.id)
+            .filter(Event.category_chain_overlaps(category_ids),
+                    ~Event.is_deleted,
+                    event_filter))
+
+
+def get_categories_ical_validators(category_ids, user, event_filter=True):
+    """Get the versions, ETag and Last-Modified date of an iCal feed.
+
+    Since the feed is usually polled by calendar clients, this allows
+    skipping the generation of the feed if it has not changed without
+    loading any of the events' data from the database.
+
+    :return: A ``(versions, etag, last_modified)`` tuple; the versions can
+             be passed on to :func:`serialize_categories_ical`.
+    """
+    event_ids = [id_ for id_, in get_categories_ical_query(category_ids, event_filter)]
+    versions = get_feed_versions(event_ids)
+    etag, last_modified = get_feed_validators(versions, 'ical', user.id if user else None,
+                                              _get_ical_user_key(user))
+    return versions, etag, last_modified
+
+
+def _get_ical_fragments(events, user, versions):
+    """Get the serialized VEVENT components of the given events.
+
+    Serialized components are cached and only need to be generated
+    again when the event changes.
+    """
+    user_key = _get_ical_user_key(user)
+    keys = {event: f'ical-{event.id}-{versions[event.id]}-{versions[None]}-{user_key}'
+            for event in events if event.id in versions}
+    cached = dict(zip(keys.values(), ical_fragment_cache.get_many(*keys.values()), strict=True)) if keys else {}
+    fragments = {event: cached[key] for event, key in keys.items() if cached[key] is not None}
+    if missing := [e for e in events if e not in fragments]:
+        # avoid query spam from accessing contact names/emails
+        event_contact_settings.preload_bulk({e.id for e in missing})
+        generated = {event: generate_event_component(event, user).to_ical()
+                     for event in missing}
+        ical_fragment_cache.set_many({keys[event]: fragment for event, fragment in generated.items()
+                                      if event in keys}, FEED_MAX_AGE)
+        fragments.update(generated)
+    return [fragments[event] for event in events]
+
+
+def serialize_categories_ical(category_ids, user, event_filter=True, event_filter_fn=None, update_query=None, *,
+                              versions=None):
     """Export the events in a category to iCal.
 
     :param category_ids: Category IDs to export
@@ -29,7 +97,11 @@ def serialize_categories_ical(category_ids, user, event_filter=True, event_filte
     :param event_filter_fn: A callable that determines which events to include (after querying)
     :param update_query: A callable that can update the query used to retrieve the events.
                          Must return the updated query object.
+    :param versions: The event versions from :func:`get_categories_ical_validators`
     """
+    if versions is None:
+        # the versions must be retrieved before loading any event data
+        versions = get_feed_versions([id_ for id_, in get_categories_ical_query(category_ids, event_filter)])
     own_room_strategy = joinedload('own_room')
     own_room_strategy.load_only('location_id', 'site', 'building', 'floor', 'number', 'verbose_name')
     own_room_strategy.lazyload('owner')
@@ -53,16 +125,30 @@ def serialize_categories_ical(category_ids, user, event_filter=True, event_filte
     if event_filter_fn:
         it = filter(event_filter_fn, it)
     events = list(it)
-    # avoid query spam from accessing contact names/emails
-    event_contact_settings.preload_bulk({e.id for e in events})
-    # make sure the parent categories are in sqlalchemy's identity cache.
-    # this avoids query spam from `protection_parent` lookups
-    _parent_categs = (Category._get_chain_query(Category.id.in_({e.category_id for e in events}))  # noqa: F841,RUF100
-                      .options(load_only('id', 'parent_id', 'protection_mode'),
-                               joinedload('acl_entries'))
-                      .all())
+    events = [e for e, can_access in zip(events, Event.can_access_many(events, user), strict=True) if can_access]
+    calendar = icalendar.Calendar()
+    calendar.add('version', '2.0')
+    calendar.add('prodid', '-//CERN//INDICO//EN')
+    header, footer = calendar.to_ical().split(b'END:VCALENDAR')
+    return BytesIO(b''.join([header, *_get_ical_fragments(events, user, versions), b'END:VCALENDAR', footer]))
 
-    return BytesIO(events_to_ical(events, user))
+
+def get_category_atom_query(category, event_filter):
+    """Get a query returning the IDs of all events that may be in an Atom feed."""
+    return (db.session.query(Event.id)
+            .filter(Event.category_chain_overlaps(category.id),
+                    Event.is_visible_in(category.id),
+                    ~Event.is_deleted,
+                    event_filter))
+
+
+def get_category_atom_validators(category, url, user, event_filter):
+    """Get the ETag and Last-Modified date of an Atom feed.
+
+    :return: An ``(etag, last_modified)`` tuple
+    """
+    versions = get_feed_versions([id_ for id_, in get_category_atom_query(category, event_filter)])
+    return get_feed_validators(versions, 'atom', url, user.id if user else None)
 
 
 def serialize_category_atom(category, url, user, event_filter):
@@ -84,7 +170,8 @@ def serialize_category_atom(category, url, user, event_filter):
                                 'access_key'),
                       subqueryload('acl_entries'))
              .order_by(Event.start_dt))
-    events = [e for e in query if e.can_access(user)]
+    events = query.all()
+    events = [e for e, can_access in zip(events, Event.can_access_many(events, user), strict=True) if can_access]
 
     feed = FeedGenerator()
     feed.id(url)
@@ -0,0 +1,198 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+"""Precomputed per-category and per-year statistics.
+
+Counting the events, contributions and attachments of a large category
+tree is expensive, so the counts of each category are stored in the
+`CategoryStats` table and refreshed in the background whenever
+something affecting them changes.  To avoid recounting a category
+for every single change, refreshes are delayed a bit so all changes
+made within that time only result in one refresh.  Getting the
+statistics of a category tree only needs to sum up the rows of its
+categories.
+"""
+
+from collections import defaultdict
+from datetime import date
+
+from flask import g, has_app_context
+
+from indico.core.cache import make_scoped_cache
+from indico.core.db import db
+from indico.core.db.sqlalchemy.links import LinkType
+from indico.modules.attachments.models.attachments import Attachment
+from indico.modules.attachments.models.folders import AttachmentFolder
+from indico.modules.categories.models.categories import Category
+from indico.modules.categories.models.stats import CategoryStats
+from indico.modules.events import Event
+from indico.modules.events.contributions.models.contributions import Contribution
+from indico.modules.events.contributions.models.subcontributions import SubContribution
+from indico.modules.events.sessions.models.sessions import Session
+from indico.modules.events.timetable.models.entries import TimetableEntry, TimetableEntryType
+from indico.util.date_time import now_utc
+
+
+#: How long (in seconds) to wait before refreshing the statistics of a category
+STATS_UPDATE_DELAY = 60
+
+_cache = make_scoped_cache('category-stats')
+
+
+def _year(column):
+    return db.cast(db.extract('year', column), db.Integer)
+
+
+def _count_events(category_filter):
+    return (db.session
+            .query(Event.category_id, _year(Event.start_dt), db.func.count())
+            .filter(~Event.is_deleted, category_filter)
+            .group_by(Event.category_id, _year(Event.start_dt)))
+
+
+def _count_created_events(category_filter):
+    return (db.session
+            .query(Event.category_id, _year(Event.created_dt), db.func.count())
+            .filter(~Event.is_deleted, category_filter)
+            .group_by(Event.category_id, _year(Event.created_dt)))
+
+
+def _count_contributions(category_filter):
+    return (db.session
+            .query(Event.category_id, _year(TimetableEntry.start_dt), db.func.count())
+            .join(TimetableEntry.event)
+            .filter(TimetableEntry.type == TimetableEntryType.CONTRIBUTION,
+                    ~Event.is_deleted,
+                    category_filter)
+            .group_by(Event.category_id, _year(TimetableEntry.start_dt)))
+
+
+def _count_attachments(category_filter):
+    subcontrib_contrib = db.aliased(Contribution)
+    return (db.session
+            .query(Event.category_id, _year(Event.start_dt), db.func.count(Attachment.id))
+            .join(Attachment.folder)
+            .join(AttachmentFolder.event)
+            .outerjoin(AttachmentFolder.session)
+            .outerjoin(AttachmentFolder.contribution)
+            .outerjoin(AttachmentFolder.subcontribution)
+            .outerjoin(subcontrib_contrib, subcontrib_contrib.id == SubContribution.contribution_id)
+            .filter(AttachmentFolder.link_type != LinkType.category,
+                    ~Attachment.is_deleted,
+                    ~AttachmentFolder.is_deleted,
+                    ~Event.is_deleted,
+                    # we have exactly one of those or none if the attachment is on the event itself
+                    ~db.func.coalesce(Session.is_deleted, Contribution.is_deleted, SubContribution.is_deleted, False),
+                    # in case of a subcontribution we also need to check that the contrib is not deleted
+                    (subcontrib_contrib.is_deleted.is_(None) | ~subcontrib_contrib.is_deleted),
+                    category_filter)
+            .group_by(Event.category_id, _year(Event.start_dt)))
+
+
+def _refresh_stats(category_filter):
+    counts = defaultdict(dict)
+    for column, query_fn in (('events', _count_events),
+                             ('created_events', _count_created_events),
+                             ('contributions', _count_contributions),
+                             ('attachments', _count_attachments)):
+        for category_id, year, count in query_fn(category_filter):
+            counts[(category_id, year)][column] = count
+    now = now_utc()
+    rows = [{'category_id': category_id, 'year': year, 'events': 0, 'created_events': 0, 'contributions': 0,
+             'attachments': 0, 'updated_dt': now, **data}
+            for (category_id, year), data in counts.items()]
+    if rows:
+        db.session.execute(CategoryStats.__table__.insert(), rows)
+    return len(rows)
+
+
+def _lock_stats():
+    # make sure concurrent refreshes of the same category do not try to insert the same rows;
+    # this lock mode conflicts with itself but not with regular reads
+    db.session.execute(db.text('LOCK TABLE categories.stats IN SHARE ROW EXCLUSIVE MODE'))
+
+
+def refresh_category_stats(category_ids):
+    """Recalculate the statistics of the given categories.
+
+    Only objects directly inside these categories are counted, so the
+    cost of this does not depend on the size of their subtrees.
+    """
+    category_ids = set(category_ids)
+    _lock_stats()
+    db.session.execute(CategoryStats.__table__.delete().where(CategoryStats.category_id.in_(category_ids)))
+    _refresh_stats(Event.category_id.in_(category_ids))
+
+
+def rebuild_category_stats():
+    """Recalculate the statistics of all categories.
+
+    :return: The number of rows written
+    """
+    _lock_stats()
+    db.session.execute(CategoryStats.__table__.delete())
+    return _refresh_stats(True)
+
+
+def get_category_stats(category_id=None):
+    """Get category statistics.
+
+    :param category_id: The category ID to get statistics for.
+                        Subcategories are also included.
+    """
+    query = db.session.query(CategoryStats.year,
+                             db.func.sum(CategoryStats.events).label('events'),
+                             db.func.sum(CategoryStats.created_events).label('created_events'),
+                             db.func.sum(CategoryStats.contributions).label('contributions'),
+                             db.func.sum(CategoryStats.attachments).label('attachments'),
+                             db.func.max(CategoryStats.updated_dt).label('updated_dt'))
+    if category_id is not None:
+        subtree_cte = Category.get_subtree_ids_cte([category_id])
+        query = query.filter(CategoryStats.category_id.in_(db.select([subtree_cte.c.id])))
+    rows = query.group_by(CategoryStats.year).order_by(CategoryStats.year).all()
+    return {'events_by_year': {row.year: row.events for row in rows if row.events},
+            'contribs_by_year': {row.year: row.contributions for row in rows if row.contributions},
+            'attachments': sum(row.attachments for row in rows),
+            'updated': max((row.updated_dt for row in rows), default=now_utc()),
+            'min_year': min((row.year for row in rows if row.created_events), default=date.today().year)}
+
+
+def schedule_stats_update(obj):
+    """Refresh the statistics of the category containing `obj` after the transaction has been committed.
+
+    :param obj: A category or any object inside an event
+    """
+    if isinstance(obj, Category):
+        category_id = obj.id
+    elif isinstance(obj, Event):
+        category_id = obj.category_id
+    else:
+        if isinstance(obj, Attachment):
+            obj = obj.folder
+        if isinstance(obj, AttachmentFolder) and obj.link_type == LinkType.category:
+            return
+        if (event := getattr(obj, 'event', None)) is None:
+            return
+        category_id = event.category_id
+    if category_id is not None and has_app_context():
+        g.setdefault('category_stats_pending', set()).add(category_id)
+
+
+def pop_pending_stats_updates():
+    """Get the categories whose statistics need to be refreshed.
+
+    Categories for which a (delayed) refresh is already pending are
+    skipped, since that refresh will also include the latest changes.
+    """
+    if not has_app_context():
+        return None
+    if (pending := g.pop('category_stats_pending', None)) is None:
+        return None
+    # the lock expires before the delayed refresh runs, so any change committed while
+    # it exists is included in that refresh (if the cache is unavailable we always refresh)
+    return {category_id for category_id in pending
+            if _cache.add(f'pending/{category_id}', True, STATS_UPDATE_DELAY) is not False}
@@ -0,0 +1,89 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from pytz import utc
+
+from indico.modules.categories.stats import (get_category_stats, pop_pending_stats_updates, rebuild_category_stats,
+                                             refresh_category_stats, schedule_stats_update)
+from indico.modules.events.timetable.models.entries import TimetableEntry
+
+
+def _dt(year):
+    return datetime(year, 6, 1, 10, tzinfo=utc)
+
+
+@pytest.fixture
+def stats_data(db, create_category, create_event, create_contribution, dummy_category):
+    subcategory = create_category(title='sub', parent=dummy_category)
+    events = [
+        create_event(category=dummy_category, start_dt=_dt(2020), end_dt=_dt(2020) + timedelta(hours=1),
+                     created_dt=_dt(2019)),
+        create_event(category=subcategory, start_dt=_dt(2021), end_dt=_dt(2021) + timedelta(hours=1),
+                     created_dt=_dt(2021)),
+        create_event(category=subcategory, start_dt=_dt(2021), end_dt=_dt(2021) + timedelta(hours=1),
+                     created_dt=_dt(2021)),
+    ]
+    contrib = create_contribution(events[1], 'Talk')
+    db.session.add(TimetableEntry(event=events[1], contribution=contrib, start_dt=_dt(2021)))
+    deleted_event = create_event(category=subcategory, start_dt=_dt(2018), end_dt=_dt(2018) + timedelta(hours=1))
+    deleted_event.is_deleted = True
+    db.session.flush()
+    return subcategory, events
+
+
+def test_get_category_stats(stats_data, dummy_category):
+    subcategory, __ = stats_data
+    assert rebuild_category_stats() == 3
+    stats = get_category_stats(dummy_category.id)
+    assert stats['events_by_year'] == {2020: 1, 2021: 2}
+    assert stats['contribs_by_year'] == {2021: 1}
+    assert stats['attachments'] == 0
+    assert stats['min_year'] == 2019
+    stats = get_category_stats(subcategory.id)
+    assert stats['events_by_year'] == {2021: 2}
+    assert stats['contribs_by_year'] == {2021: 1}
+    assert stats['min_year'] == 2021
+
+
+def test_get_category_stats_empty(dummy_category):
+    stats = get_category_stats(dummy_category.id)
+    assert stats['events_by_year'] == {}
+    assert stats['contribs_by_year'] == {}
+    assert stats['attachments'] == 0
+    assert stats['min_year'] == date.today().year
+
+
+def test_refresh_category_stats(db, stats_data, dummy_category):
+    subcategory, events = stats_data
+    rebuild_category_stats()
+    events[1].is_deleted = True
+    events[0].start_dt = _dt(2022)
+    events[0].end_dt = _dt(2022) + timedelta(hours=1)
+    db.session.flush()
+    refresh_category_stats([subcategory.id])
+    # the other category has not been refreshed
+    stats = get_category_stats(dummy_category.id)
+    assert stats['events_by_year'] == {2020: 1, 2021: 1}
+    assert stats['contribs_by_year'] == {}
+    refresh_category_stats([dummy_category.id])
+    assert get_category_stats(dummy_category.id)['events_by_year'] == {2021: 1, 2022: 1}
+
+
+def test_schedule_stats_update(stats_data, dummy_category, dummy_contribution, dummy_event):
+    subcategory, events = stats_data
+    pop_pending_stats_updates()
+    assert pop_pending_stats_updates() is None
+    schedule_stats_update(events[1])
+    schedule_stats_update(dummy_contribution)
+    schedule_stats_update(subcategory)
+    assert pop_pending_stats_updates() == {subcategory.id, dummy_event.category_id}
+    # further changes are included in the already scheduled refresh
+    schedule_stats_update(events[1])
+    assert pop_pending_stats_updates() == set()
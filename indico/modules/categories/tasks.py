@@ -13,6 +13,7 @@ from indico.core.celery import celery
 from indico.core.config import config
 from indico.core.db import db
 from indico.modules.categories import Category, logger
+from indico.modules.categories.stats import rebuild_category_stats, refresh_category_stats
 from indico.modules.users import User, UserSetting
 from indico.modules.users.models.suggestions import SuggestedCategory
 from indico.modules.users.util import get_related_categories
@@ -73,3 +74,19 @@ def category_cleanup():
             if i % 100 == 0:
                 db.session.commit()
         db.session.commit()
+
+
+@celery.task(name='update_category_stats')
+def update_category_stats(category_ids):
+    logger.info('Updating statistics of categories %s', ', '.join(map(str, category_ids)))
+    refresh_category_stats(category_ids)
+    db.session.commit()
+
+
+@celery.periodic_task(name='category_stats_rebuild', run_every=crontab(minute='45', hour='3'))
+def category_stats_rebuild():
+    # the statistics are updated whenever something changes, but rebuilding them
+    # regularly ensures that changes not triggering an update are also picked up
+    num_rows = rebuild_category_stats()
+    db.session.commit()
+    logger.info('Rebuilt category statistics (%d rows)', num_rows)
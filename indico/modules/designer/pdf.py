@@ -68,6 +68,7 @@ class DesignerPDFBase:
         if self.config.page_orientation == PageOrientation.landscape:
             self.page_size = pagesizes.landscape(self.page_size)
         self.width, self.height = self.page_size
+        self._background_images = {}
         setTTFonts()
 
     def _process_tpl_data(self, tpl_data):
@@ -89,6 +90,26 @@ class DesignerPDFBase:
         fd.seek(0)
         return fd
 
+    def _get_background_image(self, template):
+        """Get the decoded background image of a template.
+
+        The image is only loaded and decoded once per PDF, no matter how
+        many pages or badges it is drawn on.
+
+        :return: An `ImageReader` or ``None`` if the template has no
+                 background image.
+        """
+        if not template.background_image:
+            return None
+        try:
+            return self._background_images[template.id]
+        except KeyError:
+            pass
+        with template.background_image.open() as f:
+            img_reader = ImageReader(self._remove_transparency(f))
+        self._background_images[template.id] = img_reader
+        return img_reader
+
     def get_pdf(self):
         data = BytesIO()
         canvas = Canvas(data, pagesize=self.page_size)
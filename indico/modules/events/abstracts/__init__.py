@@ -37,11 +37,43 @@ logger = Logger.get('events.abstracts')
 @signals.event.times_changed.connect
 def _clear_boa_cache(sender, obj=None, **kwargs):
     from indico.modules.events.abstracts.util import clear_boa_cache
+    from indico.modules.events.contributions.models.contributions import Contribution
+    from indico.modules.events.models.persons import EventPerson
+    from indico.modules.events.sessions.models.blocks import SessionBlock
+    from indico.modules.events.sessions.models.sessions import Session
     if isinstance(obj, Break):
         # breaks do not show up in the BoA
         return
-    event = (obj or sender).event
-    clear_boa_cache(event)
+    obj = obj or sender
+    # figure out which contributions in the BoA need to be rendered again
+    if isinstance(obj, Contribution):
+        contribs = {obj}
+    elif isinstance(obj, EventPerson):
+        contribs = {link.contribution for link in obj.contribution_links}
+    elif isinstance(obj, Session):
+        contribs = set(obj.contributions)
+    elif isinstance(obj, SessionBlock):
+        # only the times of blocks are relevant for the BoA
+        contribs = set()
+    else:
+        contribs = None
+    clear_boa_cache(obj.event, contribs)
+
+
+@signals.core.after_commit.connect
+def _schedule_boa_precompiles(sender, **kwargs):
+    from indico.modules.events.abstracts.tasks import precompile_boa
+    from indico.modules.events.abstracts.util import (BOA_PRECOMPILE_DELAY, boa_precompile_cache,
+                                                      flush_boa_fragment_updates, pop_pending_boa_precompiles)
+    flush_boa_fragment_updates()
+    for event_id in sorted(pop_pending_boa_precompiles() or ()):
+        if boa_precompile_cache.add(event_id, True, BOA_PRECOMPILE_DELAY):
+            precompile_boa.apply_async([event_id], countdown=BOA_PRECOMPILE_DELAY)
+
+
+@signals.core.import_tasks.connect
+def _import_tasks(sender, **kwargs):
+    import indico.modules.events.abstracts.tasks  # noqa: F401
 
 
 @signals.menu.items.connect_via('event-management-sidemenu')
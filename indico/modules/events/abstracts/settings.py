@@ -149,6 +149,7 @@ boa_settings = EventSettingsProxy('abstracts_book', {
     'show_abstract_ids': False,
     'cache_path': None,
     'cache_path_tex': None,
+    'cache_outdated_dt': None,
     'min_lines_per_abstract': 0,
     'link_format': BOALinkFormat.frame,
 }, converters={
@@ -156,4 +157,5 @@ boa_settings = EventSettingsProxy('abstracts_book', {
     'corresponding_author': EnumConverter(BOACorrespondingAuthorType),
     'announcement_render_mode': EnumConverter(RenderMode),
     'link_format': EnumConverter(BOALinkFormat),
+    'cache_outdated_dt': DatetimeConverter,
 })
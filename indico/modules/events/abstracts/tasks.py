@@ -0,0 +1,36 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from indico.core.celery import celery
+from indico.core.db import db
+from indico.modules.events import Event
+from indico.modules.events.abstracts import logger
+from indico.modules.events.abstracts.util import boa_precompile_cache, create_boa, delete_boa_cache
+from indico.modules.events.contributions import contribution_settings
+
+
+@celery.task(name='precompile_boa', request_context=True)
+def precompile_boa(event_id):
+    """Build the book of abstracts so it is ready when someone requests it."""
+    boa_precompile_cache.delete(event_id)
+    event = Event.get(event_id, is_deleted=False)
+    if event is None:
+        return
+    if event.has_custom_boa or not contribution_settings.get(event, 'published'):
+        # nobody gets the generated book anymore, so don't keep the outdated one around
+        delete_boa_cache(event)
+        db.session.commit()
+        return
+    logger.info('Precompiling book of abstracts for %r', event)
+    try:
+        create_boa(event, force=True)
+    except Exception:
+        db.session.rollback()
+        logger.exception('Could not precompile book of abstracts for %r', event)
+        # stop serving the outdated book; the next request builds it again
+        delete_boa_cache(event)
+    db.session.commit()
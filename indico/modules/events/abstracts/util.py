@@ -10,13 +10,18 @@ import itertools
 import os
 import shutil
 from collections import defaultdict, namedtuple
+from datetime import timedelta
+from uuid import uuid4
 
+from flask import g
 from sqlalchemy.orm import contains_eager, joinedload, load_only, noload
 
+from indico.core.cache import make_scoped_cache
 from indico.core.config import config
 from indico.core.db import db
 from indico.core.db.sqlalchemy.util.session import no_autoflush
-from indico.legacy.pdfinterface.latex import AbstractBook
+from indico.legacy.pdfinterface.latex import (BOA_FRAGMENT_CACHE_TTL, AbstractBook, boa_fragment_cache,
+                                              get_boa_fragment_version_key, get_latex_artifact_store)
 from indico.modules.events import Event
 from indico.modules.events.abstracts.forms import InvitedAbstractMixin
 from indico.modules.events.abstracts.models.abstracts import Abstract, AbstractState
@@ -28,12 +33,20 @@ from indico.modules.events.contributions.models.fields import ContributionFieldV
 from indico.modules.events.models.persons import EventPerson
 from indico.modules.events.tracks.models.principals import TrackPrincipal
 from indico.modules.events.tracks.models.tracks import Track
+from indico.util.date_time import now_utc
 from indico.util.i18n import force_locale
 from indico.util.spreadsheets import unique_col
 from indico.util.string import format_email_with_name
 from indico.web.flask.templating import get_template_module
 
 
+#: How long to wait after a change before rebuilding the book of abstracts
+BOA_PRECOMPILE_DELAY = 60
+#: How long an outdated book of abstracts may be served while a new one is built
+BOA_OUTDATED_MAX_AGE = timedelta(minutes=30)
+boa_precompile_cache = make_scoped_cache('boa-precompile')
+
+
 def build_default_email_template(event: Event, tpl_type: str) -> AbstractEmailTemplate:
     """
     Build a default e-mail template based on a notification type
@@ -312,13 +325,19 @@ def get_track_reviewer_abstract_counts(event, user):
             for track, total, reviewed, unreviewed in query}
 
 
-def create_boa(event):
+def create_boa(event, *, force=False):
     """Create the book of abstracts if necessary.
 
+    While a new book of abstracts is being built in the background, the
+    outdated one is returned unless it has been outdated for too long.
+
+    :param force: Whether to build the book of abstracts even if there
+                  is a cached one.
     :return: The path to the PDF file
     """
     path = boa_settings.get(event, 'cache_path')
-    if path:
+    outdated_dt = boa_settings.get(event, 'cache_outdated_dt')
+    if path and not force and (outdated_dt is None or now_utc() - outdated_dt < BOA_OUTDATED_MAX_AGE):
         path = os.path.join(config.CACHE_DIR, path)
         if os.path.exists(path):
             # update file mtime so it's not deleted during cache cleanup
@@ -329,8 +348,12 @@ def create_boa(event):
         tmp_path = pdf.generate()
     filename = f'boa-{event.id}.pdf'
     full_path = os.path.join(config.CACHE_DIR, filename)
-    shutil.move(tmp_path, full_path)
+    # the previous file may still be sent to someone, so it needs to be replaced atomically
+    tmp_full_path = f'{full_path}.{uuid4().hex}.tmp'
+    shutil.move(tmp_path, tmp_full_path)
+    os.replace(tmp_full_path, full_path)
     boa_settings.set(event, 'cache_path', filename)
+    boa_settings.delete(event, 'cache_outdated_dt')
     return full_path
 
 
@@ -344,8 +367,34 @@ def create_boa_tex(event):
         return tex.generate_source_archive()
 
 
-def clear_boa_cache(event):
-    """Delete the cached book of abstract."""
+def clear_boa_cache(event, contribs=None):
+    """Invalidate the cached book of abstract.
+
+    If the book of abstracts can be built in the background, this is
+    scheduled and the outdated one keeps being served until the new one
+    is ready.  Otherwise it is deleted.
+
+    :param contribs: The contributions whose rendered LaTeX code is
+                     outdated.  If omitted, the code of all contributions
+                     in the event is outdated.
+    :return: Whether there was a cached book of abstracts.
+    """
+    _invalidate_boa_fragments(event, contribs)
+    path = boa_settings.get(event, 'cache_path')
+    if not path:
+        return False
+    if config.LATEX_ENABLED and get_latex_artifact_store():
+        if boa_settings.get(event, 'cache_outdated_dt') is None:
+            boa_settings.set(event, 'cache_outdated_dt', now_utc())
+        # only rebuild books which are actually being used
+        schedule_boa_precompile(event)
+        return True
+    delete_boa_cache(event)
+    return True
+
+
+def delete_boa_cache(event):
+    """Delete the cached book of abstracts, including an outdated one."""
     path = boa_settings.get(event, 'cache_path')
     if path:
         try:
@@ -353,7 +402,37 @@ def clear_boa_cache(event):
         except OSError as e:
             if e.errno != errno.ENOENT:
                 raise
-        boa_settings.delete(event, 'cache_path')
+    boa_settings.delete(event, 'cache_path', 'cache_outdated_dt')
+
+
+def _invalidate_boa_fragments(event, contribs=None):
+    pending = g.setdefault('boa_fragments_pending', set())
+    if contribs is None:
+        pending.add((event.id, None))
+    else:
+        pending.update((event.id, contrib.id) for contrib in contribs if contrib.id is not None)
+
+
+def flush_boa_fragment_updates():
+    """Invalidate the rendered LaTeX code of contributions changed in the committed transaction."""
+    if pending := g.pop('boa_fragments_pending', None):
+        boa_fragment_cache.set_many({get_boa_fragment_version_key(event_id, contrib_id): uuid4().hex
+                                     for event_id, contrib_id in pending}, BOA_FRAGMENT_CACHE_TTL)
+
+
+def schedule_boa_precompile(event):
+    """Rebuild the book of abstracts in the background.
+
+    The task is scheduled once the transaction has been committed and
+    delayed a bit so a sequence of changes only results in a single build.
+    """
+    if not config.LATEX_ENABLED or not get_latex_artifact_store():
+        return
+    g.setdefault('boa_precompile_pending', set()).add(event.id)
+
+
+def pop_pending_boa_precompiles():
+    return g.pop('boa_precompile_pending', None)
 
 
 def get_events_with_abstract_reviewer_convener(user, dt=None):
@@ -0,0 +1,89 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from datetime import timedelta
+
+import pytest
+
+from indico.legacy.pdfinterface.latex import AbstractBook
+from indico.modules.events.abstracts.settings import boa_settings
+from indico.modules.events.abstracts.tasks import precompile_boa
+from indico.modules.events.abstracts.util import (clear_boa_cache, create_boa, flush_boa_fragment_updates,
+                                                  pop_pending_boa_precompiles)
+from indico.util.date_time import now_utc
+
+
+@pytest.mark.usefixtures('request_context')
+def test_boa_fragments(dummy_event, create_contribution):
+    contrib = create_contribution(dummy_event, 'Old title')
+    other = create_contribution(dummy_event, 'Other')
+    fragments = AbstractBook(dummy_event)._args['fragments']
+    assert 'Old title' in fragments[0]
+    assert 'Other' in fragments[1]
+    contrib.title = 'New title'
+    other.title = 'Another'
+    clear_boa_cache(dummy_event, {contrib})
+    # cached until the change is committed
+    assert 'Old title' in AbstractBook(dummy_event)._args['fragments'][0]
+    flush_boa_fragment_updates()
+    fragments = AbstractBook(dummy_event)._args['fragments']
+    assert 'New title' in fragments[0]
+    assert 'Other' in fragments[1]
+    clear_boa_cache(dummy_event)
+    flush_boa_fragment_updates()
+    assert 'Another' in AbstractBook(dummy_event)._args['fragments'][1]
+
+
+@pytest.mark.usefixtures('request_context')
+def test_boa_fragments_digest(dummy_event, dummy_session, create_contribution):
+    create_contribution(dummy_event, 'Contrib', session=dummy_session)
+    assert dummy_session.title in AbstractBook(dummy_event)._args['fragments'][0]
+    # data which is not covered by the fragment versions is part of the cache key
+    dummy_session.title = 'Renamed session'
+    assert 'Renamed session' in AbstractBook(dummy_event)._args['fragments'][0]
+
+
+@pytest.mark.usefixtures('db')
+def test_clear_boa_cache_outdated(dummy_event, mocker, patch_indico_config, tmp_path):
+    patch_indico_config('CACHE_DIR', str(tmp_path))
+    patch_indico_config('LATEX_ENABLED', True)
+    mocker.patch('indico.modules.events.abstracts.util.get_latex_artifact_store', return_value=object())
+    abstract_book = mocker.patch('indico.modules.events.abstracts.util.AbstractBook')
+    cached_file = tmp_path / 'boa-outdated.pdf'
+    cached_file.write_bytes(b'outdated')
+    boa_settings.set(dummy_event, 'cache_path', cached_file.name)
+
+    assert clear_boa_cache(dummy_event)
+    assert cached_file.exists()
+    assert pop_pending_boa_precompiles() == {dummy_event.id}
+    # the outdated book is served while the new one is being built
+    assert create_boa(dummy_event) == str(cached_file)
+    assert not abstract_book.called
+    # unless that takes too long
+    boa_settings.set(dummy_event, 'cache_outdated_dt', now_utc() - timedelta(days=1))
+    new_file = tmp_path / 'new.pdf'
+    new_file.write_bytes(b'new')
+    abstract_book.return_value.generate.return_value = str(new_file)
+    assert create_boa(dummy_event) == str(tmp_path / f'boa-{dummy_event.id}.pdf')
+    assert boa_settings.get(dummy_event, 'cache_outdated_dt') is None
+
+
+@pytest.mark.usefixtures('db')
+def test_precompile_boa_failed(dummy_event, mocker, patch_indico_config, tmp_path):
+    patch_indico_config('CACHE_DIR', str(tmp_path))
+    mocker.patch('indico.modules.events.abstracts.tasks.contribution_settings.get', return_value=True)
+    mocker.patch('indico.modules.events.abstracts.tasks.create_boa', side_effect=Exception)
+    cached_file = tmp_path / 'boa-outdated.pdf'
+    cached_file.write_bytes(b'outdated')
+    boa_settings.set(dummy_event, 'cache_path', cached_file.name)
+    boa_settings.set(dummy_event, 'cache_outdated_dt', now_utc())
+
+    precompile_boa(dummy_event.id)
+    # the outdated book is not served anymore
+    assert not cached_file.exists()
+    assert boa_settings.get(dummy_event, 'cache_path') is None
+    assert boa_settings.get(dummy_event, 'cache_outdated_dt') is None
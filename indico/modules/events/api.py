@@ -38,6 +38,7 @@ from indico.util.date_time import iterdays
 from indico.util.i18n import orig_string
 from indico.util.signals import values_from_signal
 from indico.web.flask.util import send_file, url_for
+from indico.web.http_api.cache import add_cache_tags, category_content_tag, category_tag, event_tag
 from indico.web.http_api.hooks.base import HTTPAPIHook, IteratedDataFetcher
 from indico.web.http_api.responses import HTTPAPIError
 from indico.web.http_api.util import get_query_parameter
@@ -474,6 +475,10 @@ class CategoryEventFetcher(IteratedDataFetcher, SerializerBase):
             idlist = [int(x) for x in idlist]
         except ValueError:
             raise HTTPAPIError('Category IDs must be numeric', 400)
+        # the result also depends on the protection of the parent categories
+        for chain_ids, in db.session.query(Category.chain_ids).filter(Category.id.in_(idlist)):
+            add_cache_tags(*map(category_tag, chain_ids))
+        add_cache_tags(*map(category_content_tag, idlist))
         if format == 'ics':
             buf = serialize_categories_ical(idlist, self.user,
                                             event_filter=Event.happens_between(self._fromDT, self._toDT),
@@ -487,7 +492,7 @@ class CategoryEventFetcher(IteratedDataFetcher, SerializerBase):
                              Event.happens_between(self._fromDT, self._toDT))
                      .options(*self._get_query_options(self._detail_level)))
         query = self._update_query(query)
-        return self.serialize_events(x for x in query if self._filter_event(x) and x.can_access(self.user))
+        return self.serialize_events(self._filter_accessible(x for x in query if self._filter_event(x)))
 
     def category_extra(self, ids):
         if self._toDT is None:
@@ -505,6 +510,7 @@ class CategoryEventFetcher(IteratedDataFetcher, SerializerBase):
             idlist = [int(x) for x in idlist]
         except ValueError:
             raise HTTPAPIError('Event IDs must be numeric', 400)
+        add_cache_tags(*map(event_tag, idlist))
         event_filters = (Event.id.in_(idlist),
                          ~Event.is_deleted,
                          Event.happens_between(self._fromDT, self._toDT))
@@ -520,7 +526,11 @@ class CategoryEventFetcher(IteratedDataFetcher, SerializerBase):
             SessionBlock.query.join(Session).join(Event).filter(*event_filters),
             'timetable_entry'
         )
-        return self.serialize_events(x for x in query if self._filter_event(x) and x.can_access(self.user))
+        return self.serialize_events(self._filter_accessible(x for x in query if self._filter_event(x)))
+
+    def _filter_accessible(self, events):
+        events = list(events)
+        return [e for e, can_access in zip(events, Event.can_access_many(events, self.user), strict=True) if can_access]
 
     def _filter_event(self, event):
         if self._room or self._location or self._eventType:
@@ -50,6 +50,9 @@ class SubContribution(SearchableTitleMixin, SearchableDescriptionMixin, Attached
     ATTACHMENT_FOLDER_ID_COLUMN = 'subcontribution_id'
     possible_render_modes = {RenderMode.html, RenderMode.markdown}
     default_render_mode = RenderMode.markdown
+    #: Used by :meth:`.ProtectionMixin.can_access_many` since access
+    #: checks are delegated to the contribution
+    protection_parent_relationships = ('contribution',)
 
     @declared_attr
     def __table_args__(cls):
@@ -6,10 +6,8 @@
 # LICENSE file for more details.
 
 import os
-import shutil
-from io import BytesIO
+from functools import partial
 from operator import attrgetter
-from zipfile import ZipFile, ZipInfo
 
 from flask import jsonify, request, session
 from marshmallow import EXCLUDE, fields
@@ -40,8 +38,9 @@ from indico.modules.users import User
 from indico.util.fs import secure_filename
 from indico.util.i18n import _
 from indico.util.marshmallow import not_empty
+from indico.util.zipstream import ZipStream
 from indico.web.args import parser, use_kwargs, use_rh_args, use_rh_kwargs
-from indico.web.flask.util import send_file
+from indico.web.flask.util import send_stream
 
 
 class RHEditingUploadFile(UploadFileMixin, RHContributionEditableBase):
@@ -369,25 +368,22 @@ class RHExportRevisionFiles(RHContributionEditableRevisionBase):
         return self.editable.can_see_timeline(session.user)
 
     def _process(self):
-        buf = BytesIO()
-        with ZipFile(buf, 'w', allowZip64=True) as zip_handler:
-            for revision_file in self.revision.files:
-                file = revision_file.file
-                filename = secure_filename(file.filename, f'file-{file.id}')
-                file_type = revision_file.file_type
-                folder_name = secure_filename(file_type.name, f'file-type-{file_type.id}')
-                first_revision = min(file.editing_revision_files, key=attrgetter('revision.created_dt')).revision
-                info = ZipInfo(filename=os.path.join(folder_name, filename),
-                               date_time=first_revision.created_dt.astimezone(self.event.tzinfo).timetuple()[:6])
-                info.external_attr = 0o644 << 16
-                with file.storage.open(file.storage_file_id) as src, zip_handler.open(info, 'w') as dest:
-                    shutil.copyfileobj(src, dest, 1024*8)
+        zip_stream = ZipStream()
+        for revision_file in self.revision.files:
+            file = revision_file.file
+            filename = secure_filename(file.filename, f'file-{file.id}')
+            file_type = revision_file.file_type
+            folder_name = secure_filename(file_type.name, f'file-type-{file_type.id}')
+            first_revision = min(file.editing_revision_files, key=attrgetter('revision.created_dt')).revision
+            zip_stream.add_file(os.path.join(folder_name, filename),
+                                partial(file.storage.open, file.storage_file_id), file.size,
+                                dt=first_revision.created_dt.astimezone(self.event.tzinfo))
         zip_filename = f'revision-{self.revision.id}.zip'
         if self.contrib.code:
             zip_filename = f'{self.contrib.code}-{zip_filename}'
-
-        buf.seek(0)
-        return send_file(zip_filename, buf, 'application/zip', inline=False)
+        zip_stream.check()
+        return send_stream(zip_filename, zip_stream, 'application/zip', inline=False,
+                           content_length=zip_stream.content_length)
 
 
 class RHDownloadRevisionFile(RHContributionEditableRevisionBase):
@@ -317,11 +317,11 @@ function SeriesEvents({
     setResults([]);
   };
 
-  const searchEvents = async (q, searchOffset = 0, addToResults = false) => {
+  const searchEvents = async (q, after = undefined, addToResults = false) => {
     let resp;
     try {
       resp = await debounce(() =>
-        indicoAxios.get(eventSearch({category_id: categoryId, q, offset: searchOffset}))
+        indicoAxios.get(eventSearch({category_id: categoryId, q, after}))
       );
     } catch (error) {
       handleAxiosError(error);
@@ -418,7 +418,7 @@ function SeriesEvents({
 
   const loadMore = () => {
     setSearching(true);
-    searchEvents(searchQuery.trim(), results.length, true);
+    searchEvents(searchQuery.trim(), results[results.length - 1].id, true);
   };
 
   if (eventOptions.length > 0 && hasMore) {
@@ -5,9 +5,42 @@
 // modify it under the terms of the MIT License; see the
 // LICENSE file for more details.
 
-/* eslint-disable import/unambiguous */
+import {indicoAxios, handleAxiosError} from 'indico/utils/axios';
+import {$T} from 'indico/utils/i18n';
 
 (function(global) {
+  function pollBadgeGeneration(statusURL) {
+    let progress = 0;
+    let closeLoader = IndicoUI.Dialogs.Util.progress($T.gettext('Generating badges'));
+
+    async function poll() {
+      let res;
+      try {
+        res = await indicoAxios.get(statusURL);
+      } catch (error) {
+        handleAxiosError(error);
+        closeLoader();
+        return;
+      }
+      if (res.data.download_url) {
+        window.location.href = res.data.download_url;
+        closeLoader();
+        return;
+      }
+      const newProgress = Math.floor(res.data.progress * 100);
+      if (newProgress !== progress) {
+        progress = newProgress;
+        closeLoader();
+        closeLoader = IndicoUI.Dialogs.Util.progress(
+          $T.gettext('Generating badges ({0}%)').format(progress)
+        );
+      }
+      poll();
+    }
+
+    poll();
+  }
+
   global.setupBadgePrinting = function setupBadgePrinting(templates) {
     const $template = $('#template');
     const $pageLayout = $('#page_layout');
@@ -17,6 +50,13 @@
     const $marginEditor = $('.margin-editor');
     const $infoMessage = $('.info');
 
+    // large PDFs are generated in the background
+    $('#badge-settings-form').on('ajaxForm:success', (evt, data) => {
+      if (data.badges_status_url) {
+        pollBadgeGeneration(data.badges_status_url);
+      }
+    });
+
     function toggleFoldableOption(template, pageSize, pageOrientation) {
       const foldablePairs = {
         A0: 'A2',
@@ -15,7 +15,9 @@ from indico.core.db.sqlalchemy.principals import EmailPrincipal, PrincipalType
 from indico.core.db.sqlalchemy.protection import ProtectionMode
 from indico.core.permissions import get_available_permissions
 from indico.modules.events import Event
+from indico.modules.events.contributions.models.contributions import Contribution
 from indico.modules.events.models.principals import EventPrincipal
+from indico.modules.users import User
 from indico.testing.util import bool_matrix
 
 
@@ -225,6 +227,53 @@ def test_can_access_key(create_event):
     assert not event.can_access(None)
 
 
+@pytest.mark.usefixtures('request_context')
+def test_can_access_many(db, create_category, create_event, create_contribution, create_user, dummy_group,
+                         count_queries):
+    reader = create_user(1)
+    other = create_user(2)
+    dummy_group.group.members.add(reader)
+    protected_categ = create_category(1, protection_mode=ProtectionMode.protected)
+    protected_categ.update_principal(dummy_group, read_access=True)
+    subcateg = create_category(2, parent=protected_categ)
+    events = []
+    for i in range(5):
+        events += [create_event(10 + i, category=subcateg),
+                   create_event(20 + i, category=subcateg, protection_mode=ProtectionMode.public),
+                   create_event(30 + i, protection_mode=ProtectionMode.protected)]
+    for event in events[2::3]:
+        event.update_principal(reader, read_access=True)
+    contribs = [create_contribution(event, 'Contrib', protection_mode=ProtectionMode.protected)
+                for event in events[:6]]
+    contribs[0].update_principal(other, read_access=True)
+    db.session.flush()
+
+    def _check_access(user_id, event_ids, contrib_ids, load_categories):
+        db.session.expunge_all()
+        user = User.get(user_id) if user_id is not None else None
+        objs = (Event.query.filter(Event.id.in_(event_ids)).order_by(Event.id).all() +
+                Contribution.query.filter(Contribution.id.in_(contrib_ids)).order_by(Contribution.id).all())
+        if load_categories:
+            # the categories of the events are loaded but not their ACLs and parents
+            for obj in objs:
+                obj.event.category  # noqa: B018
+        with count_queries() as cnt:
+            rv = Event.can_access_many(objs, user)
+        assert rv == [obj.can_access(user) for obj in objs]
+        return rv, cnt()
+
+    event_ids = [e.id for e in events]
+    contrib_ids = [c.id for c in contribs]
+    for user_id in (None, reader.id, other.id):
+        for load_categories in (False, True):
+            __, few_queries = _check_access(user_id, event_ids[:3], contrib_ids[:2], load_categories)
+            rv, many_queries = _check_access(user_id, event_ids, contrib_ids, load_categories)
+            # the number of queries does not depend on the number of objects
+            assert many_queries == few_queries
+            assert many_queries <= 10
+    assert rv.count(True) == 6
+
+
 @pytest.mark.usefixtures('request_context')
 def test_can_manage_permissions(create_event, dummy_user):
     event = create_event()
@@ -38,6 +38,7 @@ from indico.core.db.sqlalchemy.util.models import auto_table_args
 from indico.core.db.sqlalchemy.util.queries import db_dates_overlap, get_related_object
 from indico.modules.categories import Category
 from indico.modules.categories.models.event_move_request import EventMoveRequest, MoveRequestState
+from indico.modules.categories.models.paths import CategoryPath
 from indico.modules.events.management.util import get_non_inheriting_objects
 from indico.modules.events.models.persons import EventPerson, PersonLinkMixin
 from indico.modules.events.notifications import notify_event_creation
@@ -88,6 +89,7 @@ class Event(SearchableTitleMixin, DescriptionMixin, LocationMixin, ProtectionMan
     disallowed_protection_modes = frozenset()
     inheriting_have_acl = True
     allow_none_protection_parent = True
+    protection_parent_relationships = ('category',)
     allow_access_key = True
     allow_no_access_contact = True
     person_link_relation_name = 'EventPersonLink'
@@ -473,16 +475,13 @@ class Event(SearchableTitleMixin, DescriptionMixin, LocationMixin, ProtectionMan
         Create a filter that checks whether the event has any of the
         provided category ids in its parent chain.
 
-        Warning: This method cannot be used in a negated filter.
-
         :param category_ids: A list of category ids or a single
                              category id
         """
-        from indico.modules.categories import Category
         if not isinstance(category_ids, (list, tuple, set)):
             category_ids = [category_ids]
-        cte = Category.get_subtree_ids_cte(category_ids)
-        return cte.c.id == Event.category_id
+        return Event.category_id.in_(db.select([CategoryPath.descendant_id])
+                                     .where(CategoryPath.ancestor_id.in_(category_ids)))
 
     @classmethod
     def is_visible_in(cls, category_id):
@@ -490,10 +489,11 @@ class Event(SearchableTitleMixin, DescriptionMixin, LocationMixin, ProtectionMan
         Create a filter that checks whether the event is visible in
         the specified category.
         """
-        cte = Category.get_visible_categories_cte(category_id)
         return (db.exists(db.select([1]))
-                .where(db.and_(cte.c.id == Event.category_id,
-                               db.or_(Event.visibility.is_(None), Event.visibility > cte.c.level))))
+                .where(db.and_(CategoryPath.ancestor_id == category_id,
+                               CategoryPath.descendant_id == Event.category_id,
+                               CategoryPath.is_visible,
+                               db.or_(Event.visibility.is_(None), Event.visibility > CategoryPath.depth))))
 
     @property
     def event(self):
@@ -1199,14 +1199,13 @@ def _mappers_configured():
 
     # Event.category_chain -- the category ids of the event, starting
     # with the root category down to the event's immediate parent.
-    cte = Category.get_tree_cte()
-    query = select([cte.c.path]).where(cte.c.id == Event.category_id).correlate_except(cte).scalar_subquery()
+    query = Category.get_chain_subquery(Event.category_id)
     Event.category_chain = column_property(query, deferred=True)
 
     # Event.detailed_category_chain -- the category chain of the event, starting
     # with the root category down to the event's immediate parent.
-    cte = Category.get_tree_cte(lambda cat: db.func.json_build_object('id', cat.id, 'title', cat.title))
-    query = select([cte.c.path]).where(cte.c.id == Event.category_id).correlate_except(cte).scalar_subquery()
+    query = Category.get_chain_subquery(Event.category_id,
+                                        lambda cat: db.func.json_build_object('id', cat.id, 'title', cat.title))
     Event.detailed_category_chain = column_property(query, deferred=True)
 
     # Event.effective_protection_mode -- the effective protection mode
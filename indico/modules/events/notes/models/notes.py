@@ -32,6 +32,9 @@ class EventNote(LinkMixin, db.Model):
     unique_links = True
     events_backref_name = 'all_notes'
     link_backref_name = 'note'
+    #: Used by :meth:`.ProtectionMixin.can_access_many` since access
+    #: checks are performed on the linked object
+    protection_parent_relationships = ('event', 'session', 'contribution', 'subcontribution')
 
     @strict_classproperty
     @classmethod
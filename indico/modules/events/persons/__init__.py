@@ -20,6 +20,18 @@ from indico.web.menu import SideMenuItem
 logger = Logger.get('events.persons')
 
 
+@signals.core.app_created.connect
+def _setup_person_list_change_tracking(app, **kwargs):
+    from indico.modules.events.persons.lists import setup_person_list_change_tracking
+    setup_person_list_change_tracking()
+
+
+@signals.core.after_commit.connect
+def _flush_person_list_updates(sender, **kwargs):
+    from indico.modules.events.persons.lists import flush_person_list_updates
+    flush_person_list_updates()
+
+
 @signals.menu.items.connect_via('event-management-sidemenu')
 def _sidemenu_items(sender, event, **kwargs):
     if event.can_manage(session.user):
@@ -34,15 +34,16 @@ from indico.modules.events.models.principals import EventPrincipal
 from indico.modules.events.models.roles import EventRole
 from indico.modules.events.persons import logger, persons_settings
 from indico.modules.events.persons.forms import ManagePersonListsForm
+from indico.modules.events.persons.lists import get_person_role_matrix
 from indico.modules.events.persons.operations import update_person
 from indico.modules.events.persons.schemas import EventPersonSchema, EventPersonUpdateSchema
 from indico.modules.events.persons.views import WPManagePersons
-from indico.modules.events.registration.models.forms import RegistrationForm
 from indico.modules.events.registration.models.registrations import Registration
+from indico.modules.events.sessions.models.blocks import SessionBlock
 from indico.modules.events.sessions.models.principals import SessionPrincipal
 from indico.modules.events.sessions.models.sessions import Session
 from indico.modules.logs import LogKind
-from indico.modules.users import user_management_settings
+from indico.modules.users import User, user_management_settings
 from indico.modules.users.models.affiliations import Affiliation
 from indico.util.date_time import now_utc
 from indico.util.i18n import _, ngettext
@@ -66,161 +67,133 @@ BUILTIN_ROLES = {'chairperson': {'name': _('Chairperson'), 'code': 'CHR', 'color
                                      'css': 'background-color: #53c7ad !important; border-color: #53c7ad !important'}}
 
 
+def _load_by_id(cls, ids, *options):
+    if not ids:
+        return {}
+    return {obj.id: obj for obj in cls.query.filter(cls.id.in_(ids)).options(*options)}
+
+
 class RHPersonsBase(RHManageEventBase):
-    def generate_abstracts_data(self, person_link):
-        return {'title': person_link.abstract.verbose_title,
-                'url': url_for('abstracts.display_abstract', person_link.abstract, management=True)}
+    def generate_abstracts_data(self, abstract):
+        return {'title': abstract.verbose_title,
+                'url': url_for('abstracts.display_abstract', abstract, management=True)}
 
-    def generate_sessions_data(self, person_link):
-        return {'title': person_link.session_block.full_title}
+    def generate_sessions_data(self, session_block):
+        return {'title': session_block.full_title}
 
-    def generate_contributions_data(self, person_link):
-        return {'title': person_link.contribution.title,
+    def generate_contributions_data(self, contribution):
+        return {'title': contribution.title,
                 'url': url_for('contributions.manage_contributions', self.event,
-                               selected=person_link.contribution.friendly_id)}
+                               selected=contribution.friendly_id)}
 
-    def generate_subcontributions_data(self, person_link):
-        return {'title': f'{person_link.subcontribution.contribution.title} ({person_link.subcontribution.title})',
+    def generate_subcontributions_data(self, subcontribution):
+        return {'title': f'{subcontribution.contribution.title} ({subcontribution.title})',
                 'url': url_for('contributions.manage_contributions', self.event,
-                               selected=person_link.subcontribution.contribution.friendly_id)}
-
-    def get_persons(self):
-        abstract_strategy = joinedload('abstract_links')
-        abstract_strategy.joinedload('abstract')
-        abstract_strategy.joinedload('person').joinedload('user')
-        contribution_strategy = joinedload('contribution_links')
-        contribution_strategy.joinedload('contribution')
-        contribution_strategy.joinedload('person').joinedload('user')
-        subcontribution_strategy = joinedload('subcontribution_links')
-        subcontribution_strategy.joinedload('subcontribution')
-        subcontribution_strategy.joinedload('person').joinedload('user')
-        session_block_strategy = joinedload('session_block_links')
-        session_block_strategy.joinedload('session_block')
-        session_block_strategy.joinedload('person').joinedload('user')
-        event_strategy = joinedload('event_links')
-        event_strategy.joinedload('person').joinedload('user')
-
-        chairpersons = {link.person for link in self.event.person_links}
+                               selected=subcontribution.contribution.friendly_id)}
+
+    def _get_role_data(self, role, elements):
+        data = BUILTIN_ROLES[role].copy()
+        data['elements'] = elements
+        return data
+
+    def _get_event_roles_data(self, event_roles, role_ids):
+        event_roles_data = {f'custom_{role.id}': {'name': role.name, 'code': role.code, 'css': role.css}
+                            for role in (event_roles[role_id] for role_id in role_ids)}
+        return dict(sorted(event_roles_data.items(), key=lambda t: t[1]['code']))
+
+    def get_persons(self, person=None):
+        """Get the persons of the event and their roles.
+
+        :param person: An `EventPerson` to restrict the result to; in
+                       this case only the data of that person is valid.
+        """
+        matrix = get_person_role_matrix(self.event, person_ids=({person.id} if person else None))
+        is_lecture = self.event.type == 'lecture'
+        has_abstracts = self.event.has_feature('abstracts')
+
+        # load everything referenced in the role matrix at once
+        event_person_query = (EventPerson.query.with_parent(self.event)
+                              .options(joinedload('user'), joinedload('affiliation_link')))
+        if person:
+            event_person_query = event_person_query.filter(EventPerson.id == person.id)
+        event_persons = {p.id: p for p in event_person_query}
+        event_roles = {role.id: role for role in self.event.roles}
+        abstracts = _load_by_id(Abstract, {id_ for r in matrix.persons for id_ in r.abstract_ids})
+        session_blocks = _load_by_id(SessionBlock, {id_ for r in matrix.persons for id_ in r.session_block_ids},
+                                     joinedload('session'))
+        contributions = _load_by_id(Contribution, {id_ for r in matrix.persons
+                                                   for id_ in r.speaker_contribution_ids + r.author_contribution_ids})
+        subcontributions = _load_by_id(SubContribution, {id_ for r in matrix.persons for id_ in r.subcontribution_ids},
+                                       joinedload('contribution'))
+        registrations = _load_by_id(Registration, {id_ for r in itertools.chain(matrix.persons, matrix.role_members)
+                                                   for id_ in r.registration_ids},
+                                    joinedload('registration_form'))
+        role_member_users = _load_by_id(User, {r.user_id for r in matrix.role_members})
+
         persons = defaultdict(lambda: {'roles': {},
                                        'registrations': [],
                                        'has_event_person': True,
                                        'id_field_name': 'person_id'})
-
-        _reg_person_join = db.or_((EventPerson.user_id == Registration.user_id),
-                                  db.and_(EventPerson.user_id.is_(None),
-                                          Registration.user_id.is_(None),
-                                          EventPerson.email == Registration.email))
-        event_persons_query = (db.session.query(EventPerson, Registration)
-                               .filter(EventPerson.event_id == self.event.id)
-                               .outerjoin(Registration, db.and_(
-                                   Registration.event_id == self.event.id,
-                                   Registration.registration_form.has(~RegistrationForm.is_deleted),
-                                   _reg_person_join
-                               ))
-                               .options(abstract_strategy,
-                                        event_strategy,
-                                        contribution_strategy,
-                                        subcontribution_strategy,
-                                        session_block_strategy)
-                               .all())
-
-        event_user_roles = defaultdict(set)
-        for event_role in self.event.roles:
-            for user in event_role.members:
-                event_user_roles[user].add(event_role)
-
         event_person_users = set()
-        for event_person, registration in event_persons_query:
+        for person_roles in matrix.persons:
+            if not (event_person := event_persons.get(person_roles.person_id)):
+                continue
             data = persons[event_person.email or event_person.id]
-            if registration and registration.is_active:
-                data['registrations'].append(registration)
+            data['registrations'] += [registrations[id_] for id_ in person_roles.registration_ids]
             data['person'] = event_person
-            if event_person in chairpersons:
-                if self.event.type != 'lecture':
-                    data['roles']['chairperson'] = BUILTIN_ROLES['chairperson'].copy()
-                else:
-                    data['roles']['lecture_speaker'] = BUILTIN_ROLES['lecture_speaker'].copy()
+            roles = data['roles']
+            if person_roles.is_chairperson:
+                chair_role = 'lecture_speaker' if is_lecture else 'chairperson'
+                roles[chair_role] = BUILTIN_ROLES[chair_role].copy()
 
-            if self.event.type == 'lecture':
+            if is_lecture:
                 continue
 
-            if self.event.has_feature('abstracts'):
-                abstracts = {person_link.abstract_id: self.generate_abstracts_data(person_link)
-                             for person_link in event_person.abstract_links if not person_link.abstract.is_deleted}
-
-                if abstracts:
-                    data['roles']['author'] = BUILTIN_ROLES['author'].copy()
-                    data['roles']['author']['elements'] = abstracts
-
-            session_blocks = {person_link.session_block_id: self.generate_sessions_data(person_link)
-                              for person_link in event_person.session_block_links
-                              if not person_link.session_block.session.is_deleted}
-
-            if session_blocks:
-                data['roles']['convener'] = BUILTIN_ROLES['convener'].copy()
-                data['roles']['convener']['elements'] = session_blocks
-
-            contributions = {person_link.contribution.id: self.generate_contributions_data(person_link)
-                             for person_link in event_person.contribution_links
-                             if person_link.is_speaker and not person_link.contribution.is_deleted}
-
-            subcontributions = {person_link.subcontribution.id: self.generate_subcontributions_data(person_link)
-                                for person_link in event_person.subcontribution_links
-                                if not person_link.subcontribution.is_deleted and
-                                not person_link.subcontribution.contribution.is_deleted}
-
-            if contributions or subcontributions:
-                data['roles']['speaker'] = BUILTIN_ROLES['speaker'].copy()
-                data['roles']['speaker']['elements'] = contributions | subcontributions
-
-            author_contributions = {person_link.contribution.id: self.generate_contributions_data(person_link)
-                                    for person_link in event_person.contribution_links
-                                    if person_link.is_author and not person_link.contribution.is_deleted}
-
-            if author_contributions:
-                data['roles']['author'] = BUILTIN_ROLES['author'].copy()
-                data['roles']['author']['elements'] = author_contributions
-
-            event_user_roles_data = {}
-            for role in event_user_roles[event_person.user]:
-                event_user_roles_data[f'custom_{role.id}'] = {'name': role.name, 'code': role.code, 'css': role.css}
-            event_user_roles_data = dict(sorted(event_user_roles_data.items(), key=lambda t: t[1]['code']))
-            data['roles'] |= event_user_roles_data
-
-            event_person_users.add(event_person.user)
+            if has_abstracts and person_roles.abstract_ids:
+                roles['author'] = self._get_role_data('author', {
+                    id_: self.generate_abstracts_data(abstracts[id_]) for id_ in person_roles.abstract_ids
+                })
+            if person_roles.session_block_ids:
+                roles['convener'] = self._get_role_data('convener', {
+                    id_: self.generate_sessions_data(session_blocks[id_]) for id_ in person_roles.session_block_ids
+                })
+            if person_roles.speaker_contribution_ids or person_roles.subcontribution_ids:
+                speaker_contributions = {id_: self.generate_contributions_data(contributions[id_])
+                                         for id_ in person_roles.speaker_contribution_ids}
+                speaker_subcontributions = {id_: self.generate_subcontributions_data(subcontributions[id_])
+                                            for id_ in person_roles.subcontribution_ids}
+                roles['speaker'] = self._get_role_data('speaker', speaker_contributions | speaker_subcontributions)
+            if person_roles.author_contribution_ids:
+                roles['author'] = self._get_role_data('author', {
+                    id_: self.generate_contributions_data(contributions[id_])
+                    for id_ in person_roles.author_contribution_ids
+                })
+            roles |= self._get_event_roles_data(event_roles, person_roles.event_role_ids)
+            event_person_users.add(event_person.user_id)
 
         internal_role_users = defaultdict(lambda: {'roles': {},
                                                    'person': [],
                                                    'registrations': [],
                                                    'has_event_person': False,
                                                    'id_field_name': 'user_id'})
-        for user, roles in event_user_roles.items():
-            if user in event_person_users:
+        for member_roles in matrix.role_members:
+            if member_roles.user_id in event_person_users:
                 continue
-            for role in roles:
-                user_metadata = internal_role_users[user.email]
-                user_metadata['person'] = user
-                user_metadata['roles'][f'custom_{role.id}'] = {'name': role.name, 'code': role.code, 'css': role.css}
-            user_metadata['roles'] = dict(sorted(user_metadata['roles'].items(), key=lambda x: x[1]['code']))
-
-        regs = (Registration.query
-                .with_parent(self.event)
-                .join(Registration.registration_form)
-                .filter(Registration.user_id.in_(data['person'].id for data in internal_role_users.values()),
-                        Registration.is_active, ~RegistrationForm.is_deleted)
-                .all())
-        for reg in regs:
-            internal_role_users[reg.user.email]['registrations'].append(reg)
+            user = role_member_users[member_roles.user_id]
+            user_metadata = internal_role_users[user.email]
+            user_metadata['person'] = user
+            user_metadata['roles'] = self._get_event_roles_data(event_roles, member_roles.event_role_ids)
+            user_metadata['registrations'] += [registrations[id_] for id_ in member_roles.registration_ids]
 
         persons |= internal_role_users
         # Some EventPersons will have no built-in roles since they were connected to deleted things
         builtin_roles = set(BUILTIN_ROLES)
-        for person in persons:
-            roles = set(persons[person]['roles'].keys())
+        for person_data in persons.values():
+            roles = set(person_data['roles'].keys())
             if not roles:
-                persons[person]['roles']['no_roles'] = True
+                person_data['roles']['no_roles'] = True
             if not roles & builtin_roles:
-                persons[person]['roles']['no_builtin_roles'] = True
+                person_data['roles']['no_builtin_roles'] = True
         return persons
 
 
@@ -432,7 +405,7 @@ class RHUpdateEventPerson(RHEventPersonActionBase):
     @use_args(EventPersonUpdateSchema, partial=True)
     def _process(self, args):
         update_person(self.person, args)
-        person_data = self.get_persons()[self.person.email or self.person.id]
+        person_data = self.get_persons(self.person)[self.person.email or self.person.id]
         tpl = get_template_module('events/persons/management/_person_list_row.html')
         allow_custom_affiliations = not user_management_settings.get('only_predefined_affiliations')
         return jsonify(html=tpl.render_person_row(person_data, bool(self.event.registration_forms),
@@ -455,7 +428,7 @@ class RHSyncEventPerson(RHEventPersonActionBase):
             raise Forbidden(_('Persons with no associated users cannot be synced.'))
         self.person.sync_user(notify=False)
         logger.info('EventPerson synced with user in event %r: %r', self.event, self.person)
-        person_data = self.get_persons()[self.person.email or self.person.id]
+        person_data = self.get_persons(self.person)[self.person.email or self.person.id]
         tpl = get_template_module('events/persons/management/_person_list_row.html')
         allow_custom_affiliations = not user_management_settings.get('only_predefined_affiliations')
         return jsonify_data(html=tpl.render_person_row(person_data, bool(self.event.registration_forms),
@@ -0,0 +1,228 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+import itertools
+from collections import namedtuple
+from datetime import timedelta
+from uuid import uuid4
+
+from flask import g, has_app_context
+from sqlalchemy import inspect
+from sqlalchemy.event import contains, listen
+
+from indico.core.cache import make_scoped_cache
+from indico.core.db import db
+from indico.modules.events.abstracts.models.abstracts import Abstract
+from indico.modules.events.abstracts.models.persons import AbstractPersonLink
+from indico.modules.events.contributions.models.contributions import Contribution
+from indico.modules.events.contributions.models.persons import (AuthorType, ContributionPersonLink,
+                                                               SubContributionPersonLink)
+from indico.modules.events.contributions.models.subcontributions import SubContribution
+from indico.modules.events.models.persons import EventPerson, EventPersonLink, PersonLinkBase
+from indico.modules.events.models.roles import EventRole, role_members_table
+from indico.modules.events.registration.models.forms import RegistrationForm
+from indico.modules.events.registration.models.registrations import Registration
+from indico.modules.events.sessions.models.blocks import SessionBlock
+from indico.modules.events.sessions.models.persons import SessionBlockPersonLink
+from indico.modules.events.sessions.models.sessions import Session
+
+
+persons_list_cache = make_scoped_cache('event-persons-list')
+
+#: The number of persons above which the role matrix of an event is cached
+PERSONS_LIST_CACHE_THRESHOLD = 250
+#: How long the cached role matrix of an event is kept
+PERSONS_LIST_CACHE_TTL = timedelta(hours=6)
+
+#: The objects determining the roles of event persons
+_PERSON_ROLE_TYPES = (EventPerson, PersonLinkBase, Registration, RegistrationForm, EventRole)
+#: The objects containing person links, which only affect the roles of
+#: event persons when they are deleted or restored
+_PERSON_LINK_PARENT_TYPES = (Abstract, Contribution, SubContribution, Session, SessionBlock)
+
+#: The roles of an event person, containing the IDs of the objects the
+#: person is linked to
+PersonRoles = namedtuple('PersonRoles', ('person_id', 'user_id', 'is_chairperson', 'abstract_ids',
+                                         'session_block_ids', 'speaker_contribution_ids', 'author_contribution_ids',
+                                         'subcontribution_ids', 'registration_ids', 'event_role_ids'))
+#: The roles of a user who is a member of an event role but not
+#: necessarily an event person
+RoleMemberRoles = namedtuple('RoleMemberRoles', ('user_id', 'event_role_ids', 'registration_ids'))
+#: The roles of all persons in an event
+PersonRoleMatrix = namedtuple('PersonRoleMatrix', ('persons', 'role_members'))
+
+
+def _ids(value):
+    return tuple(sorted(value)) if value else ()
+
+
+def _get_registrations_subquery(event, person_criterion):
+    return (db.select([db.func.array_agg(Registration.id)])
+            .where(db.and_(Registration.event_id == event.id,
+                           Registration.registration_form_id == RegistrationForm.id,
+                           Registration.is_active,
+                           ~RegistrationForm.is_deleted,
+                           person_criterion))
+            .scalar_subquery())
+
+
+def _get_event_persons_roles(event, person_ids=None):
+    chairs = (db.session.query(EventPersonLink.person_id)
+              .filter(EventPersonLink.event_id == event.id)
+              .distinct()
+              .subquery())
+    abstracts = (db.session.query(AbstractPersonLink.person_id,
+                                  db.func.array_agg(AbstractPersonLink.abstract_id).label('ids'))
+                 .join(Abstract, Abstract.id == AbstractPersonLink.abstract_id)
+                 .filter(Abstract.event_id == event.id, ~Abstract.is_deleted)
+                 .group_by(AbstractPersonLink.person_id)
+                 .subquery())
+    session_blocks = (db.session.query(SessionBlockPersonLink.person_id,
+                                       db.func.array_agg(SessionBlockPersonLink.session_block_id).label('ids'))
+                      .join(SessionBlock, SessionBlock.id == SessionBlockPersonLink.session_block_id)
+                      .join(Session, Session.id == SessionBlock.session_id)
+                      .filter(Session.event_id == event.id, ~Session.is_deleted)
+                      .group_by(SessionBlockPersonLink.person_id)
+                      .subquery())
+    contribution_ids = db.func.array_agg(ContributionPersonLink.contribution_id)
+    contributions = (db.session.query(ContributionPersonLink.person_id,
+                                      contribution_ids.filter(ContributionPersonLink.is_speaker).label('speaker_ids'),
+                                      contribution_ids.filter(ContributionPersonLink.author_type != AuthorType.none)
+                                      .label('author_ids'))
+                     .join(Contribution, Contribution.id == ContributionPersonLink.contribution_id)
+                     .filter(Contribution.event_id == event.id, ~Contribution.is_deleted)
+                     .group_by(ContributionPersonLink.person_id)
+                     .subquery())
+    subcontributions = (db.session.query(SubContributionPersonLink.person_id,
+                                         db.func.array_agg(SubContributionPersonLink.subcontribution_id).label('ids'))
+                        .join(SubContribution, SubContribution.id == SubContributionPersonLink.subcontribution_id)
+                        .join(Contribution, Contribution.id == SubContribution.contribution_id)
+                        .filter(Contribution.event_id == event.id, ~SubContribution.is_deleted,
+                                ~Contribution.is_deleted)
+                        .group_by(SubContributionPersonLink.person_id)
+                        .subquery())
+    event_roles = (db.session.query(role_members_table.c.user_id,
+                                    db.func.array_agg(role_members_table.c.role_id).label('ids'))
+                   .join(EventRole, EventRole.id == role_members_table.c.role_id)
+                   .filter(EventRole.event_id == event.id)
+                   .group_by(role_members_table.c.user_id)
+                   .subquery())
+    registrations = _get_registrations_subquery(event, db.or_(
+        Registration.user_id == EventPerson.user_id,
+        db.and_(EventPerson.user_id.is_(None), Registration.user_id.is_(None),
+                EventPerson.email == Registration.email)
+    ))
+    query = (db.session.query(EventPerson.id, EventPerson.user_id, chairs.c.person_id.isnot(None), abstracts.c.ids,
+                              session_blocks.c.ids, contributions.c.speaker_ids, contributions.c.author_ids,
+                              subcontributions.c.ids, registrations, event_roles.c.ids)
+             .filter(EventPerson.event_id == event.id)
+             .outerjoin(chairs, chairs.c.person_id == EventPerson.id)
+             .outerjoin(abstracts, abstracts.c.person_id == EventPerson.id)
+             .outerjoin(session_blocks, session_blocks.c.person_id == EventPerson.id)
+             .outerjoin(contributions, contributions.c.person_id == EventPerson.id)
+             .outerjoin(subcontributions, subcontributions.c.person_id == EventPerson.id)
+             .outerjoin(event_roles, event_roles.c.user_id == EventPerson.user_id))
+    if person_ids is not None:
+        query = query.filter(EventPerson.id.in_(person_ids))
+    return [PersonRoles(person_id, user_id, is_chairperson, *map(_ids, ids))
+            for person_id, user_id, is_chairperson, *ids in query]
+
+
+def _get_role_members_roles(event):
+    registrations = _get_registrations_subquery(event, Registration.user_id == role_members_table.c.user_id)
+    query = (db.session.query(role_members_table.c.user_id, db.func.array_agg(role_members_table.c.role_id),
+                              registrations)
+             .join(EventRole, EventRole.id == role_members_table.c.role_id)
+             .filter(EventRole.event_id == event.id)
+             .group_by(role_members_table.c.user_id))
+    return [RoleMemberRoles(user_id, _ids(role_ids), _ids(registration_ids))
+            for user_id, role_ids, registration_ids in query]
+
+
+def get_person_role_matrix(event, person_ids=None):
+    """Get the roles of all persons in an event.
+
+    All roles are retrieved using aggregated queries, so the size of the
+    result only depends on the number of persons and their links.  The
+    matrix of large events is cached until something in the event changes.
+
+    :param event: The event
+    :param person_ids: The IDs of event persons to restrict the result
+                       to; in this case the event role members who are
+                       not event persons are not included and the
+                       cache is never used.
+    :return: A `PersonRoleMatrix` containing the `PersonRoles` of the
+             event persons and the `RoleMemberRoles` of the members of
+             the event roles
+    """
+    if person_ids is not None:
+        return PersonRoleMatrix(_get_event_persons_roles(event, person_ids), [])
+    # the version needs to be retrieved before querying the database, so data
+    # loaded right before an invalidation is never cached as current
+    version = persons_list_cache.get(f'version-{event.id}')
+    if version is None:
+        version = uuid4().hex
+        persons_list_cache.set(f'version-{event.id}', version, PERSONS_LIST_CACHE_TTL)
+    cache_key = f'matrix-{event.id}-{version}'
+    if (matrix := persons_list_cache.get(cache_key)) is not None:
+        return matrix
+    matrix = PersonRoleMatrix(_get_event_persons_roles(event), _get_role_members_roles(event))
+    if len(matrix.persons) >= PERSONS_LIST_CACHE_THRESHOLD:
+        persons_list_cache.set(cache_key, matrix, PERSONS_LIST_CACHE_TTL)
+    return matrix
+
+
+def _get_event_id(obj):
+    if isinstance(obj, PersonLinkBase):
+        return obj.person.event_id
+    elif isinstance(obj, SessionBlock):
+        return obj.session.event_id
+    elif isinstance(obj, SubContribution):
+        return obj.contribution.event_id
+    return obj.event_id
+
+
+def _affects_person_roles(obj, deleted):
+    if isinstance(obj, _PERSON_ROLE_TYPES):
+        return True
+    elif isinstance(obj, _PERSON_LINK_PARENT_TYPES):
+        # person links of deleted objects are ignored
+        return deleted or (hasattr(type(obj), 'is_deleted') and inspect(obj).attrs.is_deleted.history.has_changes())
+    return False
+
+
+def _collect_person_list_changes(session, flush_context):
+    if not has_app_context():
+        return
+    pending = g.setdefault('pending_person_list_updates', set())
+    for obj in itertools.chain(session.new, session.dirty):
+        if _affects_person_roles(obj, False) and (event_id := _get_event_id(obj)) is not None:
+            pending.add(event_id)
+    for obj in session.deleted:
+        if _affects_person_roles(obj, True) and (event_id := _get_event_id(obj)) is not None:
+            pending.add(event_id)
+
+
+def setup_person_list_change_tracking():
+    """Track changes which affect the cached person lists of events.
+
+    Changes to event persons, their links, registrations and event roles
+    as well as deleting or restoring objects containing person links
+    invalidate the role matrix of the event once the transaction has been
+    committed.
+    """
+    if not contains(db.session, 'after_flush', _collect_person_list_changes):
+        listen(db.session, 'after_flush', _collect_person_list_changes)
+
+
+def flush_person_list_updates():
+    """Invalidate the role matrices of all events changed in the committed transaction."""
+    if not has_app_context():
+        return
+    if pending := g.pop('pending_person_list_updates', None):
+        persons_list_cache.set_many({f'version-{event_id}': uuid4().hex for event_id in pending},
+                                    PERSONS_LIST_CACHE_TTL)
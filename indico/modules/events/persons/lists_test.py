@@ -0,0 +1,79 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from indico.modules.events.contributions.models.persons import (AuthorType, ContributionPersonLink,
+                                                               SubContributionPersonLink)
+from indico.modules.events.models.persons import EventPersonLink
+from indico.modules.events.models.roles import EventRole
+from indico.modules.events.persons.lists import (PersonRoles, RoleMemberRoles, flush_person_list_updates,
+                                                 get_person_role_matrix, persons_list_cache)
+
+
+pytest_plugins = 'indico.modules.events.registration.testing.fixtures'
+
+
+def test_get_person_role_matrix(db, dummy_event, dummy_user, dummy_reg, create_user, create_event_person,
+                                create_contribution, create_subcontribution):
+    other_user = create_user(123)
+    speaker_user = create_user(124, 'John', 'Doe')
+    chair = create_event_person(dummy_event, dummy_user)
+    dummy_event.person_links.append(EventPersonLink(person=chair))
+    speaker = create_event_person(dummy_event, speaker_user)
+    contrib = create_contribution(dummy_event, 'Dummy')
+    deleted_contrib = create_contribution(dummy_event, 'Deleted', is_deleted=True)
+    subcontrib = create_subcontribution(contrib, 'Dummy sub')
+    contrib.person_links.append(ContributionPersonLink(person=speaker, is_speaker=True,
+                                                       author_type=AuthorType.primary))
+    contrib.person_links.append(ContributionPersonLink(person=chair, is_speaker=False,
+                                                       author_type=AuthorType.secondary))
+    deleted_contrib.person_links.append(ContributionPersonLink(person=chair, is_speaker=True))
+    subcontrib.person_links.append(SubContributionPersonLink(person=speaker))
+    role = EventRole(event=dummy_event, name='Role', code='ROL', color='005272', members={dummy_user, other_user})
+    db.session.flush()
+
+    matrix = get_person_role_matrix(dummy_event)
+    assert sorted(matrix.persons) == sorted([
+        PersonRoles(chair.id, dummy_user.id, True, (), (), (), (contrib.id,), (), (dummy_reg.id,), (role.id,)),
+        PersonRoles(speaker.id, speaker_user.id, False, (), (), (contrib.id,), (contrib.id,), (subcontrib.id,), (), ()),
+    ])
+    assert sorted(matrix.role_members) == [
+        RoleMemberRoles(dummy_user.id, (role.id,), (dummy_reg.id,)),
+        RoleMemberRoles(other_user.id, (role.id,), ()),
+    ]
+    assert get_person_role_matrix(dummy_event, {speaker.id}).persons == [
+        PersonRoles(speaker.id, speaker_user.id, False, (), (), (contrib.id,), (contrib.id,), (subcontrib.id,), (), ()),
+    ]
+
+
+def test_get_person_role_matrix_cached(db, monkeypatch, dummy_event, dummy_user, create_event_person):
+    monkeypatch.setattr('indico.modules.events.persons.lists.PERSONS_LIST_CACHE_THRESHOLD', 1)
+    person = create_event_person(dummy_event, dummy_user)
+    flush_person_list_updates()
+    assert not get_person_role_matrix(dummy_event).persons[0].is_chairperson
+    dummy_event.person_links.append(EventPersonLink(person=person))
+    db.session.flush()
+    # cached until the change is committed
+    assert not get_person_role_matrix(dummy_event).persons[0].is_chairperson
+    flush_person_list_updates()
+    assert get_person_role_matrix(dummy_event).persons[0].is_chairperson
+
+
+def test_get_person_role_matrix_unrelated_change(db, dummy_event, dummy_contribution):
+    flush_person_list_updates()
+    get_person_role_matrix(dummy_event)
+    version = persons_list_cache.get(f'version-{dummy_event.id}')
+    # changes which do not affect any roles keep the cached matrix
+    dummy_event.title = 'Changed'
+    dummy_contribution.title = 'Changed'
+    db.session.flush()
+    flush_person_list_updates()
+    assert persons_list_cache.get(f'version-{dummy_event.id}') == version
+    # but deleting a contribution removes the roles of its persons
+    dummy_contribution.is_deleted = True
+    db.session.flush()
+    flush_person_list_updates()
+    assert persons_list_cache.get(f'version-{dummy_event.id}') != version
@@ -8,7 +8,6 @@
 from collections import namedtuple
 
 from reportlab.lib.units import cm
-from reportlab.lib.utils import ImageReader
 
 from indico.modules.designer import PageOrientation
 from indico.modules.designer.pdf import DesignerPDFBase
@@ -30,11 +29,9 @@ class PosterPDF(DesignerPDFBase):
         config = self.config
         tpl_data = self.tpl_data
 
-        if self.template.background_image:
-            with self.template.background_image.open() as f:
-                self._draw_background(canvas, ImageReader(self._remove_transparency(f)), tpl_data,
-                                      config.margin_horizontal, config.margin_vertical,
-                                      tpl_data.width_cm * cm, tpl_data.height_cm * cm)
+        if img_reader := self._get_background_image(self.template):
+            self._draw_background(canvas, img_reader, tpl_data, config.margin_horizontal, config.margin_vertical,
+                                  tpl_data.width_cm * cm, tpl_data.height_cm * cm)
 
         placeholders = get_placeholders(self.placeholders_context)
 
@@ -10,10 +10,10 @@ from collections import namedtuple
 from itertools import product
 
 from reportlab.lib.units import cm
-from reportlab.lib.utils import ImageReader
 from werkzeug.exceptions import BadRequest
 
 from indico.core import signals
+from indico.modules.designer import PageLayout
 from indico.modules.designer.pdf import DesignerPDFBase
 from indico.modules.designer.util import is_regform_field_placeholder
 from indico.modules.events.registration.settings import DEFAULT_BADGE_SETTINGS
@@ -23,6 +23,10 @@ from indico.util.signals import values_from_signal
 
 
 FONT_SIZE_RE = re.compile(r'(\d+)(pt)?')
+#: The number of badges above which the PDF is generated in the background
+BACKGROUND_BADGES_THRESHOLD = 200
+#: The approximate number of badges rendered in a single background task
+BADGES_CHUNK_SIZE = 100
 ConfigData = namedtuple('ConfigData', list(DEFAULT_BADGE_SETTINGS))
 
 
@@ -31,14 +35,35 @@ def _get_font_size(text):
 
 
 class RegistrantsListToBadgesPDF(DesignerPDFBase):
-    def __init__(self, template, config, event, registrations, include_accompanying_persons):
+    def __init__(self, template, config, event, registrations, include_accompanying_persons, *, persons_slice=None):
         super().__init__(template, config)
         from indico.modules.events.registration.util import get_persons
         self.persons = get_persons(registrations, include_accompanying_persons)
+        if persons_slice is not None:
+            self.persons = self.persons[persons_slice]
 
     def _build_config(self, config_data):
         return ConfigData(**config_data)
 
+    def _get_grid_size(self):
+        """Get the number of badges that fit on a page horizontally and vertically."""
+        config = self.config
+        available_width = self.width - (config.left_margin + config.right_margin + config.margin_columns) * cm
+        n_horizontal = int((available_width + config.margin_columns*cm) /
+                           ((self.tpl_data.width_cm + config.margin_columns) * cm))
+        available_height = self.height - (config.top_margin + config.bottom_margin + config.margin_rows) * cm
+        n_vertical = int((available_height + config.margin_rows*cm) /
+                         ((self.tpl_data.height_cm + config.margin_rows) * cm))
+
+        if not n_horizontal or not n_vertical:
+            raise BadRequest(_('The template dimensions are too large for the page size you selected'))
+        return n_horizontal, n_vertical
+
+    @property
+    def badges_per_page(self):
+        n_horizontal, n_vertical = self._get_grid_size()
+        return n_horizontal * n_vertical
+
     def _iter_position(self, canvas, n_horizonal, n_vertical):
         """Go over every possible position on the page."""
         config = self.config
@@ -50,17 +75,7 @@ class RegistrantsListToBadgesPDF(DesignerPDFBase):
             canvas.showPage()
 
     def _build_pdf(self, canvas):
-        config = self.config
-
-        available_width = self.width - (config.left_margin + config.right_margin + config.margin_columns) * cm
-        n_horizontal = int((available_width + config.margin_columns*cm) /
-                           ((self.tpl_data.width_cm + config.margin_columns) * cm))
-        available_height = self.height - (config.top_margin + config.bottom_margin + config.margin_rows) * cm
-        n_vertical = int((available_height + config.margin_rows*cm) /
-                         ((self.tpl_data.height_cm + config.margin_rows) * cm))
-
-        if not n_horizontal or not n_vertical:
-            raise BadRequest(_('The template dimensions are too large for the page size you selected'))
+        n_horizontal, n_vertical = self._get_grid_size()
 
         # Print a badge for each registration
         for person, (x, y) in zip(self.persons, self._iter_position(canvas, n_horizontal, n_vertical), strict=False):
@@ -83,9 +98,8 @@ class RegistrantsListToBadgesPDF(DesignerPDFBase):
             canvas.rect(*badge_rect)
             canvas.restoreState()
 
-        if template.background_image:
-            with template.background_image.open() as f:
-                self._draw_background(canvas, ImageReader(self._remove_transparency(f)), tpl_data, *badge_rect)
+        if img_reader := self._get_background_image(template):
+            self._draw_background(canvas, img_reader, tpl_data, *badge_rect)
 
         placeholders = get_placeholders(self.placeholders_context)
 
@@ -137,10 +151,12 @@ class RegistrantsListToBadgesPDF(DesignerPDFBase):
 
 
 class RegistrantsListToBadgesPDFFoldable(RegistrantsListToBadgesPDF):
-    def _build_pdf(self, canvas):
+    def _get_grid_size(self):
         # Only one badge per page
-        n_horizontal = 1
-        n_vertical = 1
+        return 1, 1
+
+    def _build_pdf(self, canvas):
+        n_horizontal, n_vertical = self._get_grid_size()
 
         for person, (x, y) in zip(self.persons, self._iter_position(canvas, n_horizontal, n_vertical), strict=False):
             self._draw_badge(canvas, person, self.template, self.tpl_data, x * cm, y * cm)
@@ -166,17 +182,7 @@ class RegistrantsListToBadgesPDFFoldable(RegistrantsListToBadgesPDF):
 
 class RegistrantsListToBadgesPDFDoubleSided(RegistrantsListToBadgesPDF):
     def _build_pdf(self, canvas):
-        config = self.config
-
-        available_width = self.width - (config.left_margin + config.right_margin + config.margin_columns) * cm
-        n_horizontal = int((available_width + config.margin_columns*cm) /
-                           ((self.tpl_data.width_cm + config.margin_columns) * cm))
-        available_height = self.height - (config.top_margin + config.bottom_margin + config.margin_rows) * cm
-        n_vertical = int((available_height + config.margin_rows*cm) /
-                         ((self.tpl_data.height_cm + config.margin_rows) * cm))
-
-        if not n_horizontal or not n_vertical:
-            raise BadRequest(_('The template dimensions are too large for the page size you selected'))
+        n_horizontal, n_vertical = self._get_grid_size()
 
         per_page = n_horizontal * n_vertical
         # make batch of as many badges as we can fit into one page and add duplicates for printing back sides
@@ -208,3 +214,40 @@ class RegistrantsListToBadgesPDFDoubleSided(RegistrantsListToBadgesPDF):
                 x_cm = (self.width - x*cm - self.tpl_data.width_cm*cm)
                 self._draw_badge(canvas, person, self.template.backside_template,
                                  self.backside_tpl_data, x_cm, y * cm)
+
+
+def get_badge_pdf_class(page_layout):
+    if page_layout == PageLayout.foldable:
+        return RegistrantsListToBadgesPDFFoldable
+    elif page_layout == PageLayout.double_sided:
+        return RegistrantsListToBadgesPDFDoubleSided
+    else:
+        return RegistrantsListToBadgesPDF
+
+
+def split_badge_persons(persons, per_page, chunk_size=BADGES_CHUNK_SIZE):
+    """Split the badges of a PDF into chunks which can be rendered separately.
+
+    The chunk size is rounded to a multiple of the number of badges per
+    page, so concatenating the PDFs of all chunks results in the same
+    pages as rendering all badges at once.
+
+    :param persons: The persons to print badges for, as returned by
+                    `get_persons`
+    :param per_page: The number of badges per page
+    :param chunk_size: The approximate number of badges per chunk
+    :return: A list of ``(registration_ids, persons_slice)`` tuples; the
+             slice selects the persons of the chunk from the persons of
+             the registrations in the chunk.
+    """
+    chunk_size = max(1, chunk_size // per_page) * per_page
+    chunks = []
+    for start in range(0, len(persons), chunk_size):
+        chunk = persons[start:start + chunk_size]
+        # a chunk may start with an accompanying person whose registration started in the previous chunk
+        skip = 0
+        while start - skip > 0 and persons[start - skip - 1]['registration'] == chunk[0]['registration']:
+            skip += 1
+        registration_ids = list(dict.fromkeys(person['registration'].id for person in chunk))
+        chunks.append((registration_ids, slice(skip, skip + len(chunk))))
+    return chunks
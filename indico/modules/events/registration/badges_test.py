@@ -0,0 +1,46 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from types import SimpleNamespace
+
+import pytest
+
+from indico.modules.events.registration.badges import split_badge_persons
+
+
+def _make_persons(accompanying):
+    persons = []
+    for id_, num_accompanying in enumerate(accompanying, 1):
+        registration = SimpleNamespace(id=id_)
+        persons.append({'id': id_, 'registration': registration, 'is_accompanying': False})
+        persons += [{'id': f'{id_}-{n}', 'registration': registration, 'is_accompanying': True}
+                    for n in range(num_accompanying)]
+    return persons
+
+
+@pytest.mark.parametrize(('per_page', 'chunk_size', 'expected_sizes'), (
+    (1, 5, [5, 5, 2]),
+    (4, 3, [4, 4, 4]),
+    (4, 9, [8, 4]),
+    (4, 100, [12]),
+))
+def test_split_badge_persons(per_page, chunk_size, expected_sizes):
+    persons = _make_persons([0, 2, 0, 3, 0, 1])
+    chunks = split_badge_persons(persons, per_page, chunk_size)
+    assert [s.stop - s.start for __, s in chunks] == expected_sizes
+    # rendering the chunks separately results in the same badges
+    by_id = {}
+    for person in persons:
+        by_id.setdefault(person['registration'].id, []).append(person)
+    rendered = []
+    for registration_ids, persons_slice in chunks:
+        rendered += [p for id_ in registration_ids for p in by_id[id_]][persons_slice]
+    assert rendered == persons
+
+
+def test_split_badge_persons_empty():
+    assert split_badge_persons([], 4) == []
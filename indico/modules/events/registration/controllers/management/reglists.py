@@ -10,10 +10,10 @@ import itertools
 import os
 import uuid
 from collections import defaultdict
-from contextlib import contextmanager
 from io import BytesIO
 from operator import attrgetter
 
+from celery.exceptions import TimeoutError
 from flask import flash, jsonify, redirect, render_template, request, session
 from pypdf import PdfWriter
 from sqlalchemy.orm import joinedload, subqueryload
@@ -22,6 +22,7 @@ from werkzeug.exceptions import BadRequest, Forbidden, NotFound
 
 from indico.core import signals
 from indico.core.cache import make_scoped_cache
+from indico.core.celery import AsyncResult
 from indico.core.config import config
 from indico.core.db import db
 from indico.core.errors import IndicoError, NoReportError
@@ -34,9 +35,7 @@ from indico.modules.designer.util import get_badge_format, get_inherited_templat
 from indico.modules.events import EventLogRealm
 from indico.modules.events.payment.util import toggle_registration_payment
 from indico.modules.events.registration import logger
-from indico.modules.events.registration.badges import (RegistrantsListToBadgesPDF,
-                                                       RegistrantsListToBadgesPDFDoubleSided,
-                                                       RegistrantsListToBadgesPDFFoldable)
+from indico.modules.events.registration.badges import BACKGROUND_BADGES_THRESHOLD, get_badge_pdf_class
 from indico.modules.events.registration.controllers import (CheckEmailMixin, RegistrationEditMixin,
                                                             UploadRegistrationFileMixin, UploadRegistrationPictureMixin)
 from indico.modules.events.registration.controllers.management import (RHManageRegFormBase, RHManageRegFormsBase,
@@ -52,13 +51,14 @@ from indico.modules.events.registration.notifications import (notify_registratio
                                                               notify_registration_state_update)
 from indico.modules.events.registration.placeholders.registrations import PicturePlaceholder
 from indico.modules.events.registration.settings import event_badge_settings
+from indico.modules.events.registration.tasks import get_badge_generation_job, start_badge_generation
 from indico.modules.events.registration.util import (ActionMenuEntry, create_registration,
-                                                     generate_spreadsheet_from_registrations,
                                                      get_flat_section_submission_data, get_initial_form_values,
                                                      get_registration_spreadsheet_column_formats,
-                                                     get_ticket_attachments, get_title_uuid, get_user_data,
-                                                     import_registrations_from_csv, load_registration_schema,
-                                                     make_registration_schema)
+                                                     get_registration_spreadsheet_headers, get_ticket_attachments,
+                                                     get_title_uuid, get_user_data, import_registrations_from_csv,
+                                                     iter_registration_spreadsheet_rows, iter_registrations_for_export,
+                                                     load_registration_schema, make_registration_schema)
 from indico.modules.events.registration.views import WPManageRegistration
 from indico.modules.events.util import ZipGeneratorMixin
 from indico.modules.logs import LogKind
@@ -266,18 +266,23 @@ class RHRegistrationsActionBase(RHManageRegFormBase):
     """Base class for classes performing actions on registrations."""
 
     registration_query_options = ()
+    #: Whether to load all selected registrations into ``self.registrations``.
+    #: When disabled, only ``self.registrations_query`` is available.
+    preload_registrations = True
 
     @use_kwargs({
         'registration_ids': fields.List(fields.Integer(), data_key='registration_id', load_default=lambda: []),
     })
     def _process_args(self, registration_ids):
         RHManageRegFormBase._process_args(self)
-        self.registrations = (Registration.query.with_parent(self.regform)
-                              .filter(Registration.id.in_(registration_ids),
-                                      ~Registration.is_deleted)
-                              .order_by(*Registration.order_by_name)
-                              .options(*self.registration_query_options)
-                              .all())
+        self.registrations_query = (Registration.query.with_parent(self.regform)
+                                    .filter(Registration.id.in_(registration_ids),
+                                            ~Registration.is_deleted))
+        if self.preload_registrations:
+            self.registrations = (self.registrations_query
+                                  .order_by(*Registration.order_by_name)
+                                  .options(*self.registration_query_options)
+                                  .all())
 
 
 class RHRegistrationEmailRegistrantsPreview(RHRegistrationsActionBase):
@@ -487,21 +492,33 @@ class RHRegistrationsExportPDFBook(RHRegistrationsExportBase):
         return send_file('RegistrantsBook.pdf', BytesIO(pdf.getPDFBin()), 'application/pdf')
 
 
-class RHRegistrationsExportCSV(RHRegistrationsExportBase):
+class RHRegistrationsExportSpreadsheetBase(RHRegistrationsExportBase):
+    """Base class for spreadsheet exports streaming the registrations in chunks."""
+
+    preload_registrations = False
+
+    def _get_spreadsheet_data(self):
+        regform_items = self.export_config['regform_items']
+        static_items = self.export_config['static_item_ids']
+        headers = get_registration_spreadsheet_headers(regform_items, static_items)
+        registrations = iter_registrations_for_export(self.registrations_query)
+        rows = iter_registration_spreadsheet_rows(registrations, regform_items, static_items)
+        return headers, rows
+
+
+class RHRegistrationsExportCSV(RHRegistrationsExportSpreadsheetBase):
     """Export registration list to a CSV file."""
 
     def _process(self):
-        headers, rows = generate_spreadsheet_from_registrations(self.registrations, self.export_config['regform_items'],
-                                                                self.export_config['static_item_ids'])
+        headers, rows = self._get_spreadsheet_data()
         return send_csv('registrations.csv', headers, rows)
 
 
-class RHRegistrationsExportExcel(RHRegistrationsExportBase):
+class RHRegistrationsExportExcel(RHRegistrationsExportSpreadsheetBase):
     """Export registration list to an XLSX file."""
 
     def _process(self):
-        headers, rows = generate_spreadsheet_from_registrations(self.registrations, self.export_config['regform_items'],
-                                                                self.export_config['static_item_ids'])
+        headers, rows = self._get_spreadsheet_data()
         column_formats = get_registration_spreadsheet_column_formats(self.export_config['regform_items'])
         return send_xlsx('registrations.xlsx', headers, rows, tz=self.event.tzinfo, column_formats=column_formats)
 
@@ -557,12 +574,7 @@ class RHRegistrationsPrintBadges(RHRegistrationsActionBase):
         config_params = badge_cache.get(request.view_args['uuid'])
         if not config_params:
             raise NotFound
-        if config_params['page_layout'] == PageLayout.foldable:
-            pdf_class = RegistrantsListToBadgesPDFFoldable
-        elif config_params['page_layout'] == PageLayout.double_sided:
-            pdf_class = RegistrantsListToBadgesPDFDoubleSided
-        else:
-            pdf_class = RegistrantsListToBadgesPDF
+        pdf_class = get_badge_pdf_class(config_params['page_layout'])
         registration_ids = config_params.pop('registration_ids')
         registrations = (Registration.query.with_parent(self.event)
                          .filter(Registration.id.in_(registration_ids),
@@ -578,6 +590,30 @@ class RHRegistrationsPrintBadges(RHRegistrationsActionBase):
         return send_file(f'{file_name_prefix}-{self.event.id}.pdf', pdf.get_pdf(), 'application/pdf')
 
 
+class RHRegistrationsBadgesStatus(RHManageRegFormBase):
+    """Get the status of a badge PDF generated in the background."""
+
+    ALLOW_LOCKED = True
+
+    def _process(self):
+        task_id = request.view_args['task_id']
+        job = get_badge_generation_job(task_id)
+        if job is None or job[0] != self.regform.id:
+            raise NotFound
+        res = AsyncResult(task_id)
+        try:
+            download_url = res.get(5, propagate=False)
+        except TimeoutError:
+            return jsonify(download_url=None, progress=job[1])
+        try:
+            if res.successful():
+                return jsonify(download_url=download_url, progress=1)
+            else:
+                raise IndicoError(_('Badge generation failed'))
+        finally:
+            res.forget()
+
+
 class RHRegistrationsConfigBadges(RHRegistrationsActionBase):
     """Print badges for the selected registrations."""
 
@@ -607,6 +643,21 @@ class RHRegistrationsConfigBadges(RHRegistrationsActionBase):
     def _set_event_badge_settings(self, event, data):
         event_badge_settings.set_multi(self.event, data)
 
+    def _generate_in_background(self, template_id, data):
+        template = DesignerTemplate.get_or_404(template_id)
+        registrations = (Registration.query.with_parent(self.regform)
+                         .filter(Registration.id.in_(data.pop('registration_ids')),
+                                 Registration.is_active)
+                         .order_by(*Registration.order_by_name)
+                         .all())
+        signals.event.designer.print_badge_template.send(template, regform=self.regform,
+                                                         registrations=registrations)
+        file_name_prefix = 'Tickets' if data.pop('is_ticket') else 'Badges'
+        task_id = start_badge_generation(template, data, self.regform, registrations,
+                                         f'{file_name_prefix}-{self.event.id}.pdf')
+        return jsonify_data(flash=False,
+                            badges_status_url=url_for('.registrations_badges_status', self.regform, task_id=task_id))
+
     def _process(self):
         all_templates = set(self.event.designer_templates) | get_inherited_templates(self.event)
         badge_templates = {tpl.id: {
@@ -638,6 +689,8 @@ class RHRegistrationsConfigBadges(RHRegistrationsActionBase):
                 self._set_event_badge_settings(self.event, data)
             data['registration_ids'] = [x.id for x in registrations]
             data['is_ticket'] = self.TICKET_BADGES
+            if len(registrations) > BACKGROUND_BADGES_THRESHOLD:
+                return self._generate_in_background(int(template_id), data)
 
             key = str(uuid.uuid4())
             badge_cache.set(key, data, timeout=1800)
@@ -1055,14 +1108,15 @@ class RHRegistrationsExportReceipts(ZipGeneratorMixin, RHRegistrationsActionBase
             outputbuf.seek(0)
             yield _FileWrapper(outputbuf, f'{template.title}-{template.id}.pdf')
 
-    @contextmanager
-    def _get_item_path(self, item):
+    def _get_item_opener(self, item):
         if isinstance(item, _FileWrapper):
-            yield item.content
-            return
+            return lambda: BytesIO(item.content.getvalue())
+        return ZipGeneratorMixin._get_item_opener(self, item[1])
 
-        with item[1].get_local_path() as path:
-            yield path
+    def _get_item_size(self, item):
+        if isinstance(item, _FileWrapper):
+            return len(item.content.getvalue())
+        return item[1].size
 
     @use_kwargs({
         'combined': fields.Bool(load_default=False),
@@ -6,24 +6,39 @@
 # LICENSE file for more details.
 
 from collections import defaultdict
+from datetime import timedelta
+from io import BytesIO
+from uuid import uuid4
 
+from celery import chord
 from celery.schedules import crontab
+from pypdf import PdfWriter
+from sqlalchemy.orm import subqueryload
 
 from indico.core import signals
+from indico.core.cache import make_scoped_cache
 from indico.core.celery import celery
+from indico.core.config import config
 from indico.core.db import db
 from indico.core.storage.backend import get_storage
+from indico.modules.designer.models.templates import DesignerTemplate
 from indico.modules.events import Event
 from indico.modules.events.registration import logger
+from indico.modules.events.registration.badges import get_badge_pdf_class, split_badge_persons
 from indico.modules.events.registration.models.form_fields import RegistrationFormField, RegistrationFormFieldData
 from indico.modules.events.registration.models.forms import RegistrationForm
 from indico.modules.events.registration.models.registrations import Registration, RegistrationData
-from indico.modules.events.registration.util import close_registration
+from indico.modules.events.registration.util import close_registration, get_persons
+from indico.modules.files.models.files import File
 from indico.modules.receipts.models.files import ReceiptFile
 from indico.util.date_time import now_utc
 from indico.util.string import snakify_keys
 
 
+badge_generation_cache = make_scoped_cache('badge-generation')
+BADGE_GENERATION_TTL = timedelta(hours=2)
+
+
 def _delete_file(reg_data):
     if reg_data.storage_file_id is None:
         return
@@ -118,3 +133,78 @@ def delete_previous_registration_file(registration_id, field_data_id, storage_ba
     logger.debug('Deleting registration file: %s from %s storage', storage_file_id, storage_backend)
     storage = get_storage(storage_backend)
     storage.delete(storage_file_id)
+
+
+def start_badge_generation(template, config_params, regform, registrations, filename):
+    """Generate a badge PDF in the background.
+
+    The badges are split into chunks which are rendered in parallel by
+    the Celery workers and then merged into a single PDF.  The progress
+    of the job can be retrieved using `get_badge_generation_job`.
+
+    :param template: The badge `DesignerTemplate`
+    :param config_params: The badge printing settings
+    :param regform: The `RegistrationForm` of the registrations
+    :param registrations: The registrations to print badges for
+    :param filename: The filename of the generated PDF
+    :return: The ID of the Celery task returning the download URL of
+             the PDF.
+    """
+    pdf_class = get_badge_pdf_class(config_params['page_layout'])
+    per_page = pdf_class(template, config_params, regform.event, [], False).badges_per_page
+    persons = get_persons(registrations, regform.tickets_for_accompanying_persons)
+    task_id = str(uuid4())
+    badge_generation_cache.set_many({task_id: {'regform_id': regform.id, 'total': len(persons)},
+                                     f'{task_id}-done': 0},
+                                    BADGE_GENERATION_TTL)
+    header = [render_badges_chunk.s(task_id, template.id, config_params, regform.id, registration_ids, persons_slice)
+              for registration_ids, persons_slice in split_badge_persons(persons, per_page)]
+    chord(header)(merge_badge_chunks.s(regform.event.id, filename).set(task_id=task_id))
+    return task_id
+
+
+def get_badge_generation_job(task_id):
+    """Get the registration form ID and progress of a background badge generation job.
+
+    :return: A ``(regform_id, progress)`` tuple, where the progress is the
+             fraction of badges rendered so far, or ``None`` if the job
+             does not exist or has expired.
+    """
+    job, done = badge_generation_cache.get_many(task_id, f'{task_id}-done')
+    if job is None:
+        return None
+    progress = min(1, (done or 0) / job['total']) if job['total'] else 1
+    return job['regform_id'], progress
+
+
+@celery.task(ignore_result=False)
+def render_badges_chunk(task_id, template_id, config_params, regform_id, registration_ids, persons_slice):
+    template = DesignerTemplate.get(template_id)
+    regform = RegistrationForm.get(regform_id)
+    positions = {id_: n for n, id_ in enumerate(registration_ids)}
+    registrations = (Registration.query.with_parent(regform)
+                     .filter(Registration.id.in_(registration_ids))
+                     .options(subqueryload('data').joinedload('field_data'))
+                     .all())
+    registrations.sort(key=lambda r: positions[r.id])
+    pdf_class = get_badge_pdf_class(config_params['page_layout'])
+    pdf = pdf_class(template, config_params, regform.event, registrations, regform.tickets_for_accompanying_persons,
+                    persons_slice=persons_slice)
+    data = pdf.get_pdf().getvalue()
+    badge_generation_cache.inc(f'{task_id}-done', len(pdf.persons))
+    return data
+
+
+@celery.task(ignore_result=False)
+def merge_badge_chunks(chunks, event_id, filename):
+    writer = PdfWriter()
+    for data in chunks:
+        writer.append(BytesIO(data))
+    buf = BytesIO()
+    writer.write(buf)
+    buf.seek(0)
+    f = File(filename=filename, content_type='application/pdf', meta={'event_id': event_id})
+    f.save(('event', event_id, 'badges'), buf, backend=config.STATIC_SITE_STORAGE)
+    db.session.add(f)
+    db.session.commit()
+    return f.signed_download_url
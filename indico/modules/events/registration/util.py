@@ -19,7 +19,7 @@ from marshmallow import RAISE, ValidationError, fields, validates
 from PIL import Image, ImageOps
 from qrcode import QRCode, constants
 from sqlalchemy import and_, or_
-from sqlalchemy.orm import contains_eager, joinedload, load_only, undefer
+from sqlalchemy.orm import contains_eager, joinedload, load_only, selectinload, undefer
 
 from indico.core import signals
 from indico.core.config import config
@@ -575,15 +575,8 @@ def get_registration_spreadsheet_column_formats(regform_items):
     }
 
 
-def generate_spreadsheet_from_registrations(registrations, regform_items, static_items):
-    """Generate a spreadsheet data from a given registration list.
-
-    :param registrations: The list of registrations to include in the file
-    :param regform_items: The registration form items to be used as columns
-    :param static_items: Registration form information as extra columns
-    """
-    field_names = ['ID', 'Name']
-    special_item_mapping = {
+def _get_spreadsheet_special_items():
+    return {
         'reg_date': ('Registration date', lambda x: x.submitted_dt),
         'state': ('Registration state', lambda x: x.state.title),
         'price': ('Price', lambda x: x.render_price()),
@@ -595,13 +588,33 @@ def generate_spreadsheet_from_registrations(registrations, regform_items, static
                                                     else '')),
         'tags_present': ('Tags', lambda x: [t.title for t in x.tags] if x.tags else ''),
     }
+
+
+def get_registration_spreadsheet_headers(regform_items, static_items):
+    """Get the column headers for a registration spreadsheet.
+
+    :param regform_items: The registration form items to be used as columns
+    :param static_items: Registration form information as extra columns
+    """
+    field_names = ['ID', 'Name']
     for item in regform_items:
         field_names.append(unique_col(item.title, item.id))
         if item.input_type == 'accommodation':
             field_names.append(unique_col('{} ({})'.format(item.title, 'Arrival'), item.id))
             field_names.append(unique_col('{} ({})'.format(item.title, 'Departure'), item.id))
-    field_names.extend(title for name, (title, fn) in special_item_mapping.items() if name in static_items)
-    rows = []
+    field_names.extend(title for name, (title, fn) in _get_spreadsheet_special_items().items()
+                       if name in static_items)
+    return field_names
+
+
+def iter_registration_spreadsheet_rows(registrations, regform_items, static_items):
+    """Generate the spreadsheet rows for the given registrations.
+
+    :param registrations: An iterable of registrations to include in the file
+    :param regform_items: The registration form items to be used as columns
+    :param static_items: Registration form information as extra columns
+    """
+    special_item_mapping = _get_spreadsheet_special_items()
     for registration in registrations:
         data = registration.data_by_field
         registration_dict = {
@@ -633,10 +646,56 @@ def generate_spreadsheet_from_registrations(registrations, regform_items, static
                 continue
             value = fn(registration)
             registration_dict[title] = value
-        rows.append(registration_dict)
+        yield registration_dict
+
+
+def generate_spreadsheet_from_registrations(registrations, regform_items, static_items):
+    """Generate a spreadsheet data from a given registration list.
+
+    For large exports, use :func:`get_registration_spreadsheet_headers` and
+    :func:`iter_registration_spreadsheet_rows` instead, which do not keep
+    all rows in memory.
+
+    :param registrations: The list of registrations to include in the file
+    :param regform_items: The registration form items to be used as columns
+    :param static_items: Registration form information as extra columns
+    """
+    field_names = get_registration_spreadsheet_headers(regform_items, static_items)
+    rows = list(iter_registration_spreadsheet_rows(registrations, regform_items, static_items))
     return field_names, rows
 
 
+def iter_registrations_for_export(query, chunk_size=500):
+    """Iterate over registrations in chunks with their data eager-loaded.
+
+    The registrations are ordered by name and loaded using keyset pagination,
+    so only one chunk needs to be in memory at any time no matter how many
+    registrations the query returns.
+
+    :param query: A query returning registrations; it must not be ordered
+    :param chunk_size: The number of registrations to load at once
+    """
+    sort_key = Registration.order_by_name
+    query = (query
+             .add_columns(*sort_key)
+             .order_by(*sort_key)
+             .options(selectinload(Registration.data).joinedload(RegistrationData.field_data),
+                      selectinload(Registration.tags),
+                      joinedload(Registration.transaction))
+             .limit(chunk_size))
+    last_key = None
+    while True:
+        chunk_query = query
+        if last_key is not None:
+            chunk_query = chunk_query.filter(db.tuple_(*sort_key) > db.tuple_(*last_key))
+        chunk = chunk_query.all()
+        for registration, *__ in chunk:
+            yield registration
+        if len(chunk) < chunk_size:
+            break
+        last_key = tuple(chunk[-1])[1:]
+
+
 def get_registrations_with_tickets(user, event):
     query = (Registration.query.with_parent(event)
              .filter(Registration.user == user,
@@ -5,7 +5,7 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 from dataclasses import dataclass
 from io import BytesIO
 from itertools import groupby
@@ -258,6 +258,111 @@ def get_category_timetable(categ_ids, start_dt, end_dt, detail_level='event', tz
     return result
 
 
+TimetableRow = namedtuple('TimetableRow', ('event_id', 'type', 'object_id', 'start_dt', 'local_date'))
+
+
+def get_category_timetable_rows(categ_ids, start_dt, end_dt, detail_level='event', tz=utc, from_categ=None):
+    """Retrieve the events and timetable entries within a time interval in a set of categories.
+
+    Unlike :func:`get_category_timetable`, this only fetches the columns
+    needed to know which timetable entries take place on which day, with
+    the date in the given timezone being calculated in the database.
+    The objects of these entries can be loaded when they are actually
+    needed using :func:`load_timetable_objects`.
+
+    :param categ_ids: iterable containing list of category IDs
+    :param start_dt: start of search interval (``datetime``, expected
+                     to be in display timezone)
+    :param end_dt: end of search interval (``datetime`` in expected
+                   to be in display timezone)
+    :param detail_level: the level of detail of information
+                         (``event|session|contribution``)
+    :param tz: the ``timezone`` used to determine the date of entries
+    :param from_categ: ``Category`` that will be taken into account to calculate
+                       visibility
+    :return: a ``(events, rows)`` tuple containing the list of events and
+             a dict mapping event ids to a list of `TimetableRow` tuples
+             sorted by their start time.
+    """
+    day_start = start_dt.astimezone(utc)
+    day_end = end_dt.astimezone(utc)
+    dates_overlap = lambda t: (t.start_dt >= day_start) & (t.start_dt <= day_end)
+    # like in `get_category_timetable`, events with timetable entries in the interval are
+    # included even if the event itself (e.g. due to outdated dates) does not overlap it
+    query = (Event.query
+             .filter(Event.category_chain_overlaps(categ_ids),
+                     ~Event.is_deleted,
+                     (Event.happens_between(day_start, day_end) |
+                      Event.timetable_entries.any(dates_overlap(TimetableEntry))))
+             .options(subqueryload(Event.person_links).joinedload(EventPersonLink.person),
+                      joinedload(Event.own_room).noload('owner'),
+                      joinedload(Event.own_venue),
+                      joinedload(Event.category).undefer('effective_icon_data'),
+                      undefer('effective_protection_mode')))
+    if from_categ:
+        query = query.filter(Event.is_visible_in(from_categ.id))
+    events = query.all()
+    rows = defaultdict(list)
+    if detail_level == 'event' or not events:
+        return events, rows
+
+    types = {TimetableEntryType.SESSION_BLOCK}
+    if detail_level == 'contribution':
+        types |= {TimetableEntryType.CONTRIBUTION, TimetableEntryType.BREAK}
+    query = (db.session.query(TimetableEntry.event_id,
+                              TimetableEntry.type,
+                              db.func.coalesce(TimetableEntry.session_block_id, TimetableEntry.contribution_id,
+                                               TimetableEntry.break_id),
+                              TimetableEntry.start_dt,
+                              cast(TimetableEntry.start_dt.astimezone(tz), Date))
+             .outerjoin(SessionBlock, SessionBlock.id == TimetableEntry.session_block_id)
+             .outerjoin(Session, Session.id == SessionBlock.session_id)
+             .outerjoin(Contribution, Contribution.id == TimetableEntry.contribution_id)
+             .filter(TimetableEntry.event_id.in_({e.id for e in events}),
+                     TimetableEntry.type.in_(types),
+                     dates_overlap(TimetableEntry),
+                     ~db.func.coalesce(Session.is_deleted, False),
+                     ~db.func.coalesce(Contribution.is_deleted, False))
+             .order_by(TimetableEntry.start_dt, TimetableEntry.id))
+    for row in map(TimetableRow._make, query):
+        rows[row.event_id].append(row)
+    return events, rows
+
+
+def load_timetable_objects(rows):
+    """Load the objects referenced by timetable rows.
+
+    :param rows: An iterable of `TimetableRow` tuples
+    :return: a dict mapping ``(type, object_id)`` tuples to the session
+             block, contribution or break
+    """
+    ids = defaultdict(set)
+    for row in rows:
+        ids[row.type].add(row.object_id)
+    queries = {
+        TimetableEntryType.SESSION_BLOCK: (
+            SessionBlock.query
+            .filter(SessionBlock.id.in_(ids[TimetableEntryType.SESSION_BLOCK]))
+            .options(joinedload(SessionBlock.timetable_entry),
+                     subqueryload('session').joinedload('blocks').joinedload('person_links'))
+        ),
+        TimetableEntryType.CONTRIBUTION: (
+            Contribution.query
+            .filter(Contribution.id.in_(ids[TimetableEntryType.CONTRIBUTION]))
+            .options(joinedload(Contribution.timetable_entry),
+                     joinedload(Contribution.person_links))
+        ),
+        TimetableEntryType.BREAK: (
+            Break.query
+            .filter(Break.id.in_(ids[TimetableEntryType.BREAK]))
+            .options(joinedload(Break.timetable_entry))
+        ),
+    }
+    return {(type_, obj.id): obj
+            for type_, query in queries.items() if ids[type_]
+            for obj in query}
+
+
 def render_entry_info_balloon(entry, editable=False, sess=None, is_session_timetable=False):
     if entry.break_:
         return render_template('events/timetable/balloons/break.html', break_=entry.break_, editable=editable,
@@ -5,12 +5,16 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
 import pytest
+import pytz
 from pytz import utc
 
-from indico.modules.events.timetable.util import find_latest_entry_end_dt
+from indico.modules.events.timetable.models.breaks import Break
+from indico.modules.events.timetable.models.entries import TimetableEntry, TimetableEntryType
+from indico.modules.events.timetable.util import (find_latest_entry_end_dt, get_category_timetable_rows,
+                                                  load_timetable_objects)
 
 
 @pytest.mark.parametrize(('event_start_dt', 'event_end_dt', 'day', 'valid'), (
@@ -27,3 +31,55 @@ def test_find_latest_entry_end_dt_valid_day(dummy_event, event_start_dt, event_e
     if not valid:
         with pytest.raises(ValueError):
             find_latest_entry_end_dt(obj=dummy_event, day=day)
+
+
+def test_get_category_timetable_rows(db, create_event, create_contribution, dummy_category):
+    tz = pytz.timezone('Europe/Zurich')
+    event = create_event(start_dt=datetime(2016, 1, 2, 8, tzinfo=utc), end_dt=datetime(2016, 1, 3, 23, tzinfo=utc))
+    create_event(start_dt=datetime(2016, 2, 2, 8, tzinfo=utc), end_dt=datetime(2016, 2, 2, 9, tzinfo=utc))
+    contrib = create_contribution(event, 'Late')
+    other_contrib = create_contribution(event, 'Early')
+    deleted_contrib = create_contribution(event, 'Deleted')
+    break_ = Break(title='Coffee', duration=timedelta(minutes=30))
+    db.session.add_all([
+        # 23:30 UTC is already the next day in Zurich
+        TimetableEntry(event=event, contribution=contrib, start_dt=datetime(2016, 1, 2, 23, 30, tzinfo=utc)),
+        TimetableEntry(event=event, contribution=other_contrib, start_dt=datetime(2016, 1, 2, 9, tzinfo=utc)),
+        TimetableEntry(event=event, contribution=deleted_contrib, start_dt=datetime(2016, 1, 2, 10, tzinfo=utc)),
+        TimetableEntry(event=event, break_=break_, start_dt=datetime(2016, 1, 2, 12, tzinfo=utc)),
+    ])
+    deleted_contrib.is_deleted = True
+    db.session.flush()
+    start_dt = tz.localize(datetime(2016, 1, 1))
+    end_dt = tz.localize(datetime(2016, 1, 8))
+
+    events, rows = get_category_timetable_rows([dummy_category.id], start_dt, end_dt, tz=tz)
+    assert events == [event]
+    assert not rows
+
+    events, rows = get_category_timetable_rows([dummy_category.id], start_dt, end_dt, 'contribution', tz=tz)
+    assert events == [event]
+    assert [(row.type, row.object_id, row.local_date) for row in rows[event.id]] == [
+        (TimetableEntryType.CONTRIBUTION, other_contrib.id, date(2016, 1, 2)),
+        (TimetableEntryType.BREAK, break_.id, date(2016, 1, 2)),
+        (TimetableEntryType.CONTRIBUTION, contrib.id, date(2016, 1, 3)),
+    ]
+    objects = load_timetable_objects(rows[event.id])
+    assert objects == {(TimetableEntryType.CONTRIBUTION, other_contrib.id): other_contrib,
+                       (TimetableEntryType.BREAK, break_.id): break_,
+                       (TimetableEntryType.CONTRIBUTION, contrib.id): contrib}
+
+    events, rows = get_category_timetable_rows([dummy_category.id], start_dt, end_dt, 'session', tz=tz)
+    assert not rows
+
+
+def test_get_category_timetable_rows_entries_outside_event(db, create_event, create_contribution, dummy_category):
+    # an entry within the interval includes the event even if its dates are outside it
+    event = create_event(start_dt=datetime(2016, 2, 2, 8, tzinfo=utc), end_dt=datetime(2016, 2, 2, 9, tzinfo=utc))
+    contrib = create_contribution(event, 'Outdated')
+    db.session.add(TimetableEntry(event=event, contribution=contrib, start_dt=datetime(2016, 1, 5, 9, tzinfo=utc)))
+    db.session.flush()
+    events, rows = get_category_timetable_rows([dummy_category.id], datetime(2016, 1, 1, tzinfo=utc),
+                                               datetime(2016, 1, 8, tzinfo=utc), 'contribution')
+    assert events == [event]
+    assert [row.object_id for row in rows[event.id]] == [contrib.id]
@@ -13,11 +13,11 @@ import warnings
 from collections import defaultdict
 from contextlib import contextmanager
 from copy import deepcopy
+from functools import partial
 from io import BytesIO
 from mimetypes import guess_extension
 from tempfile import NamedTemporaryFile
 from urllib.parse import urlsplit
-from zipfile import ZipFile
 
 from flask import current_app, flash, g, redirect, request, session
 from sqlalchemy import inspect
@@ -54,7 +54,8 @@ from indico.util.i18n import _
 from indico.util.iterables import materialize_iterable
 from indico.util.string import strip_tags
 from indico.util.user import principal_from_identifier
-from indico.web.flask.util import send_file, url_for
+from indico.util.zipstream import ZipStream
+from indico.web.flask.util import send_stream, url_for
 from indico.web.forms.colors import get_colors
 
 
@@ -711,34 +712,85 @@ class ZipGeneratorMixin:
         yield from files_holder
 
     def _get_item_path(self, item):
+        """Get a context manager providing a local path to an item's file.
+
+        This is only used if a subclass still overrides it instead of
+        `_get_item_opener`.  Besides a path, the context manager may also
+        provide a `BytesIO` with the file's content.
+        """
         return item.get_local_path()
 
+    @property
+    def _uses_item_path(self):
+        return type(self)._get_item_path is not ZipGeneratorMixin._get_item_path
+
+    @contextmanager
+    def _open_item_path(self, item):
+        with self._get_item_path(item) as path:
+            if isinstance(path, BytesIO):
+                yield BytesIO(path.getvalue())
+                return
+            with open(path, 'rb') as f:
+                yield f
+
+    def _get_item_opener(self, item):
+        """Get a callable returning a file-like object for an item.
+
+        The zip file is generated after the request has been committed, so
+        everything needed to open the file is retrieved in advance to avoid
+        reloading each item from the database.
+        """
+        if self._uses_item_path:
+            return partial(self._open_item_path, item)
+        return partial(item.storage.open, item.storage_file_id)
+
+    def _get_item_size(self, item):
+        if self._uses_item_path:
+            # the file from a custom path may differ from the stored one
+            return None
+        return item.size
+
+    def _build_zip_stream(self, files_holder):
+        """Build a streamed zip file containing the files passed.
+
+        :param files_holder: An iterable (or an iterable containing) object that
+                             contains the files to be added in the zip file.
+        """
+        zip_stream = ZipStream()
+        self.used_filenames = set()
+        for item in self._iter_items(files_holder):
+            name = self._prepare_folder_structure(item)
+            self.used_filenames.add(name)
+            zip_stream.add_file(name, self._get_item_opener(item), self._get_item_size(item))
+        return zip_stream
+
     def _generate_zip_file(self, files_holder, name_prefix='material', name_suffix=None, return_file=False):
-        """Generate a zip file containing the files passed.
+        """Send a zip file containing the files passed.
+
+        The zip file is generated while it is being sent, so even large
+        files can be downloaded right away.
 
         :param files_holder: An iterable (or an iterable containing) object that
                              contains the files to be added in the zip file.
         :param name_prefix: The prefix to the zip file name
         :param name_suffix: The suffix to the zip file name
-        :param return_file: Return the temp file instead of a response
+        :param return_file: Return a temp file containing the zip file instead
+                            of a response; use `_build_zip_stream` to avoid
+                            writing the file to disk
         """
-        temp_file = NamedTemporaryFile(suffix='.zip', dir=config.TEMP_DIR, delete=False)  # noqa: SIM115
-        with ZipFile(temp_file.name, 'w', allowZip64=True) as zip_handler:
-            self.used_filenames = set()
-            for item in self._iter_items(files_holder):
-                name = self._prepare_folder_structure(item)
-                self.used_filenames.add(name)
-                with self._get_item_path(item) as filepath:
-                    if isinstance(filepath, BytesIO):
-                        zip_handler.writestr(name, filepath.getvalue())
-                    else:
-                        zip_handler.write(filepath, name)
-
-        zip_file_name = f'{name_prefix}-{name_suffix}.zip' if name_suffix else f'{name_prefix}.zip'
-        chmod_umask(temp_file.name)
+        zip_stream = self._build_zip_stream(files_holder)
         if return_file:
+            temp_file = NamedTemporaryFile(suffix='.zip', dir=config.TEMP_DIR, delete=False)  # noqa: SIM115
+            for chunk in zip_stream:
+                temp_file.write(chunk)
+            temp_file.seek(0)
+            chmod_umask(temp_file.name)
             return temp_file
-        return send_file(zip_file_name, temp_file.name, 'application/zip', inline=False)
+        # make sure missing files fail before we start sending a (then incomplete) zip file
+        zip_stream.check()
+        zip_file_name = f'{name_prefix}-{name_suffix}.zip' if name_suffix else f'{name_prefix}.zip'
+        return send_stream(zip_file_name, zip_stream, 'application/zip', inline=False,
+                           content_length=zip_stream.content_length)
 
     def _prepare_folder_structure(self, item):
         file_name = secure_filename(f'{item.id}_{item.filename}', str(item.id))
@@ -5,9 +5,15 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
+import os
+from contextlib import contextmanager
+from io import BytesIO
+from types import SimpleNamespace
+from zipfile import ZipFile
+
 import pytest
 
-from indico.modules.events.util import get_event_from_url
+from indico.modules.events.util import ZipGeneratorMixin, get_event_from_url
 
 
 @pytest.mark.parametrize(('url', 'asserted_error_message'), (
@@ -23,3 +29,25 @@ def test_get_event_from_url_raises_value_error(url, asserted_error_message):
 def test_get_event_from_url_returns_event(dummy_event):
     event = get_event_from_url(f'http://localhost/event/{dummy_event.id}')
     assert event == dummy_event
+
+
+def test_zip_generator_item_path(patch_indico_config, tmp_path):
+    # subclasses overriding the old `_get_item_path` hook keep working
+    class _ZipGenerator(ZipGeneratorMixin):
+        @contextmanager
+        def _get_item_path(self, item):
+            if item.id == 1:
+                yield BytesIO(b'in memory')
+                return
+            path = tmp_path / item.filename
+            path.write_bytes(b'on disk')
+            yield str(path)
+
+    patch_indico_config('TEMP_DIR', str(tmp_path))
+    items = [SimpleNamespace(id=1, filename='a.txt'), SimpleNamespace(id=2, filename='b.txt')]
+    temp_file = _ZipGenerator()._generate_zip_file(items, return_file=True)
+    with ZipFile(temp_file) as zip_file:
+        assert zip_file.read('1_a.txt') == b'in memory'
+        assert zip_file.read('2_b.txt') == b'on disk'
+    temp_file.close()
+    os.unlink(temp_file.name)
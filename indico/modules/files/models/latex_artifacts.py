@@ -0,0 +1,47 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from uuid import uuid4
+
+from indico.core.config import config
+from indico.core.db import db
+from indico.core.db.sqlalchemy import UTCDateTime
+from indico.core.storage import StoredFileMixin
+from indico.util.date_time import now_utc
+from indico.util.string import format_repr
+
+
+class LatexArtifact(StoredFileMixin, db.Model):
+    """A PDF compiled from LaTeX, identified by a hash of its sources.
+
+    A row is only created once the PDF has been stored completely, so any
+    artifact in the database can be retrieved from the storage backend.
+    """
+
+    __tablename__ = 'latex_artifacts'
+    __table_args__ = {'schema': 'indico'}
+
+    #: The hash of the LaTeX sources and assets
+    source_hash = db.Column(
+        db.String,
+        primary_key=True
+    )
+    #: The last time the PDF has been used (updated at most once a day)
+    last_used_dt = db.Column(
+        UTCDateTime,
+        nullable=False,
+        index=True,
+        default=now_utc
+    )
+
+    def _build_storage_path(self):
+        # a unique name so concurrent compiles never write to the same file
+        path = f'latex-pdfs/{self.source_hash[:2]}/{self.source_hash}-{uuid4().hex[:8]}.pdf'
+        return config.LATEX_PDF_STORAGE, path
+
+    def __repr__(self):
+        return format_repr(self, 'source_hash', 'last_used_dt')
@@ -0,0 +1,39 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from datetime import timedelta
+
+import pytest
+
+from indico.legacy.pdfinterface.latex import get_latex_artifact_store
+from indico.modules.files.models.latex_artifacts import LatexArtifact
+from indico.util.date_time import now_utc
+
+
+@pytest.mark.usefixtures('db')
+def test_latex_artifact_store(patch_indico_config, tmp_path):
+    patch_indico_config('LATEX_PDF_STORAGE', 'default')
+    store = get_latex_artifact_store()
+    source = tmp_path / 'source.pdf'
+    source.write_bytes(b'%PDF-test')
+    target = tmp_path / 'target.pdf'
+
+    assert not store.retrieve('abc123', target)
+    store.store('abc123', source)
+    assert LatexArtifact.query.count() == 1
+    assert store.retrieve('abc123', target)
+    assert target.read_bytes() == b'%PDF-test'
+
+    # a corrupted file is never served
+    artifact = LatexArtifact.query.one()
+    artifact.md5 = 'x'
+    assert not store.retrieve('abc123', target)
+
+    assert not store.cleanup(timedelta(days=1))
+    artifact.last_used_dt = now_utc() - timedelta(days=2)
+    assert store.cleanup(timedelta(days=1)) == {'abc123'}
+    assert not LatexArtifact.query.count()
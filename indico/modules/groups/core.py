@@ -225,16 +225,24 @@ class _MultipassGroupProxy(GroupProxy):
             # provider not found or setting not found
             return DEFAULT_GROUP_CACHE_TTL
 
+    def _get_membership_key(self, user):
+        return f'{self.provider}:{self.name}:{user.id}'
+
     def has_member(self, user):
         if not user:
             return False
-        key = f'{self.provider}:{self.name}:{user.id}'
+        key = self._get_membership_key(user)
         # Before hitting the redis-based cache, check if we have it cached on `g`; that way
         # we greatly improve performance whenever we have a very large amount of membership
         # checks, e.g. when someone exports a large category to iCal, and the Indico instance
         # makes heavy use of multipass groups for event/category access control.
         if (rv := g.setdefault('group_membership_cache', {}).get(key)) is not None:
             return rv
+        # If the provider allows it, we get all the groups of the user at once, so any
+        # other membership check for the same provider does not need to query it again.
+        if (names := _get_user_multipass_groups(user).get(self.provider)) is not None:
+            rv = g.group_membership_cache[key] = self.name.lower() in names
+            return rv
         rv = group_membership_cache.get(key)
         if rv is not None:
             return rv
@@ -282,3 +290,98 @@ class _MultipassGroupProxy(GroupProxy):
 
     def __repr__(self):
         return f'<MultipassGroupProxy({self.provider}, {self.name})>'
+
+
+def _get_identity_group_cache_ttl(provider):
+    ttl = provider.settings.get('group_cache_ttl', DEFAULT_GROUP_CACHE_TTL)
+    return ttl if ttl is None or isinstance(ttl, int) else ttl[0]
+
+
+def _get_user_multipass_groups(user):
+    """Get the names of all groups the user is in, for each provider supporting it.
+
+    Only identity providers where ``bulk_group_membership`` is enabled in
+    the settings are included.
+
+    :return: A dict mapping provider names to sets of lowercase group names
+    """
+    request_cache = g.setdefault('user_multipass_groups_cache', {})
+    if (rv := request_cache.get(user.id)) is not None:
+        return rv
+    providers = {}
+    for identity in user.identities:
+        provider = multipass.identity_providers.get(identity.provider)
+        if (provider is not None and provider.supports_get_identity_groups and
+                provider.settings.get('bulk_group_membership')):
+            providers.setdefault(provider.name, []).append(identity.identifier)
+    keys = {name: f'user-groups:{name}:{user.id}' for name in providers}
+    rv = {name: names for name, names in zip(keys, group_membership_cache.get_many(*keys.values()), strict=True)
+          if names is not None}
+    for name, identifiers in providers.items():
+        if name in rv:
+            continue
+        provider = multipass.identity_providers[name]
+        try:
+            rv[name] = frozenset(group.name.lower()
+                                 for identifier in identifiers
+                                 for group in provider.get_identity_groups(identifier))
+        except MultipassException as e:
+            warn(f'Could not retrieve groups of {user} from {name}: {e}', stacklevel=2)
+            continue
+        if ttl := _get_identity_group_cache_ttl(provider):
+            group_membership_cache.set(keys[name], rv[name], timeout=ttl)
+    request_cache[user.id] = rv
+    return rv
+
+
+def get_group_memberships(user, groups, *, lookup_missing=True):
+    """Check whether a user is a member of many groups at once.
+
+    Instead of checking each group individually, the cached results for
+    all groups are retrieved using a single cache lookup.  For identity
+    providers with ``bulk_group_membership`` enabled, all groups of the
+    user are retrieved from the provider at once (and cached) instead of
+    checking the membership in each group.
+
+    The results are stored in the same per-request cache used by
+    :meth:`GroupProxy.has_member`, so subsequent ``user in group`` checks
+    (e.g. in ACL checks) for any of these groups are free.
+
+    :param user: A :class:`.User`
+    :param groups: An iterable containing group proxies; anything else
+                   (e.g. users in an ACL) is ignored
+    :param lookup_missing: Whether to check the membership of groups
+                           with no cached result using the identity
+                           provider.  If disabled, such groups are
+                           missing from the returned dict and will be
+                           checked only when needed.
+    :return: A dict mapping groups to membership status
+    """
+    groups = set(groups)
+    rv = {}
+    if not user:
+        return dict.fromkeys(groups, False)
+    if config.LOCAL_GROUPS:
+        local_groups = set(user.local_groups)
+        rv.update((group, group.group in local_groups) for group in groups if isinstance(group, _LocalGroupProxy))
+    else:
+        rv.update((group, False) for group in groups if isinstance(group, _LocalGroupProxy))
+    request_cache = g.setdefault('group_membership_cache', {})
+    # the same group may be referenced by many ACLs, but we only need to check each one once
+    keys = {group._get_membership_key(user): group for group in groups if isinstance(group, _MultipassGroupProxy)}
+    pending = {key: group for key, group in keys.items() if key not in request_cache}
+    if pending and (user_groups := _get_user_multipass_groups(user)):
+        for key, group in list(pending.items()):
+            if (names := user_groups.get(group.provider)) is not None:
+                request_cache[key] = group.name.lower() in names
+                del pending[key]
+    if pending:
+        for key, value in zip(pending, group_membership_cache.get_many(*pending), strict=True):
+            if value is not None:
+                request_cache[key] = value
+        if lookup_missing:
+            for key, group in pending.items():
+                if key not in request_cache:
+                    group.has_member(user)
+    rv.update((group, request_cache[key]) for key, group in keys.items() if key in request_cache)
+    return rv
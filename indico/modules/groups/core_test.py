@@ -0,0 +1,55 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+import pytest
+
+from indico.modules.groups import GroupProxy
+from indico.modules.groups.core import _MultipassGroupProxy, get_group_memberships, group_membership_cache
+
+
+@pytest.fixture
+def no_provider_lookups(monkeypatch):
+    def _fail(*args, **kwargs):
+        raise AssertionError('unexpected provider lookup')
+
+    monkeypatch.setattr('indico.modules.groups.core._get_user_multipass_groups', lambda user: {})
+    monkeypatch.setattr(_MultipassGroupProxy, 'group', property(_fail))
+
+
+@pytest.mark.usefixtures('no_provider_lookups')
+def test_get_group_memberships_cached(dummy_group, create_group, create_user):
+    other_group = create_group(1338)
+    user = create_user(123, groups={dummy_group})
+    groups = [GroupProxy(name, 'test') for name in ('a', 'b', 'c')]
+    group_membership_cache.set_many({f'test:a:{user.id}': True, f'test:b:{user.id}': False})
+    rv = get_group_memberships(user, [*groups, groups[0], dummy_group, other_group], lookup_missing=False)
+    assert rv == {groups[0]: True, groups[1]: False, dummy_group: True, other_group: False}
+    # the results are now available for regular membership checks
+    assert user in groups[0]
+    assert user not in groups[1]
+
+
+def test_get_group_memberships_bulk_provider(monkeypatch, dummy_user):
+    calls = []
+
+    def _get_user_multipass_groups(user):
+        calls.append(user)
+        return {'test': frozenset({'a', 'b'})}
+
+    monkeypatch.setattr('indico.modules.groups.core._get_user_multipass_groups', _get_user_multipass_groups)
+    groups = [GroupProxy(name, 'test') for name in ('a', 'B', 'c')]
+    assert get_group_memberships(dummy_user, groups) == {groups[0]: True, groups[1]: True, groups[2]: False}
+    assert len(calls) == 1
+    # everything is cached for the current request
+    assert get_group_memberships(dummy_user, groups) == {groups[0]: True, groups[1]: True, groups[2]: False}
+    assert dummy_user in GroupProxy('a', 'test')
+    assert len(calls) == 1
+
+
+def test_get_group_memberships_no_user():
+    group = GroupProxy('a', 'test')
+    assert get_group_memberships(None, [group]) == {group: False}
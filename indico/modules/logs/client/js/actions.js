@@ -118,8 +118,8 @@ export function viewNextEntry() {
   };
 }
 
-export function updateEntries(entries, pages, totalPageCount) {
-  return {type: UPDATE_ENTRIES, entries, pages, totalPageCount};
+export function updateEntries(entries, pages, totalPageCount, page, firstCursor, lastCursor) {
+  return {type: UPDATE_ENTRIES, entries, pages, totalPageCount, page, firstCursor, lastCursor};
 }
 
 export function fetchStarted() {
@@ -134,7 +134,7 @@ export function fetchLogEntries() {
   return async (dispatch, getStore) => {
     dispatch(fetchStarted());
     const {
-      logs: {filters, keyword, currentPage, metadataQuery},
+      logs: {filters, keyword, currentPage, metadataQuery, entriesPage, firstCursor, lastCursor},
       staticData: {fetchLogsUrl},
     } = getStore();
 
@@ -146,6 +146,18 @@ export function fetchLogEntries() {
     if (keyword) {
       params.q = keyword;
     }
+    // when moving to an adjacent page, load it relative to the current one which
+    // is much faster than skipping all the previous entries for large logs
+    if (entriesPage !== null && currentPage === entriesPage + 1 && lastCursor) {
+      params.after = lastCursor;
+    } else if (
+      entriesPage !== null &&
+      currentPage === entriesPage - 1 &&
+      currentPage > 1 &&
+      firstCursor
+    ) {
+      params.before = firstCursor;
+    }
 
     Object.entries(filters).forEach(([item, active]) => {
       if (active) {
@@ -164,7 +176,15 @@ export function fetchLogEntries() {
       dispatch(fetchFailed());
       return;
     }
-    const {entries, pages, total_page_count: totalPageCount} = response.data;
-    dispatch(updateEntries(entries, pages, totalPageCount));
+    const {
+      entries,
+      pages,
+      total_page_count: totalPageCount,
+      first_cursor: newFirstCursor,
+      last_cursor: newLastCursor,
+    } = response.data;
+    dispatch(
+      updateEntries(entries, pages, totalPageCount, currentPage, newFirstCursor, newLastCursor)
+    );
   };
 }
@@ -16,6 +16,9 @@ const initialState = {
   filters: {},
   pages: [],
   totalPageCount: 0,
+  entriesPage: null,
+  firstCursor: null,
+  lastCursor: null,
   currentViewIndex: null,
   hasNewEntries: false,
 };
@@ -25,9 +28,9 @@ export default function logReducer(state = initialState, action) {
     case actions.SET_INITIAL_REALMS:
       return {...state, filters: Object.fromEntries(action.initialRealms.map(r => [r, true]))};
     case actions.SET_KEYWORD:
-      return {...state, keyword: action.keyword};
+      return {...state, keyword: action.keyword, entriesPage: null};
     case actions.SET_FILTER:
-      return {...state, filters: {...state.filters, ...action.filter}};
+      return {...state, filters: {...state.filters, ...action.filter}, entriesPage: null};
     case actions.SET_PAGE:
       return {...state, currentPage: action.currentPage};
     case actions.UPDATE_ENTRIES:
@@ -36,6 +39,9 @@ export default function logReducer(state = initialState, action) {
         entries: action.entries,
         pages: action.pages,
         totalPageCount: action.totalPageCount,
+        entriesPage: action.page,
+        firstCursor: action.firstCursor,
+        lastCursor: action.lastCursor,
         isFetching: false,
       };
     case actions.FETCH_STARTED:
@@ -45,7 +51,7 @@ export default function logReducer(state = initialState, action) {
     case actions.SET_DETAILED_VIEW:
       return {...state, currentViewIndex: action.currentViewIndex};
     case actions.SET_METADATA_QUERY:
-      return {...state, metadataQuery: action.metadataQuery};
+      return {...state, metadataQuery: action.metadataQuery, entriesPage: null};
     case actions.SET_HAS_NEW_ENTRIES:
       return {...state, hasNewEntries: action.hasNewEntries};
     default:
@@ -5,8 +5,11 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
+from datetime import datetime, timedelta
+
 from babel.dates import get_timezone
 from flask import flash, jsonify, request, session
+from pytz import utc
 from werkzeug.exceptions import BadRequest, Forbidden
 
 from indico.core.config import config
@@ -30,11 +33,33 @@ from indico.web.util import jsonify_data, jsonify_template
 
 
 LOG_PAGE_SIZE = 15
+_EPOCH = datetime(1970, 1, 1, tzinfo=utc)
+
+
+def _matches(ts_vector, text):
+    return ts_vector.match(db.func.indico.indico_unaccent(preprocess_ts_string(text)), postgresql_regconfig='simple')
 
 
 def _contains(field, text):
-    return (db.func.to_tsvector('simple', db.func.indico.indico_unaccent(field))
-            .match(db.func.indico.indico_unaccent(preprocess_ts_string(text)), postgresql_regconfig='simple'))
+    return _matches(db.func.to_tsvector('simple', db.func.indico.indico_unaccent(field)), text)
+
+
+def _encode_cursor(key):
+    """Encode the key of a log entry so it can be used in an URL."""
+    if key is None:
+        return None
+    logged_dt, id_ = key
+    return f'{(logged_dt - _EPOCH) // timedelta(microseconds=1)}:{id_}'
+
+
+def _decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        timestamp, id_ = map(int, cursor.split(':'))
+    except ValueError:
+        raise BadRequest('Invalid cursor')
+    return _EPOCH + timedelta(microseconds=timestamp), id_
 
 
 def _get_metadata_query():
@@ -108,37 +133,34 @@ class LogsAPIMixin:
         filters = request.args.getlist('filters')
         metadata_query = _get_metadata_query()
         text = request.args.get('q')
+        after = _decode_cursor(request.args.get('after'))
+        before = _decode_cursor(request.args.get('before'))
 
         if not filters and not metadata_query:
             return jsonify(current_page=1, pages=[], entries=[], total_page_count=0)
 
         query = self.object.log_entries if self.object else self.model.query
-        query = query.order_by(self.model.logged_dt.desc())
         realms = {self.realm_enum.get(f) for f in filters if self.realm_enum.get(f)}
         if realms:
             query = query.filter(self.model.realm.in_(realms))
 
         if text:
-            query = query.filter(
-                db.or_(_contains(self.model.module, text),
-                       _contains(self.model.type, text),
-                       _contains(self.model.summary, text),
-                       _contains(db.m.User.first_name + ' ' + db.m.User.last_name, text),
-                       _contains(self.model.data['body'].astext, text),
-                       _contains(self.model.data['subject'].astext, text),
-                       _contains(self.model.data['from'].astext, text),
-                       _contains(self.model.data['to'].astext, text),
-                       _contains(self.model.data['cc'].astext, text))
-            ).outerjoin(db.m.User, db.m.User.id == self.model.user_id)
+            matching_user_ids = (db.m.User.query
+                                 .filter(_contains(db.m.User.first_name + ' ' + db.m.User.last_name, text))
+                                 .with_entities(db.m.User.id))
+            query = query.filter(db.or_(_matches(self.model.get_search_document(), text),
+                                        self.model.user_id.in_(matching_user_ids.subquery())))
 
         if metadata_query:
             query = query.filter(self.model.meta.contains(metadata_query))
 
-        query = query.paginate(page=page, per_page=LOG_PAGE_SIZE)
+        query = query.paginate_keyset((self.model.logged_dt, self.model.id), page=page, per_page=LOG_PAGE_SIZE,
+                                      after=after, before=before, estimate_total=True)
         tzinfo = self.object_tzinfo
         entries = [dict(serialize_log_entry(entry, tzinfo), index=index, html=entry.render())
                    for index, entry in enumerate(query.items)]
-        return jsonify(current_page=page, pages=list(query.iter_pages()), total_page_count=query.pages, entries=entries)
+        return jsonify(current_page=page, pages=list(query.iter_pages()), total_page_count=query.pages, entries=entries,
+                       first_cursor=_encode_cursor(query.first_key), last_cursor=_encode_cursor(query.last_key))
 
 
 class RHAppLogsJSON(LogsAPIMixin, RHAdminBase):
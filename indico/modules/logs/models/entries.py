@@ -53,6 +53,10 @@ class AppLogRealm(RichIntEnum):
     admin = 2
 
 
+#: The fields from the log entry data which are searchable
+SEARCHABLE_DATA_FIELDS = ('body', 'subject', 'from', 'to', 'cc')
+
+
 class LogKind(IndicoIntEnum):
     other = 1
     positive = 2
@@ -69,7 +73,9 @@ class LogEntryBase(db.Model):
     @strict_classproperty
     @classmethod
     def __auto_table_args(cls):
-        return (db.Index(None, 'meta', postgresql_using='gin'),)
+        link_columns = (cls.link_fk_name,) if cls.link_fk_name else ()
+        return (db.Index(None, 'meta', postgresql_using='gin'),
+                db.Index(None, *link_columns, 'logged_dt', 'id'))
 
     user_backref_name = None
     link_fk_name = None
@@ -160,6 +166,19 @@ class LogEntryBase(db.Model):
         renderer = self.renderer
         return renderer.render_entry(self) if renderer else None
 
+    @classmethod
+    def get_search_document(cls):
+        """Get the full-text search document used to search log entries.
+
+        It contains the module, type and summary of the entry as well as
+        the most relevant fields of logged emails and is covered by a
+        GIN index.
+        """
+        text = cls.module + ' ' + cls.type + ' ' + cls.summary
+        for key in SEARCHABLE_DATA_FIELDS:
+            text = text + ' ' + db.func.coalesce(cls.data[key].astext, '')
+        return db.func.to_tsvector('simple', db.func.indico.indico_unaccent(text))
+
     def __repr__(self):
         return format_repr(self, 'id', type(self).link_fk_name, 'logged_dt', 'realm', 'module', _text=self.summary)
 
@@ -284,3 +303,13 @@ class AppLogEntry(LogEntryBase):
 
     def __repr__(self):
         return format_repr(self, 'id', 'logged_dt', 'realm', 'module', _text=self.summary)
+
+
+def _make_search_index(model):
+    return db.Index(f'ix_{model.__tablename__}_search_fts', model.get_search_document(), postgresql_using='gin')
+
+
+_make_search_index(EventLogEntry)
+_make_search_index(CategoryLogEntry)
+_make_search_index(UserLogEntry)
+_make_search_index(AppLogEntry)
@@ -131,6 +131,27 @@ def _event_deleted(event, user, **kwargs):
             link.reservation_occurrence.cancel(user or session.user, 'Associated event was deleted')
 
 
+@signals.rb.booking_created.connect
+@signals.rb.booking_state_changed.connect
+@signals.rb.booking_modified.connect
+@signals.rb.booking_deleted.connect
+def _schedule_occupancy_update(sender, **kwargs):
+    from indico.modules.rb.statistics import schedule_occupancy_update
+    schedule_occupancy_update(sender)
+
+
+@signals.rb.booking_occurrence_state_changed.connect
+def _schedule_occupancy_update_occurrence(sender, **kwargs):
+    from indico.modules.rb.statistics import schedule_occupancy_update
+    schedule_occupancy_update(sender.reservation)
+
+
+@signals.core.after_commit.connect
+def _flush_occupancy_updates(sender, **kwargs):
+    from indico.modules.rb.statistics import flush_occupancy_updates
+    flush_occupancy_updates()
+
+
 class BookPermission(ManagementPermission):
     name = 'book'
     friendly_name = pgettext('Room booking permission name', 'Book')
@@ -37,6 +37,7 @@ from indico.modules.rb.schemas import (AdminRoomSchema, EquipmentTypeArgs, Featu
                                        admin_equipment_type_schema, admin_locations_schema, bookable_hours_schema,
                                        map_areas_schema, nonbookable_periods_admin_schema, room_attribute_schema,
                                        room_equipment_schema, room_feature_schema, room_update_schema)
+from indico.modules.rb.statistics import get_occupancy_report
 from indico.modules.rb.util import (WEEKDAYS, build_rooms_spritesheet, get_resized_room_photo, rb_is_admin,
                                     rb_is_location_manager, remove_room_spritesheet_photo)
 from indico.util.date_time import overlaps
@@ -459,6 +460,30 @@ class RHRooms(RHRoomBookingAdminBase):
         return jsonify(id=room.id)
 
 
+class RHOccupancyReport(RHRoomBookingAdminBase):
+    """Occupancy statistics for rooms in a date range."""
+
+    @use_kwargs({
+        'start_date': fields.Date(required=True),
+        'end_date': fields.Date(required=True),
+        'location': ModelField(Location, filter_deleted=True, load_default=None, data_key='location_id'),
+        'building': fields.String(load_default=None),
+    }, location='query')
+    def _process(self, start_date, end_date, location, building):
+        if start_date > end_date:
+            abort(422, messages={'end_date': [_('End date cannot be before the start date')]})
+        query = Room.query.filter_by(is_deleted=False)
+        if location:
+            query = query.filter_by(location=location)
+        if building:
+            query = query.filter_by(building=building)
+        report = get_occupancy_report(query.all(), start_date, end_date)
+        return jsonify({**report,
+                        'start_date': start_date.isoformat(),
+                        'end_date': end_date.isoformat(),
+                        'days': {day.isoformat(): value for day, value in report['days'].items()}})
+
+
 _base_args = {
     'default': fields.Bool(),
     'bounds': fields.Nested({
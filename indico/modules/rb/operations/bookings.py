@@ -33,7 +33,7 @@ from indico.modules.rb.operations.misc import get_rooms_nonbookable_periods, get
 from indico.modules.rb.util import (WEEKDAYS, group_by_occurrence_date, serialize_availability, serialize_blockings,
                                     serialize_booking_details, serialize_nonbookable_periods, serialize_occurrences,
                                     serialize_unbookable_hours)
-from indico.util.date_time import iterdays, server_to_utc
+from indico.util.date_time import IntervalIndex, iterdays, server_to_utc
 from indico.util.i18n import _
 from indico.util.iterables import group_list
 from indico.util.string import natural_sort_key
@@ -156,8 +156,8 @@ def get_rooms_availability(rooms, start_dt, end_dt, repeat_frequency, repeat_int
 
 
 def get_room_candidates(candidates, conflicts):
-    return [candidate for candidate in candidates
-            if not (any(candidate.overlaps(conflict) for conflict in conflicts))]
+    index = IntervalIndex(conflicts)
+    return [candidate for candidate in candidates if not index.overlaps(candidate.start_dt, candidate.end_dt)]
 
 
 def _bookings_query(filters, *, noload_room=False, load_room_acl=False):
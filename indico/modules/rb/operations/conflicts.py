@@ -7,7 +7,6 @@
 
 from collections import defaultdict
 from datetime import datetime
-from itertools import combinations
 
 from flask import session
 from sqlalchemy.orm import contains_eager
@@ -17,7 +16,7 @@ from indico.modules.rb.models.reservations import Reservation
 from indico.modules.rb.models.rooms import Room
 from indico.modules.rb.util import (WEEKDAYS, TempReservationConcurrentOccurrence, TempReservationOccurrence,
                                     check_empty_candidates, rb_is_admin)
-from indico.util.date_time import get_overlap
+from indico.util.date_time import IntervalIndex, get_overlap
 from indico.util.iterables import group_list
 
 
@@ -80,59 +79,73 @@ def get_room_bookings_conflicts(candidates, occurrences, skip_conflicts_with=fro
     conflicts = set()
     pre_conflicts = set()
     conflicting_candidates = set()
+    index = IntervalIndex(occ for occ in occurrences if occ.reservation.id not in skip_conflicts_with)
     for candidate in candidates:
-        for occurrence in occurrences:
-            if occurrence.reservation.id in skip_conflicts_with:
-                continue
-            if candidate.overlaps(occurrence):
-                overlap = candidate.get_overlap(occurrence)
-                obj = TempReservationOccurrence(*overlap, reservation=occurrence.reservation)
-                if occurrence.reservation.is_accepted:
-                    conflicting_candidates.add(candidate)
-                    conflicts.add(obj)
-                else:
-                    pre_conflicts.add(obj)
+        for occurrence in index.overlapping(candidate.start_dt, candidate.end_dt):
+            overlap = candidate.get_overlap(occurrence)
+            obj = TempReservationOccurrence(*overlap, reservation=occurrence.reservation)
+            if occurrence.reservation.is_accepted:
+                conflicting_candidates.add(candidate)
+                conflicts.add(obj)
+            else:
+                pre_conflicts.add(obj)
     return conflicts, pre_conflicts, conflicting_candidates
 
 
 def get_room_blockings_conflicts(room_id, candidates, occurrences, allow_admin):
     conflicts = set()
     conflicting_candidates = set()
+    room = Room.get(room_id)
+    index = IntervalIndex((occ for occ in occurrences
+                           if not occ.blocking.can_override(session.user, room=room, allow_admin=allow_admin)),
+                          key=lambda occ: (occ.blocking.start_date, occ.blocking.end_date))
     for candidate in candidates:
-        for occurrence in occurrences:
-            blocking = occurrence.blocking
-            if blocking.start_date <= candidate.start_dt.date() <= blocking.end_date:
-                if blocking.can_override(session.user, room=Room.get(room_id), allow_admin=allow_admin):
-                    continue
-                conflicting_candidates.add(candidate)
-                obj = TempReservationOccurrence(candidate.start_dt, candidate.end_dt, None)
-                conflicts.add(obj)
+        candidate_date = candidate.start_dt.date()
+        if index.overlaps(candidate_date, candidate_date, inclusive=True):
+            conflicting_candidates.add(candidate)
+            obj = TempReservationOccurrence(candidate.start_dt, candidate.end_dt, None)
+            conflicts.add(obj)
     return conflicts, conflicting_candidates
 
 
 def get_room_nonbookable_periods_conflicts(candidates, occurrences):
     conflicts = set()
     conflicting_candidates = set()
+    index = IntervalIndex(occurrences)
     for candidate in candidates:
-        for occurrence in occurrences:
+        for occurrence in index.overlapping(candidate.start_dt, candidate.end_dt):
             overlap = get_overlap((candidate.start_dt, candidate.end_dt), (occurrence.start_dt, occurrence.end_dt))
-            if overlap.count(None) != len(overlap):
-                conflicting_candidates.add(candidate)
-                obj = TempReservationOccurrence(overlap[0], overlap[1], None)
-                conflicts.add(obj)
+            conflicting_candidates.add(candidate)
+            obj = TempReservationOccurrence(overlap[0], overlap[1], None)
+            conflicts.add(obj)
     return conflicts, conflicting_candidates
 
 
+def _get_unbookable_hours_overlap(candidate, hours):
+    hours_start_dt = candidate.start_dt.replace(hour=hours.start_time.hour, minute=hours.start_time.minute)
+    hours_end_dt = candidate.end_dt.replace(hour=hours.end_time.hour, minute=hours.end_time.minute)
+    return get_overlap((candidate.start_dt, candidate.end_dt), (hours_start_dt, hours_end_dt))
+
+
 def get_room_unbookable_hours_conflicts(candidates, occurrences):
     conflicts = set()
     conflicting_candidates = set()
+    indexes = {weekday: IntervalIndex(hours, key=lambda x: (x.start_time.replace(second=0, microsecond=0),
+                                                            x.end_time.replace(second=0, microsecond=0)))
+               for weekday, hours in occurrences.items()}
     for candidate in candidates:
-        for occurrence in occurrences[WEEKDAYS[candidate.start_dt.weekday()]]:
-            hours_start_dt = candidate.start_dt.replace(hour=occurrence.start_time.hour,
-                                                        minute=occurrence.start_time.minute)
-            hours_end_dt = candidate.end_dt.replace(hour=occurrence.end_time.hour,
-                                                    minute=occurrence.end_time.minute)
-            overlap = get_overlap((candidate.start_dt, candidate.end_dt), (hours_start_dt, hours_end_dt))
+        index = indexes[WEEKDAYS[candidate.start_dt.weekday()]]
+        if not index:
+            continue
+        start_dt, end_dt = candidate.start_dt, candidate.end_dt
+        if start_dt.date() == end_dt.date() and not any(dt.second or dt.microsecond for dt in (start_dt, end_dt)):
+            # the unbookable hours are applied to the day of the candidate, so within a
+            # single day we can look them up by time
+            matching_hours = index.overlapping(start_dt.time(), end_dt.time())
+        else:
+            matching_hours = index.items
+        for hours in matching_hours:
+            overlap = _get_unbookable_hours_overlap(candidate, hours)
             if overlap.count(None) != len(overlap):
                 conflicting_candidates.add(candidate)
                 obj = TempReservationOccurrence(overlap[0], overlap[1], None)
@@ -142,10 +155,14 @@ def get_room_unbookable_hours_conflicts(candidates, occurrences):
 
 def get_concurrent_pre_bookings(pre_bookings, skip_conflicts_with=frozenset()):
     concurrent_pre_bookings = []
-    for (x, y) in combinations(pre_bookings, 2):
-        if any(pre_booking.reservation.id in skip_conflicts_with for pre_booking in [x, y]):
+    index = IntervalIndex(pre_bookings)
+    for i, x in enumerate(index.items):
+        if x.reservation.id in skip_conflicts_with:
             continue
-        if x.overlaps(y):
+        for j in index.overlapping_indices(x.start_dt, x.end_dt):
+            y = index.items[j]
+            if j <= i or y.reservation.id in skip_conflicts_with:
+                continue
             overlap = x.get_overlap(y)
             obj = TempReservationConcurrentOccurrence(*overlap, reservations=[x.reservation, y.reservation])
             concurrent_pre_bookings.append(obj)
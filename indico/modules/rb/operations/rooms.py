@@ -22,7 +22,7 @@ from indico.modules.rb.models.reservation_occurrences import ReservationOccurren
 from indico.modules.rb.models.reservations import Reservation
 from indico.modules.rb.models.room_features import RoomFeature
 from indico.modules.rb.models.rooms import Room
-from indico.modules.rb.statistics import calculate_rooms_occupancy
+from indico.modules.rb.statistics import get_occupancy_report
 from indico.modules.rb.util import rb_is_admin
 from indico.util.caching import memoize_redis
 
@@ -122,7 +122,7 @@ def get_room_statistics(room):
                                           'start_dt', datetime.combine(start_date, time()),
                                           'end_dt', datetime.combine(end_date, time.max)))
                  .count())
-        percentage = calculate_rooms_occupancy([room], start_date, end_date) * 100
+        percentage = get_occupancy_report([room], start_date, end_date)['occupancy'] * 100
         if count > 0 or percentage > 0:
             data['count']['values'].append({'days': days, 'value': count})
             data['percentage']['values'].append({'days': days, 'value': percentage})
@@ -5,11 +5,27 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
-from datetime import date, datetime, time
+"""Room occupancy analytics.
+
+The booked time of rooms is aggregated per room and day: the time booked
+during the working time slots (used for the occupancy) and the time booked
+during each hour of the day.  The aggregates are computed from the booked
+intervals, which are loaded in a single query for all rooms and the whole
+date range.  Since past days rarely change, their aggregates are cached in
+monthly chunks, so reports for long date ranges do not need to process all
+the bookings again.
+"""
+
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, time, timedelta
+from uuid import uuid4
 
 from dateutil.relativedelta import relativedelta
+from flask import g, has_app_context
 
+from indico.core.cache import make_scoped_cache
 from indico.core.db import db
+from indico.core.db.sqlalchemy.util.queries import db_dates_overlap
 from indico.modules.rb.models.reservation_occurrences import ReservationOccurrence
 from indico.modules.rb.models.reservations import Reservation
 from indico.util.date_time import iterdays
@@ -17,48 +33,211 @@ from indico.util.date_time import iterdays
 
 WORKING_TIME_PERIODS = ((time(8, 30), time(12, 30)), (time(13, 30), time(17, 30)))
 
+#: How long the aggregates of a past month are cached
+OCCUPANCY_CACHE_TTL = timedelta(days=30)
 
-def calculate_rooms_bookable_time(rooms, start_date=None, end_date=None):
+occupancy_cache = make_scoped_cache('rb-occupancy')
+
+#: The booked time (in seconds) of a room on a single day.  `working_time`
+#: only includes the time booked during the working time periods while
+#: `hours` contains the time booked during each hour of the day.
+DailyOccupancy = namedtuple('DailyOccupancy', ('working_time', 'hours'))
+
+_DAY_SECONDS = 86400
+
+
+def _seconds(t):
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+_WORKING_TIME_SLOTS = tuple((_seconds(start), _seconds(end)) for start, end in WORKING_TIME_PERIODS)
+WORKING_TIME_PER_DAY = sum(end - start for start, end in _WORKING_TIME_SLOTS)
+
+
+def _get_default_range(start_date, end_date):
     if end_date is None:
         end_date = date.today() - relativedelta(days=1)
     if start_date is None:
         start_date = end_date - relativedelta(days=29)
-    working_time_per_day = sum((datetime.combine(date.today(), end) - datetime.combine(date.today(), start)).seconds
-                               for start, end in WORKING_TIME_PERIODS)
+    return start_date, end_date
+
+
+def _iter_months(start_date, end_date):
+    month = start_date.replace(day=1)
+    while month <= end_date:
+        yield month
+        month += relativedelta(months=1)
+
+
+def _overlap(starts, ends, lo, hi):
+    """Get the total length of the overlaps of intervals with ``[lo, hi)``."""
+    return sum(max(0, min(end, hi) - max(start, lo)) for start, end in zip(starts, ends, strict=True))
+
+
+def _aggregate_day(starts, ends):
+    working_time = sum(_overlap(starts, ends, lo, hi) for lo, hi in _WORKING_TIME_SLOTS)
+    hours = [0] * 24
+    for start, end in zip(starts, ends, strict=True):
+        for hour in range(start // 3600, -(-end // 3600)):
+            hours[hour] += min(end, (hour + 1) * 3600) - max(start, hour * 3600)
+    return DailyOccupancy(working_time, hours)
+
+
+def _load_intervals(room_ids, start_date, end_date):
+    """Load the booked intervals of rooms.
+
+    Intervals spanning multiple days are split at midnight.
+
+    :return: A dict mapping ``(room_id, day)`` tuples to a pair of lists
+             containing the start and end times of the intervals on that
+             day in seconds since midnight.
+    """
+    query = (db.session.query(Reservation.room_id, ReservationOccurrence.start_dt, ReservationOccurrence.end_dt)
+             .join(ReservationOccurrence.reservation)
+             .filter(Reservation.room_id.in_(room_ids),
+                     ReservationOccurrence.is_valid,
+                     db_dates_overlap(ReservationOccurrence,
+                                      'start_dt', datetime.combine(start_date, time()),
+                                      'end_dt', datetime.combine(end_date, time.max))))
+    intervals = defaultdict(lambda: ([], []))
+    for room_id, start_dt, end_dt in query:
+        day = max(start_dt.date(), start_date)
+        while day <= min(end_dt.date(), end_date):
+            starts, ends = intervals[(room_id, day)]
+            starts.append(_seconds(start_dt) if day == start_dt.date() else 0)
+            ends.append(_seconds(end_dt) if day == end_dt.date() else _DAY_SECONDS)
+            day += timedelta(days=1)
+    return intervals
+
+
+def _get_room_versions(room_ids):
+    keys = [f'version-{room_id}' for room_id in room_ids]
+    versions = dict(zip(room_ids, occupancy_cache.get_many(*keys), strict=True))
+    if missing := {room_id: uuid4().hex for room_id, version in versions.items() if version is None}:
+        occupancy_cache.set_many({f'version-{room_id}': version for room_id, version in missing.items()},
+                                 OCCUPANCY_CACHE_TTL)
+        versions.update(missing)
+    return versions
+
+
+def get_daily_occupancy(room_ids, start_date, end_date):
+    """Get the booked time of rooms per day.
+
+    :param room_ids: The IDs of the rooms
+    :param start_date: The first day to include
+    :param end_date: The last day to include
+    :return: A dict mapping ``(room_id, day)`` tuples to `DailyOccupancy`
+             objects; days without any bookings are omitted
+    """
+    room_ids = sorted(set(room_ids))
+    if not room_ids or start_date > end_date:
+        return {}
+    today = date.today()
+    months = list(_iter_months(start_date, end_date))
+    # only months which are over are cached since bookings are much more likely to change in the
+    # present or future; the versions need to be retrieved before loading the data from the database
+    versions = _get_room_versions(room_ids)
+    cache_keys = {(room_id, month): f'month-{room_id}-{versions[room_id]}-{month:%Y-%m}'
+                  for room_id in room_ids
+                  for month in months
+                  if month + relativedelta(months=1) <= today}
+    cached = dict(zip(cache_keys, occupancy_cache.get_many(*cache_keys.values()), strict=True))
+    chunks = {key: data for key, data in cached.items() if data is not None}
+    if missing := {(room_id, month) for room_id in room_ids for month in months} - chunks.keys():
+        load_start = min(month for __, month in missing)
+        load_end = max(month for __, month in missing) + relativedelta(months=1, days=-1)
+        intervals = _load_intervals({room_id for room_id, __ in missing}, load_start, load_end)
+        computed = {key: {} for key in missing}
+        for (room_id, day), (starts, ends) in intervals.items():
+            if (chunk := computed.get((room_id, day.replace(day=1)))) is not None:
+                chunk[day] = _aggregate_day(starts, ends)
+        if to_cache := {cache_keys[key]: data for key, data in computed.items() if key in cache_keys}:
+            occupancy_cache.set_many(to_cache, OCCUPANCY_CACHE_TTL)
+        chunks.update(computed)
+    return {(room_id, day): DailyOccupancy(*data)
+            for (room_id, __), chunk in chunks.items()
+            for day, data in chunk.items()
+            if start_date <= day <= end_date}
+
+
+def get_occupancy_report(rooms, start_date=None, end_date=None):
+    """Calculate the occupancy of rooms.
+
+    The occupancy is the fraction of the bookable time (the working time
+    periods on working days) during which the rooms are booked.  For the
+    hours of the week, the whole day is considered bookable.
+
+    :param rooms: The rooms to include
+    :param start_date: The first day to include; defaults to 30 days
+                       before `end_date`
+    :param end_date: The last day to include; defaults to yesterday
+    :return: A dict containing the total occupancy and the occupancy per
+             room, building, day and hour of the week
+    """
+    start_date, end_date = _get_default_range(start_date, end_date)
+    rooms = list(rooms)
+    daily = get_daily_occupancy([r.id for r in rooms], start_date, end_date)
+    days = [start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1)]
+    working_days = [day for day in days if day.weekday() < 5]
+    bookable_per_room = len(working_days) * WORKING_TIME_PER_DAY
+    booked_per_room = defaultdict(int)
+    booked_per_day = defaultdict(int)
+    booked_per_hour = [[0] * 24 for __ in range(7)]
+    for (room_id, day), data in daily.items():
+        if day.weekday() < 5:
+            booked_per_room[room_id] += data.working_time
+            booked_per_day[day] += data.working_time
+        for hour, seconds in enumerate(data.hours):
+            booked_per_hour[day.weekday()][hour] += seconds
+    rooms_by_building = defaultdict(list)
+    for room in rooms:
+        rooms_by_building[room.building].append(room.id)
+
+    def _ratio(booked, bookable):
+        return booked / bookable if bookable else 0
+
+    weekday_counts = [sum(1 for day in days if day.weekday() == weekday) for weekday in range(7)]
+    booked_time = sum(booked_per_room.values())
+    bookable_time = bookable_per_room * len(rooms)
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'booked_time': booked_time,
+        'bookable_time': bookable_time,
+        'occupancy': _ratio(booked_time, bookable_time),
+        'rooms': {room.id: _ratio(booked_per_room[room.id], bookable_per_room) for room in rooms},
+        'buildings': {building: _ratio(sum(booked_per_room[room_id] for room_id in room_ids),
+                                       bookable_per_room * len(room_ids))
+                      for building, room_ids in rooms_by_building.items()},
+        'days': {day: _ratio(booked_per_day[day], WORKING_TIME_PER_DAY * len(rooms)) for day in working_days},
+        'hours_of_week': [[_ratio(seconds, weekday_counts[weekday] * 3600 * len(rooms)) for seconds in hours]
+                          for weekday, hours in enumerate(booked_per_hour)],
+    }
+
+
+def calculate_rooms_bookable_time(rooms, start_date=None, end_date=None):
+    start_date, end_date = _get_default_range(start_date, end_date)
     working_days = sum(1 for __ in iterdays(start_date, end_date, skip_weekends=True))
-    return working_days * working_time_per_day * len(rooms)
+    return working_days * WORKING_TIME_PER_DAY * len(rooms)
 
 
 def calculate_rooms_booked_time(rooms, start_date=None, end_date=None):
-    if end_date is None:
-        end_date = date.today() - relativedelta(days=1)
-    if start_date is None:
-        start_date = end_date - relativedelta(days=29)
-    # Reservations on working days
-    reservations_query = (Reservation.query
-                          .filter(Reservation.room_id.in_(r.id for r in rooms),
-                                  db.extract('dow', ReservationOccurrence.start_dt).between(1, 5),
-                                  db.cast(ReservationOccurrence.start_dt, db.Date) >= start_date,
-                                  db.cast(ReservationOccurrence.end_dt, db.Date) <= end_date,
-                                  ReservationOccurrence.is_valid)
-                          .join(Reservation.occurrences))
-
-    rsv_start = db.cast(ReservationOccurrence.start_dt, db.TIME)
-    rsv_end = db.cast(ReservationOccurrence.end_dt, db.TIME)
-    slots = ((db.cast(start, db.TIME), db.cast(end, db.TIME)) for start, end in WORKING_TIME_PERIODS)
-
-    # this basically handles all possible ways an occurrence overlaps with each one of the working time slots
-    overlaps = sum(db.case([
-        ((rsv_start < start) & (rsv_end > end), db.extract('epoch', end - start)),
-        ((rsv_start < start) & (rsv_end > start) & (rsv_end <= end), db.extract('epoch', rsv_end - start)),
-        ((rsv_start >= start) & (rsv_start < end) & (rsv_end > end), db.extract('epoch', end - rsv_start)),
-        ((rsv_start >= start) & (rsv_end <= end), db.extract('epoch', rsv_end - rsv_start))
-    ], else_=0) for start, end in slots)
-
-    return reservations_query.with_entities(db.func.sum(overlaps)).scalar() or 0
+    start_date, end_date = _get_default_range(start_date, end_date)
+    return get_occupancy_report(rooms, start_date, end_date)['booked_time']
 
 
 def calculate_rooms_occupancy(rooms, start=None, end=None):
-    bookable_time = calculate_rooms_bookable_time(rooms, start, end)
-    booked_time = calculate_rooms_booked_time(rooms, start, end)
-    return booked_time / bookable_time if bookable_time else 0
+    return get_occupancy_report(rooms, start, end)['occupancy']
+
+
+def schedule_occupancy_update(reservation):
+    """Discard the cached occupancy of a room after the transaction has been committed."""
+    if has_app_context():
+        g.setdefault('pending_rb_occupancy_updates', set()).add(reservation.room_id)
+
+
+def flush_occupancy_updates():
+    if not has_app_context():
+        return
+    if pending := g.pop('pending_rb_occupancy_updates', None):
+        occupancy_cache.set_many({f'version-{room_id}': uuid4().hex for room_id in pending}, OCCUPANCY_CACHE_TTL)
@@ -0,0 +1,61 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from datetime import date, datetime
+
+import pytest
+
+from indico.modules.rb.statistics import (WORKING_TIME_PER_DAY, _aggregate_day, flush_occupancy_updates,
+                                          get_daily_occupancy, get_occupancy_report, schedule_occupancy_update)
+
+
+def test_aggregate_day():
+    # 09:00-11:00 and 12:00-14:00
+    data = _aggregate_day([9 * 3600, 12 * 3600], [11 * 3600, 14 * 3600])
+    assert data.working_time == 2 * 3600 + 30 * 60 + 30 * 60
+    assert data.hours[8:15] == [0, 3600, 3600, 0, 3600, 3600, 0]
+    # a booking lasting until midnight
+    data = _aggregate_day([int(23.5 * 3600)], [24 * 3600])
+    assert data.working_time == 0
+    assert data.hours[23] == 1800
+
+
+@pytest.mark.usefixtures('db')
+def test_get_occupancy_report(create_room, create_reservation):
+    room_a = create_room(building='1')
+    room_b = create_room(building='2')
+    # monday
+    create_reservation(room=room_a, start_dt=datetime(2024, 1, 8, 9), end_dt=datetime(2024, 1, 8, 11))
+    # saturday
+    create_reservation(room=room_b, start_dt=datetime(2024, 1, 13, 9), end_dt=datetime(2024, 1, 13, 11))
+    report = get_occupancy_report([room_a, room_b], date(2024, 1, 8), date(2024, 1, 14))
+    assert report['bookable_time'] == 2 * 5 * WORKING_TIME_PER_DAY
+    assert report['booked_time'] == 7200
+    assert report['occupancy'] == 7200 / (2 * 5 * WORKING_TIME_PER_DAY)
+    assert report['rooms'] == {room_a.id: 7200 / (5 * WORKING_TIME_PER_DAY), room_b.id: 0}
+    assert report['buildings'] == {'1': 7200 / (5 * WORKING_TIME_PER_DAY), '2': 0}
+    assert report['days'][date(2024, 1, 8)] == 7200 / (2 * WORKING_TIME_PER_DAY)
+    assert date(2024, 1, 13) not in report['days']
+    assert report['hours_of_week'][0][9] == 0.5
+    assert report['hours_of_week'][5][10] == 0.5
+    assert report['hours_of_week'][1][9] == 0
+
+
+@pytest.mark.usefixtures('db')
+def test_get_daily_occupancy_cached(dummy_room, create_reservation):
+    create_reservation(start_dt=datetime(2024, 1, 8, 9), end_dt=datetime(2024, 1, 8, 11))
+    assert get_daily_occupancy([dummy_room.id], date(2024, 1, 1), date(2024, 1, 31)).keys() == {
+        (dummy_room.id, date(2024, 1, 8))
+    }
+    reservation = create_reservation(start_dt=datetime(2024, 1, 9, 9), end_dt=datetime(2024, 1, 9, 11))
+    # past months are cached
+    assert (dummy_room.id, date(2024, 1, 9)) not in get_daily_occupancy([dummy_room.id], date(2024, 1, 1),
+                                                                         date(2024, 1, 31))
+    schedule_occupancy_update(reservation)
+    flush_occupancy_updates()
+    assert (dummy_room.id, date(2024, 1, 9)) in get_daily_occupancy([dummy_room.id], date(2024, 1, 1),
+                                                                     date(2024, 1, 31))
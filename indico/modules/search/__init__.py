@@ -8,9 +8,13 @@
 from flask import g, render_template, request
 
 from indico.core import signals
+from indico.core.logger import Logger
 from indico.web.flask.templating import template_hook
 
 
+logger = Logger.get('search')
+
+
 @signals.core.app_created.connect
 def _check_search_provider(app, **kwargs):
     from .base import get_search_provider
@@ -26,3 +30,56 @@ def _add_conference_search_box(event, **kwargs):
         request.endpoint != 'search.event_search'
     ):
         return render_template('search/event_search_bar.html', event=event)
+
+
+@signals.core.import_tasks.connect
+def _import_tasks(sender, **kwargs):
+    import indico.modules.search.tasks  # noqa: F401
+
+
+@signals.acl.protection_changed.connect
+@signals.acl.entry_changed.connect
+def _acl_changed(sender, obj, **kwargs):
+    from indico.modules.attachments.models.attachments import Attachment
+    from indico.modules.attachments.models.folders import AttachmentFolder
+    from indico.modules.categories import Category
+    from indico.modules.events import Event
+    from indico.modules.events.contributions.models.contributions import Contribution
+    from indico.modules.events.sessions.models.sessions import Session
+    from indico.modules.search.acl_index import is_acl_index_enabled, schedule_index_update
+    if is_acl_index_enabled() and isinstance(obj, (Category, Event, Session, Contribution, AttachmentFolder,
+                                                   Attachment)):
+        schedule_index_update(obj)
+
+
+@signals.category.moved.connect
+@signals.event.moved.connect
+@signals.event.created.connect
+def _moved_or_created(obj, **kwargs):
+    from indico.modules.search.acl_index import is_acl_index_enabled, schedule_index_update
+    if is_acl_index_enabled():
+        schedule_index_update(obj)
+
+
+@signals.users.merged.connect
+def _merge_users(target, source, **kwargs):
+    from indico.core.db import db
+    from indico.modules.search.acl_index import is_acl_index_enabled
+    from indico.modules.search.models.acl_index import SearchACLIndexEntry
+    if is_acl_index_enabled():
+        # the merged ACL entries now reference the target user; dropping the
+        # old entries makes the objects unindexed until they are reindexed
+        affected = (db.select([SearchACLIndexEntry.object_type, SearchACLIndexEntry.object_id])
+                    .where(SearchACLIndexEntry.principal == f'user:{source.id}'))
+        db.session.execute(SearchACLIndexEntry.__table__.delete()
+                           .where(db.tuple_(SearchACLIndexEntry.object_type,
+                                            SearchACLIndexEntry.object_id).in_(affected)))
+
+
+@signals.core.after_commit.connect
+def _after_commit(sender, **kwargs):
+    from indico.modules.search.acl_index import pop_pending_index_updates
+    from indico.modules.search.tasks import update_search_acl_index
+    if pending := pop_pending_index_updates():
+        update_search_acl_index.delay(category_ids=sorted(pending['categories']),
+                                      event_ids=sorted(pending['events']))
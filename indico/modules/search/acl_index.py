@@ -0,0 +1,278 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+"""Precomputed visibility index used to prefilter the internal search.
+
+For every searchable object the index stores the set of principal
+tokens which may grant read access to it.  Tokens are derived from the
+same rules `ProtectionMixin.can_access` uses (protection mode, ACL
+entries, inherited protection and inherited management privileges).
+
+Principals which cannot be resolved without a full access check (e.g.
+multipass groups, event roles, registration forms, IP networks, email
+principals or access keys) are represented by the `CHECK` token, which
+every user matches.  The index is therefore always a superset of what
+a user may read; the regular access check is still performed on the
+candidates it returns, but it rarely needs to reject any of them.
+"""
+
+from flask import g
+from sqlalchemy.orm import joinedload, selectinload
+
+from indico.core.config import config
+from indico.core.db import db
+from indico.core.db.sqlalchemy.links import LinkType
+from indico.core.db.sqlalchemy.principals import PrincipalType
+from indico.core.db.sqlalchemy.protection import ProtectionManagersMixin, ProtectionMode
+from indico.modules.attachments.models.attachments import Attachment
+from indico.modules.attachments.models.folders import AttachmentFolder
+from indico.modules.categories import Category
+from indico.modules.events import Event
+from indico.modules.events.contributions.models.contributions import Contribution
+from indico.modules.events.contributions.models.subcontributions import SubContribution
+from indico.modules.events.notes.models.notes import EventNote
+from indico.modules.search.base import SearchTarget
+from indico.modules.search.models.acl_index import SearchACLIndexEntry
+
+
+#: Token matching any user, including anonymous ones
+ANYONE = 'anyone'
+#: Token matching any user, but requiring a real access check
+CHECK = 'check'
+#: Token used for objects nobody (except admins) can read
+NOBODY = 'nobody'
+
+
+def is_acl_index_enabled():
+    return config.SEARCH_ACL_INDEX
+
+
+def get_principal_token(entry):
+    """Get the index token for an ACL entry."""
+    if entry.type == PrincipalType.user:
+        return f'user:{entry.user_id}'
+    elif entry.type == PrincipalType.local_group:
+        return f'group:{entry.local_group_id}'
+    # anything else depends on external data (or the request) and
+    # can only be resolved using a real access check
+    return CHECK
+
+
+def get_user_principal_tokens(user):
+    """Get all index tokens that may match the given user."""
+    tokens = {ANYONE, CHECK}
+    if user is not None:
+        tokens.add(f'user:{user.id}')
+        tokens.update(f'group:{group.id}' for group in user.local_groups)
+    return tokens
+
+
+def _get_acl_tokens(obj):
+    tokens = {get_principal_token(entry) for entry in obj.acl_entries}
+    if obj.allow_speakers and obj.speakers_can_access:
+        tokens.add(CHECK)
+    return tokens
+
+
+def _get_manager_tokens(obj, cache):
+    """Get the tokens of anyone with management privileges on `obj` or its parents."""
+    if obj is None or not isinstance(obj, ProtectionManagersMixin):
+        return frozenset()
+    key = ('managers', obj)
+    try:
+        return cache[key]
+    except KeyError:
+        pass
+    tokens = {get_principal_token(entry) for entry in obj.acl_entries if entry.has_management_permission('ANY')}
+    tokens |= _get_manager_tokens(obj.protection_parent, cache)
+    cache[key] = rv = frozenset(tokens)
+    return rv
+
+
+def get_read_tokens(obj, cache=None):
+    """Get the tokens of all principals that may be able to read `obj`.
+
+    :param obj: A category, event, session, contribution, subcontribution,
+                attachment folder, attachment or note
+    :param cache: A dict used to memoize the tokens of parent objects
+                  when indexing many objects at once
+    """
+    if cache is None:
+        cache = {}
+    try:
+        return cache[obj]
+    except KeyError:
+        pass
+
+    if isinstance(obj, SubContribution):
+        rv = get_read_tokens(obj.contribution, cache)
+    elif isinstance(obj, EventNote):
+        rv = get_read_tokens(obj.object, cache)
+    else:
+        tokens = set()
+        if obj.allow_access_key and obj.access_key:
+            tokens.add(CHECK)
+        if obj.protection_mode == ProtectionMode.public:
+            tokens.add(ANYONE)
+        elif obj.protection_mode == ProtectionMode.protected:
+            tokens |= _get_acl_tokens(obj)
+            if isinstance(obj, ProtectionManagersMixin):
+                tokens |= _get_manager_tokens(obj.protection_parent, cache)
+        elif obj.protection_mode == ProtectionMode.inheriting:
+            if obj.inheriting_have_acl:
+                tokens |= _get_acl_tokens(obj)
+            if (parent := obj.protection_parent) is not None:
+                tokens |= get_read_tokens(parent, cache)
+        if isinstance(obj, (AttachmentFolder, Attachment)):
+            # people who can manage attachments of the linked object can always access them
+            linked_object = obj.object if isinstance(obj, AttachmentFolder) else obj.folder.object
+            if isinstance(linked_object, SubContribution):
+                # subcontribution speakers may be able to manage its attachments
+                tokens.add(CHECK)
+                linked_object = linked_object.contribution
+            tokens |= _get_manager_tokens(linked_object, cache)
+        rv = frozenset(tokens)
+
+    cache[obj] = rv
+    return rv
+
+
+def _make_rows(target, obj, event_id, category_id, cache):
+    tokens = get_read_tokens(obj, cache) or {NOBODY}
+    return [{'object_type': target, 'object_id': obj.id, 'principal': token, 'event_id': event_id,
+             'category_id': category_id}
+            for token in tokens]
+
+
+def _insert_rows(rows):
+    if rows:
+        db.session.execute(SearchACLIndexEntry.__table__.insert(), rows)
+
+
+def index_event(event, cache=None):
+    """(Re)build the index entries of an event and its contents."""
+    if cache is None:
+        cache = {}
+    db.session.execute(SearchACLIndexEntry.__table__.delete().where(SearchACLIndexEntry.event_id == event.id))
+    if event.is_deleted:
+        return
+    rows = _make_rows(SearchTarget.event, event, event.id, event.category_id, cache)
+    contribs = (Contribution.query
+                .with_parent(event)
+                .filter(~Contribution.is_deleted)
+                .options(selectinload(Contribution.acl_entries),
+                         joinedload(Contribution.session).selectinload('acl_entries')))
+    for contrib in contribs:
+        rows += _make_rows(SearchTarget.contribution, contrib, event.id, event.category_id, cache)
+    attachments = (Attachment.query
+                   .join(Attachment.folder)
+                   .filter(AttachmentFolder.event_id == event.id,
+                           AttachmentFolder.link_type != LinkType.category,
+                           ~AttachmentFolder.is_deleted,
+                           ~Attachment.is_deleted)
+                   .options(selectinload(Attachment.acl_entries),
+                            joinedload(Attachment.folder).selectinload(AttachmentFolder.acl_entries)))
+    for attachment in attachments:
+        rows += _make_rows(SearchTarget.attachment, attachment, event.id, event.category_id, cache)
+    notes = EventNote.query.filter(EventNote.event_id == event.id, ~EventNote.is_deleted)
+    for note in notes:
+        rows += _make_rows(SearchTarget.event_note, note, event.id, event.category_id, cache)
+    _insert_rows(rows)
+
+
+def index_categories(categories, cache=None):
+    """Add index entries for the given categories (but not their contents)."""
+    if cache is None:
+        cache = {}
+    rows = []
+    for categ in categories.options(selectinload(Category.acl_entries)):
+        rows += _make_rows(SearchTarget.category, categ, None, categ.id, cache)
+    _insert_rows(rows)
+
+
+def index_category(category, cache=None):
+    """(Re)build the index entries of a category subtree and its events."""
+    if cache is None:
+        cache = {}
+    subtree_cte = Category.get_subtree_ids_cte([category.id])
+    subtree_ids = db.select([subtree_cte.c.id])
+    db.session.execute(SearchACLIndexEntry.__table__.delete()
+                       .where(SearchACLIndexEntry.category_id.in_(subtree_ids)))
+    index_categories(Category.query.filter(Category.id.in_(subtree_ids), ~Category.is_deleted), cache)
+    events = (Event.query
+              .filter(Event.category_id.in_(subtree_ids), ~Event.is_deleted)
+              .options(selectinload(Event.acl_entries)))
+    for event in events:
+        index_event(event, cache)
+
+
+def index_missing():
+    """Index all searchable objects which are not in the index yet."""
+    def _missing(target, id_column):
+        return ~db.exists().where((SearchACLIndexEntry.object_type == target) &
+                                  (SearchACLIndexEntry.object_id == id_column))
+
+    cache = {}
+    categories = Category.query.filter(~Category.is_deleted, _missing(SearchTarget.category, Category.id))
+    num_categories = categories.count()
+    index_categories(categories, cache)
+    event_ids = {id_ for id_, in db.session.query(Event.id)
+                 .filter(~Event.is_deleted, _missing(SearchTarget.event, Event.id))}
+    event_ids |= {id_ for id_, in db.session.query(Contribution.event_id)
+                  .filter(~Contribution.is_deleted, _missing(SearchTarget.contribution, Contribution.id))}
+    event_ids |= {id_ for id_, in db.session.query(AttachmentFolder.event_id)
+                  .join(AttachmentFolder.attachments)
+                  .filter(~Attachment.is_deleted, ~AttachmentFolder.is_deleted,
+                          AttachmentFolder.link_type != LinkType.category,
+                          _missing(SearchTarget.attachment, Attachment.id))}
+    event_ids |= {id_ for id_, in db.session.query(EventNote.event_id)
+                  .filter(~EventNote.is_deleted, _missing(SearchTarget.event_note, EventNote.id))}
+    for event in Event.query.filter(Event.id.in_(event_ids), ~Event.is_deleted):
+        index_event(event, cache)
+    return num_categories, len(event_ids)
+
+
+def make_acl_index_filter(target, id_column, user):
+    """Create a filter criterion restricting a search query using the index.
+
+    Objects that are not indexed at all are always kept to avoid hiding
+    objects created after the last index update.
+    """
+    indexed = db.exists().where((SearchACLIndexEntry.object_type == target) &
+                                (SearchACLIndexEntry.object_id == id_column))
+    matching = db.exists().where((SearchACLIndexEntry.object_type == target) &
+                                 (SearchACLIndexEntry.object_id == id_column) &
+                                 SearchACLIndexEntry.principal.in_(get_user_principal_tokens(user)))
+    return ~indexed | matching
+
+
+def schedule_index_update(obj):
+    """Invalidate the index for everything affected by a change of `obj`.
+
+    The stale entries are removed immediately (so the affected objects
+    are treated as not indexed) and the index is rebuilt in the background
+    once the transaction has been committed.
+    """
+    pending = g.setdefault('search_acl_index_pending', {'categories': set(), 'events': set()})
+    if isinstance(obj, Attachment):
+        obj = obj.folder
+    if isinstance(obj, Category):
+        if obj.id is None:
+            # new objects are not in the index yet
+            return
+        subtree_cte = Category.get_subtree_ids_cte([obj.id])
+        db.session.execute(SearchACLIndexEntry.__table__.delete()
+                           .where(SearchACLIndexEntry.category_id.in_(db.select([subtree_cte.c.id]))))
+        pending['categories'].add(obj.id)
+    elif (event := obj.event) is not None and event.id is not None:
+        db.session.execute(SearchACLIndexEntry.__table__.delete()
+                           .where(SearchACLIndexEntry.event_id == event.id))
+        pending['events'].add(event.id)
+
+
+def pop_pending_index_updates():
+    return g.pop('search_acl_index_pending', None)
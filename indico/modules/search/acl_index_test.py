@@ -0,0 +1,94 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+import pytest
+
+from indico.core.db.sqlalchemy.principals import EmailPrincipal
+from indico.core.db.sqlalchemy.protection import ProtectionMode
+from indico.modules.events import Event
+from indico.modules.search.acl_index import (ANYONE, CHECK, NOBODY, get_read_tokens, get_user_principal_tokens,
+                                             index_category, index_event, make_acl_index_filter,
+                                             schedule_index_update)
+from indico.modules.search.base import SearchTarget
+from indico.modules.search.models.acl_index import SearchACLIndexEntry
+
+
+def _event_ids_visible_to(user):
+    query = Event.query.filter(make_acl_index_filter(SearchTarget.event, Event.id, user))
+    return {e.id for e in query}
+
+
+def test_read_tokens_public(dummy_event):
+    assert get_read_tokens(dummy_event) == {ANYONE}
+
+
+@pytest.mark.usefixtures('request_context')
+def test_read_tokens_protected(dummy_category, dummy_event, create_user, dummy_group):
+    reader = create_user(1)
+    manager = create_user(2)
+    dummy_category.update_principal(manager, full_access=True)
+    dummy_event.protection_mode = ProtectionMode.protected
+    dummy_event.update_principal(reader, read_access=True)
+    dummy_event.update_principal(dummy_group, read_access=True)
+    assert get_read_tokens(dummy_event) == {f'user:{reader.id}', f'user:{manager.id}',
+                                            f'group:{dummy_group.id}'}
+
+
+@pytest.mark.usefixtures('request_context')
+def test_read_tokens_inherited(dummy_category, dummy_event, dummy_contribution, dummy_user):
+    dummy_category.protection_mode = ProtectionMode.protected
+    dummy_category.update_principal(dummy_user, read_access=True)
+    dummy_contribution.update_principal(EmailPrincipal('foo@example.com'), read_access=True)
+    assert get_read_tokens(dummy_contribution) == {f'user:{dummy_user.id}', CHECK}
+
+
+def test_read_tokens_access_key(dummy_event):
+    dummy_event.protection_mode = ProtectionMode.protected
+    dummy_event.access_key = 'secret'
+    assert get_read_tokens(dummy_event) == {CHECK}
+
+
+def test_user_principal_tokens(dummy_user, dummy_group):
+    assert get_user_principal_tokens(None) == {ANYONE, CHECK}
+    dummy_group.group.members.add(dummy_user)
+    assert get_user_principal_tokens(dummy_user) == {ANYONE, CHECK, f'user:{dummy_user.id}',
+                                                     f'group:{dummy_group.id}'}
+
+
+@pytest.mark.usefixtures('request_context')
+def test_acl_index_filter(db, dummy_category, create_event, create_user):
+    reader = create_user(1)
+    other = create_user(2)
+    public_event = create_event(1)
+    protected_event = create_event(2, protection_mode=ProtectionMode.protected)
+    protected_event.update_principal(reader, read_access=True)
+    secret_event = create_event(3, protection_mode=ProtectionMode.protected)
+    db.session.flush()
+    index_category(dummy_category)
+    assert {e.object_id for e in SearchACLIndexEntry.query.filter_by(principal=NOBODY)} == {secret_event.id}
+    assert _event_ids_visible_to(None) == {public_event.id}
+    assert _event_ids_visible_to(other) == {public_event.id}
+    assert _event_ids_visible_to(reader) == {public_event.id, protected_event.id}
+    # events which are not indexed yet are always included
+    new_event = create_event(4, protection_mode=ProtectionMode.protected)
+    assert _event_ids_visible_to(other) == {public_event.id, new_event.id}
+
+
+@pytest.mark.usefixtures('request_context')
+def test_schedule_index_update(db, dummy_category, dummy_event, dummy_user, create_user):
+    dummy_event.protection_mode = ProtectionMode.protected
+    db.session.flush()
+    index_event(dummy_event)
+    assert _event_ids_visible_to(dummy_user) == set()
+    dummy_event.update_principal(dummy_user, read_access=True)
+    schedule_index_update(dummy_event)
+    # stale entries are removed immediately
+    assert not SearchACLIndexEntry.query.filter_by(event_id=dummy_event.id).has_rows()
+    assert _event_ids_visible_to(dummy_user) == {dummy_event.id}
+    index_event(dummy_event)
+    assert _event_ids_visible_to(dummy_user) == {dummy_event.id}
+    assert _event_ids_visible_to(create_user(1)) == set()
@@ -5,20 +5,17 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
-import itertools
-
 from sqlalchemy.orm import contains_eager, joinedload, load_only, raiseload, selectinload, subqueryload, undefer
 from werkzeug.exceptions import BadRequest
 
 from indico.core.db import db
 from indico.core.db.sqlalchemy.links import LinkType
-from indico.core.db.sqlalchemy.protection import ProtectionMode
-from indico.core.db.sqlalchemy.util.queries import get_n_matching
+from indico.core.db.sqlalchemy.protection import ProtectionMode, preload_protection_data
+from indico.core.db.sqlalchemy.util.queries import get_n_matching_keyset
 from indico.modules.attachments.models.attachments import Attachment
 from indico.modules.attachments.models.folders import AttachmentFolder
 from indico.modules.attachments.models.principals import AttachmentFolderPrincipal, AttachmentPrincipal
 from indico.modules.categories import Category
-from indico.modules.categories.models.principals import CategoryPrincipal
 from indico.modules.events import Event
 from indico.modules.events.contributions.models.contributions import Contribution
 from indico.modules.events.contributions.models.principals import ContributionPrincipal
@@ -28,6 +25,7 @@ from indico.modules.events.notes.models.notes import EventNote, EventNoteRevisio
 from indico.modules.events.sessions.models.blocks import SessionBlock
 from indico.modules.events.sessions.models.principals import SessionPrincipal
 from indico.modules.events.sessions.models.sessions import Session
+from indico.modules.search.acl_index import is_acl_index_enabled, make_acl_index_filter
 from indico.modules.search.base import IndicoSearchProvider, SearchTarget
 from indico.modules.search.result_schemas import (AttachmentResultSchema, CategoryResultSchema,
                                                   ContributionResultSchema, EventNoteResultSchema, EventResultSchema)
@@ -89,41 +87,6 @@ class InternalSearch(IndicoSearchProvider):
             'results': results,
         }
 
-    def _preload_categories(self, objs, preloaded_categories):
-        obj_types = {type(o) for o in objs}
-        assert len(obj_types) == 1
-        obj_type = obj_types.pop()
-
-        if obj_type == Event:
-            chain_query = db.session.query(Event.category_chain).filter(Event.id.in_(o.id for o in objs))
-        elif obj_type == Category:
-            chain_query = db.session.query(Category.chain_ids).filter(Category.id.in_(o.id for o in objs))
-        elif obj_type == Contribution:
-            chain_query = (db.session.query(Event.category_chain)
-                           .join(Contribution.event)
-                           .filter(Contribution.id.in_(o.id for o in objs)))
-        elif obj_type == Attachment:
-            chain_query = (db.session.query(Event.category_chain)
-                           .join(Attachment.folder)
-                           .join(AttachmentFolder.event)
-                           .filter(Attachment.id.in_(o.id for o in objs)))
-        elif obj_type == EventNote:
-            chain_query = (db.session.query(Event.category_chain)
-                           .join(EventNote.event)
-                           .filter(EventNote.id.in_(o.id for o in objs)))
-        else:
-            raise Exception(f'Unhandled object type: {obj_type}')
-        category_ids = set(itertools.chain.from_iterable(id for id, in chain_query))
-        query = (
-            Category.query
-            .filter(Category.id.in_(category_ids))
-            .options(load_only('id', 'parent_id', 'protection_mode'))
-        )
-        Category.preload_relationships(query, 'acl_entries',
-                                       strategy=lambda rel: _apply_acl_entry_strategy(subqueryload(rel),
-                                                                                      CategoryPrincipal))
-        preloaded_categories |= set(query)
-
     def _can_access(self, user, obj, allow_effective_protection_mode=True, admin_override_enabled=False):
         if isinstance(obj, (Category, Event, Session, Contribution)):
             # more efficient for events/categories/contribs since it avoids climbing up the chain
@@ -150,27 +113,39 @@ class InternalSearch(IndicoSearchProvider):
         return (protection_mode == ProtectionMode.public or
                 obj.can_access(user, allow_admin=admin_override_enabled))
 
-    def _paginate(self, query, page, column, user, admin_override_enabled):
+    def _filter_acl_index(self, query, target, column, user, admin_override_enabled):
+        """Restrict a query to objects the user may be able to access.
+
+        :return: A ``(query, prefiltered)`` tuple indicating whether the
+                 search ACL index has been used to filter the query.
+        """
+        if admin_override_enabled or not is_acl_index_enabled():
+            return query, False
+        return query.filter(make_acl_index_filter(target, column, user)), True
+
+    def _paginate(self, query, page, column, user, admin_override_enabled, *, prefiltered=False):
         reverse = False
         pagenav = {'prev': None, 'next': None}
-        if not page:
-            query = query.order_by(column.desc())
-        elif page > 0:  # next page
-            query = query.filter(column < page).order_by(column.desc())
+        order_by, after = column.desc(), None
+        if page and page > 0:  # next page
+            after = (page,)
             # since we asked for a next page we know that a previous page exists
             pagenav['prev'] = -(page - 1)
-        elif page < 0:  # prev page
-            query = query.filter(column > -page).order_by(column)
+        elif page and page < 0:  # prev page
+            order_by, after = column, (-page,)
             # since we asked for a previous page we know that a next page exists
             pagenav['next'] = -(page - 1)
             reverse = True
 
-        preloaded_categories = set()
-        res = get_n_matching(
-            query, self.RESULTS_PER_PAGE + 1,
+        preloaded = []
+        res, __ = get_n_matching_keyset(
+            query, self.RESULTS_PER_PAGE + 1, [order_by],
             lambda obj: self._can_access(user, obj, admin_override_enabled=admin_override_enabled),
-            prefetch_factor=20,
-            preload_bulk=lambda objs: self._preload_categories(objs, preloaded_categories)
+            after=after,
+            # if the query has been prefiltered almost all objects are accessible,
+            # so there is no need to fetch more than what we need for the page
+            prefetch_factor=(1 if prefiltered else 20),
+            preload_bulk=lambda objs: preloaded.extend(preload_protection_data(objs, user))
         )
 
         if len(res) > self.RESULTS_PER_PAGE:
@@ -202,7 +177,10 @@ class InternalSearch(IndicoSearchProvider):
                           undefer(Category.effective_protection_mode),
                           subqueryload(Category.acl_entries)))
 
-        objs, pagenav = self._paginate(query, page, Category.id, user, admin_override_enabled)
+        query, prefiltered = self._filter_acl_index(query, SearchTarget.category, Category.id, user,
+                                                    admin_override_enabled)
+        objs, pagenav = self._paginate(query, page, Category.id, user, admin_override_enabled,
+                                       prefiltered=prefiltered)
         res = DetailedCategorySchema(many=True).dump(objs)
         return pagenav, CategoryResultSchema(many=True).load(res)
 
@@ -225,7 +203,10 @@ class InternalSearch(IndicoSearchProvider):
                 _apply_acl_entry_strategy(selectinload(Event.acl_entries), EventPrincipal)
             )
         )
-        objs, pagenav = self._paginate(query, page, Event.id, user, admin_override_enabled)
+        query, prefiltered = self._filter_acl_index(query, SearchTarget.event, Event.id, user,
+                                                    admin_override_enabled)
+        objs, pagenav = self._paginate(query, page, Event.id, user, admin_override_enabled,
+                                       prefiltered=prefiltered)
 
         query = (
             Event.query
@@ -277,7 +258,10 @@ class InternalSearch(IndicoSearchProvider):
             )
         )
 
-        objs, pagenav = self._paginate(query, page, Contribution.id, user, admin_override_enabled)
+        query, prefiltered = self._filter_acl_index(query, SearchTarget.contribution, Contribution.id, user,
+                                                    admin_override_enabled)
+        objs, pagenav = self._paginate(query, page, Contribution.id, user, admin_override_enabled,
+                                       prefiltered=prefiltered)
 
         event_strategy = joinedload(Contribution.event)
         event_strategy.joinedload(Event.own_venue)
@@ -420,7 +404,10 @@ class InternalSearch(IndicoSearchProvider):
             .outerjoin(Session.event.of_type(session_event))
         )
 
-        objs, pagenav = self._paginate(query, page, Attachment.id, user, admin_override_enabled)
+        query, prefiltered = self._filter_acl_index(query, SearchTarget.attachment, Attachment.id, user,
+                                                    admin_override_enabled)
+        objs, pagenav = self._paginate(query, page, Attachment.id, user, admin_override_enabled,
+                                       prefiltered=prefiltered)
 
         query = (
             Attachment.query
@@ -539,7 +526,10 @@ class InternalSearch(IndicoSearchProvider):
             .outerjoin(Session.event.of_type(session_event))
         )
 
-        objs, pagenav = self._paginate(query, page, EventNote.id, user, admin_override_enabled)
+        query, prefiltered = self._filter_acl_index(query, SearchTarget.event_note, EventNote.id, user,
+                                                    admin_override_enabled)
+        objs, pagenav = self._paginate(query, page, EventNote.id, user, admin_override_enabled,
+                                       prefiltered=prefiltered)
 
         query = (
             EventNote.query
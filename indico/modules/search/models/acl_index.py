@@ -0,0 +1,57 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from indico.core.db import db
+from indico.core.db.sqlalchemy import PyIntEnum
+from indico.modules.search.base import SearchTarget
+from indico.util.string import format_repr
+
+
+class SearchACLIndexEntry(db.Model):
+    """A precomputed "who may read what" entry used to prefilter searches.
+
+    Each searchable object has one row for every principal token that
+    may grant read access to it.  Objects without any rows are treated
+    as not indexed yet and are always considered as search candidates.
+    """
+
+    __tablename__ = 'acl_index'
+    __table_args__ = (db.Index(None, 'principal', 'object_type', 'object_id'),
+                      {'schema': 'search'})
+
+    #: The type of the indexed object
+    object_type = db.Column(
+        PyIntEnum(SearchTarget),
+        primary_key=True,
+        autoincrement=False
+    )
+    #: The ID of the indexed object
+    object_id = db.Column(
+        db.Integer,
+        primary_key=True,
+        autoincrement=False
+    )
+    #: A token identifying a principal that may read the object
+    principal = db.Column(
+        db.String,
+        primary_key=True
+    )
+    #: The ID of the event containing the object (if any)
+    event_id = db.Column(
+        db.Integer,
+        nullable=True,
+        index=True
+    )
+    #: The ID of the category containing the object (if any)
+    category_id = db.Column(
+        db.Integer,
+        nullable=True,
+        index=True
+    )
+
+    def __repr__(self):
+        return format_repr(self, 'object_type', 'object_id', 'principal')
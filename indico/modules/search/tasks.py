@@ -0,0 +1,36 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from celery.schedules import crontab
+
+from indico.core.celery import celery
+from indico.core.db import db
+from indico.modules.categories import Category
+from indico.modules.events import Event
+from indico.modules.search import logger
+from indico.modules.search.acl_index import index_category, index_event, index_missing, is_acl_index_enabled
+
+
+@celery.task(name='update_search_acl_index')
+def update_search_acl_index(category_ids=(), event_ids=()):
+    cache = {}
+    for category in Category.query.filter(Category.id.in_(category_ids)):
+        logger.info('Updating search ACL index for %r', category)
+        index_category(category, cache)
+    for event in Event.query.filter(Event.id.in_(event_ids)):
+        logger.info('Updating search ACL index for %r', event)
+        index_event(event, cache)
+    db.session.commit()
+
+
+@celery.periodic_task(name='search_acl_index_missing', run_every=crontab(minute='15', hour='2'))
+def search_acl_index_missing():
+    if not is_acl_index_enabled():
+        return
+    num_categories, num_events = index_missing()
+    db.session.commit()
+    logger.info('Added %d categories and %d events to the search ACL index', num_categories, num_events)
@@ -60,6 +60,24 @@ def _category_deleted(category, **kwargs):
     category.favorite_of.clear()
 
 
+@signals.core.app_created.connect
+def _setup_linked_events_tracking(app, **kwargs):
+    from indico.modules.users.linked_events import setup_linked_events_tracking
+    setup_linked_events_tracking()
+
+
+@signals.core.after_commit.connect
+def _flush_linked_events_updates(sender, **kwargs):
+    from indico.modules.users.linked_events import flush_linked_events_updates
+    flush_linked_events_updates()
+
+
+@signals.users.merged.connect
+def _merge_users(target, source, **kwargs):
+    from indico.modules.users.linked_events import invalidate_linked_events
+    invalidate_linked_events(source, target)
+
+
 @signals.menu.items.connect_via('admin-sidemenu')
 def _extend_admin_menu(sender, **kwargs):
     if session.user.is_admin:
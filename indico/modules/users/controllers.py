@@ -27,7 +27,7 @@ from indico.core.auth import multipass
 from indico.core.cache import make_scoped_cache
 from indico.core.config import config
 from indico.core.db import db
-from indico.core.db.sqlalchemy.util.queries import get_n_matching
+from indico.core.db.sqlalchemy.util.queries import get_n_matching_keyset
 from indico.core.errors import UserValueError
 from indico.core.marshmallow import mm
 from indico.core.notifications import make_email, send_email
@@ -55,11 +55,11 @@ from indico.modules.users.operations import (add_secondary_email, create_user, d
                                              revoke_admin)
 from indico.modules.users.schemas import (AffiliationArgs, AffiliationSchema, BasicCategorySchema, FavoriteEventSchema,
                                           UserPersonalDataSchema)
-from indico.modules.users.util import (get_avatar_url_from_name, get_gravatar_for_user, get_linked_events,
-                                       get_mastodon_server_name, get_related_categories, get_suggested_categories,
-                                       get_unlisted_events, get_user_by_email, get_user_titles, log_user_update,
-                                       merge_users, search_affiliations, search_users, send_avatar, serialize_user,
-                                       set_user_avatar)
+from indico.modules.users.util import (count_users, get_avatar_url_from_name, get_gravatar_for_user,
+                                       get_linked_events, get_mastodon_server_name, get_related_categories,
+                                       get_suggested_categories, get_unlisted_events, get_user_by_email,
+                                       get_user_titles, log_user_update, merge_users, search_affiliations,
+                                       search_users, send_avatar, serialize_user, set_user_avatar)
 from indico.modules.users.views import (WPAffiliationsDashboard, WPUser, WPUserDashboard, WPUserDataExport,
                                         WPUserFavorites, WPUserPersonalData, WPUserProfilePic, WPUsersAdmin)
 from indico.util.countries import get_countries
@@ -82,6 +82,8 @@ from indico.web.util import (ExpectedError, is_legacy_signed_url_valid, jsonify_
 
 
 IDENTITY_ATTRIBUTES = {'first_name', 'last_name', 'email', 'affiliation', 'full_name'}
+#: The max number of Indico users loaded when searching users in the user picker
+USER_SEARCH_LIMIT = 100
 UserEntry = namedtuple('UserEntry', IDENTITY_ATTRIBUTES | {'profile_url', 'avatar_url', 'user'})
 
 
@@ -108,9 +110,9 @@ def get_events_in_categories(category_ids, user, from_, limit=10):
                       load_only('id', 'category_id', 'start_dt', 'end_dt', 'title', 'access_key',
                                 'protection_mode', 'series_id', 'series_pos', 'series_count',
                                 'label_id', 'label_message', 'description', 'own_room_id', 'own_venue_id',
-                                'own_room_name', 'own_venue_name'))
-             .order_by(absolute_time_delta, Event.id))
-    return get_n_matching(query, limit, lambda x: x.can_access(user))
+                                'own_room_name', 'own_venue_name')))
+    events, __ = get_n_matching_keyset(query, limit, (absolute_time_delta, Event.id), lambda x: x.can_access(user))
+    return events
 
 
 class RHUserBase(RHProtected):
@@ -1106,7 +1108,10 @@ class RHUserSearch(RHProtected):
         'No criteria provided'
     ), location='query')
     def _process(self, exact, external, favorites_first, **criteria):
-        matches = search_users(exact=exact, include_pending=True, external=external, **criteria)
+        # the best matches come first, so there is no need to load all the users matching
+        # a short search string since only the first few ones are shown anyway
+        matches = search_users(exact=exact, include_pending=True, external=external, limit=USER_SEARCH_LIMIT,
+                               favorites_first=favorites_first, **criteria)
         self.externals = {}
 
         def _sort_key(entry):
@@ -1124,6 +1129,10 @@ class RHUserSearch(RHProtected):
             favorites = {u.id for u in session.user.favorite_users}
             results.sort(key=lambda x: x['id'] not in favorites)
         total = len(results)
+        num_users = sum(isinstance(entry, User) for entry in matches)
+        if num_users >= USER_SEARCH_LIMIT:
+            # not all matching users have been loaded, but the total is shown in the search
+            total += count_users(exact=exact, include_pending=True, **criteria) - num_users
         results = results[:10]
         self._process_pending_users(results)
         return jsonify(users=results, total=total)
@@ -38,3 +38,18 @@ def test_user_data_request(mocker, dummy_user):
     response = rh._process()
     task.assert_called()
     assert response == {'state': DataExportRequestState.running.name}
+
+
+@pytest.mark.usefixtures('db', 'request_context')
+def test_user_search_total(mocker, create_user):
+    from indico.modules.users.controllers import RHUserSearch
+    mocker.patch('indico.modules.users.controllers.USER_SEARCH_LIMIT', 2)
+    for i in range(1, 5):
+        create_user(i, f'Jorge{i}', 'Smith')
+    create_user(5, 'Anna', 'Smith')
+
+    request.args = MultiDict({'first_name': 'jorge'})
+    response = RHUserSearch()._process()
+    # only the best matches are loaded, but the total includes all of them
+    assert len(response.json['users']) == 2
+    assert response.json['total'] == 4
@@ -7,9 +7,7 @@
 
 from datetime import timedelta
 from pathlib import Path, PurePath
-from tempfile import NamedTemporaryFile
 from uuid import uuid4
-from zipfile import ZipFile
 
 import yaml
 from sqlalchemy.orm import joinedload, selectinload, subqueryload
@@ -36,6 +34,7 @@ from indico.modules.users import logger
 from indico.modules.users.models.export import DataExportOptions, DataExportRequest, DataExportRequestState
 from indico.util.date_time import now_utc
 from indico.util.fs import secure_filename
+from indico.util.zipstream import ZipStream
 from indico.web.flask.templating import get_template_module
 from indico.web.flask.util import url_for
 
@@ -76,35 +75,31 @@ def initialize_new_request(user, options, include_files):
 
 
 def generate_zip(user, data, files, max_size):
-    temp_file = NamedTemporaryFile(suffix='.zip', dir=config.TEMP_DIR, delete=False)  # noqa: SIM115
-    try:
-        return _generate_zip(user, data, files, max_size, temp_file)
-    finally:
-        Path(temp_file.name).unlink(missing_ok=True)
-
-
-def _generate_zip(user, data, files, max_size, temp_file):
-    max_size_exceeded = False
-    with ZipFile(temp_file, 'w', allowZip64=True) as zip_file:
-        for key, subdata in data.items():
-            zip_file.writestr(f'{key}.yaml', convert_to_yaml(subdata))
-
-        written = 0
-        for file in files:
-            written += getattr(file, 'file', file).size
-            if written <= max_size:
-                write_file(zip_file, file)
-            else:
-                max_size_exceeded = True
-                break
-
-    temp_file.seek(0)
+    """Generate the zip file and write it directly to the storage backend."""
+    zip_stream, max_size_exceeded = build_zip_stream(data, files, max_size)
     file = File(filename='data-export.zip', content_type='application/zip')
-    file.save(('user', user.id), temp_file)
+    file.save(('user', user.id), zip_stream.open())
     file.claim()
     return file, max_size_exceeded
 
 
+def build_zip_stream(data, files, max_size):
+    max_size_exceeded = False
+    zip_stream = ZipStream()
+    for key, subdata in data.items():
+        zip_stream.add_data(f'{key}.yaml', convert_to_yaml(subdata))
+
+    written = 0
+    for file in files:
+        written += getattr(file, 'file', file).size
+        if written <= max_size:
+            add_file(zip_stream, file)
+        else:
+            max_size_exceeded = True
+            break
+    return zip_stream, max_size_exceeded
+
+
 def serialize_user_data(export_request):
     from indico.modules.users.export_schemas import UserDataExportSchema
 
@@ -125,11 +120,10 @@ def options_to_fields(options):
     return fields
 
 
-def write_file(zip_file, file):
+def add_file(zip_stream, file):
     path = build_storage_path(file)
     file = getattr(file, 'file', file)
-    with file.open() as f:
-        zip_file.writestr(path, f.read())
+    zip_stream.add_file(path, file.open, file.size)
 
 
 def get_user_files(export_request):
@@ -0,0 +1,223 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+import itertools
+from datetime import timedelta
+from uuid import uuid4
+
+from flask import g, has_app_context
+from sqlalchemy import inspect
+from sqlalchemy.event import contains, listen
+
+from indico.core.cache import make_scoped_cache
+from indico.core.db import db
+from indico.modules.events.abstracts.models.abstracts import Abstract, AbstractState
+from indico.modules.events.abstracts.models.persons import AbstractPersonLink
+from indico.modules.events.contributions.models.contributions import Contribution
+from indico.modules.events.contributions.models.persons import ContributionPersonLink, SubContributionPersonLink
+from indico.modules.events.contributions.models.principals import ContributionPrincipal
+from indico.modules.events.contributions.models.subcontributions import SubContribution
+from indico.modules.events.models.events import Event, EventType
+from indico.modules.events.models.persons import EventPerson, EventPersonLink, PersonLinkBase
+from indico.modules.events.models.principals import EventPrincipal
+from indico.modules.events.registration.models.forms import RegistrationForm
+from indico.modules.events.registration.models.registrations import Registration
+from indico.modules.events.sessions.models.principals import SessionPrincipal
+from indico.modules.events.sessions.models.sessions import Session
+from indico.modules.events.surveys.models.submissions import SurveySubmission
+from indico.modules.events.surveys.models.surveys import Survey
+from indico.modules.events.tracks.models.principals import TrackPrincipal
+from indico.modules.events.tracks.models.tracks import Track
+from indico.modules.users.models.favorites import favorite_event_table
+from indico.modules.users.models.users import User
+
+
+linked_events_cache = make_scoped_cache('linked-events')
+
+#: How long the linked events of a user are cached.  Most changes
+#: invalidate the cached data immediately, but e.g. deleting a
+#: contribution or session only becomes visible once it expired.
+LINKED_EVENTS_CACHE_TTL = timedelta(hours=1)
+#: The roles which come from objects with a `user_id` column
+_USER_LINK_TYPES = (Registration, SurveySubmission, EventPrincipal, SessionPrincipal, ContributionPrincipal,
+                    TrackPrincipal, EventPerson)
+
+
+def _select(event_id, role, *criteria):
+    return db.select([event_id.label('event_id'), role.label('role')]).where(db.and_(*criteria))
+
+
+def _get_linked_events_query(user_id):
+    role = db.literal
+    bad_abstract_states = {AbstractState.withdrawn, AbstractState.rejected}
+    abstract_criteria = (~Abstract.is_deleted, ~Abstract.state.in_(bad_abstract_states))
+    person_role = db.case([(Event._type == EventType.lecture, 'lecture_speaker')], else_='conference_chair')
+    queries = [
+        _select(RegistrationForm.event_id, role('registration_registrant'),
+                Registration.user_id == user_id,
+                Registration.registration_form_id == RegistrationForm.id,
+                Registration.is_active,
+                ~RegistrationForm.is_deleted),
+        _select(Survey.event_id, role('survey_submitter'),
+                SurveySubmission.user_id == user_id,
+                SurveySubmission.survey_id == Survey.id,
+                ~Survey.is_deleted),
+        # any ACL entry links the event, even if it does not grant a specific role
+        _select(EventPrincipal.event_id, db.cast(db.null(), db.String),
+                EventPrincipal.user_id == user_id),
+        _select(EventPrincipal.event_id, role('conference_manager'),
+                EventPrincipal.user_id == user_id,
+                EventPrincipal.has_management_permission('ANY')),
+        _select(Event.id, role('conference_creator'),
+                Event.creator_id == user_id),
+        _select(EventPerson.event_id, person_role,
+                EventPerson.user_id == user_id,
+                Event.id == EventPerson.event_id,
+                db.exists().where(EventPersonLink.person_id == EventPerson.id)),
+        _select(EventPerson.event_id, role('contributor'),
+                EventPerson.user_id == user_id,
+                db.exists().where(ContributionPersonLink.person_id == EventPerson.id,
+                                  Contribution.id == ContributionPersonLink.contribution_id,
+                                  ~Contribution.is_deleted)),
+        _select(EventPerson.event_id, role('contributor'),
+                EventPerson.user_id == user_id,
+                db.exists().where(SubContributionPersonLink.person_id == EventPerson.id,
+                                  SubContribution.id == SubContributionPersonLink.subcontribution_id,
+                                  Contribution.id == SubContribution.contribution_id,
+                                  ~SubContribution.is_deleted,
+                                  ~Contribution.is_deleted)),
+        _select(Abstract.event_id, role('abstract_submitter'),
+                Abstract.submitter_id == user_id,
+                *abstract_criteria),
+        _select(EventPerson.event_id, role('abstract_person'),
+                EventPerson.user_id == user_id,
+                db.exists().where(AbstractPersonLink.person_id == EventPerson.id,
+                                  Abstract.id == AbstractPersonLink.abstract_id,
+                                  *abstract_criteria)),
+        _select(favorite_event_table.c.target_id, role('favorited'),
+                favorite_event_table.c.user_id == user_id),
+    ]
+    queries += [_select(EventPrincipal.event_id, role(event_role),
+                        EventPrincipal.user_id == user_id,
+                        EventPrincipal.permissions.any(permission))
+                for permission, event_role in (('review_all_abstracts', 'abstract_reviewer'),
+                                               ('convene_all_abstracts', 'track_convener'))]
+    queries += [_select(EventPrincipal.event_id, role(permission),
+                        EventPrincipal.user_id == user_id,
+                        EventPrincipal.has_management_permission(permission, explicit=True))
+                for permission in ('paper_manager', 'paper_judge', 'paper_content_reviewer', 'paper_layout_reviewer')]
+    queries += [_select(Session.event_id, role(session_role),
+                        SessionPrincipal.user_id == user_id,
+                        Session.id == SessionPrincipal.session_id,
+                        ~Session.is_deleted,
+                        criterion)
+                for session_role, criterion in (('session_coordinator', SessionPrincipal.permissions.any('coordinate')),
+                                                ('session_submission', SessionPrincipal.permissions.any('submit')),
+                                                ('session_manager', SessionPrincipal.full_access),
+                                                ('session_access', SessionPrincipal.read_access))]
+    queries += [_select(Contribution.event_id, role(contribution_role),
+                        ContributionPrincipal.user_id == user_id,
+                        Contribution.id == ContributionPrincipal.contribution_id,
+                        ~Contribution.is_deleted,
+                        criterion)
+                for contribution_role, criterion in (
+                    ('contribution_submission', ContributionPrincipal.permissions.any('submit')),
+                    ('contribution_manager', ContributionPrincipal.full_access),
+                    ('contribution_access', ContributionPrincipal.read_access),
+                )]
+    queries += [_select(Track.event_id, role(track_role),
+                        TrackPrincipal.user_id == user_id,
+                        Track.id == TrackPrincipal.track_id,
+                        TrackPrincipal.permissions.any(permission))
+                for permission, track_role in (('review', 'abstract_reviewer'), ('convene', 'track_convener'))]
+    return db.union_all(*queries)
+
+
+def _get_version(user_id):
+    key = f'version-{user_id}'
+    if (version := linked_events_cache.get(key)) is None:
+        version = uuid4().hex
+        linked_events_cache.set(key, version, LINKED_EVENTS_CACHE_TTL)
+    return version
+
+
+def get_linked_event_roles(user):
+    """Get the IDs of all events linked to a user and the user's roles in them.
+
+    The links are retrieved using a single query and cached until they
+    are invalidated by a change affecting them.  Neither deleted nor past
+    events are filtered out, so the result can be used for any date range.
+
+    :param user: A `User`
+    :return: A dict mapping event IDs to sets of roles
+    """
+    # the version needs to be retrieved before querying the database, so
+    # data loaded right before an invalidation is never cached as current
+    cache_key = f'links-{user.id}-{_get_version(user.id)}'
+    if (links := linked_events_cache.get(cache_key)) is not None:
+        return links
+    links = {}
+    for event_id, role in db.session.execute(_get_linked_events_query(user.id)):
+        roles = links.setdefault(event_id, set())
+        if role is not None:
+            roles.add(role)
+    linked_events_cache.set(cache_key, links, LINKED_EVENTS_CACHE_TTL)
+    return links
+
+
+def invalidate_linked_events(*users):
+    """Invalidate the cached linked events of some users.
+
+    The cached data is discarded once the current transaction has been
+    committed.
+    """
+    if has_app_context():
+        g.setdefault('pending_linked_events_updates', set()).update(user.id for user in users)
+
+
+def _get_user_ids(obj):
+    if isinstance(obj, User):
+        return {obj.id}
+    elif isinstance(obj, _USER_LINK_TYPES):
+        # also include the previous user in case the object was reassigned
+        return {obj.user_id, *inspect(obj).attrs.user_id.history.deleted}
+    elif isinstance(obj, PersonLinkBase):
+        return {obj.person.user_id}
+    elif isinstance(obj, Abstract):
+        return {obj.submitter_id, *(link.person.user_id for link in obj.person_links)}
+    elif isinstance(obj, Event):
+        return {obj.creator_id}
+    return set()
+
+
+def _collect_linked_events_changes(session, flush_context):
+    if not has_app_context():
+        return
+    pending = g.setdefault('pending_linked_events_updates', set())
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        pending |= _get_user_ids(obj)
+    pending.discard(None)
+
+
+def setup_linked_events_tracking():
+    """Track changes which affect the linked events of users.
+
+    Changes to registrations, ACL entries, person links and other objects
+    linking a user to an event invalidate the cached linked events of that
+    user once the transaction is committed.
+    """
+    if not contains(db.session, 'after_flush', _collect_linked_events_changes):
+        listen(db.session, 'after_flush', _collect_linked_events_changes)
+
+
+def flush_linked_events_updates():
+    """Invalidate the linked events of all users affected by the committed transaction."""
+    if not has_app_context():
+        return
+    if pending := g.pop('pending_linked_events_updates', None):
+        linked_events_cache.set_many({f'version-{user_id}': uuid4().hex for user_id in pending},
+                                     LINKED_EVENTS_CACHE_TTL)
@@ -0,0 +1,83 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from datetime import datetime
+
+import pytest
+from pytz import utc
+
+from indico.modules.events.contributions.models.persons import ContributionPersonLink
+from indico.modules.events.contributions.util import get_events_with_linked_contributions
+from indico.modules.events.models.events import EventType
+from indico.modules.events.models.persons import EventPersonLink
+from indico.modules.events.util import get_events_managed_by, get_events_with_linked_event_persons
+from indico.modules.users.linked_events import (flush_linked_events_updates, get_linked_event_roles,
+                                                setup_linked_events_tracking)
+from indico.modules.users.util import get_linked_events
+
+
+@pytest.fixture(autouse=True)
+def _linked_events_tracking():
+    setup_linked_events_tracking()
+
+
+@pytest.mark.usefixtures('db')
+def test_get_linked_event_roles(create_user, create_event, create_event_person, create_contribution):
+    user = create_user(123)
+    managed = create_event(creator=user)
+    managed.update_principal(user, full_access=True, permissions={'paper_judge'})
+    lecture = create_event(type_=EventType.lecture)
+    lecture.person_links.append(EventPersonLink(person=create_event_person(lecture, user)))
+    conference = create_event()
+    contribution = create_contribution(conference, 'Dummy')
+    contribution.person_links.append(ContributionPersonLink(person=create_event_person(conference, user)))
+    favorite = create_event()
+    user.favorite_events.add(favorite)
+    create_event()
+    assert get_linked_event_roles(user) == {
+        managed.id: {'conference_creator', 'conference_manager', 'paper_judge'},
+        lecture.id: {'lecture_speaker'},
+        conference.id: {'contributor'},
+        favorite.id: {'favorited'},
+    }
+    # the old per-role helpers return the same data
+    assert set(get_events_managed_by(user)) == {managed.id}
+    assert get_events_with_linked_event_persons(user) == {lecture.id: 'lecture_speaker'}
+    assert get_events_with_linked_contributions(user) == {conference.id: {'contributor'}}
+
+
+def test_get_linked_event_roles_invalidated(db, create_user, create_event):
+    user = create_user(123)
+    event = create_event()
+    flush_linked_events_updates()
+    assert get_linked_event_roles(user) == {}
+    event.update_principal(user, read_access=True)
+    db.session.flush()
+    # cached until the change is committed
+    assert get_linked_event_roles(user) == {}
+    flush_linked_events_updates()
+    assert get_linked_event_roles(user) == {event.id: set()}
+
+
+@pytest.mark.usefixtures('db')
+def test_get_linked_events_dt(create_user, create_event):
+    user = create_user(123)
+    past = create_event(start_dt=datetime(2020, 1, 1, 10, tzinfo=utc), end_dt=datetime(2020, 1, 1, 12, tzinfo=utc))
+    running = create_event(start_dt=datetime(2020, 1, 1, 10, tzinfo=utc), end_dt=datetime(2030, 1, 1, tzinfo=utc))
+    future = create_event(start_dt=datetime(2029, 1, 1, 10, tzinfo=utc), end_dt=datetime(2029, 1, 1, 12, tzinfo=utc))
+    for event in (past, running, future):
+        event.update_principal(user, full_access=True)
+        user.favorite_events.add(event)
+    favorite = create_event(start_dt=datetime(2020, 1, 1, 10, tzinfo=utc), end_dt=datetime(2030, 1, 1, tzinfo=utc))
+    user.favorite_events.add(favorite)
+    dt = datetime(2025, 1, 1, tzinfo=utc)
+    # favorite events are only included if they have not started yet
+    assert get_linked_events(user, dt) == {
+        running: {'conference_manager'},
+        future: {'conference_manager', 'favorited'},
+    }
+    assert len(get_linked_events(user)) == 4
@@ -10,7 +10,6 @@ from sqlalchemy.event import listens_for
 from sqlalchemy.orm import column_property, mapper
 
 from indico.core.db import db
-from indico.core.db.sqlalchemy.custom.unaccent import define_unaccented_lowercase_index
 from indico.core.db.sqlalchemy.searchable import make_fts_index
 from indico.modules.logs import AppLogEntry
 from indico.util.string import format_repr
@@ -20,6 +19,8 @@ class Affiliation(db.Model):
     __tablename__ = 'affiliations'
 
     __table_args__ = (db.Index(None, 'meta', postgresql_using='gin'),
+                      db.Index('ix_affiliations_search_key_trgm', 'search_key', postgresql_using='gin',
+                               postgresql_ops={'search_key': 'gin_trgm_ops'}),
                       {'schema': 'indico'})
 
     id = db.Column(
@@ -77,6 +78,15 @@ class Affiliation(db.Model):
                                             array(['']), '|||'),
         deferred=True,
     )
+    #: The unaccented, lowercase version of `searchable_names`, used for
+    #: substring and similarity searches
+    search_key = db.deferred(db.Column(
+        db.String,
+        db.Computed("indico.indico_unaccent(lower(indico.text_array_to_string("
+                    "ARRAY['']::text[] || indico.text_array_append(alt_names::text[], name::text) || "
+                    "ARRAY['']::text[], '|||')))"),
+        nullable=False
+    ))
 
     # relationship backrefs:
     # - abstract_links (AbstractPersonLink._affiliation_link)
@@ -107,8 +117,6 @@ class Affiliation(db.Model):
         return AppLogEntry.log(*args, meta={'affiliation_id': self.id}, **kwargs)
 
 
-define_unaccented_lowercase_index(Affiliation.searchable_names, Affiliation.__table__,
-                                  'ix_affiliations_searchable_names_unaccent')
 make_fts_index(Affiliation, 'searchable_names')
 
 
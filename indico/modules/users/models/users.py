@@ -200,6 +200,10 @@ class User(PersonMixin, db.Model):
                       db.CheckConstraint("is_pending OR (first_name != '' AND last_name != '')",
                                          'not_pending_proper_names'),
                       db.CheckConstraint("(picture IS NULL) = (picture_metadata::text = 'null')", 'valid_picture'),
+                      db.Index('ix_users_search_name_trgm', 'search_name', postgresql_using='gin',
+                               postgresql_ops={'search_name': 'gin_trgm_ops'}),
+                      db.Index('ix_users_search_name_prefix', 'search_name',
+                               postgresql_ops={'search_name': 'text_pattern_ops'}),
                       {'schema': 'users'})
 
     #: the unique id of the user
@@ -219,6 +223,14 @@ class User(PersonMixin, db.Model):
         nullable=False,
         index=True
     )
+    #: the unaccented, lowercase name of the user, used for searching;
+    #: the first name is repeated at the end so a single pattern matches
+    #: both "first last" and "last first"
+    search_name = db.deferred(db.Column(
+        db.String,
+        db.Computed("indico.indico_unaccent(lower(first_name || ' ' || last_name || ' ' || first_name))"),
+        nullable=False
+    ))
     # the title of the user - you usually want the `title` property!
     _title = db.Column(
         'title',
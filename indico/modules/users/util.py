@@ -45,7 +45,7 @@ from indico.util.fs import secure_filename
 from indico.util.i18n import _
 from indico.util.network import make_validate_request_url_hook, validate_request_url
 from indico.util.signals import make_interceptable
-from indico.util.string import crc32, remove_accents
+from indico.util.string import crc32
 from indico.web.flask.util import send_file, url_for
 from indico.web.util import strip_path_from_url
 
@@ -122,43 +122,14 @@ def get_linked_events(user, dt=None, limit=None, load_also=(), extra_options=())
     :param dt: Only include events taking place on/after that date
     :param limit: Max number of events
     """
-    from indico.modules.events.abstracts.util import (get_events_with_abstract_persons,
-                                                      get_events_with_abstract_reviewer_convener)
-    from indico.modules.events.contributions.util import get_events_with_linked_contributions
-    from indico.modules.events.papers.util import get_events_with_paper_roles
-    from indico.modules.events.registration.util import get_events_registered
-    from indico.modules.events.sessions.util import get_events_with_linked_sessions
-    from indico.modules.events.surveys.util import get_events_with_submitted_surveys
-    from indico.modules.events.util import (get_events_created_by, get_events_managed_by,
-                                            get_events_with_linked_event_persons)
-
-    links = {}
-    for event_id in get_events_registered(user, dt):
-        links.setdefault(event_id, set()).add('registration_registrant')
-    for event_id in get_events_with_submitted_surveys(user, dt):
-        links.setdefault(event_id, set()).add('survey_submitter')
-    for event_id in get_events_managed_by(user, dt):
-        links.setdefault(event_id, set()).add('conference_manager')
-    for event_id in get_events_created_by(user, dt):
-        links.setdefault(event_id, set()).add('conference_creator')
-    for event_id, principal_roles in get_events_with_linked_sessions(user, dt).items():
-        links.setdefault(event_id, set()).update(principal_roles)
-    for event_id, principal_roles in get_events_with_linked_contributions(user, dt).items():
-        links.setdefault(event_id, set()).update(principal_roles)
-    for event_id, role in get_events_with_linked_event_persons(user, dt).items():
-        links.setdefault(event_id, set()).add(role)
-    for event_id, roles in get_events_with_abstract_reviewer_convener(user, dt).items():
-        links.setdefault(event_id, set()).update(roles)
-    for event_id, roles in get_events_with_abstract_persons(user, dt).items():
-        links.setdefault(event_id, set()).update(roles)
-    for event_id, roles in get_events_with_paper_roles(user, dt).items():
-        links.setdefault(event_id, set()).update(roles)
-    for event in user.favorite_events:
-        if dt is None or event.start_dt >= dt:
-            links.setdefault(event.id, set()).add('favorited')
+    from indico.modules.users.linked_events import get_linked_event_roles
 
+    links = get_linked_event_roles(user)
     if not links:
         return {}
+    # favorite events are only included if they have not started yet
+    favorited = {event_id for event_id, roles in links.items() if 'favorited' in roles}
+    only_favorited = {event_id for event_id in favorited if links[event_id] == {'favorited'}}
 
     # Find events (past and future) which are closest to the current time
     time_delta = now_utc(False) - Event.start_dt
@@ -166,7 +137,8 @@ def get_linked_events(user, dt=None, limit=None, load_also=(), extra_options=())
 
     query = (Event.query
              .filter(~Event.is_deleted,
-                     Event.id.in_(links))
+                     Event.id.in_(links),
+                     Event.ends_after(dt))
              .options(joinedload('series'),
                       joinedload('label'),
                       load_only('id', 'category_id', 'title', 'start_dt', 'end_dt',
@@ -174,12 +146,17 @@ def get_linked_events(user, dt=None, limit=None, load_also=(), extra_options=())
                                 *load_also),
                       *extra_options)
              .order_by(absolute_time_delta, Event.id))
+    if dt is not None and only_favorited:
+        query = query.filter(Event.id.notin_(only_favorited) | (Event.start_dt >= dt))
     if limit is not None:
         query = query.limit(limit)
 
     # Sort by 'start_dt' so that past events appear at the top and future events at the bottom
     events = sorted(query, key=attrgetter('start_dt'))
-    return {event: links[event.id] for event in events}
+    return {event: (links[event.id] - {'favorited'}
+                    if event.id in favorited and dt is not None and event.start_dt < dt
+                    else links[event.id])
+            for event in events}
 
 
 def get_unlisted_events(user):
@@ -212,16 +189,31 @@ def serialize_user(user):
     }
 
 
-def _build_name_search(name_list):
-    text = remove_accents('%{}%'.format('%'.join(escape_like(name) for name in name_list)))
-    return db.or_(db.func.indico.indico_unaccent(db.func.concat(User.first_name, ' ', User.last_name)).ilike(text),
-                  db.func.indico.indico_unaccent(db.func.concat(User.last_name, ' ', User.first_name)).ilike(text))
+def _match_search_key(column, pattern):
+    # the column already contains unaccented, lowercase data, so it can be
+    # matched using its trigram index without unaccenting every row
+    return column.like(db.func.indico.indico_unaccent(pattern.lower()))
+
+
+def _build_name_search(name_list, prefix=False):
+    pattern = '{}%'.format('%'.join(escape_like(name) for name in name_list))
+    return _match_search_key(User.search_name, pattern if prefix else f'%{pattern}')
 
 
 def build_user_search_query(criteria, exact=False, include_deleted=False, include_pending=False,
-                            include_blocked=False, favorites_first=False):
+                            include_blocked=False, favorites_first=False, name_prefix=False):
+    """Build a query to search for users.
+
+    When searching by ``name``, users whose name starts with the search
+    string are returned first, followed by the other matches ranked by
+    their similarity to the search string.
+
+    :param name_prefix: Whether the ``name`` criterion should only match
+                        the beginning of the names, which is much faster
+                        than a substring search.
+    """
     unspecified = object()
-    query = User.query.distinct(User.id).options(db.joinedload(User._all_emails))
+    query = User.query.options(db.joinedload(User._all_emails))
 
     if not include_pending:
         query = query.filter(~User.is_pending)
@@ -232,28 +224,38 @@ def build_user_search_query(criteria, exact=False, include_deleted=False, includ
 
     email = criteria.pop('email', unspecified)
     if email is not unspecified:
-        query = query.join(UserEmail).filter(unaccent_match(UserEmail.email, email, exact))
+        query = query.filter(User._all_emails.any(unaccent_match(UserEmail.email, email, exact)))
 
     # search on any of the name fields (first_name OR last_name)
     name = criteria.pop('name', unspecified)
+    rank = []
     if name is not unspecified:
         if exact:
             raise ValueError("'name' is not compatible with 'exact'")
         if 'first_name' in criteria or 'last_name' in criteria:
             raise ValueError("'name' is not compatible with (first|last)_name")
-        query = query.filter(_build_name_search(name.replace(',', '').split()))
+        name_list = name.replace(',', '').split()
+        query = query.filter(_build_name_search(name_list, prefix=name_prefix))
+        search_string = db.func.indico.indico_unaccent(' '.join(name_list).lower())
+        rank = [_build_name_search(name_list, prefix=True).desc(),
+                db.func.word_similarity(search_string, User.search_name).desc()]
 
     for k, v in criteria.items():
         query = query.filter(unaccent_match(getattr(User, k), v, exact))
-
-    # wrap as subquery so we can apply order regardless of distinct-by-id
-    query = query.from_self()
+        if k in ('first_name', 'last_name'):
+            # any match must also be contained in the search name, and checking that first
+            # allows using its trigram index instead of unaccenting the names of all users
+            query = query.filter(_match_search_key(User.search_name, f'%{escape_like(v)}%'))
+            if not exact:
+                # exact matches first
+                rank.append(unaccent_match(getattr(User, k), v, exact=True).desc())
 
     if favorites_first:
         query = (query.outerjoin(favorite_user_table, db.and_(favorite_user_table.c.user_id == session.user.id,
                                                               favorite_user_table.c.target_id == User.id))
                  .order_by(nullslast(favorite_user_table.c.user_id)))
-    return query.order_by(db.func.lower(db.func.indico.indico_unaccent(User.first_name)),
+    return query.order_by(*rank,
+                          db.func.lower(db.func.indico.indico_unaccent(User.first_name)),
                           db.func.lower(db.func.indico.indico_unaccent(User.last_name)),
                           User.id)
 
@@ -276,7 +278,7 @@ def _deduplicate_identities(identities):
 
 
 def search_users(exact=False, include_deleted=False, include_pending=False, include_blocked=False,
-                 external=False, allow_system_user=False, **criteria):
+                 external=False, allow_system_user=False, limit=None, favorites_first=False, **criteria):
     """Search for users.
 
     :param exact: Indicates if only exact matches should be returned.
@@ -292,6 +294,12 @@ def search_users(exact=False, include_deleted=False, include_pending=False, incl
                      for matching users.
     :param allow_system_user: Whether the system user may be returned
                               in the search results.
+    :param limit: The max number of Indico users to return.  When
+                  searching by name, only the best matches are kept.
+                  When searching by first or last name, exact matches
+                  are kept first.
+    :param favorites_first: Whether to keep the favorite users of the
+                            current user first when using `limit`.
     :param criteria: A dict containing any of the following keys:
                      name, first_name, last_name, email, affiliation, phone,
                      address
@@ -305,15 +313,28 @@ def search_users(exact=False, include_deleted=False, include_pending=False, incl
     if not criteria:
         return set()
 
-    query = (build_user_search_query(dict(criteria), exact=exact, include_deleted=include_deleted,
-                                     include_pending=include_pending, include_blocked=include_blocked)
-             .options(db.joinedload(User.identities),
-                      db.joinedload(User.merged_into_user)))
+    def _query(**kwargs):
+        query = (build_user_search_query(dict(criteria), exact=exact, include_deleted=include_deleted,
+                                         include_pending=include_pending, include_blocked=include_blocked,
+                                         favorites_first=favorites_first, **kwargs)
+                 .options(db.joinedload(User.identities),
+                          db.joinedload(User.merged_into_user)))
+        return query.limit(limit) if limit is not None else query
+
+    users = None
+    if limit is not None and 'name' in criteria:
+        # names starting with the search string are ranked first, so if there are
+        # enough of them we can skip the much slower substring search
+        users = _query(name_prefix=True).all()
+        if len(users) < limit:
+            users = None
+    if users is None:
+        users = _query().all()
 
     found_emails = {}
     found_identities = {}
     system_user = set()
-    for user in query:
+    for user in users:
         for identity in user.identities:
             found_identities[(identity.provider, identity.identifier)] = user
         for email in user.all_emails:
@@ -334,6 +355,20 @@ def search_users(exact=False, include_deleted=False, include_pending=False, incl
     return set(found_emails.values()) | system_user
 
 
+def count_users(exact=False, include_deleted=False, include_pending=False, include_blocked=False, **criteria):
+    """Count the Indico users matching a search.
+
+    This uses the same criteria as :func:`search_users` but never
+    searches any identity providers.
+    """
+    criteria = {key: value.strip() for key, value in criteria.items() if value.strip()}
+    if not criteria:
+        return 0
+    query = build_user_search_query(criteria, exact=exact, include_deleted=include_deleted,
+                                    include_pending=include_pending, include_blocked=include_blocked)
+    return query.order_by(None).enable_eagerloads(False).count()
+
+
 def get_user_by_email(email, create_pending=False):
     """Find a user based on his email address.
 
@@ -609,13 +644,14 @@ def get_mastodon_server_name(url):
 
 
 def _match_search(q, exact=False, prefix=False):
+    q = escape_like(q)
     if exact:
         match_str = f'|||{q}|||'
     elif prefix:
         match_str = f'|||{q}'
     else:
         match_str = q
-    return unaccent_match(Affiliation.searchable_names, match_str, exact=False)
+    return _match_search_key(Affiliation.search_key, f'%{match_str}%')
 
 
 def _weighted_score(*params):
@@ -626,6 +662,8 @@ def _weighted_score(*params):
 def search_affiliations(q):
     exact_match = _match_search(q, exact=True)
     score = _weighted_score((exact_match, 150), (_match_search(q, prefix=True), 60), (_match_search(q), 20))
+    # rank the remaining matches (e.g. those only matching some words) by how similar they are
+    score += db.func.word_similarity(db.func.indico.indico_unaccent(q.lower()), Affiliation.search_key) * 20
     countries = set(get_countries_regex().findall(q))
     for country in countries:
         q = q.replace(country, '')
@@ -0,0 +1,63 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+import pytest
+
+from indico.modules.users.util import build_user_search_query, search_users
+
+
+@pytest.fixture
+def users(create_user):
+    return [create_user(1, 'Jörg', 'Müller'),
+            create_user(2, 'Anna', 'Jorgensen'),
+            create_user(3, 'Peter', 'Jorge'),
+            create_user(4, 'Jorge', 'Smith', email='jorge@example.test')]
+
+
+@pytest.mark.usefixtures('db')
+@pytest.mark.parametrize(('name', 'expected'), (
+    ('jorg', {1, 2, 3, 4}),
+    ('muller jorg', {1}),
+    ('jörg müller', {1}),
+    ('smith', {4}),
+    ('jorge smith', {4}),
+    ('smith, jorge', {4}),
+    ('nobody', set()),
+))
+def test_search_users_name(users, name, expected):
+    assert {u.id for u in search_users(name=name)} == expected
+
+
+@pytest.mark.usefixtures('db')
+def test_search_users_name_ranked(users):
+    query = build_user_search_query({'name': 'jorg'})
+    # names starting with the search string first, then the most similar ones
+    assert [u.id for u in query][:2] == [1, 4]
+    assert [u.id for u in build_user_search_query({'name': 'jorg'}, name_prefix=True)] == [1, 4]
+
+
+@pytest.mark.usefixtures('db')
+def test_search_users_limit(users):
+    assert {u.id for u in search_users(name='jorg', limit=2)} == {1, 4}
+    assert {u.id for u in search_users(name='jorge', limit=3)} == {2, 3, 4}
+
+
+@pytest.mark.usefixtures('db')
+def test_search_users_email(users):
+    users[3].secondary_emails.add('jorge.smith@example.test')
+    assert {u.id for u in search_users(email='jorge')} == {4}
+    assert {u.id for u in search_users(email='jorge.smith@example.test', exact=True)} == {4}
+
+
+@pytest.mark.usefixtures('db')
+def test_search_users_first_last_name(users):
+    assert {u.id for u in search_users(first_name='jorg')} == {1, 4}
+    assert {u.id for u in search_users(last_name='jorg')} == {2, 3}
+    assert {u.id for u in search_users(first_name='jörg', last_name='muller')} == {1}
+    assert {u.id for u in search_users(first_name='jorge', exact=True)} == {4}
+    # exact matches are kept when limiting the results
+    assert {u.id for u in search_users(last_name='jorge', limit=1)} == {3}
@@ -6,6 +6,7 @@
 # LICENSE file for more details.
 
 import re
+from bisect import bisect_left, bisect_right
 from collections import Counter
 from datetime import datetime
 from datetime import time as dt_time
@@ -450,6 +451,86 @@ def get_overlap(range1, range2):
     return latest_start, earliest_end
 
 
+class IntervalIndex:
+    """A static index to quickly find intervals overlapping a range.
+
+    The intervals are stored in an implicit interval tree (a list sorted
+    by the start of the intervals where every node also knows the latest
+    end in its subtree), so looking up the intervals overlapping a range
+    takes O(log n + k) instead of checking every single interval.
+
+    The semantics of the lookups are the same as those of :func:`overlaps`.
+
+    :param items: The objects to index
+    :param key: A function returning a ``(start, end)`` tuple for an
+                object; by default the ``start_dt`` and ``end_dt``
+                attributes are used.
+    """
+
+    def __init__(self, items, key=lambda x: (x.start_dt, x.end_dt)):
+        self.items = list(items)
+        ranges = [key(item) for item in self.items]
+        self._order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+        self._starts = [ranges[i][0] for i in self._order]
+        self._ends = [ranges[i][1] for i in self._order]
+        self._max_ends = self._ends[:]
+        self._build(0, len(self._order))
+
+    def __len__(self):
+        return len(self.items)
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        max_end = self._ends[mid]
+        for child_max_end in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child_max_end is not None and child_max_end > max_end:
+                max_end = child_max_end
+        self._max_ends[mid] = max_end
+        return max_end
+
+    def overlapping_indices(self, start, end, inclusive=False):
+        """Get the positions of the intervals overlapping a range.
+
+        :return: A sorted list of indices into :attr:`items`
+        """
+        # only intervals starting before the end of the range may overlap
+        limit = (bisect_right if inclusive else bisect_left)(self._starts, end)
+
+        def ends_after(dt):
+            return dt >= start if inclusive else dt > start
+
+        result = []
+        stack = [(0, len(self._order))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= limit or lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if not ends_after(self._max_ends[mid]):
+                # nothing in this subtree ends after the start of the range
+                continue
+            stack.append((lo, mid))
+            if mid < limit:
+                if ends_after(self._ends[mid]):
+                    result.append(self._order[mid])
+                stack.append((mid + 1, hi))
+        result.sort()
+        return result
+
+    def overlapping(self, start, end, inclusive=False):
+        """Get the intervals overlapping a range.
+
+        :return: A list of the overlapping objects in their original order
+        """
+        return [self.items[i] for i in self.overlapping_indices(start, end, inclusive=inclusive)]
+
+    def overlaps(self, start, end, inclusive=False):
+        """Check whether any interval overlaps a range."""
+        return bool(self.overlapping_indices(start, end, inclusive=inclusive))
+
+
 def iterdays(start, end, skip_weekends=False, day_whitelist=None, day_blacklist=None):
     tzinfo = start.tzinfo if isinstance(start, datetime) else None
     weekdays = (MO, TU, WE, TH, FR) if skip_weekends else None
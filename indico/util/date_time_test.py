@@ -5,13 +5,18 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
+import random
+from collections import namedtuple
 from datetime import datetime, timedelta
 
 import pytest
 from pytz import timezone
 
-from indico.util.date_time import (_adjust_skeleton, as_utc, convert_py_weekdays_to_js, format_human_timedelta,
-                                   format_skeleton, iterdays, strftime_all_years)
+from indico.util.date_time import (IntervalIndex, _adjust_skeleton, as_utc, convert_py_weekdays_to_js,
+                                   format_human_timedelta, format_skeleton, iterdays, overlaps, strftime_all_years)
+
+
+TempOccurrence = namedtuple('TempOccurrence', ('start_dt', 'end_dt'))
 
 
 @pytest.mark.parametrize(('delta', 'granularity', 'expected'), (
@@ -112,3 +117,34 @@ def test_format_skeleton(skeleton, expected):
 ))
 def test_convert_py_weekdays_to_js(py_weekdays, expected_js_weekdays):
     assert convert_py_weekdays_to_js(py_weekdays) == expected_js_weekdays
+
+
+@pytest.mark.parametrize('inclusive', (False, True))
+def test_interval_index(inclusive):
+    rnd = random.Random(42)
+    base = datetime(2025, 1, 1)
+    for __ in range(200):
+        intervals = []
+        for __ in range(rnd.randint(0, 40)):
+            start = base + timedelta(hours=rnd.randint(0, 100))
+            intervals.append((start, start + timedelta(hours=rnd.randint(0, 20))))
+        index = IntervalIndex(intervals, key=lambda x: x)
+        for __ in range(20):
+            start = base + timedelta(hours=rnd.randint(-10, 120))
+            end = start + timedelta(hours=rnd.randint(0, 10))
+            expected = [x for x in intervals if overlaps((start, end), x, inclusive=inclusive)]
+            assert index.overlapping(start, end, inclusive=inclusive) == expected
+            assert index.overlaps(start, end, inclusive=inclusive) == bool(expected)
+
+
+def test_interval_index_attrs():
+    a = TempOccurrence(datetime(2025, 1, 1, 10), datetime(2025, 1, 1, 12))
+    b = TempOccurrence(datetime(2025, 1, 1, 8), datetime(2025, 1, 1, 9))
+    c = TempOccurrence(datetime(2025, 1, 1, 11), datetime(2025, 1, 1, 14))
+    index = IntervalIndex([a, b, c])
+    assert len(index) == 3
+    assert index.overlapping(datetime(2025, 1, 1, 9), datetime(2025, 1, 1, 11)) == [a]
+    assert index.overlapping(datetime(2025, 1, 1, 9), datetime(2025, 1, 1, 11), inclusive=True) == [a, b, c]
+    assert index.overlapping(datetime(2025, 1, 1, 11, 30), datetime(2025, 1, 1, 13)) == [a, c]
+    assert not index.overlaps(datetime(2025, 1, 1, 14), datetime(2025, 1, 1, 15))
+    assert not IntervalIndex([])
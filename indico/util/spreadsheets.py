@@ -5,21 +5,24 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
+import codecs
 import csv
 import re
 from contextlib import contextmanager
 from datetime import date, datetime
 from enum import auto
-from io import BytesIO, TextIOWrapper
+from io import BytesIO, StringIO, TextIOWrapper
+from tempfile import NamedTemporaryFile
 
 from markupsafe import Markup
 from speaklater import is_lazy_string
 from xlsxwriter import Workbook
 
+from indico.core.config import config
 from indico.core.errors import UserValueError
 from indico.util.enum import RichStrEnum
 from indico.util.i18n import _
-from indico.web.flask.util import send_file
+from indico.web.flask.util import send_file, send_stream
 
 
 class CSVFieldDelimiter(RichStrEnum):
@@ -93,6 +96,38 @@ def csv_text_io_wrapper(buf):
         w.detach()
 
 
+def _get_row_values(row, header_positions):
+    assert len(row) == len(header_positions)
+    return [v for k, v in sorted(row.items(), key=lambda x: header_positions[x[0]])]
+
+
+def iter_csv(headers, rows, *, include_header=True, chunk_size=1000):
+    """Generate a CSV file from a list of headers and rows in chunks.
+
+    Unlike :func:`generate_csv` this never keeps the whole file in memory,
+    as long as `rows` is a generator as well.
+
+    :param headers: a list of cell captions
+    :param rows: an iterable of dicts mapping captions to values
+    :param include_header: whether to include a header in the data
+    :param chunk_size: the number of rows to encode at once
+    :return: an iterator yielding the UTF-8 encoded CSV data
+    """
+    encoder = codecs.getincrementalencoder('utf-8-sig')()
+    buf = StringIO()
+    writer = csv.writer(buf)
+    if include_header:
+        writer.writerow(map(_prepare_header, headers))
+    header_positions = {name: i for i, name in enumerate(headers)}
+    for i, row in enumerate(rows, 1):
+        writer.writerow([_prepare_csv_data(v) for v in _get_row_values(row, header_positions)])
+        if i % chunk_size == 0:
+            yield encoder.encode(buf.getvalue())
+            buf.seek(0)
+            buf.truncate()
+    yield encoder.encode(buf.getvalue(), final=True)
+
+
 def generate_csv(headers, rows, *, include_header=True):
     """Generate a CSV file from a list of headers and rows.
 
@@ -105,18 +140,7 @@ def generate_csv(headers, rows, *, include_header=True):
     :param include_header: whether to include a header in the data
     :return: an `io.BytesIO` containing the CSV data
     """
-    buf = BytesIO()
-    with csv_text_io_wrapper(buf) as csvbuf:
-        writer = csv.writer(csvbuf)
-        if include_header:
-            writer.writerow(map(_prepare_header, headers))
-        header_positions = {name: i for i, name in enumerate(headers)}
-        assert all(len(row) == len(headers) for row in rows)
-        for row in rows:
-            row = sorted(row.items(), key=lambda x: header_positions[x[0]])
-            writer.writerow([_prepare_csv_data(v) for k, v in row])
-    buf.seek(0)
-    return buf
+    return BytesIO(b''.join(iter_csv(headers, rows, include_header=include_header)))
 
 
 def _prepare_excel_data(data):
@@ -145,25 +169,13 @@ def _strftime_to_excel_number_format(fmt):
     return result
 
 
-def generate_xlsx(headers, rows, *, tz=None, column_formats=None):
-    """Generate an XLSX file from a list of headers and rows.
-
-    :param headers: a list of cell captions
-    :param rows: a list of dicts mapping captions to values
-    :param tz: the timezone for the values that are datetime objects
-    :param column_formats: optional mapping of header keys to Excel number formats
-    :return: an `io.BytesIO` containing the XLSX data
-    """
+def _write_xlsx(target, headers, rows, *, tz=None, column_formats=None, workbook_options=None):
     if column_formats is None:
         column_formats = {}
-    workbook_options = {'in_memory': True, 'strings_to_formulas': False, 'strings_to_numbers': False,
-                        'strings_to_urls': False}
-    buf = BytesIO()
+    workbook_options = {'strings_to_formulas': False, 'strings_to_numbers': False, 'strings_to_urls': False,
+                        **(workbook_options or {})}
     header_positions = {name: i for i, name in enumerate(headers)}
-    # convert row dicts to lists
-    rows = [[x[1] for x in sorted(row.items(), key=lambda x: header_positions[x[0]])] for row in rows]
-    assert all(len(row) == len(headers) for row in rows)
-    with Workbook(buf, workbook_options) as workbook:
+    with Workbook(target, workbook_options) as workbook:
         bold = workbook.add_format({'bold': True})
         wb_formats = {
             fmt: workbook.add_format({'num_format': _strftime_to_excel_number_format(fmt)})
@@ -178,8 +190,8 @@ def generate_xlsx(headers, rows, *, tz=None, column_formats=None):
         sheet = workbook.add_worksheet()
         for col, name in enumerate(map(_prepare_header, headers)):
             sheet.write(0, col, name, bold)
-        for row, values in enumerate(rows, 1):
-            for col, data in enumerate(values):
+        for row, row_data in enumerate(rows, 1):
+            for col, data in enumerate(_get_row_values(row_data, header_positions)):
                 cell_format = column_formats_list[col]
                 if isinstance(data, datetime):
                     sheet.write_datetime(row, col, data.astimezone(tz).replace(tzinfo=None),
@@ -188,21 +200,61 @@ def generate_xlsx(headers, rows, *, tz=None, column_formats=None):
                     sheet.write_datetime(row, col, data, cell_format or date_format)
                 else:
                     sheet.write(row, col, _prepare_excel_data(data), cell_format)
+
+
+def generate_xlsx(headers, rows, *, tz=None, column_formats=None):
+    """Generate an XLSX file from a list of headers and rows.
+
+    :param headers: a list of cell captions
+    :param rows: a list of dicts mapping captions to values
+    :param tz: the timezone for the values that are datetime objects
+    :param column_formats: optional mapping of header keys to Excel number formats
+    :return: an `io.BytesIO` containing the XLSX data
+    """
+    buf = BytesIO()
+    _write_xlsx(buf, headers, rows, tz=tz, column_formats=column_formats, workbook_options={'in_memory': True})
     buf.seek(0)
     return buf
 
 
+def generate_xlsx_file(headers, rows, *, tz=None, column_formats=None):
+    """Generate an XLSX file from a list of headers and rows in a temporary file.
+
+    The rows are written one by one and flushed to disk right away, so
+    memory usage does not depend on the number of rows as long as `rows`
+    is a generator.
+
+    :param headers: a list of cell captions
+    :param rows: an iterable of dicts mapping captions to values
+    :param tz: the timezone for the values that are datetime objects
+    :param column_formats: optional mapping of header keys to Excel number formats
+    :return: a temporary file object containing the XLSX data, which is
+             deleted as soon as it is closed
+    """
+    temp_file = NamedTemporaryFile(suffix='.xlsx', dir=config.TEMP_DIR)  # noqa: SIM115
+    try:
+        _write_xlsx(temp_file.name, headers, rows, tz=tz, column_formats=column_formats,
+                    workbook_options={'constant_memory': True, 'tmpdir': config.TEMP_DIR})
+    except Exception:
+        temp_file.close()
+        raise
+    temp_file.seek(0)
+    return temp_file
+
+
 def send_csv(filename, headers, rows, *, include_header=True):
     """Send a CSV file to the client.
 
+    The CSV data is generated while the response is being sent, so
+    `rows` may be a generator to avoid keeping all the data in memory.
+
     :param filename: The name of the CSV file
     :param headers: a list of cell captions
-    :param rows: a list of dicts mapping captions to values
+    :param rows: an iterable of dicts mapping captions to values
     :param include_header: whether to include a header in the data
     :return: a flask response containing the CSV data
     """
-    buf = generate_csv(headers, rows, include_header=include_header)
-    return send_file(filename, buf, 'text/csv', inline=False)
+    return send_stream(filename, iter_csv(headers, rows, include_header=include_header), 'text/csv', inline=False)
 
 
 def send_xlsx(filename, headers, rows, *, tz=None, column_formats=None):
@@ -210,10 +262,11 @@ def send_xlsx(filename, headers, rows, *, tz=None, column_formats=None):
 
     :param filename: The name of the CSV file
     :param headers: a list of cell captions
-    :param rows: a list of dicts mapping captions to values
+    :param rows: an iterable of dicts mapping captions to values
     :param tz: the timezone for the values that are datetime objects
     :param column_formats: optional mapping of header keys to Excel number formats
     :return: a flask response containing the XLSX data
     """
-    buf = generate_xlsx(headers, rows, tz=tz, column_formats=column_formats)
-    return send_file(filename, buf, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', inline=False)
+    temp_file = generate_xlsx_file(headers, rows, tz=tz, column_formats=column_formats)
+    return send_file(filename, temp_file, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                     inline=False)
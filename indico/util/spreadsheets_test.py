@@ -9,7 +9,7 @@ import textwrap
 
 import pytest
 
-from indico.util.spreadsheets import generate_csv
+from indico.util.spreadsheets import generate_csv, iter_csv
 
 
 def test_generate_csv():
@@ -51,3 +51,14 @@ def test_generate_csv_malicious(value, expected):
     rows = [{'foo': value, 'bar': ''}]
     csv = generate_csv(headers, rows).read().decode('utf-8-sig').strip().splitlines()
     assert csv == ['foo,bar', f'{expected},']
+
+
+def test_iter_csv_chunks():
+    headers = ['foo', 'bar']
+    rows = ({'foo': f'row{i}', 'bar': i} for i in range(5))
+    chunks = list(iter_csv(headers, rows, chunk_size=2))
+    assert len(chunks) == 3
+    assert chunks[0].startswith('\ufeff'.encode())
+    assert not any(chunk.startswith('\ufeff'.encode()) for chunk in chunks[1:])
+    csv = b''.join(chunks).decode('utf-8-sig').splitlines()
+    assert csv == ['foo,bar', 'row0,0', 'row1,1', 'row2,2', 'row3,3', 'row4,4']
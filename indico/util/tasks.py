@@ -37,3 +37,17 @@ def temp_cleanup():
     _log_deleted(logger, 'Deleted from cache: %s', deleted)
     deleted = cleanup_dir(config.TEMP_DIR, timedelta(days=1))
     _log_deleted(logger, 'Deleted from temp: %s', deleted)
+
+
+@celery.periodic_task(name='latex_pdf_cleanup', run_every=crontab(minute='30', hour='4'))
+def latex_pdf_cleanup(days=30):
+    """Delete stored LaTeX PDFs which have not been used recently.
+
+    :param days: number of days after which to delete unused PDFs
+    """
+    from indico.core.logger import Logger
+    from indico.legacy.pdfinterface.latex import get_latex_artifact_store
+    if not (store := get_latex_artifact_store()):
+        return
+    deleted = store.cleanup(timedelta(days=days))
+    _log_deleted(Logger.get(), 'Deleted stored LaTeX PDF: %s', deleted)
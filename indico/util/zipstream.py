@@ -0,0 +1,191 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+import io
+import time
+from dataclasses import dataclass
+from zipfile import ZIP64_LIMIT, ZIP_FILECOUNT_LIMIT, ZIP_STORED, ZipFile, ZipInfo
+
+
+CHUNK_SIZE = 256 * 1024
+
+
+@dataclass(frozen=True)
+class _ZipStreamEntry:
+    name: str
+    opener: object
+    size: int | None
+    date_time: tuple
+
+    def make_info(self):
+        info = ZipInfo(self.name, date_time=self.date_time)
+        info.compress_type = ZIP_STORED
+        info.external_attr = 0o644 << 16
+        if self.size is not None:
+            # lets zipfile decide whether ZIP64 records are needed
+            info.file_size = self.size
+        return info
+
+
+class _WriteBuffer:
+    """A non-seekable file-like object collecting the data written to it.
+
+    Since it cannot seek, :class:`~zipfile.ZipFile` writes the CRC and
+    sizes of each file after its data instead of updating the header.
+    """
+
+    def __init__(self, keep=True):
+        self.keep = keep
+        self.chunks = []
+        self.size = 0
+        self.pos = 0
+
+    def write(self, data):
+        if self.keep:
+            self.chunks.append(bytes(data))
+            self.size += len(data)
+        self.pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+class _ChunkReader(io.RawIOBase):
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        while not self._pending:
+            try:
+                self._pending = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        size = min(len(buf), len(self._pending))
+        buf[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class ZipStream:
+    """A ZIP archive that is generated while it is being read.
+
+    Files are only opened once their data is needed, and their data is
+    passed on in small chunks.  This allows sending even huge archives
+    to a client or writing them to a storage backend without keeping
+    them in memory or writing them to a temporary file first.
+
+    The files are not compressed, which allows calculating the size of
+    the archive in advance.  Large archives use the ZIP64 extensions.
+    """
+
+    def __init__(self):
+        self._entries = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add_file(self, name, opener, size=None, dt=None):
+        """Add a file to the archive.
+
+        :param name: The path of the file inside the archive
+        :param opener: A callable returning a file-like object containing
+                       the file's data, e.g. ``stored_file.open``
+        :param size: The size of the file; if it is known for all files,
+                     the size of the archive can be calculated in advance
+        :param dt: The modification time of the file as a `datetime`
+                   (in the timezone that should be shown to the user);
+                   defaults to the current time
+        """
+        date_time = (dt.timetuple() if dt else time.localtime())[:6]
+        self._entries.append(_ZipStreamEntry(name, opener, size, date_time))
+
+    def add_data(self, name, data, dt=None):
+        """Add a file with the given content to the archive.
+
+        :param name: The path of the file inside the archive
+        :param data: The file content as bytes or a string
+        :param dt: The modification time of the file as a `datetime`
+        """
+        if isinstance(data, str):
+            data = data.encode()
+        self.add_file(name, lambda: io.BytesIO(data), len(data), dt)
+
+    def check(self):
+        """Ensure all files of the archive can be opened.
+
+        Once the archive is being sent, errors can no longer be reported
+        to the client, who would just get a truncated archive.  Calling
+        this method first makes sure e.g. missing files fail right away.
+        """
+        for entry in self._entries:
+            with entry.opener():
+                pass
+
+    @property
+    def content_length(self):
+        """The size of the archive in bytes.
+
+        This is ``None`` if the size of any file is not known or if the
+        archive needs ZIP64 records, since the size of these depends on
+        the offsets of the files inside the archive.
+        """
+        if len(self._entries) >= ZIP_FILECOUNT_LIMIT or any(entry.size is None for entry in self._entries):
+            return None
+        data_size = sum(entry.size for entry in self._entries)
+        if data_size >= ZIP64_LIMIT:
+            return None
+        # without ZIP64 records, the size of the zip structures does not depend
+        # on the file sizes, so we can let zipfile build them without any data
+        sink = _WriteBuffer(keep=False)
+        with ZipFile(sink, 'w') as zip_file:
+            for entry in self._entries:
+                with zip_file.open(entry.make_info(), 'w'):
+                    pass
+        size = sink.tell() + data_size
+        return size if size < ZIP64_LIMIT else None
+
+    def __iter__(self):
+        """Generate the archive as chunks of bytes."""
+        buf = _WriteBuffer()
+        with ZipFile(buf, 'w', allowZip64=True) as zip_file:
+            for entry in self._entries:
+                written = 0
+                with (entry.opener() as src,
+                      zip_file.open(entry.make_info(), 'w', force_zip64=(entry.size is None)) as dest):
+                    while chunk := src.read(CHUNK_SIZE):
+                        dest.write(chunk)
+                        written += len(chunk)
+                        if buf.size >= CHUNK_SIZE:
+                            yield buf.pop()
+                if entry.size is not None and written != entry.size:
+                    # the precalculated size of the archive would be wrong
+                    raise ValueError(f'Size mismatch for {entry.name}: expected {entry.size}, got {written}')
+                if buf.size >= CHUNK_SIZE:
+                    yield buf.pop()
+        if data := buf.pop():
+            yield data
+
+    def open(self):
+        """Get a file-like object from which the archive can be read.
+
+        This is useful to save the archive using a storage backend.
+        """
+        return io.BufferedReader(_ChunkReader(self), CHUNK_SIZE)
@@ -0,0 +1,64 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+from datetime import datetime
+from io import BytesIO
+from zipfile import ZipFile
+
+import pytest
+
+from indico.util.zipstream import CHUNK_SIZE, ZipStream
+
+
+def _make_stream(known_sizes=True):
+    big = b'x' * (CHUNK_SIZE * 3 + 123)
+    zip_stream = ZipStream()
+    zip_stream.add_data('a.txt', 'hello', dt=datetime(2024, 1, 2, 3, 4, 5))
+    zip_stream.add_file('föö/big.bin', lambda: BytesIO(big), len(big) if known_sizes else None)
+    zip_stream.add_data('b.yaml', b'foo: bar')
+    return zip_stream, big
+
+
+@pytest.mark.parametrize('known_sizes', (True, False))
+def test_zip_stream(known_sizes):
+    zip_stream, big = _make_stream(known_sizes)
+    chunks = list(zip_stream)
+    assert len(chunks) > 1
+    data = b''.join(chunks)
+    with ZipFile(BytesIO(data)) as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.namelist() == ['a.txt', 'föö/big.bin', 'b.yaml']
+        assert zip_file.read('a.txt') == b'hello'
+        assert zip_file.read('föö/big.bin') == big
+        assert zip_file.getinfo('a.txt').date_time == (2024, 1, 2, 3, 4, 4)  # zip uses 2-second resolution
+    if known_sizes:
+        assert zip_stream.content_length == len(data)
+    else:
+        assert zip_stream.content_length is None
+    # reading it as a file results in the same data
+    assert zip_stream.open().read() == data
+
+
+def test_zip_stream_size_mismatch():
+    zip_stream = ZipStream()
+    zip_stream.add_file('test.txt', lambda: BytesIO(b'test'), 5)
+    with pytest.raises(ValueError, match='Size mismatch'):
+        b''.join(zip_stream)
+
+
+def test_zip_stream_check():
+    def _open_missing():
+        raise FileNotFoundError
+
+    zip_stream, __ = _make_stream()
+    zip_stream.check()
+    # the files can still be read after checking them
+    with ZipFile(zip_stream.open()) as zip_file:
+        assert zip_file.read('a.txt') == b'hello'
+    zip_stream.add_file('missing.txt', _open_missing, 1)
+    with pytest.raises(FileNotFoundError):
+        zip_stream.check()
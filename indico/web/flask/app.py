@@ -104,6 +104,11 @@ def configure_cache(app, config):
         # order to fail properly if redis is not configured.
         app.config['CACHE_TYPE'] = 'indico.core.cache.IndicoRedisCache'
         app.config['CACHE_REDIS_URL'] = config.REDIS_CACHE_URL
+        if config.LOCAL_CACHE_SIZE:
+            app.config['CACHE_TYPE'] = 'indico.core.cache.IndicoTwoTierRedisCache'
+            app.config['CACHE_OPTIONS'] = {'local_size': config.LOCAL_CACHE_SIZE,
+                                           'local_ttl': config.LOCAL_CACHE_TTL,
+                                           'local_scope_ttls': config.LOCAL_CACHE_SCOPE_TTL}
     else:
         app.config['CACHE_TYPE'] = 'flask_caching.backends.nullcache.NullCache'
         app.config['CACHE_NO_NULL_WARNING'] = True
@@ -336,11 +341,18 @@ def extend_url_map(app):
     app.url_map.converters['list'] = ListConverter
 
 
+def end_cache_write_batch(exc=None):
+    # usually the session interface already sent all cache writes, but anything written
+    # afterwards (e.g. in a streamed response) must not be lost
+    cache.end_write_batch()
+
+
 def add_handlers(app):
     app.before_request(canonicalize_url)
     app.before_request(reject_nuls)
     app.after_request(inject_current_url)
     app.after_request(inject_csp)
+    app.teardown_request(end_cache_write_batch)
     app.register_blueprint(errors_bp)
 
 
@@ -18,7 +18,7 @@ from flask.sessions import SessionInterface, SessionMixin
 from werkzeug.datastructures import CallbackDict
 from werkzeug.utils import cached_property
 
-from indico.core.cache import make_scoped_cache
+from indico.core.cache import cache, make_scoped_cache
 from indico.core.config import config
 from indico.modules.users import User
 from indico.util.date_time import get_display_tz, utc_to_server
@@ -43,6 +43,8 @@ class BaseSession(CallbackDict, SessionMixin):
         self.sid = sid
         self.new = new
         self.modified = False
+        # the serialized values as they are currently stored
+        self.stored_fields = {}
         defaults = self._get_defaults()
         if defaults:
             self.update(defaults)
@@ -164,7 +166,11 @@ class IndicoSessionInterface(SessionInterface):
     temporary_session_lifetime = timedelta(days=7)
 
     def __init__(self):
-        self.storage = make_scoped_cache('flask-session')
+        # each session is stored as a redis hash containing the serialized values of the
+        # session keys, so small changes do not require storing the whole session again
+        self.storage = make_scoped_cache('session-data')
+        # sessions stored by older versions, containing the whole serialized session
+        self.legacy_storage = make_scoped_cache('flask-session')
 
     def generate_sid(self):
         return str(uuid.uuid4())
@@ -215,10 +221,23 @@ class IndicoSessionInterface(SessionInterface):
         return False
 
     def open_session(self, app, request):
+        # cache writes made while handling the request are sent to redis together
+        # with the session data once the session is saved
+        cache.start_write_batch()
         sid = request.cookies.get(app.session_cookie_name)
         if not sid:
             return self.session_class(sid=self.generate_sid(), new=True)
-        data = self.storage.get(sid)
+        if fields := self.storage.get_hash(sid):
+            try:
+                data = {key: self.serializer.loads(value) for key, value in fields.items()}
+            except (pickle.UnpicklingError, AttributeError, EOFError, ImportError, IndexError, KeyError,
+                    TypeError, ValueError):
+                # treat sessions with corrupt or incompatible data like invalid ones
+                return self.session_class(sid=self.generate_sid(), new=True)
+            session = self.session_class(data, sid=sid)
+            session.stored_fields = fields
+            return session
+        data = self.legacy_storage.get(sid)
         if data is not None:
             try:
                 return self.session_class(self.serializer.loads(data), sid=sid)
@@ -228,14 +247,28 @@ class IndicoSessionInterface(SessionInterface):
                 pass
         return self.session_class(sid=self.generate_sid(), new=True)
 
+    def _store_session(self, session, ttl):
+        # all values are serialized since mutable values may have been changed without
+        # marking the session as modified, but only changed fields are sent to redis
+        fields = {name: self.serializer.dumps(value) for name, value in session.items()}
+        changed = {name: value for name, value in fields.items() if session.stored_fields.get(name) != value}
+        deleted = session.stored_fields.keys() - fields.keys()
+        self.storage.write_hash(session.sid, changed, deleted, ttl)
+        session.stored_fields = {name: value for name, value in {**session.stored_fields, **changed}.items()
+                                 if name not in deleted}
+
     def save_session(self, app, session, response):
         domain = self.get_cookie_domain(app)
         secure = self.get_cookie_secure(app)
         samesite = self.get_cookie_samesite(app)
         refresh_sid = self.should_refresh_sid(app, session)
+        is_legacy = not session.new and not session.stored_fields
         if not session and not session.new:
             # empty session, delete it from storage and cookie
             self.storage.delete(session.sid)
+            if is_legacy:
+                self.legacy_storage.delete(session.sid)
+            cache.flush_write_batch()
             response.delete_cookie(app.session_cookie_name, domain=domain)
             response.vary.add('Cookie')
             return
@@ -247,6 +280,7 @@ class IndicoSessionInterface(SessionInterface):
 
         if not refresh_sid and not session.modified and not self.should_refresh_session(app, session):
             # If the session has not been modified we only store if it needs to be refreshed
+            cache.flush_write_batch()
             return
 
         if config.SESSION_LIFETIME > 0 or session.hard_expiry:
@@ -262,12 +296,17 @@ class IndicoSessionInterface(SessionInterface):
             cookie_lifetime = self.get_expiration_time(app, session)
             session['_expires'] = datetime.now() + storage_ttl
 
+        if is_legacy:
+            self.legacy_storage.delete(session.sid)
         if refresh_sid:
             self.storage.delete(session.sid)
             session.sid = self.generate_sid()
+            session.stored_fields = {}
 
         session['_secure'] = request.is_secure
-        self.storage.set(session.sid, self.serializer.dumps(dict(session)), storage_ttl)
+        self._store_session(session, storage_ttl)
+        # send the session data and all other cache writes of the request in a single pipeline
+        cache.flush_write_batch()
         response.set_cookie(app.session_cookie_name, session.sid, expires=cookie_lifetime, httponly=True,
                             secure=secure, samesite=samesite)
         response.vary.add('Cookie')
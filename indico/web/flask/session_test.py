@@ -5,11 +5,12 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
+import pickle
 from datetime import UTC, datetime, timedelta
 from unittest.mock import Mock
 
 import pytest
-from flask import Response
+from flask import Response, request
 
 from indico.web.flask.session import IndicoSession, IndicoSessionInterface
 
@@ -66,3 +67,82 @@ def test_save_session_with_hard_expiry(app):
     assert session.permanent
     resp_mock.set_cookie.assert_called_once()
     assert resp_mock.set_cookie.call_args[1].get('expires') == expiry
+
+
+def _open_session(app, session_interface, sid):
+    with app.test_request_context('/ping'):
+        cookie_name = app.session_cookie_name
+    headers = {'Cookie': f'{cookie_name}={sid}'} if sid else {}
+    with app.test_request_context('/ping', headers=headers):
+        return session_interface.open_session(app, request)
+
+
+def _save_session(app, session_interface, session):
+    with app.test_request_context('/ping'):
+        session_interface.save_session(app, session, Mock(spec_set=Response))
+
+
+def test_session_storage(app, mocker):
+    session_interface = IndicoSessionInterface()
+    session = _open_session(app, session_interface, None)
+    assert session.new
+    session['foo'] = 'bar'
+    _save_session(app, session_interface, session)
+    assert {'foo', '_expires', '_secure'} <= session_interface.storage.get_hash(session.sid).keys()
+
+    session = _open_session(app, session_interface, session.sid)
+    assert not session.new
+    assert session['foo'] == 'bar'
+    assert session.stored_fields.keys() == session.keys()
+
+    # refreshing an unmodified session only updates the expiry data
+    write_hash = mocker.spy(session_interface.storage, 'write_hash')
+    mocker.patch.object(session_interface, 'should_refresh_session', return_value=True)
+    _save_session(app, session_interface, session)
+    assert write_hash.call_args[0][1].keys() == {'_expires'}
+
+    # removed keys are deleted
+    del session['foo']
+    _save_session(app, session_interface, session)
+    assert write_hash.call_args[0][2] == {'foo'}
+    assert 'foo' not in _open_session(app, session_interface, session.sid)
+
+
+def test_session_storage_mutable(app, mocker):
+    session_interface = IndicoSessionInterface()
+    session = _open_session(app, session_interface, None)
+    session['foo'] = {'bar': 1}
+    _save_session(app, session_interface, session)
+    session = _open_session(app, session_interface, session.sid)
+    # changing a mutable value does not mark the session as modified, but it is
+    # still stored when the session is refreshed
+    session['foo']['bar'] = 2
+    mocker.patch.object(session_interface, 'should_refresh_session', return_value=True)
+    _save_session(app, session_interface, session)
+    assert _open_session(app, session_interface, session.sid)['foo'] == {'bar': 2}
+
+
+def test_session_storage_corrupt(app):
+    session_interface = IndicoSessionInterface()
+    session = _open_session(app, session_interface, None)
+    session['foo'] = 'bar'
+    _save_session(app, session_interface, session)
+    session_interface.storage.write_hash(session.sid, {'foo': b'garbage'})
+    new_session = _open_session(app, session_interface, session.sid)
+    assert new_session.new
+    assert new_session.sid != session.sid
+
+
+def test_session_storage_legacy(app):
+    session_interface = IndicoSessionInterface()
+    session_interface.legacy_storage.set('legacy', pickle.dumps({'foo': 'bar'}))
+    session = _open_session(app, session_interface, 'legacy')
+    assert session['foo'] == 'bar'
+    assert not session.stored_fields
+    # the session is converted to the new format when it's saved
+    session['bar'] = 'foo'
+    _save_session(app, session_interface, session)
+    assert session_interface.legacy_storage.get('legacy') is None
+    session = _open_session(app, session_interface, 'legacy')
+    assert session['foo'] == 'bar'
+    assert session['bar'] == 'foo'
@@ -5,12 +5,22 @@
 # modify it under the terms of the MIT License; see the
 # LICENSE file for more details.
 
+import atexit
+import json
+import os
+import re
+import socket
+import threading
 import time
+from contextlib import contextmanager
+from operator import itemgetter
 
-from flask import g, request_started
+from flask import before_render_template, current_app, g, request, request_finished, request_started, template_rendered
 from sqlalchemy.engine import Engine
 from sqlalchemy.event import listens_for
 
+from indico.core.config import config
+
 
 def request_stats_request_started():
     if g.get('request_stats_initialized'):
@@ -40,6 +50,9 @@ def setup_request_stats(app):
         g.query_count += 1
         g.query_duration += total
 
+    if config.REQUEST_STATS_DIR:
+        _setup_request_instrumentation(app)
+
 
 def get_request_stats():
     initialized = g.get('request_stats_initialized')
@@ -48,3 +61,207 @@ def get_request_stats():
         'query_duration': g.query_duration if initialized else 0,
         'req_duration': (time.time() - g.req_start_ts) if initialized else 0
     }
+
+
+#: How often (in seconds) a process writes its aggregated stats to disk
+REQUEST_STATS_FLUSH_INTERVAL = 60
+#: How many distinct statements are kept per endpoint
+REQUEST_STATS_MAX_STATEMENTS = 25
+#: How often the same statement must run within a single request to
+#: be reported as a likely N+1 query
+REQUEST_STATS_REPEAT_THRESHOLD = 10
+
+_placeholder_re = re.compile(r'%\([^)]+\)s|\$\d+|\'(?:[^\']|\'\')*\'|\b\d+(?:\.\d+)?\b')
+_placeholder_list_re = re.compile(r'\?(?:\s*,\s*\?)+')
+_whitespace_re = re.compile(r'\s+')
+_stats_lock = threading.Lock()
+_stats = {}
+#: Mutable state of the stats aggregated by the current process
+_stats_state = {'last_flush': time.time()}
+
+
+def normalize_statement(statement):
+    """Normalize an SQL statement so similar queries can be grouped.
+
+    Bound parameters and literals are replaced with ``?`` and lists of
+    them (e.g. in an ``IN`` clause) are collapsed into a single ``?, ...``.
+    """
+    statement = _placeholder_re.sub('?', statement)
+    statement = _placeholder_list_re.sub('?, ...', statement)
+    return _whitespace_re.sub(' ', statement).strip()
+
+
+@contextmanager
+def request_stats_phase(name):
+    """Measure how long a phase of the current request takes.
+
+    This is a no-op unless request instrumentation is enabled using the
+    `REQUEST_STATS_DIR` setting.
+    """
+    phases = g.get('request_stats_phases')
+    if phases is None:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0) + time.time() - start
+
+
+def _make_endpoint_stats():
+    return {'requests': 0, 'duration': 0, 'max_duration': 0, 'query_count': 0, 'query_duration': 0,
+            'phases': {}, 'statements': {}, 'repeated': {}}
+
+
+def merge_request_stats(target, source):
+    """Merge aggregated per-endpoint request stats into `target`."""
+    for endpoint, data in source.items():
+        stats = target.setdefault(endpoint, _make_endpoint_stats())
+        stats['requests'] += data['requests']
+        stats['duration'] += data['duration']
+        stats['max_duration'] = max(stats['max_duration'], data['max_duration'])
+        stats['query_count'] += data['query_count']
+        stats['query_duration'] += data['query_duration']
+        for phase, duration in data['phases'].items():
+            stats['phases'][phase] = stats['phases'].get(phase, 0) + duration
+        for statement, info in data['statements'].items():
+            entry = stats['statements'].setdefault(statement, {'count': 0, 'duration': 0, 'max_duration': 0})
+            entry['count'] += info['count']
+            entry['duration'] += info['duration']
+            entry['max_duration'] = max(entry['max_duration'], info['max_duration'])
+        for statement, info in data['repeated'].items():
+            entry = stats['repeated'].setdefault(statement, {'requests': 0, 'max_count': 0})
+            entry['requests'] += info['requests']
+            entry['max_count'] = max(entry['max_count'], info['max_count'])
+        _trim_statements(stats['statements'], key=itemgetter('duration'))
+        _trim_statements(stats['repeated'], key=itemgetter('max_count'))
+    return target
+
+
+def _trim_statements(statements, key):
+    if len(statements) <= REQUEST_STATS_MAX_STATEMENTS:
+        return
+    keep = sorted(statements.items(), key=lambda x: key(x[1]), reverse=True)[:REQUEST_STATS_MAX_STATEMENTS]
+    statements.clear()
+    statements.update(keep)
+
+
+def _get_current_request_stats():
+    duration = time.time() - g.req_start_ts
+    statements = {}
+    repeated = {}
+    for raw_statement, (count, total, slowest) in g.request_stats_queries.items():
+        statement = normalize_statement(raw_statement)
+        entry = statements.setdefault(statement, {'count': 0, 'duration': 0, 'max_duration': 0})
+        entry['count'] += count
+        entry['duration'] += total
+        entry['max_duration'] = max(entry['max_duration'], slowest)
+    for statement, entry in statements.items():
+        if entry['count'] >= REQUEST_STATS_REPEAT_THRESHOLD:
+            repeated[statement] = {'requests': 1, 'max_count': entry['count']}
+    return {
+        'requests': 1,
+        'duration': duration,
+        'max_duration': duration,
+        'query_count': g.query_count,
+        'query_duration': g.query_duration,
+        'phases': g.request_stats_phases,
+        'statements': statements,
+        'repeated': repeated,
+    }
+
+
+def get_request_stats_files(stats_dir):
+    """Get the paths of all files containing aggregated request stats."""
+    if not stats_dir or not os.path.isdir(stats_dir):
+        return []
+    return [os.path.join(stats_dir, name) for name in sorted(os.listdir(stats_dir)) if name.endswith('.json')]
+
+
+def _get_request_stats_file(stats_dir):
+    return os.path.join(stats_dir, f'{socket.gethostname()}-{os.getpid()}.json')
+
+
+def flush_request_stats(stats_dir):
+    """Write the stats aggregated by the current process to disk.
+
+    Each process uses its own file, so no locking between processes is
+    needed.  Since a process may reuse the PID of an earlier one, data
+    already present in the file is merged into the new data.
+    """
+    with _stats_lock:
+        if not _stats:
+            return
+        data = dict(_stats)
+        _stats.clear()
+        _stats_state['last_flush'] = time.time()
+    path = _get_request_stats_file(stats_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        with open(path) as f:
+            data = merge_request_stats(json.load(f), data)
+    except (OSError, ValueError):
+        pass
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _setup_request_instrumentation(app):
+    stats_dir = config.REQUEST_STATS_DIR
+
+    @request_started.connect_via(app)
+    def _request_started(sender, **kwargs):
+        g.request_stats_queries = {}
+        g.request_stats_phases = {}
+        g.request_stats_template_depth = 0
+
+    @listens_for(Engine, 'after_cursor_execute', named=True)
+    def after_cursor_execute(context, statement, **unused):
+        queries = g.get('request_stats_queries')
+        if queries is None:
+            return
+        duration = time.time() - context._query_start_time
+        entry = queries.get(statement)
+        if entry is None:
+            queries[statement] = [1, duration, duration]
+        else:
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = max(entry[2], duration)
+
+    @before_render_template.connect_via(app)
+    def _before_render_template(sender, **kwargs):
+        if g.get('request_stats_phases') is None:
+            return
+        # only measure the outermost template, nested ones are included in its time
+        if g.request_stats_template_depth == 0:
+            g.request_stats_template_start = time.time()
+        g.request_stats_template_depth += 1
+
+    @template_rendered.connect_via(app)
+    def _template_rendered(sender, **kwargs):
+        if g.get('request_stats_phases') is None:
+            return
+        g.request_stats_template_depth -= 1
+        if g.request_stats_template_depth == 0:
+            duration = time.time() - g.request_stats_template_start
+            g.request_stats_phases['render_template'] = g.request_stats_phases.get('render_template', 0) + duration
+
+    @request_finished.connect_via(app)
+    def _request_finished(sender, **kwargs):
+        if g.get('request_stats_phases') is None or not request.endpoint:
+            return
+        data = {request.endpoint: _get_current_request_stats()}
+        with _stats_lock:
+            merge_request_stats(_stats, data)
+            flush_due = time.time() - _stats_state['last_flush'] > REQUEST_STATS_FLUSH_INTERVAL
+        if flush_due:
+            try:
+                flush_request_stats(stats_dir)
+            except OSError:
+                current_app.logger.exception('Could not write request stats')
+
+    atexit.register(flush_request_stats, stats_dir)
@@ -0,0 +1,37 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+import pytest
+
+from indico.web.flask.stats import merge_request_stats, normalize_statement
+
+
+@pytest.mark.parametrize(('statement', 'expected'), (
+    ('SELECT * FROM users WHERE id = %(id_1)s', 'SELECT * FROM users WHERE id = ?'),
+    ('SELECT *\n  FROM users\n  WHERE id IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s)',
+     'SELECT * FROM users WHERE id IN (?, ...)'),
+    ("SELECT * FROM users WHERE name = 'it''s' LIMIT 10", 'SELECT * FROM users WHERE name = ? LIMIT ?'),
+    ('SELECT anon_1.id FROM anon_1', 'SELECT anon_1.id FROM anon_1'),
+))
+def test_normalize_statement(statement, expected):
+    assert normalize_statement(statement) == expected
+
+
+def test_merge_request_stats():
+    def _make(duration, statements, repeated=None):
+        return {'ep': {'requests': 1, 'duration': duration, 'max_duration': duration, 'query_count': 2,
+                       'query_duration': 0.5, 'phases': {'_process': duration},
+                       'statements': statements, 'repeated': repeated or {}}}
+
+    stats = {}
+    merge_request_stats(stats, _make(1, {'a': {'count': 2, 'duration': 0.5, 'max_duration': 0.3}}))
+    merge_request_stats(stats, _make(3, {'a': {'count': 1, 'duration': 0.1, 'max_duration': 0.1}},
+                                     {'a': {'requests': 1, 'max_count': 12}}))
+    assert stats == {'ep': {'requests': 2, 'duration': 4, 'max_duration': 3, 'query_count': 4, 'query_duration': 1,
+                            'phases': {'_process': 4},
+                            'statements': {'a': {'count': 3, 'duration': 0.6, 'max_duration': 0.3}},
+                            'repeated': {'a': {'requests': 1, 'max_count': 12}}}}
@@ -9,10 +9,11 @@ import inspect
 import os
 import re
 import secrets
+import unicodedata
 from importlib import import_module
-from urllib.parse import urlsplit
+from urllib.parse import quote, urlsplit
 
-from flask import Blueprint, current_app, g, has_request_context, redirect, request
+from flask import Blueprint, Response, current_app, g, has_request_context, redirect, request, stream_with_context
 from flask import send_file as _send_file
 from flask import url_for as _url_for
 from flask.helpers import get_root_path
@@ -304,6 +305,39 @@ def send_file(name, path_or_fd, mimetype, *, last_modified=None, no_cache=True,
     return rv
 
 
+def send_stream(name, chunks, mimetype, *, inline=None, safe=True, content_length=None):
+    """Send data generated while the response is being sent.
+
+    This avoids having the whole file in memory (or on disk) before
+    sending it.  Unless `content_length` is specified, clients cannot
+    show the download progress since the size is not known in advance.
+
+    `name`, `mimetype`, `inline` and `safe` behave like in :func:`send_file`.
+    `chunks` is an iterable (usually a generator) yielding bytes.  It runs
+    within the request context, so it may use the database session etc.
+    """
+    name = re.sub(r'\s+', ' ', name).strip()
+    assert '/' in mimetype
+    inline = should_inline_file(mimetype, inline, safe=safe)
+    rv = Response(stream_with_context(chunks), mimetype=mimetype)
+    if content_length is not None:
+        rv.content_length = content_length
+    try:
+        name.encode('ascii')
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple, 'filename*': "UTF-8''{}".format(quote(name, safe='!#$&+^`|~'))}
+    else:
+        names = {'filename': name}
+    rv.headers.set('Content-Disposition', 'inline' if inline else 'attachment', **names)
+    if safe:
+        rv.headers.add('Content-Security-Policy', "script-src 'self'; object-src 'self'")
+    rv.cache_control.public = False
+    rv.cache_control.private = True
+    rv.cache_control.no_cache = True
+    return rv
+
+
 def endpoint_for_url(url, base_url=None):
     if base_url is None:
         base_url = config.BASE_URL
@@ -0,0 +1,150 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from flask import g, has_app_context
+from sqlalchemy.event import contains, listen
+
+from indico.core.cache import make_scoped_cache
+
+
+# the format of the cached entries changed when adding tags; using a new
+# scope avoids reading entries written by older versions
+API_CACHE = make_scoped_cache('legacy-http-api-v2')
+
+#: How long an invalidation of a tag is remembered.  API results are
+#: never cached for longer than this.
+CACHE_TAG_TTL = timedelta(days=1)
+
+
+def event_tag(event_id):
+    """Tag for results containing data of an event."""
+    return f'event-{event_id}'
+
+
+def category_tag(category_id):
+    """Tag for results depending on a category or its protection."""
+    return f'category-{category_id}'
+
+
+def category_content_tag(category_id):
+    """Tag for results listing the events in a category (tree)."""
+    return f'category-content-{category_id}'
+
+
+def user_tag(user_id):
+    """Tag for results generated for a specific user."""
+    return f'user-{user_id}'
+
+
+def get_object_cache_tags(obj):
+    """Get the tags of all cached results an object may affect.
+
+    Besides its own tag, changing an event (or anything inside it)
+    changes the contents of all the categories containing it.
+    """
+    from indico.modules.categories import Category
+    from indico.modules.events import Event
+    if isinstance(obj, Category):
+        # the chain of a category which has just been moved may be outdated, but its parent's is not
+        chain_ids = [*(obj.parent.chain_ids if obj.parent else ()), obj.id]
+        return {category_tag(obj.id), *map(category_content_tag, chain_ids)}
+    if isinstance(obj, Event):
+        event = obj
+    elif (event := getattr(obj, 'event', None)) is None and (folder := getattr(obj, 'folder', None)) is not None:
+        event = folder.event
+    if event is None:
+        return set()
+    chain_ids = event.category.chain_ids if event.category else ()
+    return {event_tag(event.id), *map(category_content_tag, chain_ids or ())}
+
+
+@contextmanager
+def collect_cache_tags():
+    """Collect the tags of the API result generated inside the block.
+
+    Any event or category loaded from the database inside the block is
+    tagged automatically; anything else can be tagged explicitly using
+    :func:`add_cache_tags`.
+    """
+    g.api_cache_tags = tags = set()
+    try:
+        yield tags
+    finally:
+        del g.api_cache_tags
+
+
+def add_cache_tags(*tags):
+    """Add tags to the API result which is currently being generated."""
+    if has_app_context() and (collected := g.get('api_cache_tags')) is not None:
+        collected.update(tags)
+
+
+def get_cached_result(key):
+    """Get a cached API result unless one of its tags was invalidated."""
+    entry = API_CACHE.get(key)
+    if not isinstance(entry, tuple) or len(entry) != 3:
+        return None
+    created, tags, result = entry
+    if tags and any(ts is not None and ts >= created
+                    for ts in API_CACHE.get_many(*(f'tag-{tag}' for tag in tags))):
+        return None
+    return result
+
+
+def set_cached_result(key, result, tags, created, ttl):
+    """Cache an API result.
+
+    :param key: The cache key
+    :param result: The data to cache
+    :param tags: The tags of the objects the result depends on
+    :param created: The time (as a unix timestamp) when generating the
+                    result started; invalidations of any of its tags
+                    after that time make the cached result stale
+    :param ttl: The time in seconds after which the result expires
+    """
+    ttl = min(ttl, int(CACHE_TAG_TTL.total_seconds()))
+    API_CACHE.set(key, (created, sorted(tags), result), ttl)
+
+
+def invalidate_cache_tags(*tags):
+    """Invalidate all cached API results with any of the given tags.
+
+    The invalidation is only performed once the current transaction is
+    committed so the API cannot cache a result containing data from
+    before the commit again.
+    """
+    if has_app_context():
+        g.setdefault('pending_api_cache_invalidations', set()).update(tags)
+
+
+def flush_cache_invalidations():
+    if not has_app_context():
+        return
+    if tags := g.pop('pending_api_cache_invalidations', None):
+        now = time.time()
+        API_CACHE.set_many({f'tag-{tag}': now for tag in tags}, CACHE_TAG_TTL)
+
+
+def _tag_loaded_event(target, context):
+    add_cache_tags(event_tag(target.id))
+
+
+def _tag_loaded_category(target, context):
+    add_cache_tags(category_tag(target.id))
+
+
+def setup_cache_tag_tracking():
+    """Tag API results with all events and categories loaded for them."""
+    from indico.modules.categories import Category
+    from indico.modules.events import Event
+    for model, fn in ((Event, _tag_loaded_event), (Category, _tag_loaded_category)):
+        if not contains(model, 'load', fn):
+            listen(model, 'load', fn)
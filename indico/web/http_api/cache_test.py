@@ -0,0 +1,67 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2026 CERN
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the MIT License; see the
+# LICENSE file for more details.
+
+import time
+
+import pytest
+
+from indico.web.http_api.cache import (API_CACHE, add_cache_tags, category_content_tag, category_tag,
+                                       collect_cache_tags, event_tag, flush_cache_invalidations, get_cached_result,
+                                       get_object_cache_tags, invalidate_cache_tags, set_cached_result)
+
+
+def test_cached_result_invalidation():
+    set_cached_result('a', 'result-a', {'event-1', 'user-1'}, time.time(), 60)
+    set_cached_result('b', 'result-b', {'event-2'}, time.time(), 60)
+    invalidate_cache_tags('event-1')
+    # nothing happens until the transaction has been committed
+    assert get_cached_result('a') == 'result-a'
+    flush_cache_invalidations()
+    assert get_cached_result('a') is None
+    assert get_cached_result('b') == 'result-b'
+    # results generated after the invalidation are cached again
+    set_cached_result('a', 'new-result-a', {'event-1'}, time.time(), 60)
+    assert get_cached_result('a') == 'new-result-a'
+
+
+def test_cached_result_invalidated_while_generating():
+    started = time.time()
+    invalidate_cache_tags('event-1')
+    flush_cache_invalidations()
+    set_cached_result('a', 'stale', {'event-1'}, started, 60)
+    assert get_cached_result('a') is None
+
+
+def test_cached_result_old_format():
+    # entries in the format used before results were tagged are ignored
+    API_CACHE.set('a', ('result-a', {}, time.time(), True, {}), 60)
+    assert get_cached_result('a') is None
+    set_cached_result('a', 'result-a', set(), time.time(), 60)
+    assert get_cached_result('a') == 'result-a'
+
+
+def test_collect_cache_tags():
+    add_cache_tags('ignored')
+    with collect_cache_tags() as tags:
+        add_cache_tags('event-1', 'category-2')
+    assert tags == {'event-1', 'category-2'}
+
+
+def test_collect_cache_tags_loaded_objects(db, dummy_event):
+    db.session.expunge_all()
+    with collect_cache_tags() as tags:
+        type(dummy_event).get(dummy_event.id)
+    assert event_tag(dummy_event.id) in tags
+
+
+@pytest.mark.usefixtures('db')
+def test_get_object_cache_tags(dummy_event, dummy_category, dummy_contribution):
+    expected = {event_tag(dummy_event.id), *map(category_content_tag, dummy_category.chain_ids)}
+    assert get_object_cache_tags(dummy_event) == expected
+    assert get_object_cache_tags(dummy_contribution) == expected
+    assert get_object_cache_tags(dummy_category) == {category_tag(dummy_category.id),
+                                                     *map(category_content_tag, dummy_category.chain_ids)}
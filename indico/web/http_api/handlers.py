@@ -20,7 +20,6 @@ from authlib.oauth2 import OAuth2Error
 from flask import current_app, g, request, session
 from werkzeug.exceptions import BadRequest, NotFound
 
-from indico.core.cache import make_scoped_cache
 from indico.core.db import db
 from indico.core.logger import Logger
 from indico.core.oauth import require_oauth
@@ -28,6 +27,7 @@ from indico.modules.api import APIMode, api_settings
 from indico.modules.api.models.keys import APIKey
 from indico.util.signals import make_interceptable
 from indico.web.http_api import HTTPAPIHook
+from indico.web.http_api.cache import collect_cache_tags, get_cached_result, set_cached_result, user_tag
 from indico.web.http_api.metadata.serializer import Serializer
 from indico.web.http_api.responses import HTTPAPIError, HTTPAPIResult, HTTPAPIResultSchema
 from indico.web.http_api.util import get_query_parameter
@@ -36,8 +36,6 @@ from indico.web.http_api.util import get_query_parameter
 # Remove the extension at the end or before the querystring
 RE_REMOVE_EXTENSION = re.compile(r'\.(\w+)(?:$|(?=\?))')
 
-API_CACHE = make_scoped_cache('legacy-http-api')
-
 
 def normalizeQuery(path, query, remove=('signature',), separate=False):
     """Normalize request path and query so it can be used for caching and signing.
@@ -214,7 +212,7 @@ def handler(prefix, path):
         addToCache = not hook.NO_CACHE
         cacheKey = RE_REMOVE_EXTENSION.sub('', cacheKey)
         if not noCache:
-            obj = API_CACHE.get(cacheKey)
+            obj = get_cached_result(cacheKey)
             if obj is not None:
                 result, extra, ts, complete, typeMap = obj
                 addToCache = False
@@ -222,7 +220,9 @@ def handler(prefix, path):
         g.current_api_user = user
         if result is None:
             # Perform the actual exporting
-            res = hook(user)
+            started = time.time()
+            with collect_cache_tags() as cacheTags:
+                res = hook(user)
             if isinstance(res, current_app.response_class):
                 addToCache = False
                 is_response = True
@@ -234,7 +234,9 @@ def handler(prefix, path):
         if result is not None and addToCache:
             ttl = api_settings.get('cache_ttl')
             if ttl > 0:
-                API_CACHE.set(cacheKey, (result, extra, ts, complete, typeMap), ttl)
+                if user is not None:
+                    cacheTags.add(user_tag(user.id))
+                set_cached_result(cacheKey, (result, extra, ts, complete, typeMap), cacheTags, started, ttl)
     except HTTPAPIError as e:
         error = e
         if e.code:
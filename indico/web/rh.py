@@ -30,6 +30,7 @@ from indico.core.notifications import flush_email_queue, init_email_queue
 from indico.util.i18n import _
 from indico.util.locators import get_locator
 from indico.util.signals import values_from_signal
+from indico.web.flask.stats import request_stats_phase
 from indico.web.flask.util import url_for
 from indico.web.util import get_request_user
 
@@ -244,7 +245,8 @@ class RH:
 
     def _do_process(self):
         try:
-            args_result = self._process_args()
+            with request_stats_phase('_process_args'):
+                args_result = self._process_args()
             signals.rh.process_args.send(type(self), rh=self, result=args_result)
             if isinstance(args_result, (current_app.response_class, Response)):
                 return args_result
@@ -258,7 +260,8 @@ class RH:
         if not all(signal_rv):
             raise Forbidden('Unauthorized access.')
         if not signal_rv:
-            self._check_access()
+            with request_stats_phase('_check_access'):
+                self._check_access()
         signals.rh.check_access.send(type(self), rh=self)
 
         if rv := self.normalize_url(late=True):
@@ -277,7 +280,8 @@ class RH:
             cProfile.runctx('result[0] = self._process()', globals(), locals(), profile_path)
             rv = result[0]
         else:
-            rv = self._process()
+            with request_stats_phase('_process'):
+                rv = self._process()
 
         signal_rv = values_from_signal(signals.rh.process.send(type(self), rh=self, result=rv),
                                        single_value=True, as_list=True)